@@ -31,6 +31,9 @@ RUNNING THE SERVER:
    python app.py
    
    The server will start at http://localhost:5000
+   
+   (Or `python asgi.py` for the async server, which copes better
+   with many slow uploads at once; see asgi.py.)
 
 4. Test it's working:
    
@@ -38,6 +41,9 @@ RUNNING THE SERVER:
    http://localhost:5000/api/config
    
    You should see a JSON response.
+   
+   The kiosk page itself is served at http://localhost:5000/
+   as a cached, precompressed bundle (see bundle.py).
 
 ================================================================
 WINDOWS KIOSK NOTES:
@@ -62,49 +68,149 @@ the Python server automatically when the machine boots.
 # SECTION 1: IMPORTS
 # ================================================================
 
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, current_app, jsonify, request, send_file
 from flask_cors import CORS
 import os
 import json
+import time
+import logging
+import importlib
+import hmac
+import threading
 from datetime import datetime
 
 # Import our configuration
-from config import API_PORT, STORAGE_MODE, DEBUG_MODE
+import config
+from config import API_PORT, API_VERSION, STORAGE_MODE, DEBUG_MODE, print_config
+from config_loader import config_info, config_version, on_config_change, start_config_watcher
+
+# Photo/video serving with Range requests and caching
+from media import media, media_url
+
+# Missionary gallery manifests and thumbnails (see gallery.py)
+from gallery import clear_gallery_cache, gallery, warm_galleries
+
+# Image sizes and placeholders (see catalog.py)
+from catalog import catalog, describe_assets
+
+# Several API calls in one round trip (see batch.py)
+from batch import batch
+
+# The kiosk page as a fingerprinted, precompressed bundle (see bundle.py)
+from bundle import bundle
+
+# Render timings reported by the kiosk page (see telemetry.py)
+from telemetry import start_telemetry_rollup, telemetry
+
+# Kiosk selfies forwarded to the Apps Script web app (see selfie_relay.py)
+from selfie_relay import outbox_depth, relay_status, selfie_relay, start_selfie_relay
+
+# Screensaver rotation order and screen-sized copies (see playlist.py)
+from playlist import build_playlist
+
+# What the service worker keeps for offline boot (see precache.py)
+from precache import build_precache_manifest
+
+# Streaming backup archives (see backup.py)
+from backup import import_stream, parse_since, plan_export, stream_export
+
+# Background archiving of old selfies (see retention.py)
+from retention import retention_status, start_retention_worker
+
+# Resource sampling for /api/health?deep=1 (see resource_watchdog.py)
+from resource_watchdog import start_watchdog, watch_cache, watch_queue, watchdog_report
+
+# Typed records, request validation and the fast JSON encoder
+# (see records.py)
+from records import Miracle, Selfie, TempleVisit, check_date, encoder_name, install_json_provider
+
+# Selfie wall image drawn from cached tiles (see mosaic.py)
+from mosaic import clear_mosaic_cache, parse_side, render_mosaic
+
+# Mission map spatial index and clustering (see geo_index.py)
+from geo_index import clear_mission_index, get_mission_index
+
+# Sharing records between kiosks (see replication.py)
+from blob_store import HASH_PATTERN, clear_hash_cache
+from replication import (HOPS_HEADER, KEY_HEADER, fetch_blob, read_changes,
+                         record_local_changes, replication_status, run_sync_pass,
+                         start_replication_worker)
+
+# CSV / JSON Lines bulk loading (see bulk_import.py)
+from bulk_import import detect_format, import_rows, validate_missionary, validate_temple_visit
+
+# Per-client rate limits and upload back-pressure
+from rate_limit import install_rate_limiter
+
+# Replaying retried POSTs by Idempotency-Key (see idempotency.py)
+from idempotency import HEADER as IDEMPOTENCY_HEADER, REPLAYED_HEADER, idempotency_stats, install_idempotency
 
-# Import storage modules
-from storage_local import LocalStorage
-from storage_google_drive import GoogleDriveStorage
+# Opt-in request profiling (no-op unless enabled in config.py)
+from profiling import PROFILE_HEADER, install_profiler, list_profiles, get_profile_path
+
+# NOTE: Storage modules are NOT imported here. Only the backend
+# selected by STORAGE_MODE is imported, on first use, so local
+# mode never pays for the Google API client libraries.
 
 
 # ================================================================
-# SECTION 2: APP INITIALIZATION
+# SECTION 2: API BLUEPRINT
 # ================================================================
 
-app = Flask(__name__)
-
-# Enable CORS (Cross-Origin Resource Sharing)
-# This allows the frontend to call the API from a different origin
-# (e.g., frontend served from file:// or GitHub Pages)
-CORS(app, resources={
-    r"/api/*": {
-        "origins": "*",  # Allow all origins (tighten for production)
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
+# All /api/* routes are registered on this blueprint, and
+# create_app() (near the end of this file) attaches it to an app.
+api = Blueprint('api', __name__)
 
 
 # ================================================================
-# SECTION 3: STORAGE INITIALIZATION
+# SECTION 3: STORAGE LOADING
 # ================================================================
 
-# Select storage backend based on configuration
-if STORAGE_MODE == "googleDrive":
-    storage = GoogleDriveStorage()
-    print("[Backend] Using Google Drive storage")
-else:
-    storage = LocalStorage()
-    print("[Backend] Using local filesystem storage")
+# STORAGE_MODE value -> (module name, class name)
+STORAGE_BACKENDS = {
+    "local": ("storage_local", "LocalStorage"),
+    "googleDrive": ("storage_google_drive", "GoogleDriveStorage")
+}
+
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    Get the storage backend for the current app, loading it on first use.
+    
+    The selected backend module is imported and constructed the
+    first time a request needs it, and the time that took is
+    recorded for /api/health.
+    
+    Returns:
+        LocalStorage or GoogleDriveStorage instance
+    """
+    state = current_app.extensions['kiosk']
+    if state['storage'] is None:
+        with _storage_lock:
+            if state['storage'] is None:
+                load_storage(state)
+    return state['storage']
+
+
+def load_storage(state):
+    """
+    Import and construct the storage backend selected by STORAGE_MODE.
+    
+    Args:
+        state: The app's kiosk state dict (app.extensions['kiosk'])
+    """
+    module_name, class_name = STORAGE_BACKENDS.get(STORAGE_MODE, STORAGE_BACKENDS["local"])
+    
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    state['storage'] = getattr(module, class_name)()
+    state['storage'].add_change_listener(record_local_changes)
+    state['storage_init_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    
+    print(f"[Backend] Using {STORAGE_MODE} storage: {class_name} "
+          f"loaded in {state['storage_init_ms']} ms")
 
 
 # ================================================================
@@ -166,7 +272,7 @@ def todo_response(endpoint_name):
 # SECTION 5: CONFIGURATION ENDPOINT
 # ================================================================
 
-@app.route('/api/config', methods=['GET'])
+@api.route('/api/config', methods=['GET'])
 def get_config():
     """
     GET /api/config
@@ -174,38 +280,55 @@ def get_config():
     Returns the backend configuration.
     Frontend can use this to sync settings.
     
+    The response carries a weak ETag of the effective config
+    version. Clients that send it back in If-None-Match get an
+    empty 304 until the config changes (server_time is then the
+    time of the cached response).
+    
     Response:
     {
         "status": "ok",
         "data": {
             "storage_mode": "local",
             "api_version": "1.0.0",
+            "config_version": "3f9a0c2b7d1e4a56",
             ...
         }
     }
     """
+    version = config_version()
+    etag = f'W/"{version}"'
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    info = config_info()
     config_data = {
         "storage_mode": STORAGE_MODE,
-        "api_version": "1.0.0",
+        "api_version": API_VERSION,
         "debug_mode": DEBUG_MODE,
+        "config_version": version,
+        "config_loaded_at": info["loaded_at"],
+        "config_overrides": info["overrides"],
         "server_time": datetime.now().isoformat()
     }
-    return success_response(data=config_data)
+    response = success_response(data=config_data)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 # ================================================================
 # SECTION 6: TEMPLE VISITS ENDPOINTS
 # ================================================================
 
-@app.route('/api/temple-visits', methods=['GET'])
+@api.route('/api/temple-visits', methods=['GET'])
 def get_temple_visits():
     """
     GET /api/temple-visits
     
     Returns all temple visit records.
     
-    TODO: Implement actual data loading from storage
-    
     Response:
     {
         "status": "ok",
@@ -215,15 +338,11 @@ def get_temple_visits():
         ]
     }
     """
-    # TODO: Load from storage
-    # visits = storage.list_temple_visits()
-    # return success_response(data=visits)
-    
-    # Placeholder response
-    return success_response(data=[], message="Temple visits endpoint ready (no data yet)")
+    visits = get_storage().list_temple_visits()
+    return success_response(data=visits)
 
 
-@app.route('/api/temple-visits', methods=['POST'])
+@api.route('/api/temple-visits', methods=['POST'])
 def post_temple_visit():
     """
     POST /api/temple-visits
@@ -237,37 +356,82 @@ def post_temple_visit():
         "notes": "Great temple trip!"
     }
     
-    TODO: Implement actual data saving to storage
+    The body is checked by TempleVisit.validate() (records.py);
+    invalid data gets a 400 with the reason.
     """
     data = request.get_json()
     
     if not data:
         return error_response("No data provided")
     
-    # Validate required fields
-    if 'date' not in data:
-        return error_response("'date' field is required")
+    try:
+        visit = TempleVisit.validate(data)
+    except ValueError as e:
+        return error_response(str(e))
     
-    # TODO: Save to storage
-    # result = storage.save_temple_visit(data)
-    # return success_response(data=result, message="Temple visit saved")
+    result = get_storage().save_temple_visit(visit.to_dict())
+    if result is None:
+        return error_response("Failed to save temple visit", 500)
+    return success_response(data=result, message="Temple visit saved")
+
+
+def bulk_import_response(validate, save_batch):
+    """
+    Run a bulk import of the request body (see bulk_import.py).
+    
+    Args:
+        validate: Row validator
+        save_batch: Storage method saving a list of records
+    
+    Returns:
+        JSON response with the import summary
+    """
+    try:
+        file_format = detect_format(request.content_type, request.args.get('format'))
+    except ValueError as e:
+        return error_response(str(e), 415)
+    
+    summary = import_rows(request.stream, file_format, validate, save_batch)
+    message = f"{summary['saved']} of {summary['received']} rows saved"
+    return success_response(data=summary, message=message)
+
+
+@api.route('/api/temple-visits/bulk', methods=['POST'])
+def post_temple_visits_bulk():
+    """
+    POST /api/temple-visits/bulk
     
-    # Placeholder response
-    return todo_response("POST /api/temple-visits")
+    Add many temple visits from a CSV (header row: date,count,notes)
+    or JSON Lines file sent as the request body. Invalid rows are
+    skipped and reported; the others are saved in batches.
+    
+    Response:
+    {
+        "status": "ok",
+        "message": "364 of 365 rows saved",
+        "data": {
+            "received": 365, "saved": 364, "failed": 1, "batches": 1,
+            "errors": [ { "line": 42, "error": "'date' is required" } ],
+            "errors_truncated": false
+        }
+    }
+    """
+    return bulk_import_response(validate_temple_visit, get_storage().save_temple_visits)
 
 
 # ================================================================
 # SECTION 7: SELFIES ENDPOINTS
 # ================================================================
 
-@app.route('/api/selfies', methods=['GET'])
+@api.route('/api/selfies', methods=['GET'])
 def get_selfies():
     """
     GET /api/selfies
     
     Returns list of all selfie metadata.
     
-    TODO: Implement actual selfie listing from storage
+    Old selfies are moved to an archive by retention.py;
+    ?archived=1 lists those instead.
     
     Response:
     {
@@ -278,14 +442,13 @@ def get_selfies():
         ]
     }
     """
-    # TODO: Load from storage
-    # selfies = storage.list_selfies()
-    # return success_response(data=selfies)
-    
-    return success_response(data=[], message="Selfies endpoint ready (no data yet)")
+    if request.args.get('archived') == '1':
+        return success_response(data=get_storage().list_archived_selfies())
+    selfies = get_storage().list_selfies()
+    return success_response(data=selfies)
 
 
-@app.route('/api/selfies', methods=['POST'])
+@api.route('/api/selfies', methods=['POST'])
 def post_selfie():
     """
     POST /api/selfies
@@ -298,7 +461,12 @@ def post_selfie():
         "caption": "Optional caption"
     }
     
-    TODO: Implement actual image saving to storage
+    Identical images are stored once. Re-sending the same image
+    within SELFIE_DUPLICATE_WINDOW_SECONDS (a double-tapped capture
+    button) returns the earlier selfie with "duplicate": true; a
+    selfie that only looks the same is saved with
+    "near_duplicate_of": <id>.
+    
     TODO: Handle large image uploads efficiently
     TODO: Add image validation and compression
     """
@@ -307,21 +475,84 @@ def post_selfie():
     if not data:
         return error_response("No data provided")
     
-    if 'imageBase64' not in data:
-        return error_response("'imageBase64' field is required")
+    try:
+        image_base64, selfie = Selfie.validate(data)
+    except ValueError as e:
+        return error_response(str(e))
     
-    # TODO: Save to storage
-    # result = storage.save_selfie(data['imageBase64'], data.get('caption', ''))
-    # return success_response(data=result, message="Selfie saved")
+    result = get_storage().save_selfie(image_base64, selfie.caption)
+    if result is None:
+        return error_response("Failed to save selfie", 500)
+    if result.get('duplicate'):
+        return success_response(data=result, message="Selfie already saved")
+    return success_response(data=result, message="Selfie saved")
+
+
+@api.route('/api/selfies/mosaic', methods=['GET'])
+def get_selfie_mosaic():
+    """
+    GET /api/selfies/mosaic?w=1920&h=1080
+    
+    One JPEG of the most recent selfies side by side, sized for a
+    display (defaults: MOSAIC_DEFAULT_WIDTH x MOSAIC_DEFAULT_HEIGHT).
+    
+    The wall is drawn from cached tiles and only the tiles with a
+    new selfie are redrawn (see mosaic.py). The response has a
+    strong ETag that changes only when the wall does, so a display
+    can poll with If-None-Match and mostly get 304.
     
-    return todo_response("POST /api/selfies")
+    X-Mosaic-Tiles tells how many tiles were redrawn, e.g. "1/12".
+    """
+    try:
+        width = parse_side(request.args.get('w'), config.MOSAIC_DEFAULT_WIDTH)
+        height = parse_side(request.args.get('h'), config.MOSAIC_DEFAULT_HEIGHT)
+    except ValueError as e:
+        return error_response(str(e))
+    
+    wall = render_mosaic(get_storage(), width, height)
+    if wall is None:
+        return error_response("The selfie wall needs Pillow (pip install Pillow)", 503)
+    
+    response = send_file(os.path.abspath(wall['path']), mimetype='image/jpeg',
+                         conditional=True, etag=wall['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Mosaic-Tiles'] = f"{wall['tiles_drawn']}/{wall['tiles']}"
+    return response
+
+
+@api.route('/api/selfies/<int:selfie_id>/image', methods=['GET'])
+def get_selfie_image(selfie_id):
+    """
+    GET /api/selfies/<id>/image
+    
+    The image of an active selfie. A selfie that came from another
+    kiosk (see replication.py) has its image fetched from a peer
+    the first time it is asked for.
+    
+    The response has a strong ETag (the image's blob hash).
+    """
+    storage = get_storage()
+    selfie = next((s for s in storage.list_selfies() if s.get('id') == selfie_id), None)
+    if selfie is None:
+        return error_response("Selfie not found", 404)
+    
+    path = storage.get_selfie_path(selfie)
+    if (not path or not os.path.isfile(path)) and selfie.get('origin') and selfie.get('blob'):
+        path = fetch_blob(storage, selfie['blob'])
+    if not path or not os.path.isfile(path):
+        return error_response("Selfie image is not available", 404)
+    
+    response = send_file(os.path.abspath(path), mimetype='image/jpeg', conditional=True,
+                         etag=selfie.get('blob') or True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 # ================================================================
 # SECTION 8: MIRACLES ENDPOINTS (PHASE 2)
 # ================================================================
 
-@app.route('/api/miracles', methods=['GET'])
+@api.route('/api/miracles', methods=['GET'])
 def get_miracles():
     """
     GET /api/miracles
@@ -331,13 +562,13 @@ def get_miracles():
     TODO: Implement when Phase 2 is ready
     """
     # TODO: Load from storage
-    # miracles = storage.list_miracles()
+    # miracles = get_storage().list_miracles()
     # return success_response(data=miracles)
     
     return success_response(data=[], message="Miracles endpoint ready (Phase 2)")
 
 
-@app.route('/api/miracles', methods=['POST'])
+@api.route('/api/miracles', methods=['POST'])
 def post_miracle():
     """
     POST /api/miracles
@@ -358,6 +589,11 @@ def post_miracle():
     if not data:
         return error_response("No data provided")
     
+    try:
+        Miracle.validate(data)
+    except ValueError as e:
+        return error_response(str(e))
+    
     # TODO: Save to storage
     return todo_response("POST /api/miracles")
 
@@ -366,16 +602,43 @@ def post_miracle():
 # SECTION 9: MISSIONS ENDPOINTS (PHASE 2)
 # ================================================================
 
-@app.route('/api/missions', methods=['GET'])
+@api.route('/api/missions', methods=['GET'])
 def get_missions():
     """
     GET /api/missions
+    GET /api/missions?bbox=south,west,north,east&zoom=4
     
-    Returns all missionaries and their mission details.
+    Returns all missionaries and their mission details, as loaded
+    with POST /api/missionaries/bulk.
     
-    TODO: Implement when Phase 2 is ready
+    With bbox, returns map markers for that viewport instead:
+    missionaries close together at this zoom level are merged into
+    one cluster marker (see geo_index.py). Only the index cells
+    inside the viewport are read, so panning stays cheap. The
+    response has a weak ETag of the index version.
     
-    Response:
+    Query parameters:
+    - bbox: Viewport bounds in degrees (west > east when it crosses
+            the 180th meridian)
+    - zoom: Map zoom level, 0-22 (default 2)
+    
+    Response (bbox):
+    {
+        "status": "ok",
+        "data": {
+            "zoom": 4,
+            "precision": 3,
+            "version": 7,
+            "markers": [
+                { "type": "cluster", "count": 12, "lat": -23.1, "lng": -46.2,
+                  "geohash": "6gy", "bounds": [...], "ids": [1, 4, 9, 12, 15] },
+                { "type": "missionary", "id": 3, "name": "Elder Smith",
+                  "mission": "...", "photoUrl": "...", "lat": 40.7, "lng": -74.0 }
+            ]
+        }
+    }
+    
+    Response (no bbox):
     {
         "status": "ok",
         "data": [
@@ -391,15 +654,52 @@ def get_missions():
         ]
     }
     """
-    # TODO: Load from storage
-    return success_response(data=[], message="Missions endpoint ready (Phase 2)")
+    bbox = request.args.get('bbox')
+    if bbox is None:
+        return success_response(data=get_storage().list_missionaries())
+    
+    try:
+        south, west, north, east = (float(value) for value in bbox.split(','))
+        zoom = int(request.args.get('zoom', 2))
+    except ValueError:
+        return error_response("bbox must be south,west,north,east and zoom a whole number")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        return error_response("bbox is outside the map")
+    if not 0 <= zoom <= 22:
+        return error_response("zoom must be between 0 and 22")
+    
+    index = get_mission_index(get_storage())
+    etag = f'W/"missions-{index.version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    markers = index.query(south, west, north, east, zoom)
+    response = success_response(data=dict(markers, zoom=zoom))
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@api.route('/api/missionaries/bulk', methods=['POST'])
+def post_missionaries_bulk():
+    """
+    POST /api/missionaries/bulk
+    
+    Add many missionaries from a CSV (header row with name, mission,
+    language, scripture, photoUrl, galleryFolder, startDate, lat,
+    lng) or JSON Lines file sent as the request body. Invalid rows
+    are skipped and reported; the others are saved in batches.
+    
+    Response: same shape as POST /api/temple-visits/bulk
+    """
+    return bulk_import_response(validate_missionary, get_storage().save_missionaries)
 
 
 # ================================================================
 # SECTION 10: CALENDAR ENDPOINTS (PHASE 2)
 # ================================================================
 
-@app.route('/api/calendar', methods=['GET'])
+@api.route('/api/calendar', methods=['GET'])
 def get_calendar():
     """
     GET /api/calendar
@@ -413,8 +713,13 @@ def get_calendar():
     TODO: Implement when Phase 2 is ready
     TODO: Consider Google Calendar integration
     """
-    start_date = request.args.get('start')
-    end_date = request.args.get('end')
+    # Validated now so clients get 400 for a bad date already;
+    # the range filters nothing until events are stored
+    try:
+        check_date(request.args, 'start')
+        check_date(request.args, 'end')
+    except ValueError as e:
+        return error_response(str(e))
     
     # TODO: Load from storage/calendar API
     return success_response(data=[], message="Calendar endpoint ready (Phase 2)")
@@ -424,60 +729,637 @@ def get_calendar():
 # SECTION 11: TEMPLE PHOTOS ENDPOINT (FUTURE)
 # ================================================================
 
-@app.route('/api/temple-photos', methods=['GET'])
+@api.route('/api/temple-photos', methods=['GET'])
 def get_temple_photos():
     """
     GET /api/temple-photos
     
-    Returns list of temple photos for the screensaver.
+    Returns list of temple photos for the screensaver. Files with
+    identical contents are listed once. Each photo includes its
+    size and a tiny inline placeholder to paint while it loads.
+    
+    Response:
+    {
+        "status": "ok",
+        "data": [
+            {
+                "path": "assets/temple_photos/rome_italy_temple.jpeg",
+                "url": "/media/assets/temple_photos/rome_italy_temple.jpeg?v=...",
+                "hash": "9f2c...",
+                "size": 512345,
+                "duplicates": [],
+                "width": 1600,
+                "height": 1067,
+                "placeholder": "data:image/jpeg;base64,..."
+            },
+            ...
+        ]
+    }
+    
+    TODO: Could load from Google Drive
+    """
+    return success_response(data=list_temple_photo_catalog())
+
+
+def list_temple_photo_catalog():
+    """
+    Temple photos from storage with their URL, size and placeholder.
+    
+    Returns:
+        List of photo dicts (see get_temple_photos)
+    """
+    photos = get_storage().list_temple_photos()
+    described = describe_assets([photo['path'] for photo in photos])
+    for photo in photos:
+        photo.update(described.get(photo['path'], {'url': media_url(photo['path'])}))
+    return photos
+
+
+@api.route('/api/screensaver/playlist', methods=['GET'])
+def get_screensaver_playlist():
+    """
+    GET /api/screensaver/playlist
+    
+    Returns the screensaver's rotation: every distinct temple photo
+    once, in a shuffled order that stays the same across restarts,
+    with screen-sized image URLs. The client should download only
+    the next `prefetch` photos ahead of the one on screen.
+    
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "version": "4be1...",
+            "prefetch": 2,
+            "photos": [
+                {
+                    "path": "assets/temple_photos/rome_italy_temple.jpeg",
+                    "url": "/gallery/9f2c..._1920q82.jpg?v=...",
+                    "original_url": "/media/assets/temple_photos/rome_italy_temple.jpeg?v=...",
+                    "width": 1920,
+                    "height": 1280,
+                    "placeholder": "data:image/jpeg;base64,..."
+                },
+                ...
+            ]
+        }
+    }
+    """
+    playlist = build_playlist(list_temple_photo_catalog())
+    prefetch = config.SCREENSAVER_PREFETCH_COUNT
+    etag = f'W/"{playlist["version"]}-{prefetch}"'
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    response = success_response(data=dict(playlist, prefetch=prefetch))
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# ================================================================
+# SECTION 12: OFFLINE PRECACHE ENDPOINT
+# ================================================================
+
+@api.route('/api/precache-manifest', methods=['GET'])
+def get_precache_manifest():
+    """
+    GET /api/precache-manifest
+    
+    Everything the service worker (sw.js) keeps for booting without
+    the network: the page and its bundle, the screensaver's
+    screen-sized photos and the missionary thumbnails, each with a
+    content hash. The version changes when any entry does.
+    
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "version": "5f0c2a9e1b7d4c33",
+            "counts": { "shell": 8, "screensaver": 40, "missionaries": 63 },
+            "assets": [
+                { "url": "/bundle/app.0f5a8bd746c7.js", "hash": "0f5a8bd746c7", "group": "shell" },
+                ...
+            ]
+        }
+    }
+    """
+    manifest = build_precache_manifest(build_playlist(list_temple_photo_catalog()))
+    etag = f'W/"precache-{manifest["version"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, {'ETag': etag, 'Cache-Control': 'no-cache'}
+    
+    response = success_response(data=manifest)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+# ================================================================
+# SECTION 13: BACKUP & RESTORE ENDPOINTS
+# ================================================================
+
+@api.route('/api/export', methods=['GET'])
+def export_data():
+    """
+    GET /api/export
+    
+    Downloads all collections and selfie images as one tar
+    archive, streamed as it is generated (see backup.py).
+    
+    Query parameters:
+    - since: ISO timestamp; only records created after it (use the
+             X-Export-Timestamp of the previous export)
+    - compress: "gz" for a .tar.gz
+    
+    Response headers:
+    - X-Export-Timestamp: Pass as `since` for the next incremental export
+    """
+    if not config.EXPORT_API_ENABLED:
+        return error_response("Export is disabled (EXPORT_API_ENABLED)", 403)
     
-    TODO: Implement dynamic photo loading
-    TODO: Could load from local folder or Google Drive
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return error_response("Invalid 'since' (expected an ISO timestamp)")
+    compress = request.args.get('compress') == 'gz'
+    
+    plan = plan_export(get_storage(), since)
+    exported_at = plan['manifest']['exported_at']
+    filename = "kiosk_backup_{}{}.tar{}".format(
+        exported_at[:19].replace('-', '').replace(':', '').replace('T', '_'),
+        "_incremental" if since else "",
+        ".gz" if compress else ""
+    )
+    
+    response = current_app.response_class(
+        stream_export(plan, compress=compress),
+        mimetype='application/gzip' if compress else 'application/x-tar'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Export-Timestamp'] = exported_at
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@api.route('/api/import', methods=['POST'])
+def import_data():
+    """
+    POST /api/import
+    
+    Merges a backup archive from /api/export (the raw .tar or
+    .tar.gz as the request body) into this kiosk. Records already
+    here (same uid or same content) are skipped; new ones whose id
+    is taken get the next free id (see merge_collection() in
+    storage_local.py). Disabled unless IMPORT_API_ENABLED is set.
+    
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "manifest": { "format": 1, "exported_at": "...", ... },
+            "blobs": { "added": 120, "present": 3 },
+            "collections": { "selfies": { "added": 120, "skipped": 3 }, ... },
+            "errors": []
+        }
+    }
     """
-    # TODO: Scan photos directory and return list
-    # photos = storage.list_temple_photos()
-    # return success_response(data=photos)
+    if not config.IMPORT_API_ENABLED:
+        return error_response("Import is disabled (IMPORT_API_ENABLED)", 403)
     
-    # For now, return empty list (frontend uses config.js photos)
-    return success_response(data=[], message="Use frontend config for photos")
+    try:
+        summary = import_stream(get_storage(), request.stream)
+    except ValueError as e:
+        return error_response(str(e))
+    return success_response(data=summary, message="Backup imported")
 
 
 # ================================================================
-# SECTION 12: HEALTH CHECK ENDPOINT
+# SECTION 14: REPLICATION ENDPOINTS
 # ================================================================
+# Used by other kiosks' replication.py, not by the frontend.
+
+def check_replication_access():
+    """
+    Refuse a replication request if replication is off or the
+    shared key is wrong.
+    
+    Returns:
+        Error response, or None if the request may go ahead
+    """
+    if not config.REPLICATION_ENABLED:
+        return error_response("Replication is disabled (REPLICATION_ENABLED)", 403)
+    key = config.REPLICATION_SHARED_KEY
+    if key and not hmac.compare_digest(request.headers.get(KEY_HEADER, ''), key):
+        return error_response("Wrong or missing replication key", 403)
+    return None
+
+
+@api.route('/api/replication/changes', methods=['GET'])
+def get_replication_changes():
+    """
+    GET /api/replication/changes?since=120&limit=500
+    
+    This kiosk's change log after change number `since`.
+    
+    Query parameters:
+    - since: Last change number already seen (default 0)
+    - limit: Most changes to return (default REPLICATION_BATCH_SIZE)
+    
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "node": "3f9c0a1b2d4e",
+            "latest": 134,
+            "changes": [
+                { "seq": 121, "origin": "3f9c0a1b2d4e", "origin_seq": 121,
+                  "collection": "temple_visits", "uid": "3f9c0a1b2d4e:57@2024-01-15T10:02:11.123456",
+                  "version": "2024-01-15T17:02:11.123456Z|3f9c0a1b2d4e",
+                  "record": { "date": "2024-01-15", "count": 5, ... } },
+                ...
+            ]
+        }
+    }
+    """
+    denied = check_replication_access()
+    if denied:
+        return denied
+    
+    since = max(request.args.get('since', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', config.REPLICATION_BATCH_SIZE, type=int), 1),
+                config.REPLICATION_BATCH_SIZE)
+    return success_response(data=read_changes(since, limit))
 
-@app.route('/api/health', methods=['GET'])
+
+@api.route('/api/replication/blobs/<blob_hash>', methods=['GET'])
+def get_replication_blob(blob_hash):
+    """
+    GET /api/replication/blobs/<hash>
+    
+    A stored image by its blob hash, for a peer that has the
+    selfie record but not yet the image. An image this kiosk does
+    not have yet either is first fetched from its own peers (up to
+    MAX_BLOB_HOPS kiosks away), so images can pass through a hub.
+    """
+    denied = check_replication_access()
+    if denied:
+        return denied
+    if not HASH_PATTERN.match(blob_hash):
+        return error_response("Image not found", 404)
+    
+    hops = request.headers.get(HOPS_HEADER, 0, type=int)
+    path = fetch_blob(get_storage(), blob_hash, hops)
+    if path is None:
+        return error_response("Image not found", 404)
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream',
+                     etag=blob_hash, max_age=31536000)
+
+
+@api.route('/api/replication/status', methods=['GET'])
+def get_replication_status():
+    """
+    GET /api/replication/status
+    
+    This kiosk's node id, log length, and where it is with each peer.
+    """
+    denied = check_replication_access()
+    if denied:
+        return denied
+    return success_response(data=replication_status())
+
+
+@api.route('/api/replication/sync', methods=['POST'])
+def post_replication_sync():
+    """
+    POST /api/replication/sync
+    
+    Pull from every peer now instead of waiting for the next pass.
+    
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "http://192.168.1.22:5000": { "applied": 12 },
+            "http://192.168.1.23:5000": { "error": "timed out" }
+        }
+    }
+    """
+    denied = check_replication_access()
+    if denied:
+        return denied
+    return success_response(data=run_sync_pass(get_storage()))
+
+
+# ================================================================
+# SECTION 15: DEBUG ENDPOINTS
+# ================================================================
+# Registered only when install_profiler() installs its hooks, so
+# with profiling off these routes do not exist (404).
+
+debug = Blueprint('debug', __name__)
+
+
+@debug.route('/api/debug/profiles', methods=['GET'])
+def get_debug_profiles():
+    """
+    GET /api/debug/profiles
+    
+    Lists saved request profiles, newest first, each with its
+    top functions by cumulative time. See profiling.py for how
+    to enable profiling.
+    
+    Query parameters:
+    - limit: Maximum number of profiles (default 20)
+    - top: Functions listed per profile (default 10)
+    
+    Response:
+    {
+        "status": "ok",
+        "data": [
+            {
+                "id": "20240115_093012_123_0001_GET_api_selfies",
+                "mode": "cprofile",
+                "path": "/api/selfies",
+                "duration_ms": 48.2,
+                "top_functions": [
+                    { "function": "get_selfies (app.py:255)", "calls": 1,
+                      "total_ms": 0.01, "cumulative_ms": 47.9 },
+                    ...
+                ]
+            },
+            ...
+        ]
+    }
+    """
+    limit = request.args.get('limit', 20, type=int)
+    top = request.args.get('top', 10, type=int)
+    return success_response(data=list_profiles(limit=limit, top=top))
+
+
+@debug.route('/api/debug/profiles/<profile_id>', methods=['GET'])
+def download_debug_profile(profile_id):
+    """
+    GET /api/debug/profiles/<id>
+    
+    Downloads the raw profile file (.prof or .folded) for
+    viewing in snakeviz, speedscope or flamegraph.pl.
+    """
+    path = get_profile_path(profile_id)
+    if path is None:
+        return error_response("Profile not found", 404)
+    return send_file(path, as_attachment=True)
+
+
+# ================================================================
+# SECTION 16: HEALTH CHECK ENDPOINT
+# ================================================================
+
+@api.route('/api/health', methods=['GET'])
 def health_check():
     """
     GET /api/health
+    GET /api/health?deep=1
     
     Simple health check endpoint.
-    Returns OK if server is running.
+    Returns OK if server is running. Does not load storage, so it
+    answers immediately after boot.
+    
+    With ?deep=1 the resource watchdog's latest sample is added
+    as "watchdog" (memory, file descriptors, disk, storage latency,
+    data files, queues, threads; see resource_watchdog.py), and
+    the status code is 503 while any check is critical.
+    
+    Response:
+    {
+        "status": "ok",
+        "message": "Server is healthy",
+        "data": {
+            "uptime_seconds": 12.3,
+            "storage_mode": "local",
+            "storage_loaded": true,
+            "storage_init_ms": 1.8,
+            "selfie_retention": { "last_run": "...", "pending": 0, ... },
+            "selfie_relay": { "pending": 0, "sent_total": 14, ... },
+            "replication": { "enabled": true, "latest": 134, "peers": { ... } },
+            "json_encoder": "orjson",
+            "idempotency": { "enabled": true, "keys": 12, "replayed": 1, ... },
+            "watchdog": { "status": "ok", "checks": { ... }, ... }  (?deep=1)
+        }
+    }
     """
-    return success_response(message="Server is healthy")
+    state = current_app.extensions['kiosk']
+    health = {
+        "uptime_seconds": round(time.time() - state['started_at'], 3),
+        "storage_mode": STORAGE_MODE,
+        "storage_loaded": state['storage'] is not None,
+        "storage_init_ms": state['storage_init_ms'],
+        "selfie_retention": retention_status(),
+        "selfie_relay": relay_status(),
+        "replication": replication_status(),
+        "json_encoder": encoder_name(),
+        "idempotency": idempotency_stats()
+    }
+    if request.args.get('deep') not in ('1', 'true'):
+        return success_response(data=health, message="Server is healthy")
+    
+    report = watchdog_report(get_storage())
+    health["watchdog"] = report
+    if report["status"] == "critical":
+        return success_response(data=health, message="Server is unhealthy"), 503
+    if report["status"] == "warn":
+        return success_response(data=health, message="Server is degraded")
+    return success_response(data=health, message="Server is healthy")
 
 
 # ================================================================
-# SECTION 13: ERROR HANDLERS
+# SECTION 17: ERROR HANDLERS
 # ================================================================
 
-@app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
     return error_response("Endpoint not found", 404)
 
 
-@app.errorhandler(500)
+def too_large(error):
+    """Handle 413 errors (bodies over MAX_UPLOAD_BYTES, see rate_limit.py)."""
+    return error_response("Upload is too large", 413)
+
+
 def internal_error(error):
     """Handle 500 errors."""
     return error_response("Internal server error", 500)
 
 
 # ================================================================
-# SECTION 14: SERVER STARTUP
+# SECTION 18: APP FACTORY
+# ================================================================
+
+def create_app():
+    """
+    Create and configure the Flask app.
+    
+    Cheap and free of side effects: no storage is imported, no
+    directories are created and nothing is printed. Storage is
+    loaded by get_storage() on first use.
+    
+    Returns:
+        Flask application
+    """
+    app = Flask(__name__)
+    
+    # jsonify() and request.get_json() use the fast encoder
+    install_json_provider(app)
+    
+    app.extensions['kiosk'] = {
+        'started_at': time.time(),
+        'storage': None,
+        'storage_init_ms': None
+    }
+    
+    # Enable CORS (Cross-Origin Resource Sharing)
+    # This allows the frontend to call the API from a different origin
+    # (e.g., frontend served from file:// or GitHub Pages)
+    CORS(app, resources={
+        r"/api/*": {
+            "origins": "*",  # Allow all origins (tighten for production)
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", PROFILE_HEADER, IDEMPOTENCY_HEADER],
+            "expose_headers": ["Retry-After", "X-Export-Timestamp", REPLAYED_HEADER]
+        }
+    })
+    
+    # Answer retried POSTs from their first response, before the
+    # rate limiter charges them or their body is read
+    install_idempotency(app)
+    
+    # Reject floods with 429 before any other work is done
+    install_rate_limiter(app)
+    
+    # Wrap selected requests in a profiler when enabled in config.py,
+    # and only then serve the saved profiles
+    if install_profiler(app):
+        app.register_blueprint(debug)
+    
+    app.register_blueprint(api)
+    app.register_blueprint(media)
+    app.register_blueprint(gallery)
+    app.register_blueprint(catalog)
+    app.register_blueprint(batch)
+    app.register_blueprint(bundle)
+    app.register_blueprint(telemetry)
+    app.register_blueprint(selfie_relay)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(413, too_large)
+    app.register_error_handler(500, internal_error)
+    
+    return app
+
+
+def apply_request_logging(changes=None):
+    """
+    Show or hide per-request log lines according to LOG_REQUESTS.
+    
+    Adjusts the werkzeug logger instead of adding a hook, so
+    requests pay nothing; registered as a config change listener
+    so the flag can be flipped without a restart.
+    """
+    level = logging.INFO if config.LOG_REQUESTS else logging.WARNING
+    logging.getLogger('werkzeug').setLevel(level)
+
+
+def warm_storage(app):
+    """
+    Load storage in a background thread after startup.
+    
+    /api/health answers straight away, while the first real
+    request still finds storage ready. Then the temple photo
+    placeholders and screensaver copies are made, so the
+    screensaver's first playlist does not have to decode every
+    photo.
+    """
+    def load():
+        with app.app_context():
+            get_storage()
+            try:
+                build_playlist(list_temple_photo_catalog())
+            except Exception as e:
+                print(f"[Backend] Could not index temple photos: {e}")
+    
+    threading.Thread(target=load, daemon=True, name="storage-warmup").start()
+
+
+def start_selfie_retention(app):
+    """Start archiving old selfies in the background (see retention.py)."""
+    def storage():
+        with app.app_context():
+            return get_storage()
+    
+    start_retention_worker(storage)
+
+
+def start_replication(app):
+    """Start pulling changes from other kiosks (see replication.py)."""
+    def storage():
+        with app.app_context():
+            return get_storage()
+    
+    start_replication_worker(storage)
+
+
+def start_resource_watchdog(app):
+    """
+    Start sampling resources in the background (see
+    resource_watchdog.py), with the caches it may drop when memory
+    runs high and the retention and relay backlogs as queues.
+    """
+    def storage():
+        with app.app_context():
+            return get_storage()
+    
+    watch_cache("gallery manifests", clear_gallery_cache)
+    watch_cache("selfie wall", clear_mosaic_cache)
+    watch_cache("file hashes", clear_hash_cache)
+    watch_cache("mission index", clear_mission_index)
+    watch_queue("selfie_retention", lambda: retention_status()["pending"] or 0)
+    watch_queue("selfie_relay", outbox_depth)
+    start_watchdog(storage)
+
+
+def start_background_tasks(app):
+    """
+    Start everything a serving process runs besides requests.
+    
+    Called by `python app.py` and by asgi.py at startup; never by
+    create_app(), so importing the app stays free of side effects.
+    """
+    warm_storage(app)
+    start_selfie_retention(app)
+    start_replication(app)
+    start_resource_watchdog(app)
+    start_telemetry_rollup()
+    start_selfie_relay()
+    if config.GALLERY_WARM_ON_START:
+        warm_galleries()
+    
+    # Pick up logging flags etc. from kiosk_config.json without restart
+    apply_request_logging()
+    on_config_change(apply_request_logging)
+    start_config_watcher()
+
+
+# Module-level app for `python app.py`, `flask --app app run` and
+# WSGI servers that look for app:app
+app = create_app()
+
+
+# ================================================================
+# SECTION 19: SERVER STARTUP
 # ================================================================
 
 if __name__ == '__main__':
+    print_config()
     print("=" * 60)
     print("WARD KIOSK BACKEND SERVER")
     print("=" * 60)
@@ -488,19 +1370,45 @@ if __name__ == '__main__':
     print("")
     print("Endpoints available:")
     print("  GET  /api/config        - Get configuration")
-    print("  GET  /api/health        - Health check")
+    print("  GET  /api/health        - Health check (?deep=1 for resource checks)")
     print("  GET  /api/temple-visits - Get temple visits")
     print("  POST /api/temple-visits - Add temple visit")
-    print("  GET  /api/selfies       - Get selfies")
+    print("  POST /api/temple-visits/bulk - Add visits from CSV / JSONL")
+    print("  GET  /api/selfies       - Get selfies (?archived=1 for old ones)")
     print("  POST /api/selfies       - Upload selfie")
+    print("  POST /api/selfies/relay - Queue a kiosk selfie for Apps Script")
+    print("  GET  /api/selfies/<id>/image - Selfie image")
     print("  GET  /api/miracles      - Get miracles (Phase 2)")
     print("  POST /api/miracles      - Add miracle (Phase 2)")
-    print("  GET  /api/missions      - Get missionaries (Phase 2)")
+    print("  GET  /api/missions      - Get missionaries (?bbox=&zoom= for map markers)")
+    print("  POST /api/missionaries/bulk - Add missionaries from CSV / JSONL")
+    print("  GET  /api/missionaries/<id>/photos - Gallery photos & thumbnails")
     print("  GET  /api/calendar      - Get events (Phase 2)")
+    print("  GET  /api/debug/profiles - Saved request profiles (profiling on)")
+    print("  GET  /api/images        - Image sizes & placeholders")
+    print("  GET  /api/screensaver/playlist - Screensaver rotation")
+    print("  GET  /api/export        - Download backup archive (?since=)")
+    print("  POST /api/import        - Restore backup archive")
+    print("  GET  /api/replication/changes - Change log for other kiosks")
+    print("  POST /api/replication/sync    - Pull from other kiosks now")
+    print("  GET  /media/<path>      - Photos & videos (Range, ETag)")
+    print("  POST /api/batch         - Several API calls in one request")
+    print("  GET  /api/bootstrap     - Everything the kiosk needs at startup")
+    print("  POST /api/telemetry     - Render timings from the kiosk page")
+    print("  GET  /api/telemetry/summary - Per-minute render percentiles")
     print("")
     print("Press Ctrl+C to stop the server")
+    print("(`python asgi.py` serves the same routes on asyncio)")
     print("=" * 60)
     
+    # With DEBUG_MODE, Werkzeug's reloader runs this file twice: a
+    # watcher process and the child that serves requests (marked by
+    # WERKZEUG_RUN_MAIN). Only the serving process runs background
+    # tasks, so two workers never rewrite the same files or relay
+    # the same selfies.
+    if not DEBUG_MODE or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_tasks(app)
+    
     app.run(
         host='0.0.0.0',  # Allow connections from any IP
         port=API_PORT,
@@ -0,0 +1,578 @@
+"""
+================================================================
+ASGI.PY - ASYNC (ASGI) SERVING MODE
+================================================================
+This module serves the same Flask app (every /api/*, /media/ and
+/gallery/ route) from an asyncio event loop instead of one thread
+per connection.
+
+PURPOSE:
+- Slow clients cost a coroutine, not a thread: a request body is
+  received on the event loop (spooled to a temp file once it is
+  larger than ASGI_BODY_SPOOL_BYTES) before any thread is used,
+  and response bodies are sent on the event loop too
+- Routes, and with them all storage and Drive I/O, run on a
+  bounded pool of ASGI_MAX_WORKERS threads, so hundreds of open
+  connections never mean hundreds of threads; requests beyond the
+  pool size wait their turn
+- Bodies sent to UPLOAD_ROUTES are refused with 413 as soon as
+  they pass MAX_UPLOAD_BYTES, before they are fully received
+
+HOW IT FITS TOGETHER:
+    client ──► server (uvicorn, or the built-in one below)
+           ──► WsgiToAsgi (SECTION 1): receives the body, then
+               runs the Flask app on the thread pool
+           ──► Flask app from app.py, unchanged
+
+Responses up to FIRST_SEND_BYTES go out in one message. Longer
+ones (exports, videos) are read from the app one block at a time
+on the pool and sent as they come, and stop if the client leaves.
+
+RUNNING:
+    python asgi.py                       (uvicorn if installed,
+                                          else the built-in server)
+    uvicorn asgi:application --port 5000 (any ASGI server works)
+
+The built-in server (SECTION 2) speaks plain HTTP/1.1 with
+keep-alive and chunked bodies, which is all the kiosk needs; use
+uvicorn for TLS or HTTP/2 via a proxy.
+================================================================
+"""
+
+import sys
+import json
+import asyncio
+import tempfile
+from http import HTTPStatus
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+from config import API_PORT, ASGI_MAX_WORKERS, print_config
+from app import app, start_background_tasks
+from resource_watchdog import watch_event_loop, watch_pool
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+# Response bytes gathered before the first send; smaller responses
+# are sent in a single message
+FIRST_SEND_BYTES = 64 * 1024
+
+# Request body bytes read per receive() by the built-in server
+READ_CHUNK_BYTES = 64 * 1024
+
+# Longest request line or header line, and most header lines
+MAX_LINE_BYTES = 64 * 1024
+MAX_HEADERS = 100
+
+# Marks the end of a response iterator
+_DONE = object()
+
+
+# ================================================================
+# SECTION 1: WSGI → ASGI ADAPTER
+# ================================================================
+
+class WsgiToAsgi:
+    """
+    Run a WSGI app (the Flask app) as an ASGI app.
+
+    The request body is received in full on the event loop before
+    the WSGI app is called on a bounded thread pool.
+    """
+
+    def __init__(self, wsgi_app, max_workers, on_startup=None, body_limit=None):
+        """
+        Args:
+            wsgi_app: WSGI application
+            max_workers: Threads running the WSGI app
+            on_startup: Function called once at ASGI lifespan startup
+            body_limit: Function(scope) -> largest accepted body in
+                        bytes, or None for no limit
+        """
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi")
+        self.on_startup = on_startup
+        self.body_limit = body_limit or (lambda scope: None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "websocket":
+            # No route uses websockets; refuse the handshake
+            await receive()
+            await send({"type": "websocket.close", "code": 1000})
+
+    async def _lifespan(self, receive, send):
+        """Run on_startup at startup; stop the pool at shutdown."""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    if self.on_startup:
+                        self.on_startup()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- Request --------------------------------------------------
+
+    async def _read_body(self, scope, receive, send):
+        """
+        Receive the whole request body.
+
+        Returns:
+            Tuple of (file positioned at 0, size), or None if the
+            client left or the body was refused (413 already sent)
+        """
+        limit = self.body_limit(scope)
+        declared = _header(scope, b"content-length")
+        if limit is not None and declared and declared.isdigit() and int(declared) > limit:
+            await _send_error(send, 413, f"Upload is larger than {limit} bytes")
+            return None
+
+        body = tempfile.SpooledTemporaryFile(max_size=config.ASGI_BODY_SPOOL_BYTES)
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                return None
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if limit is not None and size > limit:
+                body.close()
+                await _send_error(send, 413, f"Upload is larger than {limit} bytes")
+                return None
+            if chunk:
+                body.write(chunk)
+            if not message.get("more_body", False):
+                break
+        body.seek(0)
+        return body, size
+
+    def _environ(self, scope, body, size):
+        """WSGI environ for an ASGI HTTP scope."""
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("127.0.0.1", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": str(server[0]),
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "CONTENT_LENGTH": str(size),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.input_terminated": True,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif name not in ("CONTENT_LENGTH", "TRANSFER_ENCODING"):
+                # The body is already de-chunked and measured
+                key = "HTTP_" + name
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    # --- Response -------------------------------------------------
+
+    def _start(self, environ):
+        """
+        Call the WSGI app and read the start of its response
+        (runs on the pool).
+
+        Returns:
+            Tuple of (status, headers, first chunks, result, iterator
+            or None if the response is complete)
+        """
+        started = []
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [status, headers]
+            return written.append
+
+        result = self.wsgi_app(environ, start_response)
+        iterator = iter(result)
+        chunks = list(written)
+        size = sum(len(chunk) for chunk in chunks)
+        while size < FIRST_SEND_BYTES:
+            chunk = next(iterator, _DONE)
+            if chunk is _DONE:
+                iterator = None
+                break
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+        if not started:
+            raise RuntimeError("WSGI app returned without calling start_response")
+        return started[0], started[1], chunks, result, iterator
+
+    async def _http(self, scope, receive, send):
+        """Serve one HTTP request."""
+        received = await self._read_body(scope, receive, send)
+        if received is None:
+            return
+        body, size = received
+
+        loop = asyncio.get_running_loop()
+        result = None
+        disconnected = None
+        try:
+            try:
+                status, headers, chunks, result, iterator = await loop.run_in_executor(
+                    self.executor, self._start, self._environ(scope, body, size))
+            except Exception as e:
+                print(f"[ASGI] {scope['method']} {scope['path']} failed: {e}")
+                await _send_error(send, 500, "Internal server error")
+                return
+
+            await send({
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                            for name, value in headers]
+            })
+            await send({"type": "http.response.body", "body": b"".join(chunks),
+                        "more_body": iterator is not None})
+            if iterator is None:
+                return
+
+            # The body was read in full, so the next message can
+            # only be the client going away
+            disconnected = asyncio.ensure_future(receive())
+            while not disconnected.done():
+                chunk = await loop.run_in_executor(self.executor, next, iterator, _DONE)
+                if chunk is _DONE:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if disconnected is not None:
+                disconnected.cancel()
+            if hasattr(result, "close"):
+                await loop.run_in_executor(self.executor, result.close)
+            body.close()
+
+
+def _header(scope, name):
+    """First value of a request header as str, or None."""
+    for header_name, value in scope.get("headers", []):
+        if header_name == name:
+            return value.decode("latin-1").strip()
+    return None
+
+
+async def _send_error(send, status, message):
+    """Send an error in the API's standard JSON format."""
+    body = json.dumps({"status": "error", "message": message}).encode("utf-8")
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+# ================================================================
+# SECTION 2: BUILT-IN HTTP/1.1 SERVER
+# ================================================================
+# Used by `python asgi.py` when uvicorn is not installed.
+
+class _BadRequest(Exception):
+    """The client sent something that is not HTTP/1.x."""
+
+
+async def _read_head(reader):
+    """
+    Read a request line and headers.
+
+    Returns:
+        Tuple of (method, target, version, headers) with headers as
+        a list of (lowercase name, value) bytes, or None if the
+        client closed the connection
+    """
+    line = await reader.readline()
+    while line in (b"\r\n", b"\n"):
+        line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+        raise _BadRequest("Malformed request line")
+    method, target, version = parts
+
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, colon, value = line.partition(b":")
+        if not colon or len(headers) >= MAX_HEADERS:
+            raise _BadRequest("Malformed or too many headers")
+        headers.append((name.strip().lower(), value.strip()))
+    return method, target, version, headers
+
+
+async def _serve_request(asgi_app, head, reader, writer):
+    """
+    Serve one request on a connection.
+
+    Returns:
+        True if the connection can take another request
+    """
+    method, target, version, headers = head
+    header_map = dict(headers)
+    path, _, query = target.partition("?")
+    timeout = config.ASGI_KEEPALIVE_SECONDS
+
+    keep_alive = (version == "HTTP/1.1" and
+                  header_map.get(b"connection", b"").lower() != b"close")
+    chunked_request = b"chunked" in header_map.get(b"transfer-encoding", b"").lower()
+    try:
+        remaining = 0 if chunked_request else int(header_map.get(b"content-length", b"0"))
+    except ValueError:
+        raise _BadRequest("Bad Content-Length")
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": version[len("HTTP/"):],
+        "method": method.upper(),
+        "scheme": "http",
+        "path": unquote(path),
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": headers,
+        "client": writer.get_extra_info("peername")[:2],
+        "server": writer.get_extra_info("sockname")[:2]
+    }
+
+    state = {"body_done": False, "continued": False,
+             "status": None, "head_sent": False, "chunked": False, "finished": False}
+    closed = asyncio.Event()
+
+    async def receive():
+        nonlocal remaining
+        if state["body_done"]:
+            await closed.wait()
+            return {"type": "http.disconnect"}
+        if (not state["continued"] and (remaining or chunked_request) and
+                header_map.get(b"expect", b"").lower() == b"100-continue"):
+            state["continued"] = True
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        if chunked_request:
+            size_line = await asyncio.wait_for(reader.readline(), timeout)
+            try:
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            except ValueError:
+                raise _BadRequest("Bad chunk size")
+            if size == 0:
+                while await asyncio.wait_for(reader.readline(), timeout) not in (b"\r\n", b"\n", b""):
+                    pass
+                state["body_done"] = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            data = await asyncio.wait_for(reader.readexactly(size), timeout)
+            await reader.readline()
+            return {"type": "http.request", "body": data, "more_body": True}
+        data = b""
+        if remaining:
+            data = await asyncio.wait_for(reader.readexactly(min(remaining, READ_CHUNK_BYTES)),
+                                          timeout)
+            remaining -= len(data)
+        state["body_done"] = remaining == 0
+        return {"type": "http.request", "body": data, "more_body": remaining > 0}
+
+    async def send(message):
+        nonlocal keep_alive
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+            state["headers"] = list(message.get("headers", []))
+            return
+        if message["type"] != "http.response.body" or state["finished"]:
+            return
+
+        if not state["head_sent"]:
+            response_headers = state["headers"]
+            names = {name.lower() for name, _ in response_headers}
+            if b"content-length" not in names:
+                if version == "HTTP/1.1":
+                    state["chunked"] = True
+                    response_headers.append((b"transfer-encoding", b"chunked"))
+                else:
+                    keep_alive = False
+            if not keep_alive:
+                response_headers.append((b"connection", b"close"))
+            status = state["status"]
+            try:
+                reason = HTTPStatus(status).phrase
+            except ValueError:
+                reason = ""
+            lines = [f"HTTP/1.1 {status} {reason}".encode("latin-1")]
+            lines += [name + b": " + value for name, value in response_headers]
+            writer.write(b"\r\n".join(lines) + b"\r\n\r\n")
+            state["head_sent"] = True
+
+        body = message.get("body", b"")
+        if body and scope["method"] != "HEAD":
+            if state["chunked"]:
+                writer.write(b"%x\r\n%s\r\n" % (len(body), body))
+            else:
+                writer.write(body)
+        if not message.get("more_body", False):
+            if state["chunked"] and scope["method"] != "HEAD":
+                writer.write(b"0\r\n\r\n")
+            state["finished"] = True
+        await writer.drain()
+
+    try:
+        await asgi_app(scope, receive, send)
+    finally:
+        closed.set()
+
+    if config.LOG_REQUESTS:
+        print(f'{scope["client"][0]} - - "{method} {target} {version}" {state["status"]} -')
+    if not state["head_sent"]:
+        await send({"type": "http.response.start", "status": 500, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        return False
+    # A body the app did not read would be taken for the next request
+    return keep_alive and state["finished"] and state["body_done"]
+
+
+async def _serve_connection(asgi_app, reader, writer):
+    """Serve requests on one connection until it closes or idles out."""
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(_read_head(reader), config.ASGI_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                break
+            if head is None:
+                break
+            if not await _serve_request(asgi_app, head, reader, writer):
+                break
+    except (_BadRequest, ValueError):
+        # ValueError: a line longer than MAX_LINE_BYTES
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        pass
+    finally:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def serve(asgi_app, host, port):
+    """
+    Serve an ASGI app until cancelled (Ctrl+C).
+
+    Args:
+        asgi_app: ASGI application
+        host: Address to listen on
+        port: Port to listen on
+    """
+    inbox = asyncio.Queue()
+    outbox = asyncio.Queue()
+    lifespan = asyncio.ensure_future(asgi_app({"type": "lifespan", "asgi": {"version": "3.0"}},
+                                              inbox.get, outbox.put))
+    await inbox.put({"type": "lifespan.startup"})
+    reply = await outbox.get()
+    if reply["type"] == "lifespan.startup.failed":
+        raise RuntimeError(f"Startup failed: {reply.get('message')}")
+
+    server = await asyncio.start_server(
+        lambda reader, writer: _serve_connection(asgi_app, reader, writer),
+        host, port, limit=MAX_LINE_BYTES, backlog=1024)
+    print(f"[ASGI] Serving on http://{host}:{port} (built-in server, "
+          f"{ASGI_MAX_WORKERS} worker threads)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await inbox.put({"type": "lifespan.shutdown"})
+        await asyncio.wait_for(lifespan, 5)
+
+
+# ================================================================
+# SECTION 3: THE ASGI APPLICATION
+# ================================================================
+
+def upload_body_limit(scope):
+    """
+    MAX_UPLOAD_BYTES for UPLOAD_ROUTES, no limit elsewhere (the
+    same rule rate_limit.py applies, but before the body arrives).
+    """
+    try:
+        rule, _ = app.url_map.bind("localhost").match(
+            scope["path"], method=scope["method"], return_rule=True)
+    except Exception:
+        return None
+    if f"{scope['method']} {rule.rule}" in config.UPLOAD_ROUTES:
+        return config.MAX_UPLOAD_BYTES
+    return None
+
+
+def _startup():
+    """
+    Start the background tasks, and have the resource watchdog watch
+    the worker threads and how late the event loop runs (called on
+    the event loop at lifespan startup).
+    """
+    start_background_tasks(app)
+    watch_pool("asgi", application.executor)
+    watch_event_loop(asyncio.get_running_loop())
+
+
+# For `uvicorn asgi:application` and other ASGI servers
+application = WsgiToAsgi(app, ASGI_MAX_WORKERS,
+                         on_startup=_startup,
+                         body_limit=upload_body_limit)
+
+
+if __name__ == '__main__':
+    print_config()
+    print("=" * 60)
+    print("WARD KIOSK BACKEND SERVER (ASGI)")
+    print("=" * 60)
+
+    uvicorn = None
+    if config.ASGI_SERVER in ("auto", "uvicorn"):
+        try:
+            import uvicorn
+        except ImportError:
+            if config.ASGI_SERVER == "uvicorn":
+                print("[ASGI] ASGI_SERVER is 'uvicorn' but it is not installed "
+                      "(pip install uvicorn)")
+                sys.exit(1)
+
+    try:
+        if uvicorn:
+            uvicorn.run(application, host="0.0.0.0", port=API_PORT, lifespan="on",
+                        access_log=config.LOG_REQUESTS)
+        else:
+            asyncio.run(serve(application, "0.0.0.0", API_PORT))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,448 @@
+"""
+================================================================
+BACKUP.PY - STREAMING EXPORT & IMPORT OF KIOSK DATA
+================================================================
+This module packs everything the kiosk has stored (the JSON
+collections and the selfie images) into one tar archive, and
+unpacks such an archive into another kiosk.
+
+PURPOSE:
+- GET /api/export and `python backup.py export` write the archive
+  as it is generated: each selfie image is read and sent in
+  EXPORT_CHUNK_SIZE pieces, so a backup of gigabytes of selfies
+  needs a few MB of memory and no temp file
+- With `since`, only records created after that time (and the
+  images they use) are exported, for incremental backups
+- POST /api/import and `python backup.py import` read an archive
+  as it arrives and merge it in: a record already here (same uid,
+  or same content apart from its local id and image location) is
+  skipped, so importing the same backup twice changes nothing; a
+  new record whose id is taken gets the next free id
+
+ARCHIVE LAYOUT (tar, optionally gzipped):
+    manifest.json                 (format, exported_at, since, counts)
+    blobs/1a4bf0a8c147f1bf...     (selfie images, by content hash)
+    collections/selfies.json
+    collections/archived_selfies.json
+    collections/temple_visits.json
+    ...
+
+Images come before the collections, so an import that stops half
+way never leaves a selfie record pointing at a missing image.
+Tar rather than zip because a tar member's header goes before its
+data and nothing is written at the end, so the archive can be
+produced and consumed front to back.
+
+INCREMENTAL BACKUPS:
+Every export records its start time in manifest.json (and in the
+X-Export-Timestamp response header). Pass that value as `since`
+next time to get only what was added in between.
+
+USAGE (from the backend folder):
+    python backup.py export -o weekly.tar
+    python backup.py export --since 2024-01-15T09:30:00 --gzip -o inc.tar.gz
+    python backup.py import weekly.tar
+
+    curl -o backup.tar http://localhost:5000/api/export
+    curl --data-binary @backup.tar http://localhost:5000/api/import
+================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import tarfile
+import argparse
+from datetime import datetime
+from blob_store import HASH_PATTERN, hash_file
+
+# Archive layout version, checked on import
+EXPORT_FORMAT = 1
+
+# Bytes read from an image file per chunk of the export stream
+EXPORT_CHUNK_SIZE = 1024 * 1024
+
+# Size of a tar block; member data is padded to a multiple of it
+TAR_BLOCK_SIZE = tarfile.BLOCKSIZE
+
+# gzip compression level for ?compress=gz (images barely shrink,
+# so favour speed)
+GZIP_LEVEL = 1
+
+
+# ================================================================
+# SECTION 1: TIMESTAMPS
+# ================================================================
+
+def parse_since(value):
+    """
+    Parse the `since` of an incremental export.
+
+    Args:
+        value: ISO 8601 timestamp (e.g. "2024-01-15T09:30:00"), or
+               None / "" for a full export
+
+    Returns:
+        Naive local datetime, or None
+
+    Raises:
+        ValueError: If the value is not an ISO timestamp
+    """
+    if not value:
+        return None
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        # Stored records use naive local time
+        since = since.astimezone().replace(tzinfo=None)
+    return since
+
+
+def _record_time(record):
+    """When a record was created, or None if it does not say."""
+    value = record.get('created_at') or record.get('timestamp')
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ================================================================
+# SECTION 2: EXPORT
+# ================================================================
+
+def plan_export(storage, since=None):
+    """
+    Decide what an export contains.
+
+    The collections are read here (they are small); images are
+    only listed, and read later while streaming.
+
+    Records without a creation time are always included; import
+    skips them when they are already present.
+
+    Args:
+        storage: Storage backend (LocalStorage)
+        since: Only include records created after this datetime
+
+    Returns:
+        Dict with manifest, collections (name -> records) and
+        blobs (list of (hash, file path))
+    """
+    exported_at = datetime.now()
+    collections = {}
+    blobs = {}
+
+    for name in storage.list_collections():
+        records = storage.list_collection(name)
+        if since is not None:
+            records = [record for record in records
+                       if (_record_time(record) or exported_at) > since]
+
+        if name in ('selfies', 'archived_selfies'):
+            records = [_add_selfie_blob(storage, record, blobs) for record in records]
+        collections[name] = records
+
+    manifest = {
+        "format": EXPORT_FORMAT,
+        "exported_at": exported_at.isoformat(),
+        "since": since.isoformat() if since else None,
+        "collections": {name: len(records) for name, records in collections.items()},
+        "blobs": len(blobs)
+    }
+    return {"manifest": manifest, "collections": collections, "blobs": sorted(blobs.items())}
+
+
+def _add_selfie_blob(storage, record, blobs):
+    """
+    Add a selfie's image to the blobs to export.
+
+    Selfies saved before the blob store existed have a 'filename'
+    instead of a 'blob'; their image is exported as a blob too and
+    the exported record gets the 'blob' hash, so the importing
+    kiosk stores it like any other selfie.
+
+    Archived selfies export their hot copy and thumbnail; the
+    gzipped originals in the cold folder are not included.
+
+    Returns:
+        The record to export
+    """
+    path = storage.get_selfie_path(record)
+    if not path or not os.path.isfile(path):
+        if path:
+            print(f"[Backup] Image of selfie {record.get('id')} is missing, exporting record only",
+                  file=sys.stderr)
+        return record
+
+    blob_hash = record.get('blob') or hash_file(path)
+    blobs[blob_hash] = path
+    if record.get('thumb') and storage.blobs.exists(record['thumb']):
+        blobs[record['thumb']] = storage.blobs.path(record['thumb'])
+    if record.get('blob') != blob_hash:
+        record = dict(record, blob=blob_hash)
+    return record
+
+
+def _member_header(name, size, mtime):
+    """Tar header block(s) for a regular file member."""
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, encoding='utf-8', errors='strict')
+
+
+def _padding(size):
+    """Zero bytes that fill a member's data up to a whole tar block."""
+    return b'\0' * (-size % TAR_BLOCK_SIZE)
+
+
+def _bytes_member(name, data, mtime):
+    """Chunks of a tar member holding in-memory bytes."""
+    yield _member_header(name, len(data), mtime)
+    yield data
+    yield _padding(len(data))
+
+
+def _file_member(name, path):
+    """
+    Chunks of a tar member holding a file, read EXPORT_CHUNK_SIZE
+    bytes at a time.
+    """
+    with open(path, 'rb') as f:
+        stat_result = os.fstat(f.fileno())
+        size = stat_result.st_size
+        yield _member_header(name, size, stat_result.st_mtime)
+
+        remaining = size
+        while remaining > 0:
+            chunk = f.read(min(EXPORT_CHUNK_SIZE, remaining))
+            if not chunk:
+                # Blobs never change, so this means the file was cut
+                # short under us; keep the archive well-formed
+                chunk = b'\0' * remaining
+            remaining -= len(chunk)
+            yield chunk
+    yield _padding(size)
+
+
+def _tar_chunks(plan):
+    """Chunks of the uncompressed archive."""
+    mtime = time.time()
+    manifest = json.dumps(plan["manifest"], indent=2).encode('utf-8')
+    yield from _bytes_member("manifest.json", manifest, mtime)
+
+    for blob_hash, path in plan["blobs"]:
+        try:
+            yield from _file_member(f"blobs/{blob_hash}", path)
+        except FileNotFoundError:
+            print(f"[Backup] Blob {blob_hash} disappeared during export, skipped", file=sys.stderr)
+
+    for name, records in plan["collections"].items():
+        data = json.dumps(records, indent=2, ensure_ascii=False).encode('utf-8')
+        yield from _bytes_member(f"collections/{name}.json", data, mtime)
+
+    # End-of-archive marker
+    yield b'\0' * (TAR_BLOCK_SIZE * 2)
+
+
+def _gzip_chunks(chunks):
+    """gzip-compress a stream of chunks as it goes."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(plan, compress=False):
+    """
+    Generate the archive for a plan from plan_export().
+
+    Args:
+        plan: Result of plan_export()
+        compress: gzip the archive
+
+    Yields:
+        Byte strings; written one after another they form the
+        .tar (or .tar.gz) file
+    """
+    chunks = _tar_chunks(plan)
+    if compress:
+        chunks = _gzip_chunks(chunks)
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+
+# ================================================================
+# SECTION 3: IMPORT
+# ================================================================
+
+def import_stream(storage, fileobj):
+    """
+    Merge an archive from stream_export() into storage.
+
+    The archive is read front to back exactly once (plain or
+    gzipped), so it can come straight from a request body. Images
+    are checked against their hash as they are stored.
+
+    Args:
+        storage: Storage backend (LocalStorage)
+        fileobj: Readable binary stream holding the archive
+
+    Returns:
+        Dict with manifest, blobs ({added, present}), collections
+        (name -> {added, skipped}) and errors (list of messages)
+
+    Raises:
+        ValueError: If the stream is not a kiosk backup archive
+    """
+    summary = {
+        "manifest": None,
+        "blobs": {"added": 0, "present": 0},
+        "collections": {},
+        "errors": []
+    }
+    known_collections = set(storage.list_collections())
+
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.TarError as e:
+        raise ValueError(f"Not a tar archive: {e}")
+
+    with archive:
+        try:
+            for member in archive:
+                _import_member(storage, archive, member, known_collections, summary)
+        except tarfile.TarError as e:
+            summary["errors"].append(f"Archive is truncated or damaged: {e}")
+
+    if summary["manifest"] is None:
+        raise ValueError("Archive has no manifest.json; not a kiosk backup")
+
+    print(f"[Backup] Imported {summary['blobs']['added']} new images, "
+          f"{sum(c['added'] for c in summary['collections'].values())} new records"
+          f"{', ' + str(len(summary['errors'])) + ' errors' if summary['errors'] else ''}")
+    return summary
+
+
+def _import_member(storage, archive, member, known_collections, summary):
+    """Store one archive member, recording the outcome in summary."""
+    name = member.name
+    if not member.isfile():
+        return
+
+    if name == "manifest.json":
+        manifest = json.load(archive.extractfile(member))
+        if manifest.get("format") != EXPORT_FORMAT:
+            raise ValueError(f"Unsupported backup format: {manifest.get('format')}")
+        summary["manifest"] = manifest
+        return
+
+    if summary["manifest"] is None:
+        raise ValueError("Archive does not start with manifest.json; not a kiosk backup")
+
+    if name.startswith("blobs/"):
+        blob_hash = name[len("blobs/"):]
+        if not HASH_PATTERN.match(blob_hash):
+            summary["errors"].append(f"Skipped {name}: not a blob name")
+            return
+        try:
+            is_new = storage.import_blob(archive.extractfile(member), blob_hash)
+        except ValueError as e:
+            summary["errors"].append(f"Skipped {name}: {e}")
+            return
+        summary["blobs"]["added" if is_new else "present"] += 1
+        return
+
+    if name.startswith("collections/") and name.endswith(".json"):
+        collection = name[len("collections/"):-len(".json")]
+        if collection not in known_collections:
+            summary["errors"].append(f"Skipped {name}: unknown collection")
+            return
+        try:
+            records = json.load(archive.extractfile(member))
+        except ValueError as e:
+            summary["errors"].append(f"Skipped {name}: invalid JSON ({e})")
+            return
+        result = storage.merge_collection(collection, records)
+        if result is None:
+            summary["errors"].append(f"Could not write collection {collection}")
+            return
+        added, skipped = result
+        summary["collections"][collection] = {"added": added, "skipped": skipped}
+        return
+
+    summary["errors"].append(f"Skipped {name}: unexpected file")
+
+
+# ================================================================
+# SECTION 4: COMMAND LINE
+# ================================================================
+
+def main(argv=None):
+    """python backup.py export|import ... (see module docstring)."""
+    parser = argparse.ArgumentParser(description="Back up or restore kiosk data.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write a backup archive")
+    export_parser.add_argument("-o", "--output", default="-",
+                               help="Archive file to write (default: stdout)")
+    export_parser.add_argument("--since",
+                               help="Only records created after this ISO timestamp")
+    export_parser.add_argument("--gzip", action="store_true", help="gzip the archive")
+
+    import_parser = commands.add_parser("import", help="Merge a backup archive into this kiosk")
+    import_parser.add_argument("archive", help="Archive file to read ('-' for stdin)")
+
+    args = parser.parse_args(argv)
+
+    # Imported here so --help works without a data folder
+    from storage_local import LocalStorage
+    storage = LocalStorage()
+
+    if args.command == "export":
+        try:
+            since = parse_since(args.since)
+        except ValueError:
+            parser.error(f"--since is not an ISO timestamp: {args.since}")
+        plan = plan_export(storage, since)
+
+        written = 0
+        output = sys.stdout.buffer if args.output == "-" else open(args.output, 'wb')
+        try:
+            for chunk in stream_export(plan, compress=args.gzip):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+
+        manifest = plan["manifest"]
+        print(f"[Backup] Exported {sum(manifest['collections'].values())} records and "
+              f"{manifest['blobs']} images ({written / (1024 * 1024):.1f} MB)", file=sys.stderr)
+        print(f"[Backup] Next incremental export: --since {manifest['exported_at']}",
+              file=sys.stderr)
+        return 0
+
+    source = sys.stdin.buffer if args.archive == "-" else open(args.archive, 'rb')
+    try:
+        summary = import_stream(storage, source)
+    except ValueError as e:
+        print(f"[Backup] Import failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+    for message in summary["errors"]:
+        print(f"[Backup] {message}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
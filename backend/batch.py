@@ -0,0 +1,327 @@
+"""
+================================================================
+BATCH.PY - BATCHED REQUESTS & STARTUP BOOTSTRAP
+================================================================
+This module lets the kiosk make many API calls in one HTTP round
+trip, which matters most at startup when every module asks the
+backend for something at once.
+
+PURPOSE:
+- POST /api/batch runs a list of sub-requests against the normal
+  /api/* routes and returns all their responses together
+- GET /api/bootstrap returns everything the home screen needs
+  (config, health, screensaver playlist, missionaries, calendar,
+  image sizes, media URLs) in one payload
+
+HOW SUB-REQUESTS RUN:
+Each sub-request goes through the full Flask pipeline (rate
+limiting, profiling, ETags), so it behaves exactly as if it had
+been sent on its own. Runs of consecutive GET/HEAD sub-requests
+are independent and run in parallel on a small thread pool
+(BATCH_MAX_WORKERS). Any other method runs alone, in list order,
+after everything before it has finished, so "POST then GET" sees
+the POST's result.
+
+USAGE:
+    POST /api/batch
+    {
+        "requests": [
+            { "id": "cfg", "method": "GET", "path": "/api/config" },
+            { "id": "visits", "path": "/api/temple-visits" }
+        ]
+    }
+================================================================
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from rate_limit import cap_request_body
+from resource_watchdog import watch_pool
+
+batch = Blueprint('batch', __name__)
+
+# Methods that never change data, so may run side by side
+PARALLEL_METHODS = ("GET", "HEAD")
+
+# Routes a batch may not contain (they would nest or stream)
+EXCLUDED_PATHS = ("/api/batch", "/api/bootstrap", "/api/export", "/api/import")
+
+# Sub-request headers passed on to the route
+FORWARDED_HEADERS = ("If-None-Match", "Accept-Language", "Idempotency-Key")
+
+# Sub-response headers returned to the client
+RETURNED_HEADERS = ("ETag", "Cache-Control", "Retry-After", "Idempotent-Replayed")
+
+_executor = None
+_executor_size = None
+_executor_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: RUNNING SUB-REQUESTS
+# ================================================================
+
+def _get_executor():
+    """
+    The shared thread pool, created on first use and again when
+    BATCH_MAX_WORKERS is hot-reloaded.
+
+    A replaced pool is not shut down: batches still running on it
+    finish there, and its threads exit once nothing refers to it.
+    """
+    global _executor, _executor_size
+    with _executor_lock:
+        if _executor is None or _executor_size != config.BATCH_MAX_WORKERS:
+            _executor = ThreadPoolExecutor(max_workers=config.BATCH_MAX_WORKERS,
+                                           thread_name_prefix="batch")
+            _executor_size = config.BATCH_MAX_WORKERS
+            watch_pool("batch", _executor)
+        return _executor
+
+
+def _check_sub_request(item):
+    """
+    Validate one sub-request.
+
+    Returns:
+        Tuple of (method, path, error message or None)
+    """
+    if not isinstance(item, dict):
+        return None, None, "Sub-request must be an object"
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if not isinstance(path, str) or not path.startswith('/api/'):
+        return method, path, "'path' must start with /api/"
+    if path.split('?', 1)[0].rstrip('/') in EXCLUDED_PATHS:
+        return method, path, f"{path.split('?', 1)[0]} cannot be used in a batch"
+    return method, path, None
+
+
+def _dispatch(app, base_environ, item):
+    """
+    Run one sub-request through the app and describe its response.
+
+    Args:
+        app: Flask app
+        base_environ: WSGI environ of the outer request (for the
+                      client address and host)
+        item: Sub-request dict (already checked)
+
+    Returns:
+        Dict with id, status, headers and body (parsed JSON, or
+        None for an empty / non-JSON response)
+    """
+    method = str(item.get('method', 'GET')).upper()
+    headers = {name: value for name, value in (item.get('headers') or {}).items()
+               if name in FORWARDED_HEADERS}
+
+    builder = EnvironBuilder(
+        path=item['path'],
+        method=method,
+        headers=headers,
+        json=item.get('body') if 'body' in item else None,
+        base_url=f"{base_environ.get('wsgi.url_scheme', 'http')}://"
+                 f"{base_environ.get('HTTP_HOST', 'localhost')}",
+        environ_base={'REMOTE_ADDR': base_environ.get('REMOTE_ADDR', '127.0.0.1')}
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    with app.request_context(environ):
+        response = app.full_dispatch_request()
+        try:
+            if response.is_streamed:
+                body = None
+                error = "Streamed responses cannot be batched"
+            else:
+                body = response.get_json(silent=True)
+                error = None
+        finally:
+            response.close()
+
+    result = {
+        "id": item.get('id'),
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in RETURNED_HEADERS
+                    if name in response.headers},
+        "body": body
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+def run_batch(items):
+    """
+    Run sub-requests and collect their responses in order.
+
+    Must be called inside a request (the outer one).
+
+    Args:
+        items: List of sub-request dicts with id (optional),
+               method (default GET), path, headers and body
+
+    Returns:
+        List of response dicts in the order of `items`
+    """
+    app = current_app._get_current_object()
+    base_environ = request.environ
+    executor = _get_executor()
+    results = [None] * len(items)
+
+    def run(index):
+        try:
+            results[index] = _dispatch(app, base_environ, items[index])
+        except Exception as e:
+            print(f"[Batch] Sub-request {items[index].get('path')} failed: {e}")
+            results[index] = {"id": items[index].get('id'), "status": 500,
+                              "headers": {}, "body": None, "error": "Internal server error"}
+
+    pending = []
+
+    def wait_for_pending():
+        for future in pending:
+            future.result()
+        pending.clear()
+
+    for index, item in enumerate(items):
+        method, path, error = _check_sub_request(item)
+        if error:
+            results[index] = {"id": item.get('id') if isinstance(item, dict) else None,
+                              "status": 400, "headers": {}, "body": None, "error": error}
+            continue
+
+        if method in PARALLEL_METHODS:
+            pending.append(executor.submit(run, index))
+        else:
+            # Writes are barriers: everything before has finished,
+            # nothing after starts until this one is done. They
+            # also run on the pool, so they never share the outer
+            # request's app context (and its flask.g).
+            wait_for_pending()
+            executor.submit(run, index).result()
+    wait_for_pending()
+
+    return results
+
+
+# ================================================================
+# SECTION 2: ROUTES
+# ================================================================
+
+@batch.route('/api/batch', methods=['POST'])
+def post_batch():
+    """
+    POST /api/batch
+
+    Run several API requests in one round trip.
+
+    Request body:
+    {
+        "requests": [
+            { "id": "a", "method": "GET", "path": "/api/config",
+              "headers": { "If-None-Match": "W/\\"...\\"" } },
+            { "id": "b", "method": "POST", "path": "/api/temple-visits",
+              "body": { "date": "2024-01-15", "count": 5 } }
+        ]
+    }
+
+    Response (one entry per sub-request, same order):
+    {
+        "status": "ok",
+        "data": {
+            "responses": [
+                { "id": "a", "status": 304, "headers": { "ETag": "..." }, "body": null },
+                { "id": "b", "status": 200, "headers": {}, "body": { "status": "ok", ... } }
+            ]
+        }
+    }
+    """
+    # The whole body is parsed here, before any sub-request's
+    # upload caps apply
+    too_large = cap_request_body()
+    if too_large:
+        return too_large
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list):
+        return jsonify({"status": "error", "message": "'requests' list is required"}), 400
+
+    items = data['requests']
+    if len(items) > config.BATCH_MAX_REQUESTS:
+        return jsonify({
+            "status": "error",
+            "message": f"At most {config.BATCH_MAX_REQUESTS} requests per batch"
+        }), 400
+
+    return jsonify({"status": "ok", "data": {"responses": run_batch(items)}})
+
+
+@batch.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """
+    GET /api/bootstrap?image=assets/a.jpg&media=assets/videos/v.mp4
+
+    Everything the kiosk needs at startup, in one response. The
+    parts are fetched in parallel; a part that fails is null and
+    its error is listed in "errors".
+
+    Query parameters:
+    - image: Image paths to describe (as GET /api/images)
+    - media: Media paths to get cacheable URLs for (as GET /api/media)
+
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "config": { ... },        (GET /api/config)
+            "health": { ... },        (GET /api/health)
+            "playlist": { ... },      (GET /api/screensaver/playlist)
+            "missions": [ ... ],      (GET /api/missions)
+            "calendar": [ ... ],      (GET /api/calendar)
+            "images": { "assets/a.jpg": { ... } },
+            "media": { "assets/videos/v.mp4": { "url": "/media/..." } },
+            "errors": {}
+        }
+    }
+    """
+    parts = [
+        ("config", "/api/config"),
+        ("health", "/api/health"),
+        ("playlist", "/api/screensaver/playlist"),
+        ("missions", "/api/missions"),
+        ("calendar", "/api/calendar")
+    ]
+    images = request.args.getlist('image')
+    if images:
+        parts.append(("images", "/api/images?" + urlencode([('path', path) for path in images])))
+    media_paths = request.args.getlist('media')
+    for path in media_paths:
+        parts.append((f"media:{path}", "/api/media?" + urlencode({'path': path})))
+
+    results = run_batch([{"id": key, "path": path} for key, path in parts])
+
+    payload = {"media": {}, "errors": {}}
+    for (key, _), result in zip(parts, results):
+        body = result.get("body") or {}
+        value = body.get("data") if result["status"] == 200 else None
+        if value is None and result["status"] != 200:
+            payload["errors"][key] = body.get("message") or result.get("error") or \
+                f"HTTP {result['status']}"
+
+        if key.startswith("media:"):
+            payload["media"][key[len("media:"):]] = value
+        else:
+            payload[key] = value
+
+    response = jsonify({"status": "ok", "data": payload})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,847 @@
+"""
+================================================================
+BENCHMARK.PY - BACKEND BENCHMARK & LOAD-TEST SUITE
+================================================================
+Reproducible benchmarks for the Flask backend in app.py.
+
+PURPOSE:
+- Measure the API so storage changes can be compared by number
+- Run in-process (Flask test client) or against a running server
+- Write every run to a JSON file for later comparison
+
+SCENARIOS:
+- upload:      POST /api/selfies throughput at realistic image sizes
+- list:        GET list latency at 1k / 10k / 100k records
+- concurrent:  Concurrent POST /api/temple-visits writes
+- cold_start:  Fresh interpreter to first /api/health response
+- rate_limit:  Request flood and upload burst against the 429 limits
+- records:     Memory and JSON encode/decode time of 100k records,
+               as dicts + stdlib json (before) and as records.py
+               classes + the fast encoder (after)
+
+RUNNING THE BENCHMARKS:
+================================================================
+In-process (uses a throwaway data directory, never ./data):
+
+   cd backend
+   python benchmark.py
+
+Against a running server (records are written to its storage!):
+
+   python benchmark.py --url http://localhost:5000
+
+Pick scenarios and output file:
+
+   python benchmark.py --scenarios upload,list --output before.json
+
+Compare two runs by diffing the JSON files, e.g. the
+"p50_ms" of list/temple_visits/10000 before and after a change.
+
+NOTES:
+- In-process list benchmarks seed the JSON files directly, so
+  100k records take seconds instead of 100k POSTs.
+- Against a running server the list benchmark measures whatever
+  records the server already has (seeding is skipped).
+- Random data uses a fixed seed so runs are repeatable.
+- In-process, rate limiting is switched off for every scenario
+  except rate_limit, so the others measure the storage path.
+- The records scenario always runs in this process (it measures
+  code, not a server). Its "after" numbers use orjson only if it
+  is installed; see JSON_ENCODER in config.py.
+================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import tracemalloc
+import subprocess
+import urllib.request
+import urllib.error
+from collections import Counter
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+
+# ================================================================
+# SECTION 1: DEFAULT SETTINGS
+# ================================================================
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ALL_SCENARIOS = ["upload", "list", "concurrent", "cold_start", "rate_limit", "records"]
+
+# Selfie sizes in bytes (before base64). A 720p webcam capture is
+# ~150-400 KB as JPEG; phone-quality captures run 1-3 MB.
+UPLOAD_SIZES = [150 * 1024, 500 * 1024, 1536 * 1024, 3 * 1024 * 1024]
+UPLOADS_PER_SIZE = 20
+
+# Record counts for list latency
+LIST_RECORD_COUNTS = [1000, 10000, 100000]
+LIST_ITERATIONS = 20
+
+# Concurrent temple-visit writes
+CONCURRENT_WORKERS = 8
+CONCURRENT_WRITES = 400
+
+# Cold start runs (each is a fresh Python process)
+COLD_START_RUNS = 5
+
+# Rate limit scenario: requests in the flood, and simultaneous
+# 3 MB uploads in the burst (more than MAX_CONCURRENT_UPLOADS)
+FLOOD_REQUESTS = 300
+UPLOAD_BURST = 16
+
+# Records per kind in the records scenario, and timing repeats
+RECORD_COUNT = 100000
+RECORD_REPEATS = 3
+
+RANDOM_SEED = 365
+
+
+# ================================================================
+# SECTION 2: CLIENTS
+# ================================================================
+
+class InProcessClient:
+    """
+    Calls the app through Flask's test client (no sockets).
+
+    Flask test clients are not shared between threads, so each
+    call to clone() returns a fresh client for a worker thread.
+    """
+
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._client = flask_app.test_client()
+        self.last_headers = {}
+
+    def clone(self):
+        """Return a new client for use on another thread."""
+        return InProcessClient(self.app)
+
+    def get(self, path):
+        """
+        Send a GET request.
+
+        Returns:
+            Tuple of (status_code, body_bytes)
+        """
+        response = self._client.get(path)
+        self.last_headers = response.headers
+        return response.status_code, response.get_data()
+
+    def post_json(self, path, payload):
+        """
+        Send a POST request with a JSON body.
+
+        Returns:
+            Tuple of (status_code, body_bytes)
+        """
+        response = self._client.post(path, data=payload,
+                                     content_type='application/json')
+        self.last_headers = response.headers
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    """Calls a running server over HTTP using only the stdlib."""
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.last_headers = {}
+
+    def clone(self):
+        """Return a client for use on another thread."""
+        return HttpClient(self.base_url, self.timeout)
+
+    def _send(self, req):
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                self.last_headers = response.headers
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            self.last_headers = e.headers
+            return e.code, e.read()
+
+    def get(self, path):
+        """
+        Send a GET request.
+
+        Returns:
+            Tuple of (status_code, body_bytes)
+        """
+        return self._send(urllib.request.Request(self.base_url + path))
+
+    def post_json(self, path, payload):
+        """
+        Send a POST request with a JSON body.
+
+        Returns:
+            Tuple of (status_code, body_bytes)
+        """
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=payload,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        return self._send(req)
+
+
+# ================================================================
+# SECTION 3: MEASUREMENT HELPERS
+# ================================================================
+
+def summarize_latencies(samples_ms):
+    """
+    Summarize a list of latencies.
+
+    Args:
+        samples_ms: Latencies in milliseconds
+
+    Returns:
+        Dict with count, mean, min, max and percentiles (ms)
+    """
+    if not samples_ms:
+        return {"count": 0}
+
+    ordered = sorted(samples_ms)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "min_ms": round(ordered[0], 3),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": round(ordered[-1], 3)
+    }
+
+
+def timed(fn, *args):
+    """
+    Call fn(*args) and time it.
+
+    Returns:
+        Tuple of (elapsed_ms, return_value)
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def make_selfie_payload(size_bytes, rng):
+    """
+    Build a POST /api/selfies body with an image of the given size.
+
+    Random bytes behind a JPEG header stand in for a real photo;
+    like a JPEG they do not compress, so sizes stay realistic.
+
+    Args:
+        size_bytes: Size of the decoded image
+        rng: random.Random instance (each call draws new bytes,
+             so every body is a different image)
+
+    Returns:
+        JSON-encoded request body (bytes)
+    """
+    image = b'\xff\xd8\xff\xe0' + rng.randbytes(size_bytes - 6) + b'\xff\xd9'
+    data_url = "data:image/jpeg;base64," + base64.b64encode(image).decode('ascii')
+    return json.dumps({"imageBase64": data_url, "caption": "benchmark"}).encode('utf-8')
+
+
+# ================================================================
+# SECTION 4: SCENARIOS
+# ================================================================
+
+def bench_upload(client, options):
+    """
+    Measure selfie upload throughput at each image size.
+
+    Returns:
+        Dict keyed by size in KB with latency and throughput stats
+    """
+    rng = random.Random(RANDOM_SEED)
+    results = {}
+
+    for size in options.upload_sizes:
+        # A different image per upload, so every upload is stored
+        # (an identical one would take the duplicate path)
+        payloads = [make_selfie_payload(size, rng)
+                    for _ in range(options.uploads_per_size)]
+        latencies = []
+        failures = 0
+
+        started = time.perf_counter()
+        for payload in payloads:
+            elapsed, (status, _) = timed(client.post_json, '/api/selfies', payload)
+            latencies.append(elapsed)
+            if status != 200:
+                failures += 1
+        wall = time.perf_counter() - started
+
+        stats = summarize_latencies(latencies)
+        stats["failures"] = failures
+        stats["image_bytes"] = size
+        stats["request_bytes"] = len(payloads[0])
+        stats["uploads_per_sec"] = round(options.uploads_per_size / wall, 2)
+        stats["mb_per_sec"] = round(options.uploads_per_size * size / wall / 1e6, 2)
+        results[f"{size // 1024}KB"] = stats
+        _log(f"upload {size // 1024}KB: p50 {stats['p50_ms']} ms, "
+             f"{stats['uploads_per_sec']} uploads/s")
+
+    return results
+
+
+def _synthetic_visits(count, rng):
+    """Generate temple visit records like the ones storage writes."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "date": (start + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+            "count": rng.randint(1, 40),
+            "notes": "Ward temple night",
+            "created_at": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _synthetic_selfies(count):
+    """Generate selfie metadata records like the ones storage writes."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "filename": f"selfie_{i + 1:06d}.jpg",
+            "caption": "",
+            "size": 250000,
+            "timestamp": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _synthetic_miracles(count):
+    """Generate miracle records."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "title": f"Answered prayer {i + 1}",
+            "story": "We found the lost car keys right after family prayer.",
+            "author": "Anonymous",
+            "created_at": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _synthetic_missionaries(count, rng):
+    """Generate missionary records with mission locations."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "name": f"Elder Number{i + 1}",
+            "mission": "Brazil Sao Paulo North",
+            "language": "Portuguese",
+            "startDate": "2024-06-12",
+            "location": {"lat": round(rng.uniform(-60, 70), 5),
+                         "lng": round(rng.uniform(-180, 180), 5)},
+            "created_at": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _synthetic_events(count):
+    """Generate calendar event records."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "title": "Ward activity",
+            "date": (start + timedelta(days=i % 365)).strftime('%Y-%m-%d'),
+            "time": "19:00",
+            "location": "Cultural hall",
+            "created_at": (start + timedelta(minutes=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def _seed_list_data(count, rng):
+    """Overwrite the in-process data files with `count` records."""
+    import config
+
+    os.makedirs(config.SELFIES_DIR, exist_ok=True)
+    with open(config.TEMPLE_VISITS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(_synthetic_visits(count, rng), f)
+    with open(os.path.join(config.SELFIES_DIR, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(_synthetic_selfies(count), f)
+
+
+def bench_list(client, options):
+    """
+    Measure GET latency of the list endpoints at several sizes.
+
+    Returns:
+        Dict keyed by endpoint then record count with latency stats
+    """
+    rng = random.Random(RANDOM_SEED)
+    endpoints = {
+        "temple_visits": '/api/temple-visits',
+        "selfies": '/api/selfies'
+    }
+    results = {name: {} for name in endpoints}
+    counts = options.list_counts if options.in_process else ["existing"]
+
+    for count in counts:
+        if options.in_process:
+            _seed_list_data(count, rng)
+
+        for name, path in endpoints.items():
+            latencies = []
+            response_bytes = 0
+            for _ in range(options.list_iterations):
+                elapsed, (status, body) = timed(client.get, path)
+                latencies.append(elapsed)
+                response_bytes = len(body)
+
+            stats = summarize_latencies(latencies)
+            stats["response_bytes"] = response_bytes
+            stats["records"] = len(json.loads(body).get("data") or [])
+            results[name][str(count)] = stats
+            _log(f"list {name} @ {stats['records']}: p50 {stats['p50_ms']} ms")
+
+    return results
+
+
+def _retained_bytes(build):
+    """Bytes still allocated after build() (its result kept alive)."""
+    tracemalloc.start()
+    try:
+        result = build()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def _best_ms(fn, repeats):
+    """Fastest of `repeats` runs of fn(), in milliseconds."""
+    return round(min(timed(fn)[0] for _ in range(repeats)), 1)
+
+
+def bench_records(client, options):
+    """
+    Compare dict records + stdlib json with records.py.
+
+    For each record kind, `count` records are decoded from a JSON
+    document like the data files. Memory is what the decoded
+    collection keeps allocated; encode times are for the data file
+    layout (indented) and the API layout (compact).
+
+    Returns:
+        Dict keyed by record kind with "before", "after" and ratios
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import records
+
+    rng = random.Random(RANDOM_SEED)
+    count = options.record_count
+    repeats = options.record_repeats
+    kinds = {
+        "TempleVisit": (records.TempleVisit, _synthetic_visits(count, rng)),
+        "Selfie": (records.Selfie, _synthetic_selfies(count)),
+        "Miracle": (records.Miracle, _synthetic_miracles(count)),
+        "Missionary": (records.Missionary, _synthetic_missionaries(count, rng)),
+        "Event": (records.Event, _synthetic_events(count))
+    }
+    results = {"encoder": records.encoder_name(), "records": count}
+
+    for name, (record_class, rows) in kinds.items():
+        document = json.dumps(rows).encode('utf-8')
+        del rows
+        dicts = json.loads(document)
+        typed = [record_class.from_dict(row) for row in records.loads(document)]
+
+        before = {
+            "memory_bytes": _retained_bytes(lambda: json.loads(document)),
+            "decode_ms": _best_ms(lambda: json.loads(document), repeats),
+            "encode_file_ms": _best_ms(
+                lambda: json.dumps(dicts, indent=2, ensure_ascii=False), repeats),
+            "encode_api_ms": _best_ms(
+                lambda: json.dumps(dicts, separators=(",", ":"), ensure_ascii=False), repeats)
+        }
+        after = {
+            "memory_bytes": _retained_bytes(
+                lambda: [record_class.from_dict(row) for row in records.loads(document)]),
+            "decode_ms": _best_ms(lambda: records.loads(document), repeats),
+            "encode_file_ms": _best_ms(lambda: records.dumps(dicts, indent=True), repeats),
+            "encode_api_ms": _best_ms(lambda: records.dumps(dicts), repeats),
+            "encode_records_ms": _best_ms(lambda: records.dumps(typed), repeats)
+        }
+        results[name] = {
+            "before": before,
+            "after": after,
+            "memory_ratio": round(after["memory_bytes"] / before["memory_bytes"], 2),
+            "encode_api_speedup": round(before["encode_api_ms"] / max(after["encode_api_ms"], 0.1), 1)
+        }
+        _log(f"records {name} @ {count}: memory {before['memory_bytes'] // 1024} KB -> "
+             f"{after['memory_bytes'] // 1024} KB, API encode {before['encode_api_ms']} ms -> "
+             f"{after['encode_api_ms']} ms ({results['encoder']})")
+        del dicts, typed
+
+    return results
+
+
+def bench_concurrent(client, options):
+    """
+    Measure concurrent temple-visit writes and check none are lost.
+
+    Returns:
+        Dict with throughput, latency stats and lost-write count
+    """
+    status, body = client.get('/api/temple-visits')
+    before = len(json.loads(body).get("data") or [])
+
+    payload = json.dumps({"date": "2024-06-01", "count": 3,
+                          "notes": "benchmark"}).encode('utf-8')
+    per_worker = options.concurrent_writes // options.concurrent_workers
+
+    def worker(_):
+        worker_client = client.clone()
+        latencies = []
+        failures = 0
+        for _ in range(per_worker):
+            elapsed, (status, _) = timed(worker_client.post_json,
+                                         '/api/temple-visits', payload)
+            latencies.append(elapsed)
+            if status != 200:
+                failures += 1
+        return latencies, failures
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrent_workers) as pool:
+        outcomes = list(pool.map(worker, range(options.concurrent_workers)))
+    wall = time.perf_counter() - started
+
+    latencies = [ms for worker_latencies, _ in outcomes for ms in worker_latencies]
+    failures = sum(f for _, f in outcomes)
+    total = per_worker * options.concurrent_workers
+
+    status, body = client.get('/api/temple-visits')
+    after = len(json.loads(body).get("data") or [])
+
+    stats = summarize_latencies(latencies)
+    stats["workers"] = options.concurrent_workers
+    stats["writes"] = total
+    stats["failures"] = failures
+    stats["writes_per_sec"] = round(total / wall, 2)
+    stats["lost_writes"] = (total - failures) - (after - before)
+    _log(f"concurrent: {stats['writes_per_sec']} writes/s, "
+         f"{stats['lost_writes']} lost")
+    return stats
+
+
+# Run in a fresh interpreter by bench_cold_start. Prints the time
+# spent importing app.py, answering the first health check, and
+# loading the storage backend (which /api/health does not need).
+COLD_START_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {backend_dir!r})
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+response = flask_app.test_client().get('/api/health')
+t2 = time.perf_counter()
+with flask_app.app_context():
+    app.get_storage()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000,
+                  "first_health_ms": (t2 - t1) * 1000,
+                  "storage_init_ms": flask_app.extensions['kiosk']['storage_init_ms'],
+                  "status": response.status_code}}))
+"""
+
+
+def bench_cold_start(client, options):
+    """
+    Measure boot-to-first-/api/health in fresh Python processes.
+
+    Always runs in-process in a child interpreter, even in --url
+    mode, because a remote server cannot be restarted from here.
+    The p95 boot time is checked against COLD_START_TARGET_MS.
+
+    Returns:
+        Dict with total, import, first-request and storage timings
+    """
+    from config import COLD_START_TARGET_MS
+
+    code = COLD_START_CHILD.format(backend_dir=BACKEND_DIR)
+    totals, imports, first_requests, storage_inits = [], [], [], []
+
+    for _ in range(options.cold_start_runs):
+        # Each child gets an empty data directory, like a first boot
+        child_dir = tempfile.mkdtemp(prefix='kiosk_cold_')
+        started = time.perf_counter()
+        try:
+            completed = subprocess.run(
+                [sys.executable, '-c', code],
+                capture_output=True, text=True, cwd=child_dir
+            )
+        finally:
+            shutil.rmtree(child_dir, ignore_errors=True)
+        totals.append((time.perf_counter() - started) * 1000)
+
+        if completed.returncode != 0:
+            _log(f"cold start child failed:\n{completed.stderr}")
+            return {"error": completed.stderr.strip().splitlines()[-1:]}
+
+        child = json.loads(completed.stdout.strip().splitlines()[-1])
+        imports.append(child["import_ms"])
+        first_requests.append(child["first_health_ms"])
+        storage_inits.append(child["storage_init_ms"])
+
+    results = {
+        "boot_to_health": summarize_latencies(totals),
+        "import_app": summarize_latencies(imports),
+        "first_health_request": summarize_latencies(first_requests),
+        "storage_init": summarize_latencies(storage_inits),
+        "target_ms": COLD_START_TARGET_MS,
+        "within_target": summarize_latencies(totals)["p95_ms"] <= COLD_START_TARGET_MS
+    }
+    _log(f"cold start: p50 {results['boot_to_health']['p50_ms']} ms "
+         f"(target {COLD_START_TARGET_MS} ms, "
+         f"{'OK' if results['within_target'] else 'OVER TARGET'})")
+    return results
+
+
+def bench_rate_limit(client, options):
+    """
+    Flood one route and burst uploads to exercise the 429 limits.
+
+    Checks that excess requests are refused quickly with a
+    Retry-After header instead of piling up. In-process runs turn
+    limiting on (with a fresh limiter) just for this scenario.
+
+    Returns:
+        Dict with flood and upload-burst outcome counts and latencies
+    """
+    if options.in_process:
+        import config
+        import rate_limit
+        rate_limit._limiter = rate_limit.TokenBucketLimiter()
+        rate_limit._upload_gate = rate_limit.UploadGate()
+        config.ENABLE_RATE_LIMITING = True
+
+    try:
+        # Flood: one client hammering a cheap GET route
+        statuses = Counter()
+        latencies = []
+        missing_retry_after = 0
+        for _ in range(options.flood_requests):
+            elapsed, (status, _) = timed(client.get, '/api/config')
+            statuses[status] += 1
+            latencies.append(elapsed)
+            if status == 429 and not client.last_headers.get('Retry-After'):
+                missing_retry_after += 1
+
+        flood = summarize_latencies(latencies)
+        flood["statuses"] = {str(code): count for code, count in sorted(statuses.items())}
+        flood["missing_retry_after"] = missing_retry_after
+        _log(f"rate limit flood: {flood['statuses']}")
+
+        # Upload burst: many large selfies released at the same moment
+        payload = make_selfie_payload(3 * 1024 * 1024, random.Random(RANDOM_SEED))
+        barrier = threading.Barrier(options.upload_burst)
+
+        def upload(_):
+            worker_client = client.clone()
+            barrier.wait()
+            elapsed, (status, _) = timed(worker_client.post_json, '/api/selfies', payload)
+            return status, elapsed, worker_client.last_headers.get('Retry-After')
+
+        with ThreadPoolExecutor(max_workers=options.upload_burst) as pool:
+            outcomes = list(pool.map(upload, range(options.upload_burst)))
+
+        burst = {
+            "uploads": options.upload_burst,
+            "request_bytes": len(payload),
+            "statuses": dict(sorted(Counter(str(s) for s, _, _ in outcomes).items())),
+            "accepted": summarize_latencies([ms for s, ms, _ in outcomes if s == 200]),
+            "rejected": summarize_latencies([ms for s, ms, _ in outcomes if s == 429]),
+            "missing_retry_after": sum(1 for s, _, ra in outcomes if s == 429 and not ra)
+        }
+        if options.in_process:
+            burst["limiter"] = rate_limit.rate_limit_stats()
+        _log(f"rate limit upload burst: {burst['statuses']}")
+    finally:
+        if options.in_process:
+            config.ENABLE_RATE_LIMITING = False
+
+    return {"flood": flood, "upload_burst": burst}
+
+
+SCENARIOS = {
+    "upload": bench_upload,
+    "list": bench_list,
+    "concurrent": bench_concurrent,
+    "cold_start": bench_cold_start,
+    "rate_limit": bench_rate_limit,
+    "records": bench_records
+}
+
+
+# ================================================================
+# SECTION 5: RUNNER
+# ================================================================
+
+def _log(message):
+    print(f"[Benchmark] {message}", flush=True)
+
+
+def _git_commit():
+    """Return the current git commit hash, or None outside a repo."""
+    try:
+        completed = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                   capture_output=True, text=True, cwd=BACKEND_DIR)
+        return completed.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmarks(options):
+    """
+    Run the selected scenarios.
+
+    In-process runs chdir into a temporary directory first, so the
+    relative DATA_DIR in config.py points at throwaway storage.
+
+    Args:
+        options: Parsed command-line options
+
+    Returns:
+        Dict with run metadata and per-scenario results
+    """
+    original_cwd = os.getcwd()
+    work_dir = None
+
+    if options.in_process:
+        work_dir = tempfile.mkdtemp(prefix='kiosk_bench_')
+        os.chdir(work_dir)
+        sys.path.insert(0, BACKEND_DIR)
+        import app as backend_app
+        import config
+        config.ENABLE_RATE_LIMITING = False
+        client = InProcessClient(backend_app.create_app())
+    else:
+        client = HttpClient(options.url)
+
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(),
+            "mode": "in-process" if options.in_process else "http",
+            "target": options.url,
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": {}
+    }
+
+    try:
+        for name in options.scenarios:
+            _log(f"Running {name}...")
+            started = time.perf_counter()
+            report["results"][name] = SCENARIOS[name](client, options)
+            _log(f"{name} finished in {time.perf_counter() - started:.1f}s")
+    finally:
+        os.chdir(original_cwd)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return report
+
+
+def parse_args(argv=None):
+    """Parse command-line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the kiosk backend API.")
+    parser.add_argument('--url', help="Benchmark a running server instead of in-process")
+    parser.add_argument('--scenarios', default=",".join(ALL_SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(ALL_SCENARIOS)}")
+    parser.add_argument('--output', help="Result file (default: benchmark_results/<timestamp>.json)")
+    parser.add_argument('--quick', action='store_true',
+                        help="Fewer iterations and no 100k list run (for smoke checks)")
+    options = parser.parse_args(argv)
+
+    options.scenarios = [s.strip() for s in options.scenarios.split(',') if s.strip()]
+    unknown = [s for s in options.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(unknown)}")
+
+    options.in_process = not options.url
+    options.upload_sizes = UPLOAD_SIZES
+    options.uploads_per_size = UPLOADS_PER_SIZE
+    options.list_counts = LIST_RECORD_COUNTS
+    options.list_iterations = LIST_ITERATIONS
+    options.concurrent_workers = CONCURRENT_WORKERS
+    options.concurrent_writes = CONCURRENT_WRITES
+    options.cold_start_runs = COLD_START_RUNS
+    options.flood_requests = FLOOD_REQUESTS
+    options.upload_burst = UPLOAD_BURST
+    options.record_count = RECORD_COUNT
+    options.record_repeats = RECORD_REPEATS
+
+    if options.quick:
+        options.uploads_per_size = 3
+        options.list_counts = [1000, 10000]
+        options.list_iterations = 5
+        options.concurrent_writes = 80
+        options.cold_start_runs = 2
+        options.record_count = 10000
+        options.record_repeats = 1
+
+    if not options.output:
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        options.output = os.path.join('benchmark_results', f"bench_{stamp}.json")
+    options.output = os.path.abspath(options.output)
+
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    report = run_benchmarks(options)
+
+    os.makedirs(os.path.dirname(options.output), exist_ok=True)
+    with open(options.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    _log(f"Results written to {options.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
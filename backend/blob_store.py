@@ -0,0 +1,249 @@
+"""
+================================================================
+BLOB_STORE.PY - CONTENT-ADDRESSED FILE STORE
+================================================================
+This module stores file contents (selfie images, ...) by the
+SHA-256 hash of their bytes, so identical bytes are kept on disk
+exactly once no matter how many records refer to them.
+
+PURPOSE:
+- put() hashes the bytes and writes them only if that hash is new
+- Records (e.g. selfie metadata) refer to a blob by its hash
+- hash_file() hashes existing files once and caches the result
+  until the file changes; the asset indexers (gallery, temple
+  photos) and /media/ ETags all use it
+
+LAYOUT (in BLOBS_DIR):
+    blobs/
+    ├── 1a/
+    │   └── 1a4bf0a8c147f1bff783fae1af3f8be8...   (64 hex chars)
+    └── ae/
+        └── ae7ec8765a507a9ef76922ee687580d0...
+
+Blobs are written to a temp file and renamed into place, so a
+blob that exists is always complete.
+
+USAGE:
+    from blob_store import BlobStore, hash_file
+
+    blobs = BlobStore(BLOBS_DIR)
+    blob_hash, is_new = blobs.put(image_bytes)
+    path = blobs.path(blob_hash)
+================================================================
+"""
+
+import os
+import re
+import hashlib
+import threading
+
+# A blob hash: lowercase SHA-256 hex digest
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Read size used when hashing files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# path -> (mtime_ns, size, sha256 hex)
+_file_hashes = {}
+_file_hash_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: HASHING
+# ================================================================
+
+def hash_bytes(data):
+    """
+    Hash bytes the way blobs are addressed.
+
+    Args:
+        data: Bytes to hash
+
+    Returns:
+        64-character SHA-256 hex digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, stat_result=None):
+    """
+    Hash a file's contents, cached until its size or mtime changes.
+
+    Args:
+        path: File path
+        stat_result: os.stat() result if the caller already has one
+
+    Returns:
+        64-character SHA-256 hex digest
+    """
+    stat_result = stat_result or os.stat(path)
+    key = (stat_result.st_mtime_ns, stat_result.st_size)
+
+    cached = _file_hashes.get(path)
+    if cached and cached[:2] == key:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    file_hash = digest.hexdigest()
+
+    with _file_hash_lock:
+        _file_hashes[path] = key + (file_hash,)
+    return file_hash
+
+
+def clear_hash_cache():
+    """Forget remembered file hashes (they are recomputed on demand)."""
+    with _file_hash_lock:
+        _file_hashes.clear()
+
+
+# ================================================================
+# SECTION 2: BLOB STORE
+# ================================================================
+
+class BlobStore:
+    """
+    Content-addressed store of immutable blobs on the local disk.
+
+    Does no disk I/O until the first put().
+    """
+
+    def __init__(self, root):
+        """
+        Args:
+            root: Directory holding the blobs (created on first write)
+        """
+        self.root = root
+        self._lock = threading.Lock()
+
+    def path(self, blob_hash):
+        """
+        Path of a blob on disk (it may not exist).
+
+        Raises:
+            ValueError: If blob_hash is not a SHA-256 hex digest
+        """
+        if not HASH_PATTERN.match(blob_hash or ""):
+            raise ValueError(f"Invalid blob hash: {blob_hash!r}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash)
+
+    def exists(self, blob_hash):
+        """True if the blob is stored."""
+        return os.path.isfile(self.path(blob_hash))
+
+    def put(self, data):
+        """
+        Store bytes, unless identical bytes are already stored.
+
+        Args:
+            data: Bytes to store
+
+        Returns:
+            Tuple of (blob hash, True if the bytes were new)
+        """
+        blob_hash = hash_bytes(data)
+        path = self.path(blob_hash)
+
+        with self._lock:
+            if os.path.isfile(path):
+                return blob_hash, False
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+        return blob_hash, True
+
+    def put_stream(self, fileobj, expected_hash=None):
+        """
+        Store bytes read from a file object, block by block, so a
+        large blob never has to fit in memory.
+
+        Args:
+            fileobj: Object with read(size)
+            expected_hash: If given, the data must hash to this
+                           (e.g. a blob name from a backup archive)
+
+        Returns:
+            Tuple of (blob hash, True if the bytes were new)
+
+        Raises:
+            ValueError: If the data does not match expected_hash
+        """
+        if expected_hash is not None and self.exists(expected_hash):
+            # Already stored; just consume the data
+            for _ in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b''):
+                pass
+            return expected_hash, False
+
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        temp_path = os.path.join(self.root, f"incoming_{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    f.write(block)
+            blob_hash = digest.hexdigest()
+            if expected_hash is not None and blob_hash != expected_hash:
+                raise ValueError(f"Blob content does not match its hash {expected_hash}")
+
+            path = self.path(blob_hash)
+            with self._lock:
+                if os.path.isfile(path):
+                    return blob_hash, False
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            return blob_hash, True
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def read(self, blob_hash):
+        """
+        Read a blob's bytes.
+
+        Returns:
+            Bytes, or None if the blob is not stored
+        """
+        try:
+            with open(self.path(blob_hash), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, blob_hash):
+        """
+        Remove a blob. The caller must make sure no record still
+        refers to it.
+
+        Returns:
+            True if a blob was removed
+        """
+        try:
+            os.remove(self.path(blob_hash))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self):
+        """
+        Count the stored blobs and their total size.
+
+        Returns:
+            Dict with blobs and bytes
+        """
+        count = 0
+        total = 0
+        if os.path.isdir(self.root):
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    if HASH_PATTERN.match(name):
+                        count += 1
+                        total += os.path.getsize(os.path.join(directory, name))
+        return {"blobs": count, "bytes": total}
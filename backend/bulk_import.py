@@ -0,0 +1,234 @@
+"""
+================================================================
+BULK_IMPORT.PY - CSV / JSONL BULK IMPORT
+================================================================
+This module loads many records from one uploaded file, such as a
+year of temple visits or the ward's whole missionary list.
+
+PURPOSE:
+- The upload is read row by row as it arrives (CSV with a header
+  row, or JSON Lines: one JSON object per line), never as a whole
+- Each row is checked on its own; a bad row is reported with its
+  line number and the rest still load
+- Valid rows are saved BULK_IMPORT_BATCH_SIZE at a time, each
+  batch with a single storage write, instead of one write per row
+
+Used by POST /api/temple-visits/bulk and
+POST /api/missionaries/bulk in app.py.
+
+FILE FORMATS:
+    CSV (Content-Type: text/csv, or ?format=csv)
+        date,count,notes
+        2024-01-15,5,Youth baptism trip
+
+    JSON Lines (Content-Type: application/x-ndjson, or ?format=jsonl)
+        {"date": "2024-01-15", "count": 5, "notes": "Youth baptism trip"}
+
+USAGE:
+    from bulk_import import import_rows, validate_temple_visit
+
+    summary = import_rows(request.stream, "csv",
+                          validate_temple_visit, storage.save_temple_visits)
+================================================================
+"""
+
+import io
+import csv
+import json
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from records import TempleVisit, Missionary
+
+# Content-Type -> format
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/x-jsonlines": "jsonl",
+    "application/json-seq": "jsonl"
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+# ================================================================
+# SECTION 1: ROW VALIDATION
+# ================================================================
+# Each validator takes a row (dict of strings from CSV, or of JSON
+# values) and returns the cleaned data for storage, or raises
+# ValueError with a message for the caller. The checks themselves
+# are the record classes' (records.py), shared with the API.
+
+def validate_temple_visit(row):
+    """
+    Check one temple visit row.
+
+    Fields: date (required, YYYY-MM-DD), count (whole number of at
+    least 1, default 1), notes.
+
+    Returns:
+        Dict for storage.save_temple_visits()
+
+    Raises:
+        ValueError: If the row is invalid
+    """
+    return TempleVisit.validate(row).to_dict()
+
+
+def validate_missionary(row):
+    """
+    Check one missionary row.
+
+    Fields: name and mission (required), language, scripture,
+    photoUrl, galleryFolder, startDate (YYYY-MM-DD) and the mission
+    location as lat/lng columns (or a "location" object in JSONL).
+
+    Returns:
+        Dict for storage.save_missionaries()
+
+    Raises:
+        ValueError: If the row is invalid
+    """
+    return Missionary.validate(row).to_dict()
+
+
+# ================================================================
+# SECTION 2: READING ROWS
+# ================================================================
+
+def detect_format(content_type, requested=None):
+    """
+    Pick the file format of an upload.
+
+    Args:
+        content_type: The request's Content-Type (may be None)
+        requested: Explicit ?format= value, which wins
+
+    Returns:
+        "csv" or "jsonl"
+
+    Raises:
+        ValueError: If neither names a supported format
+    """
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format {requested!r}; use csv or jsonl")
+        return requested
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    if mimetype in CONTENT_TYPES:
+        return CONTENT_TYPES[mimetype]
+    raise ValueError("Send Content-Type text/csv or application/x-ndjson, "
+                     "or add ?format=csv|jsonl")
+
+
+def iter_rows(stream, file_format):
+    """
+    Read rows from a binary stream as they arrive.
+
+    Args:
+        stream: Readable binary stream (e.g. request.stream)
+        file_format: "csv" or "jsonl"
+
+    Yields:
+        Tuples of (line number, row dict or None, error message or
+        None); a row that cannot be parsed has an error instead
+    """
+    if not hasattr(stream, "readable"):
+        stream = io.BufferedReader(stream)
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "More values than header columns"
+                continue
+            if not any((value or "").strip() for value in row.values()):
+                continue
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, row, None
+
+
+# ================================================================
+# SECTION 3: IMPORTING
+# ================================================================
+
+def import_rows(stream, file_format, validate, save_batch):
+    """
+    Validate and save every row of an upload, in batches.
+
+    A batch whose save fails is reported as failed rows; batches
+    saved before it stay saved.
+
+    Args:
+        stream: Readable binary stream
+        file_format: "csv" or "jsonl"
+        validate: Row validator from SECTION 1
+        save_batch: Storage method saving a list of dicts with one
+                    write (returns the saved records, or None)
+
+    Returns:
+        Dict with received, saved, failed, batches, errors (list of
+        {"line", "error"}, at most BULK_IMPORT_MAX_ERRORS) and
+        errors_truncated
+    """
+    batch_size = config.BULK_IMPORT_BATCH_SIZE
+    max_errors = config.BULK_IMPORT_MAX_ERRORS
+    summary = {"received": 0, "saved": 0, "failed": 0, "batches": 0,
+               "errors": [], "errors_truncated": False}
+
+    def report(line, message):
+        summary["failed"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append({"line": line, "error": message})
+        else:
+            summary["errors_truncated"] = True
+
+    def flush(batch):
+        saved = save_batch([data for _, data in batch])
+        summary["batches"] += 1
+        if saved is None:
+            for line, _ in batch:
+                report(line, "Could not save this batch")
+        else:
+            summary["saved"] += len(saved)
+
+    batch = []
+    try:
+        for line, row, error in iter_rows(stream, file_format):
+            summary["received"] += 1
+            if error is None:
+                try:
+                    batch.append((line, validate(row)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                report(line, error)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        report(None, f"Stopped reading the file: {e}")
+
+    if batch:
+        flush(batch)
+
+    print(f"[BulkImport] {summary['saved']} of {summary['received']} rows saved "
+          f"in {summary['batches']} batches, {summary['failed']} failed")
+    return summary
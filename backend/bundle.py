@@ -0,0 +1,576 @@
+"""
+================================================================
+BUNDLE.PY - FINGERPRINTED FRONTEND BUNDLE
+================================================================
+This module builds the kiosk page into a few long-cacheable files
+and serves them, so a cold boot loads about 3 files instead of 15+
+and a warm boot loads them from the browser cache without asking.
+
+PURPOSE:
+- build_bundle() reads index.html and joins its local scripts
+  (config/config.js, js/*.js, in page order) into one file and its
+  local stylesheets into another
+- Both are minified (comments and whitespace only; nothing is
+  renamed), named after their content hash (app.3f9c0a12b4de.js),
+  and saved next to .gz (and .br, if brotli is installed) copies
+- A copy of index.html refers to the two files instead
+
+ROUTES:
+    GET /                  The rewritten index.html (no-cache)
+    GET /bundle/<file>     Bundled JS/CSS, cached for a year as
+                           immutable, gzip/brotli when accepted
+    GET /assets/<path>     Images, icons and videos the page refers
+                           to by relative path (same as /media/)
+    GET /sw.js             The offline service worker (see
+                           precache.py)
+
+REBUILDS:
+Each request for / compares the source files' sizes and modified
+times with the last build and rebuilds if one changed, so editing
+config.js or a script needs no build step. The newest
+BUNDLE_KEEP_BUILDS builds are kept for pages that were loaded
+before a rebuild. `python bundle.py` builds once and prints sizes.
+
+NOTES:
+- External scripts and stylesheets (fonts, the QR library) are
+  left as they are
+- Scripts run as one file: a script that throws while loading
+  stops the ones after it, as a syntax error would already
+
+USAGE:
+    from bundle import bundle
+
+    app.register_blueprint(bundle)
+================================================================
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+from flask import Blueprint, abort, request, send_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from config import BUNDLE_DIR, FRONTEND_ROOT
+from media import resolve_media_path, send_media_file
+
+bundle = Blueprint('bundle', __name__)
+
+# Local <script src="..."> and <link rel="stylesheet" href="...">
+SCRIPT_TAG = re.compile(r'[ \t]*<script\s+src="(?!https?:|//)([^"]+)"\s*>\s*</script>[ \t]*\n?')
+STYLESHEET_TAG = re.compile(
+    r'[ \t]*<link\s+rel="stylesheet"\s+href="(?!https?:|//)([^"]+)"\s*/?>[ \t]*\n?')
+
+# Built file names: app.<hash>.js / app.<hash>.css (+ .gz / .br)
+BUNDLE_FILE_PATTERN = re.compile(r"^app\.[0-9a-f]{12}\.(js|css)(\.gz|\.br)?$")
+
+# Bumped when the build output changes, so old builds are redone
+BUNDLE_FORMAT = 2
+
+# The current build ({} until the first build) and its lock
+_current = {}
+_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: MINIFYING
+# ================================================================
+# Both minifiers only remove comments and whitespace, so the
+# output behaves exactly like the input. Line breaks are kept in
+# JS (one per run of blank lines) so automatic semicolon insertion
+# still sees them.
+
+# Characters after which a "/" starts a regex literal, not a division
+# (except the ++ and -- operators: "a++ / 2" divides)
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+_UPDATE_OPERATORS = ("++", "--")
+_REGEX_AFTER_WORDS = {"return", "typeof", "case", "do", "else", "in", "of", "new",
+                      "delete", "void", "throw", "instanceof", "yield", "await"}
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch in "_$\\" or ord(ch) > 127
+
+
+def _scan_quoted(source, start, quote):
+    """End index of a '...' / "..." string or a regex literal's body."""
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "\n":
+            return i
+        if quote == "/" and ch == "[":
+            in_class = True
+        elif quote == "/" and ch == "]":
+            in_class = False
+        elif ch == quote and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def _scan_template(source, start):
+    """End index of a `...` template literal (with ${...} inside)."""
+    i = start + 1
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            i += 2
+        elif ch == "`":
+            return i + 1
+        elif source.startswith("${", i):
+            i = _scan_braces(source, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _scan_braces(source, start):
+    """End index of a ${...} expression, skipping nested literals."""
+    depth = 1
+    i = start
+    while i < len(source) and depth:
+        ch = source[i]
+        if ch in "'\"":
+            i = _scan_quoted(source, i, ch)
+            continue
+        if ch == "`":
+            i = _scan_template(source, i)
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        i += 1
+    return i
+
+
+def minify_js(source):
+    """
+    Remove comments and extra whitespace from JavaScript.
+
+    Strings, template literals and regex literals are copied as
+    they are.
+
+    Args:
+        source: JavaScript source text
+
+    Returns:
+        Minified source text
+    """
+    out = []
+    last = ""          # last character written
+    last_token = ""    # last identifier, keyword or operator written
+    space = newline = False
+    i, n = 0, len(source)
+
+    while i < n:
+        ch = source[i]
+        if ch == "\n":
+            newline = True
+            i += 1
+            continue
+        if ch.isspace():
+            space = True
+            i += 1
+            continue
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            # A comment spanning lines still ends a line for ASI
+            newline = newline or "\n" in source[i:end]
+            space = True
+            i = end
+            continue
+
+        if out and newline:
+            out.append("\n")
+        elif out and space and (
+                (_is_word_char(last) and (_is_word_char(ch) or ch == ".")) or
+                (last in "+-" and ch in "+-") or (last == "/" and ch == "/")):
+            out.append(" ")
+        space = newline = False
+
+        if ch in "'\"":
+            end = _scan_quoted(source, i, ch)
+        elif ch == "`":
+            end = _scan_template(source, i)
+        elif ch == "/" and (not last or last_token in _REGEX_AFTER_WORDS or
+                            (last in _REGEX_AFTER and last_token not in _UPDATE_OPERATORS)):
+            end = _scan_quoted(source, i, "/")
+            while end < n and source[end].isalpha():
+                end += 1
+        elif _is_word_char(ch):
+            end = i + 1
+            while end < n and (_is_word_char(source[end]) or
+                               (source[end] == "." and source[i].isdigit())):
+                end += 1
+            out.append(source[i:end])
+            last, last_token = source[end - 1], source[i:end]
+            i = end
+            continue
+        elif source.startswith(_UPDATE_OPERATORS, i):
+            end = i + 2
+            out.append(source[i:end])
+            last, last_token = source[end - 1], source[i:end]
+            i = end
+            continue
+        else:
+            end = i + 1
+
+        out.append(source[i:end])
+        last, last_token = source[end - 1], ""
+        i = end
+
+    return "".join(out).strip() + "\n"
+
+
+def minify_css(source):
+    """
+    Remove comments and extra whitespace from CSS.
+
+    Spaces are dropped only around { } ; , and > where they never
+    matter; strings are copied as they are.
+
+    Args:
+        source: CSS source text
+
+    Returns:
+        Minified source text
+    """
+    out = []
+    space = False
+    i, n = 0, len(source)
+
+    while i < n:
+        ch = source[i]
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            space = True
+            continue
+        if ch.isspace():
+            space = True
+            i += 1
+            continue
+
+        if space and out and out[-1][-1] not in "{};,>" and ch not in "{};,>":
+            out.append(" ")
+        space = False
+
+        if ch in "'\"":
+            end = _scan_quoted(source, i, ch)
+            out.append(source[i:end])
+            i = end
+            continue
+        if ch == "}" and out and out[-1] == ";":
+            out.pop()
+        out.append(ch)
+        i += 1
+
+    return "".join(out).strip() + "\n"
+
+
+# ================================================================
+# SECTION 2: BUILDING
+# ================================================================
+
+def _source_files():
+    """
+    Local scripts and stylesheets of index.html, in page order.
+
+    Returns:
+        Tuple of (index.html text, script paths, stylesheet paths);
+        paths are relative to FRONTEND_ROOT
+    """
+    with open(os.path.join(FRONTEND_ROOT, "index.html"), 'r', encoding='utf-8') as f:
+        html = f.read()
+    # Ignore tags inside HTML comments (e.g. the load-order notes)
+    visible = re.sub(r"<!--.*?-->", "", html, flags=re.DOTALL)
+    return html, SCRIPT_TAG.findall(visible), STYLESHEET_TAG.findall(visible)
+
+
+def _build_key(scripts, stylesheets):
+    """Changes whenever a source file or a build setting changes."""
+    parts = [f"format={BUNDLE_FORMAT}", f"minify={config.BUNDLE_MINIFY}",
+             f"brotli={brotli is not None}"]
+    for relpath in ["index.html"] + scripts + stylesheets:
+        try:
+            stat_result = os.stat(os.path.join(FRONTEND_ROOT, relpath))
+            parts.append(f"{relpath}:{stat_result.st_size}:{stat_result.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{relpath}:missing")
+    return hashlib.sha1("\n".join(parts).encode('utf-8')).hexdigest()
+
+
+def _join_sources(relpaths, separator):
+    """Concatenate source files (a missing one is skipped with a note)."""
+    pieces = []
+    for relpath in relpaths:
+        try:
+            with open(os.path.join(FRONTEND_ROOT, relpath), 'r', encoding='utf-8-sig') as f:
+                pieces.append(f.read())
+        except OSError as e:
+            print(f"[Bundle] Skipping {relpath}: {e}")
+    return separator.join(pieces)
+
+
+def _write(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _save_bundle_file(text, extension):
+    """
+    Save one bundle file with its compressed copies.
+
+    Returns:
+        Dict with name, hash and byte sizes (bytes, gzip, brotli)
+    """
+    data = text.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    name = f"app.{digest}.{extension}"
+    path = os.path.join(BUNDLE_DIR, name)
+
+    info = {"name": name, "hash": digest, "bytes": len(data)}
+    if not os.path.isfile(path):
+        _write(path, data)
+        _write(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(f"{path}.br", brotli.compress(data, quality=11))
+    info["gzip"] = os.path.getsize(f"{path}.gz")
+    if os.path.isfile(f"{path}.br"):
+        info["brotli"] = os.path.getsize(f"{path}.br")
+    return info
+
+
+def _rewrite_index(html, js_name, css_name):
+    """index.html with the local tags replaced by the bundle files."""
+    # Only tags outside comments are replaced (comments may quote them)
+    parts = re.split(r"(<!--.*?-->)", html, flags=re.DOTALL)
+    done = {"css": False, "js": False}
+
+    def stylesheet(match):
+        if done["css"]:
+            return ""
+        done["css"] = True
+        return f'    <link rel="stylesheet" href="/bundle/{css_name}">\n'
+
+    def script(match):
+        if done["js"]:
+            return ""
+        done["js"] = True
+        return f'    <script src="/bundle/{js_name}"></script>\n'
+
+    for index, part in enumerate(parts):
+        if not part.startswith("<!--"):
+            part = STYLESHEET_TAG.sub(stylesheet, part)
+            parts[index] = SCRIPT_TAG.sub(script, part)
+    return "".join(parts)
+
+
+def _prune_builds(keep_manifests):
+    """Delete bundle files not used by the kept builds."""
+    in_use = set()
+    for manifest in keep_manifests:
+        in_use.update(manifest["files"])
+    for entry in os.scandir(BUNDLE_DIR):
+        match = BUNDLE_FILE_PATTERN.match(entry.name)
+        if match and entry.name[:len(entry.name) - len(match.group(2) or "")] not in in_use:
+            os.remove(entry.path)
+
+
+def build_bundle(force=False):
+    """
+    Build the bundle if a source file changed since the last build.
+
+    Args:
+        force: Build even if nothing changed
+
+    Returns:
+        Manifest dict: key, built_at, js and css (name, hash, byte
+        sizes), index (hash of the rewritten page), files (names of this build) and scripts/stylesheets
+        (the source paths)
+    """
+    with _lock:
+        html, scripts, stylesheets = _source_files()
+        key = _build_key(scripts, stylesheets)
+        if not force and _current.get("key") == key:
+            return dict(_current)
+
+        os.makedirs(BUNDLE_DIR, exist_ok=True)
+        manifest_path = os.path.join(BUNDLE_DIR, "manifest.json")
+        if not force and not _current:
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get("key") == key and os.path.isfile(os.path.join(BUNDLE_DIR, "index.html")):
+                    _current.update(saved)
+                    return dict(_current)
+            except (OSError, ValueError):
+                pass
+
+        js_source = _join_sources(scripts, "\n;\n")
+        css_source = _join_sources(stylesheets, "\n")
+        if config.BUNDLE_MINIFY:
+            js_source = minify_js(js_source)
+            css_source = minify_css(css_source)
+
+        js_info = _save_bundle_file(js_source, "js")
+        css_info = _save_bundle_file(css_source, "css")
+        index_html = _rewrite_index(html, js_info["name"], css_info["name"]).encode('utf-8')
+        _write(os.path.join(BUNDLE_DIR, "index.html"), index_html)
+
+        manifest = {
+            "key": key,
+            "built_at": datetime.now().isoformat(),
+            "js": js_info,
+            "css": css_info,
+            "index": {"hash": hashlib.sha256(index_html).hexdigest()[:12]},
+            "files": [js_info["name"], css_info["name"]],
+            "scripts": scripts,
+            "stylesheets": stylesheets
+        }
+
+        # Remember recent builds, so their files survive pruning
+        builds_path = os.path.join(BUNDLE_DIR, "builds.json")
+        try:
+            with open(builds_path, 'r', encoding='utf-8') as f:
+                builds = json.load(f)
+        except (OSError, ValueError):
+            builds = []
+        builds = ([manifest] + [b for b in builds if b.get("files") != manifest["files"]])
+        builds = builds[:config.BUNDLE_KEEP_BUILDS]
+        _write(builds_path, json.dumps(builds, indent=2).encode('utf-8'))
+        _write(manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+        _prune_builds(builds)
+
+        _current.clear()
+        _current.update(manifest)
+        print(f"[Bundle] Built {len(scripts)} scripts -> {js_info['name']} "
+              f"({js_info['bytes']} bytes, {js_info['gzip']} gzipped), "
+              f"{len(stylesheets)} stylesheets -> {css_info['name']} ({css_info['bytes']} bytes)")
+        return dict(manifest)
+
+
+# ================================================================
+# SECTION 3: ROUTES
+# ================================================================
+
+@bundle.route('/', methods=['GET', 'HEAD'])
+@bundle.route('/index.html', methods=['GET', 'HEAD'])
+def get_index():
+    """
+    GET /
+
+    The kiosk page, referring to the current bundle. Revalidated on
+    every load (no-cache with an ETag), which is one small request.
+    """
+    if not config.BUNDLE_ENABLED:
+        abort(404)
+    try:
+        manifest = build_bundle()
+    except OSError as e:
+        print(f"[Bundle] Build failed: {e}")
+        abort(503)
+
+    response = send_file(os.path.abspath(os.path.join(BUNDLE_DIR, "index.html")),
+                         mimetype='text/html', conditional=True,
+                         etag=manifest['index']['hash'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@bundle.route('/bundle/<filename>', methods=['GET', 'HEAD'])
+def get_bundle_file(filename):
+    """
+    GET /bundle/app.<hash>.js|css
+
+    A bundle file. Its name changes with its content, so it is
+    cached for a year as immutable. Sent brotli- or gzip-compressed
+    when the browser accepts it.
+    """
+    if not BUNDLE_FILE_PATTERN.match(filename) or filename.endswith((".gz", ".br")):
+        abort(404)
+    path = os.path.join(BUNDLE_DIR, filename)
+    if not os.path.isfile(path):
+        abort(404)
+
+    mimetype = 'text/javascript' if filename.endswith('.js') else 'text/css'
+    encoding = None
+    accepted = request.accept_encodings
+    if accepted['br'] and os.path.isfile(f"{path}.br"):
+        path, encoding = f"{path}.br", 'br'
+    elif accepted['gzip'] and os.path.isfile(f"{path}.gz"):
+        path, encoding = f"{path}.gz", 'gzip'
+
+    etag = filename.split('.')[1] + (f"-{encoding}" if encoding else "")
+    response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True, etag=etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f"public, max-age={config.MEDIA_MAX_AGE_SECONDS}, immutable"
+    return response
+
+
+@bundle.route('/sw.js', methods=['GET', 'HEAD'])
+def get_service_worker():
+    """
+    GET /sw.js
+
+    The service worker. Browsers check it for updates themselves,
+    so it is never cached for long.
+    """
+    if not config.BUNDLE_ENABLED:
+        abort(404)
+    response = send_file(os.path.join(FRONTEND_ROOT, "sw.js"), mimetype='text/javascript',
+                         conditional=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+
+@bundle.route('/assets/<path:relpath>', methods=['GET', 'HEAD'])
+def get_page_asset(relpath):
+    """
+    GET /assets/<path>
+
+    Files the page refers to relatively (icons, videos, photos),
+    served like /media/assets/<path>.
+    """
+    if not config.BUNDLE_ENABLED:
+        abort(404)
+    full_path = resolve_media_path(f"assets/{relpath}")
+    if full_path is None:
+        abort(404)
+    return send_media_file(full_path)
+
+
+if __name__ == '__main__':
+    built = build_bundle(force='--force' in sys.argv)
+    for kind in ("js", "css"):
+        info = built[kind]
+        sizes = f"{info['bytes']} bytes, {info['gzip']} gzip"
+        if "brotli" in info:
+            sizes += f", {info['brotli']} brotli"
+        print(f"{kind}: {BUNDLE_DIR}/{info['name']} ({sizes})")
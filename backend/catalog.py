@@ -0,0 +1,169 @@
+"""
+================================================================
+CATALOG.PY - IMAGE CATALOG (SIZES & PLACEHOLDERS)
+================================================================
+This module remembers, for every photo the kiosk shows, its
+display size and a tiny blurred placeholder. Listing APIs include
+them so the UI can reserve the right space and paint a preview
+instantly while the full photo streams in.
+
+PURPOSE:
+- describe_image() computes (once) and returns width, height and
+  placeholder for an image file
+- describe_assets() does the same for paths under FRONTEND_ROOT
+  and adds their /media/ URLs
+- GET /api/images?path=...&path=... exposes describe_assets() for
+  images listed in config.js (e.g. missionary profile photos)
+
+CACHING:
+Entries are keyed by the image's content hash, so renaming or
+copying a photo costs nothing and editing one recomputes it.
+The catalog is saved to IMAGE_CATALOG_FILE after new entries are
+added, so each image is decoded once, ever.
+
+USAGE:
+    from catalog import catalog, describe_assets
+
+    app.register_blueprint(catalog)
+    info = describe_assets(["assets/missionary_photos/2.png"])
+================================================================
+"""
+
+import os
+import json
+import threading
+from flask import Blueprint, jsonify, request
+from config import IMAGE_CATALOG_FILE, PLACEHOLDER_SIZE
+from blob_store import hash_file
+from imaging import PIL_AVAILABLE, image_summary
+from media import media_url, resolve_media_path
+
+catalog = Blueprint('catalog', __name__)
+
+# Most paths accepted by one /api/images request
+MAX_PATHS_PER_REQUEST = 200
+
+# content hash -> {"width", "height", "placeholder", "placeholder_size"}
+_entries = None
+_dirty = False
+_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: CATALOG FILE
+# ================================================================
+
+def _load():
+    """Read the catalog file once per process."""
+    global _entries
+    if _entries is not None:
+        return
+    try:
+        with open(IMAGE_CATALOG_FILE, 'r', encoding='utf-8') as f:
+            _entries = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        _entries = {}
+
+
+def save_catalog():
+    """Write the catalog file if entries were added since the last save."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        directory = os.path.dirname(IMAGE_CATALOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{IMAGE_CATALOG_FILE}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(_entries, f)
+        os.replace(temp_path, IMAGE_CATALOG_FILE)
+        _dirty = False
+
+
+# ================================================================
+# SECTION 2: DESCRIBING IMAGES
+# ================================================================
+
+def describe_image(full_path):
+    """
+    Width, height and placeholder of an image file.
+
+    Computed on first sight of the file's contents and cached;
+    call save_catalog() afterwards to keep new entries.
+
+    Args:
+        full_path: Absolute path of the image
+
+    Returns:
+        Dict with width, height and placeholder (values are None
+        when Pillow is not installed or the file is not an image)
+    """
+    global _dirty
+    file_hash = hash_file(full_path)
+    size = PLACEHOLDER_SIZE
+
+    with _lock:
+        _load()
+        entry = _entries.get(file_hash)
+    if entry and entry.get("placeholder_size") == size:
+        return {key: entry[key] for key in ("width", "height", "placeholder")}
+
+    summary = image_summary(full_path, size) or {
+        "width": None, "height": None, "placeholder": None
+    }
+    if PIL_AVAILABLE:
+        with _lock:
+            _entries[file_hash] = dict(summary, placeholder_size=size)
+            _dirty = True
+    return summary
+
+
+def describe_assets(relpaths):
+    """
+    Describe images under FRONTEND_ROOT.
+
+    Args:
+        relpaths: Paths like "assets/temple_photos/x.jpg"
+
+    Returns:
+        Dict of path -> {url, width, height, placeholder}; paths
+        that cannot be served are left out
+    """
+    described = {}
+    for relpath in relpaths:
+        full_path = resolve_media_path(relpath)
+        if full_path is None:
+            continue
+        described[relpath] = dict(describe_image(full_path), url=media_url(relpath))
+    save_catalog()
+    return described
+
+
+# ================================================================
+# SECTION 3: ROUTES
+# ================================================================
+
+@catalog.route('/api/images', methods=['GET'])
+def get_image_info():
+    """
+    GET /api/images?path=assets/a.jpg&path=assets/b.png
+
+    Returns size, placeholder and cacheable URL for each image.
+
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "assets/missionary_photos/2.png": {
+                "url": "/media/assets/missionary_photos/2.png?v=...",
+                "width": 600,
+                "height": 800,
+                "placeholder": "data:image/jpeg;base64,..."
+            },
+            ...
+        }
+    }
+    """
+    paths = request.args.getlist('path')[:MAX_PATHS_PER_REQUEST]
+    return jsonify({"status": "ok", "data": describe_assets(paths)})
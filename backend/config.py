@@ -8,6 +8,10 @@ HOW TO USE:
 - Edit values below to customize the backend behavior
 - Keep these values in sync with frontend config/config.js
   where applicable
+- Or leave this file alone and override values in
+  kiosk_config.json or KIOSK_<NAME> environment variables
+  (see config_loader.py). Logging flags and similar settings
+  in that file are picked up without a restart.
 
 SECTIONS:
 1. Server Configuration
@@ -17,6 +21,8 @@ SECTIONS:
 ================================================================
 """
 
+import os
+
 # ================================================================
 # SECTION 1: SERVER CONFIGURATION
 # ================================================================
@@ -28,6 +34,11 @@ API_PORT = 5000
 # API version (for future compatibility)
 API_VERSION = "1.0.0"
 
+# Cold start budget: boot of a fresh Python process to the first
+# /api/health response, in milliseconds. Checked by the
+# cold_start scenario in benchmark.py.
+COLD_START_TARGET_MS = 1000
+
 
 # ================================================================
 # SECTION 2: STORAGE CONFIGURATION
@@ -112,21 +123,581 @@ LOG_STORAGE = True
 
 
 # ================================================================
-# SECTION 7: RATE LIMITING (FUTURE)
+# SECTION 7: RATE LIMITING & UPLOAD BACK-PRESSURE
+# ================================================================
+# See rate_limit.py. All of these can be changed in
+# kiosk_config.json without a restart.
+
+# Limit how fast each client (IP address) can call each route.
+# Protects the kiosk from a stuck frontend loop or an outside
+# client hammering the API.
+ENABLE_RATE_LIMITING = True
+
+# Sustained requests per minute, per client, per route
+MAX_REQUESTS_PER_MINUTE = 120
+
+# Requests a client may make back-to-back before the per-minute
+# rate kicks in (token bucket size)
+RATE_LIMIT_BURST = 30
+
+# Per-route overrides: "METHOD /path/rule" -> requests per minute
+RATE_LIMIT_ROUTES = {
+    "POST /api/selfies": 20,
+    "POST /api/temple-visits": 60
+}
+
+# Routes never rate limited. Static media is cheap and cacheable,
+# and a gallery legitimately loads dozens of images at once.
+RATE_LIMIT_EXEMPT = [
+    "GET /media/<path:filename>",
+    "HEAD /media/<path:filename>",
+    "GET /gallery/<filename>",
+    "HEAD /gallery/<filename>",
+    "GET /api/replication/changes",
+    "GET /api/replication/blobs/<blob_hash>"
+]
+
+# Upload back-pressure: routes that accept large bodies
+UPLOAD_ROUTES = [
+    "POST /api/selfies",
+    "POST /api/selfies/relay",
+    "POST /api/temple-visits/bulk",
+    "POST /api/missionaries/bulk"
+]
+
+# Largest single upload accepted (bytes); bigger bodies get 413
+# before they are read. A 3 MB photo is ~4 MB as base64 JSON.
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+
+# Uploads processed at the same time, across all clients
+MAX_CONCURRENT_UPLOADS = 4
+
+# Total bytes of uploads in flight at once, across all clients
+MAX_INFLIGHT_UPLOAD_BYTES = 48 * 1024 * 1024
+
+
+# ================================================================
+# SECTION 8: REQUEST PROFILING
+# ================================================================
+
+# Profile every request whose path starts with one of
+# PROFILING_ROUTES. Leave False on a kiosk in normal service.
+PROFILING_ENABLED = False
+
+# Allow profiling a single request by sending the header
+#   X-Kiosk-Profile: 1
+# Handy for checking one slow endpoint without profiling all.
+PROFILING_ALLOW_HEADER = False
+
+# When both flags above are False no profiling hooks are
+# installed at all, so disabled profiling costs nothing.
+
+# Profiler to use:
+# "cprofile" - Deterministic; saves a .prof file (open with
+#              snakeviz, or python -m pstats)
+# "sampling" - Samples the stack every few ms; saves a .folded
+#              file (open with speedscope or flamegraph.pl)
+PROFILING_MODE = "cprofile"
+
+# Only requests under these path prefixes are profiled
+PROFILING_ROUTES = ["/api/"]
+
+# Sampling interval for "sampling" mode (milliseconds)
+PROFILING_SAMPLE_INTERVAL_MS = 5
+
+# Where profiles are saved, and how many to keep (oldest deleted)
+PROFILES_DIR = f"{DATA_DIR}/profiles"
+PROFILES_KEEP = 50
+
+
+# ================================================================
+# SECTION 9: CONFIG FILE & HOT RELOAD
+# ================================================================
+
+# How often the config file is checked for changes (seconds).
+# See config_loader.py for which settings apply without restart.
+CONFIG_RELOAD_INTERVAL_SECONDS = 2.0
+
+
+# ================================================================
+# SECTION 10: STATIC MEDIA
+# ================================================================
+# The backend serves the kiosk's photos and videos at /media/...
+# with HTTP Range support (video seeking), ETags and caching.
+# See media.py.
+
+# Folder containing index.html, assets/, js/ and css/
+# (the parent of this backend folder)
+FRONTEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Folders under FRONTEND_ROOT that /media/ may serve
+MEDIA_DIRS = ["assets"]
+
+# Cache lifetime for fingerprinted media URLs (/media/...?v=<hash>).
+# Their content never changes, so browsers may keep them for a year.
+MEDIA_MAX_AGE_SECONDS = 31536000
+
+# Let a front-end web server (nginx X-Accel / Apache mod_xsendfile)
+# send the file bytes itself. Leave False when Flask serves directly.
+MEDIA_USE_X_SENDFILE = False
+
+
+# ================================================================
+# SECTION 11: MISSIONARY PHOTO GALLERIES
+# ================================================================
+# GET /api/missionaries/<id>/photos lists a gallery folder with
+# small thumbnails and screen-sized copies made ahead of time.
+# See gallery.py. Thumbnails need Pillow (pip install Pillow);
+# without it the original photos are listed instead.
+
+# Gallery folders live under this folder (relative to FRONTEND_ROOT)
+MISSIONARY_PHOTOS_DIR = "assets/missionary_photos"
+
+# Where manifests and resized copies are written
+GALLERY_CACHE_DIR = f"{DATA_DIR}/gallery_cache"
+
+# Longest side, in pixels, of the thumbnail and display copies
+GALLERY_THUMB_SIZE = 320
+GALLERY_DISPLAY_SIZE = 1600
+
+# JPEG quality of the resized copies (1-95)
+GALLERY_JPEG_QUALITY = 82
+
+# Build every gallery's thumbnails in the background at startup,
+# so the first visitor to open a gallery does not wait for them
+GALLERY_WARM_ON_START = True
+
+
+# ================================================================
+# SECTION 12: DEDUPLICATION
+# ================================================================
+# Selfie images are stored once per unique content, named by
+# their SHA-256 hash (see blob_store.py). Selfie records refer to
+# their image by that hash.
+
+# Content-addressed image store
+BLOBS_DIR = f"{DATA_DIR}/blobs"
+
+# A selfie that looks like one taken this many seconds earlier is
+# flagged as a repeat (e.g. a double-tapped capture button).
+# Byte-identical repeats in this window are not saved again.
+SELFIE_DUPLICATE_WINDOW_SECONDS = 10
+
+# How different two selfies may look and still count as a repeat
+# (bits out of 64 in their perceptual hash; needs Pillow)
+SELFIE_NEAR_DUPLICATE_DISTANCE = 6
+
+# Temple photos indexed for the screensaver (relative to FRONTEND_ROOT)
+TEMPLE_PHOTOS_ASSET_DIR = "assets/temple_photos"
+
+
+# ================================================================
+# SECTION 13: IMAGE PLACEHOLDERS
+# ================================================================
+# Photo listings include each image's size and a tiny blurred
+# preview (an inline JPEG under 1 KB), so the kiosk can
+# lay out and paint instantly while the real photo downloads.
+# They are computed once per image and kept in IMAGE_CATALOG_FILE.
+# See catalog.py. Needs Pillow.
+
+IMAGE_CATALOG_FILE = f"{DATA_DIR}/image_catalog.json"
+
+# Longest side of the placeholder, in pixels
+PLACEHOLDER_SIZE = 16
+
+
+# ================================================================
+# SECTION 14: SCREENSAVER PLAYLIST
+# ================================================================
+# GET /api/screensaver/playlist gives the screensaver a shuffled
+# order of distinct temple photos, resized to screen size, and
+# tells it how many upcoming photos to download ahead. See
+# playlist.py.
+
+# Longest side of the screensaver copies (kiosk screen width)
+SCREENSAVER_PHOTO_SIZE = 1920
+
+# Photos the screensaver downloads ahead of the one on screen.
+# Only these are held in browser memory, not the whole list.
+SCREENSAVER_PREFETCH_COUNT = 2
+
+# Holds the shuffle seed, so the order survives restarts
+SCREENSAVER_STATE_FILE = f"{DATA_DIR}/screensaver_state.json"
+
+
+# ================================================================
+# SECTION 15: BACKUP & RESTORE
+# ================================================================
+# GET /api/export streams a tar archive of all collections and
+# selfie images; POST /api/import merges one in. The same can be
+# done offline with `python backup.py`. See backup.py.
+
+# Allow downloading backups over HTTP
+EXPORT_API_ENABLED = True
+
+# Allow restoring backups over HTTP. Off by default: anyone who
+# can reach the server could otherwise add records.
+IMPORT_API_ENABLED = False
+
+
+# ================================================================
+# SECTION 16: SELFIE RETENTION
+# ================================================================
+# A background task moves old selfies out of the active list into
+# an archive, so listings and backups stay fast however long the
+# kiosk runs. An archived selfie keeps a thumbnail and a smaller
+# recompressed copy on hand; the original is gzipped into a cold
+# folder. See retention.py.
+
+# Run the retention task
+SELFIE_RETENTION_ENABLED = True
+
+# Selfies older than this many days are archived
+SELFIE_RETENTION_DAYS = 90
+
+# Disk space the active selfies' images may use. Beyond it the
+# oldest selfies are archived early, whatever their age.
+SELFIE_ACTIVE_BUDGET_MB = 2048
+
+# How often the task checks for work, and how many selfies it
+# archives per step (it keeps stepping until nothing is due)
+SELFIE_RETENTION_INTERVAL_SECONDS = 600
+SELFIE_RETENTION_BATCH = 25
+
+# Archive folder: index.json (archived selfie records) and
+# originals/<hash>.gz
+SELFIE_ARCHIVE_DIR = f"{DATA_DIR}/selfie_archive"
+
+# The copies kept on hand for archived selfies (longest side in
+# pixels) and their JPEG quality
+SELFIE_ARCHIVE_THUMB_SIZE = 320
+SELFIE_ARCHIVE_COPY_SIZE = 1280
+SELFIE_ARCHIVE_JPEG_QUALITY = 75
+
+# Keep the full-size originals (gzipped) in the cold folder.
+# False deletes them once the copies exist.
+SELFIE_ARCHIVE_KEEP_ORIGINALS = True
+
+
+# ================================================================
+# SECTION 17: BULK IMPORT
+# ================================================================
+# POST /api/temple-visits/bulk and POST /api/missionaries/bulk
+# load CSV or JSON Lines files. See bulk_import.py.
+
+# Valid rows saved per storage write. A year of ward records
+# fits in one batch.
+BULK_IMPORT_BATCH_SIZE = 1000
+
+# Row errors listed in the response (the rest are only counted)
+BULK_IMPORT_MAX_ERRORS = 100
+
+
+# ================================================================
+# SECTION 18: BATCHED REQUESTS
+# ================================================================
+# POST /api/batch and GET /api/bootstrap run several API calls in
+# one round trip. See batch.py.
+
+# Most sub-requests in one POST /api/batch
+BATCH_MAX_REQUESTS = 20
+
+# Sub-requests run at the same time (a change replaces the pool)
+BATCH_MAX_WORKERS = 4
+
+
+# ================================================================
+# SECTION 19: MULTI-KIOSK REPLICATION
+# ================================================================
+# Kiosks in the same building share selfies, temple visits and
+# missionaries by pulling each other's change logs over HTTP.
+# See replication.py.
+
+# Turn replication (the /api/replication/* routes and the
+# background puller) on or off
+REPLICATION_ENABLED = False
+
+# Base URLs of the other kiosks to pull from, e.g.
+# ["http://192.168.1.21:5000", "http://192.168.1.22:5000"].
+# With a hub, list only the hub here and every kiosk on the hub.
+REPLICATION_PEERS = []
+
+# This kiosk's name in the change log. Empty = a random id chosen
+# on first start and remembered in REPLICATION_DIR.
+REPLICATION_NODE_ID = ""
+
+# Shared secret sent as X-Replication-Key. When set, peers without
+# it are refused. Use the same value on every kiosk.
+REPLICATION_SHARED_KEY = ""
+
+# Seconds between pulls, changes per pull, and HTTP timeout
+REPLICATION_INTERVAL_SECONDS = 15
+REPLICATION_BATCH_SIZE = 500
+REPLICATION_TIMEOUT_SECONDS = 10
+
+# Change log (changes.jsonl) and pull positions (state.json)
+REPLICATION_DIR = f"{DATA_DIR}/replication"
+
+
+# ================================================================
+# SECTION 20: ASYNC (ASGI) SERVING
+# ================================================================
+# `python asgi.py` serves the same routes on asyncio, so slow
+# uploads and long downloads wait on the event loop instead of
+# holding a thread each. See asgi.py.
+
+# Threads running routes (storage and Drive I/O happen on these).
+# Requests beyond this wait their turn without holding a thread.
+ASGI_MAX_WORKERS = 16
+
+# Server used by `python asgi.py`: "auto" (uvicorn if installed,
+# else the built-in one), "uvicorn" or "builtin"
+ASGI_SERVER = "auto"
+
+# Request bodies up to this size stay in memory while they arrive;
+# larger ones are spooled to a temp file
+ASGI_BODY_SPOOL_BYTES = 1024 * 1024
+
+# Seconds an idle keep-alive connection stays open (built-in server)
+ASGI_KEEPALIVE_SECONDS = 15
+
+
+# ================================================================
+# SECTION 21: JSON ENCODING
+# ================================================================
+# API responses and the data files are encoded by records.py. A
+# fast encoder is used when one is installed (pip install orjson);
+# the output is the same JSON either way.
+
+# "auto" (orjson, else msgspec, else the standard library),
+# "orjson", "msgspec" or "stdlib". A named encoder that is not
+# installed falls back to the standard library.
+JSON_ENCODER = "auto"
+
+
+# ================================================================
+# SECTION 22: SELFIE MOSAIC
+# ================================================================
+# GET /api/selfies/mosaic composes the most recent selfies into one
+# wall image (see mosaic.py). The wall is cached in tiles, so a new
+# selfie only redraws the tile it lands in.
+
+# Tiles, cell thumbnails and finished walls
+MOSAIC_CACHE_DIR = f"{DATA_DIR}/mosaic_cache"
+
+# Side of one selfie's cell in pixels (the wall holds as many whole
+# cells as fit in the requested size), and the gap between cells
+MOSAIC_CELL_SIZE = 160
+MOSAIC_CELL_GAP = 4
+
+# Cells per tile side: a tile of 4 x 4 cells is redrawn as a unit
+MOSAIC_TILE_CELLS = 4
+
+# Wall size when ?w= / ?h= are not given, and the largest allowed side
+MOSAIC_DEFAULT_WIDTH = 1920
+MOSAIC_DEFAULT_HEIGHT = 1080
+MOSAIC_MAX_SIDE = 4096
+
+# Background (gaps and empty cells) and JPEG quality of the wall
+MOSAIC_BACKGROUND = "#111111"
+MOSAIC_JPEG_QUALITY = 85
+
+# Wall sizes kept in the cache; the least recently used is dropped
+MOSAIC_MAX_LAYOUTS = 4
+
+
+# ================================================================
+# SECTION 23: FRONTEND BUNDLE
+# ================================================================
+# The backend can serve the kiosk page itself: index.html with all
+# scripts in one file and all local stylesheets in another, both
+# minified, named by content hash and precompressed (see bundle.py).
+# Open http://localhost:5000/ instead of index.html.
+
+# Serve the bundled page at / (the plain index.html keeps working)
+BUNDLE_ENABLED = True
+
+# Built bundles and the rewritten index.html
+BUNDLE_DIR = f"{DATA_DIR}/bundle"
+
+# Strip comments and whitespace from the bundled JS and CSS
+BUNDLE_MINIFY = True
+
+# Older builds kept for pages loaded before a rebuild
+BUNDLE_KEEP_BUILDS = 3
+
+
+# ================================================================
+# SECTION 24: OFFLINE PRECACHE
+# ================================================================
+# When the page is served by the backend (see SECTION 23), a
+# service worker (sw.js) keeps the page and its images in the
+# browser's Cache Storage and answers API reads from its cache
+# while refreshing them, so the kiosk boots even when the backend
+# or network is slow. GET /api/precache-manifest lists what it
+# keeps (see precache.py).
+
+# Precache the screen-sized screensaver photos
+PRECACHE_SCREENSAVER_PHOTOS = True
+
+# Precache missionary portraits and gallery thumbnails
+PRECACHE_GALLERY_THUMBS = True
+
+
+# ================================================================
+# SECTION 25: RESOURCE WATCHDOG
+# ================================================================
+# A background task samples the server and its data folder and
+# reports through GET /api/health?deep=1 (see resource_watchdog.py).
+# Each check is "ok", "warn" or "critical" against the limits
+# below; the health endpoint answers 503 while any is critical.
+
+# Sample in the background (otherwise ?deep=1 samples on request)
+WATCHDOG_ENABLED = True
+
+# Seconds between samples
+WATCHDOG_INTERVAL_SECONDS = 30
+
+# Resident memory of the server process, in MB
+WATCHDOG_RSS_WARN_MB = 400
+WATCHDOG_RSS_CRITICAL_MB = 800
+
+# Open files and sockets, as a percentage of the process limit
+WATCHDOG_FDS_WARN_PERCENT = 70
+WATCHDOG_FDS_CRITICAL_PERCENT = 90
+
+# Free space on the disk holding DATA_DIR, in MB
+WATCHDOG_DISK_WARN_MB = 1024
+WATCHDOG_DISK_CRITICAL_MB = 200
+
+# Writing, syncing and reading back a small file in DATA_DIR, in ms
+WATCHDOG_STORAGE_WARN_MS = 250
+WATCHDOG_STORAGE_CRITICAL_MS = 2000
+
+# Items waiting in a background queue or for a worker pool thread
+WATCHDOG_QUEUE_WARN = 20
+WATCHDOG_QUEUE_CRITICAL = 100
+
+# How late the ASGI event loop runs a callback, in ms (asgi.py only)
+WATCHDOG_LOOP_LAG_WARN_MS = 100
+WATCHDOG_LOOP_LAG_CRITICAL_MS = 1000
+
+# Act on problems: drop in-memory caches while memory is at warn or
+# above, and pause background jobs (selfie retention, replication,
+# gallery warm-up) while memory, disk, storage latency, threads or
+# the event loop are critical
+WATCHDOG_MITIGATIONS = True
+
+
+# ================================================================
+# SECTION 26: IDEMPOTENCY KEYS
+# ================================================================
+# A POST sent with an Idempotency-Key header runs once; retries with
+# the same key get the first response back without the body being
+# read or saved again (see idempotency.py). The kiosk page sends a
+# key with every POST and reuses it when it retries.
+
+# Honor Idempotency-Key headers
+IDEMPOTENCY_ENABLED = True
+
+# Seconds a key is remembered after its first use
+IDEMPOTENCY_TTL_SECONDS = 3600
+
+# Most keys remembered; the oldest are forgotten first
+IDEMPOTENCY_MAX_KEYS = 500
+
+# Larger responses are not kept (a retry then runs again)
+IDEMPOTENCY_MAX_RESPONSE_BYTES = 64 * 1024
+
+
+# ================================================================
+# SECTION 27: CLIENT TELEMETRY
+# ================================================================
+# The kiosk page reports how long screens take to render on this
+# hardware (js/telemetry.js); the backend keeps per-minute
+# percentiles (see telemetry.py and GET /api/telemetry/summary).
+
+# Accept telemetry (the page stops sending while this is off)
+TELEMETRY_ENABLED = True
+
+# Events held in memory between rollups; the oldest are dropped
+# when it is full (restart to change)
+TELEMETRY_BUFFER_EVENTS = 50000
+
+# Seconds between rollups into TELEMETRY_DIR
+TELEMETRY_ROLLUP_SECONDS = 60
+
+# Days of rollup files kept
+TELEMETRY_KEEP_DAYS = 30
+
+# One JSON Lines file of per-minute rows per day
+TELEMETRY_DIR = f"{DATA_DIR}/telemetry"
+
+
+# ================================================================
+# SECTION 28: SELFIE RELAY (APPS SCRIPT)
+# ================================================================
+# Kiosk selfies for the Google mosaic are handed to this backend,
+# which answers at once and forwards them to the Apps Script web
+# app in the background: shrunk, several per call when the script
+# supports it, over one kept-alive HTTPS connection. See
+# selfie_relay.py (and fake_apps_script.py for testing offline).
+
+# Forward selfies (accepted selfies wait in SELFIE_RELAY_DIR while
+# this is off)
+SELFIE_RELAY_ENABLED = True
+
+# Apps Script web app the selfies are posted to
+SELFIE_RELAY_URL = "https://script.google.com/macros/s/AKfycbxFqa1EIlhbDGkTruKe1T_3qq50ITqYxtGsYdbwYFZidGzyutZqWIRwaUsRKn-a0trb8g/exec"
+
+# Longest side (pixels) and JPEG quality of the forwarded copy;
+# smaller originals are sent as they are
+SELFIE_RELAY_MAX_SIDE = 1280
+SELFIE_RELAY_JPEG_QUALITY = 80
+
+# Apps Script action taking several selfies per call (a JSON list
+# in "selfies"). Empty = the script only has saveKioskSelfie, so
+# each selfie is one call.
+SELFIE_RELAY_BATCH_ACTION = ""
+SELFIE_RELAY_BATCH_SIZE = 5
+
+# Seconds between checks of the outbox when nothing new arrived,
+# and HTTP timeout per call
+SELFIE_RELAY_INTERVAL_SECONDS = 30
+SELFIE_RELAY_TIMEOUT_SECONDS = 60
+
+# A failed selfie is retried after 2, 4, 8, ... seconds (at most
+# this many), and moved to the failed/ folder after
+# SELFIE_RELAY_MAX_ATTEMPTS tries
+SELFIE_RELAY_RETRY_MAX_SECONDS = 900
+SELFIE_RELAY_MAX_ATTEMPTS = 50
+
+# Selfies waiting to be forwarded (one .jpg + .json per selfie)
+SELFIE_RELAY_DIR = f"{DATA_DIR}/selfie_outbox"
+
+
+# ================================================================
+# Apply config file and environment overrides
 # ================================================================
+# Must stay below every setting. Reads kiosk_config.json (if any)
+# and KIOSK_* environment variables, validates everything, and
+# replaces the values above. Prints nothing.
 
-# TODO: Add rate limiting settings when needed
-# MAX_REQUESTS_PER_MINUTE = 60
-# ENABLE_RATE_LIMITING = False
+from config_loader import apply_overrides
+apply_overrides(globals())
 
 
 # ================================================================
-# Print configuration on import (for debugging)
+# Print configuration (for debugging)
 # ================================================================
+# Importing this module has no side effects; app.py calls this
+# when the server is started directly.
 
-if DEBUG_MODE:
-    print("[Config] Configuration loaded:")
-    print(f"  - API_PORT: {API_PORT}")
-    print(f"  - STORAGE_MODE: {STORAGE_MODE}")
-    print(f"  - DATA_DIR: {DATA_DIR}")
-    print(f"  - DEBUG_MODE: {DEBUG_MODE}")
+def print_config():
+    """Print the main configuration values when DEBUG_MODE is on."""
+    if DEBUG_MODE:
+        print("[Config] Configuration loaded:")
+        print(f"  - API_PORT: {API_PORT}")
+        print(f"  - STORAGE_MODE: {STORAGE_MODE}")
+        print(f"  - DATA_DIR: {DATA_DIR}")
+        print(f"  - DEBUG_MODE: {DEBUG_MODE}")
@@ -0,0 +1,557 @@
+"""
+================================================================
+CONFIG_LOADER.PY - CONFIG FILE, ENVIRONMENT & HOT RELOAD
+================================================================
+This module layers a config file and environment variables on
+top of the defaults in config.py, validates the result, and can
+re-apply safe changes while the server is running.
+
+PRECEDENCE (highest wins):
+1. Environment variables   KIOSK_<NAME>, e.g. KIOSK_API_PORT=5001
+2. Config file             kiosk_config.json (JSON object)
+3. Defaults                the values written in config.py
+
+The config file path defaults to ./kiosk_config.json and can be
+changed with the KIOSK_CONFIG_FILE environment variable. Keys are
+the same names used in config.py, e.g.:
+
+    {
+        "LOG_STORAGE": false,
+        "DATA_DIR": "D:/kiosk-data"
+    }
+
+Paths derived from DATA_DIR (SELFIES_DIR, TEMPLE_VISITS_FILE, ...)
+follow a changed DATA_DIR unless they are set explicitly.
+
+HOT RELOAD:
+start_config_watcher() polls the file for changes. Keys listed in
+HOT_RELOADABLE (logging flags, cache sizes, the batch worker
+count, ...) are applied to the config module immediately; code
+that wants to see them must read `config.NAME` at call time
+rather than binding it with `from config import NAME`. Changes to
+any other key (e.g. ASGI_MAX_WORKERS, whose pool the server holds
+from the start) are logged once and take effect on the next
+restart. An invalid file is
+rejected as a whole and the running config is kept.
+
+USAGE:
+    # config.py applies overrides on import:
+    from config_loader import apply_overrides
+    apply_overrides(globals())
+
+    # app.py:
+    from config_loader import config_version, on_config_change
+    on_config_change(lambda changes: print(changes))
+================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+
+
+# ================================================================
+# SECTION 1: SETTINGS
+# ================================================================
+
+CONFIG_FILE_ENV = "KIOSK_CONFIG_FILE"
+DEFAULT_CONFIG_FILE = "./kiosk_config.json"
+ENV_PREFIX = "KIOSK_"
+
+# Keys that can change while the server runs. Everything else is
+# read once at startup (ports, paths, storage mode, ...).
+HOT_RELOADABLE = {
+    "LOG_REQUESTS",
+    "LOG_STORAGE",
+    "PROFILING_MODE",
+    "PROFILING_ROUTES",
+    "PROFILING_SAMPLE_INTERVAL_MS",
+    "PROFILES_KEEP",
+    "CONFIG_RELOAD_INTERVAL_SECONDS",
+    "ENABLE_RATE_LIMITING",
+    "MAX_REQUESTS_PER_MINUTE",
+    "RATE_LIMIT_BURST",
+    "RATE_LIMIT_ROUTES",
+    "RATE_LIMIT_EXEMPT",
+    "UPLOAD_ROUTES",
+    "MAX_UPLOAD_BYTES",
+    "MAX_CONCURRENT_UPLOADS",
+    "MAX_INFLIGHT_UPLOAD_BYTES",
+    "MEDIA_MAX_AGE_SECONDS",
+    "SELFIE_DUPLICATE_WINDOW_SECONDS",
+    "SELFIE_NEAR_DUPLICATE_DISTANCE",
+    "SCREENSAVER_PREFETCH_COUNT",
+    "EXPORT_API_ENABLED",
+    "IMPORT_API_ENABLED",
+    "SELFIE_RETENTION_ENABLED",
+    "SELFIE_RETENTION_DAYS",
+    "SELFIE_ACTIVE_BUDGET_MB",
+    "SELFIE_RETENTION_INTERVAL_SECONDS",
+    "SELFIE_RETENTION_BATCH",
+    "SELFIE_ARCHIVE_THUMB_SIZE",
+    "SELFIE_ARCHIVE_COPY_SIZE",
+    "SELFIE_ARCHIVE_JPEG_QUALITY",
+    "SELFIE_ARCHIVE_KEEP_ORIGINALS",
+    "BULK_IMPORT_BATCH_SIZE",
+    "BULK_IMPORT_MAX_ERRORS",
+    "BATCH_MAX_REQUESTS",
+    "BATCH_MAX_WORKERS",
+    "REPLICATION_ENABLED",
+    "REPLICATION_PEERS",
+    "REPLICATION_SHARED_KEY",
+    "REPLICATION_INTERVAL_SECONDS",
+    "REPLICATION_BATCH_SIZE",
+    "REPLICATION_TIMEOUT_SECONDS",
+    "JSON_ENCODER",
+    "MOSAIC_CELL_SIZE",
+    "MOSAIC_CELL_GAP",
+    "MOSAIC_TILE_CELLS",
+    "MOSAIC_DEFAULT_WIDTH",
+    "MOSAIC_DEFAULT_HEIGHT",
+    "MOSAIC_MAX_SIDE",
+    "MOSAIC_BACKGROUND",
+    "MOSAIC_JPEG_QUALITY",
+    "MOSAIC_MAX_LAYOUTS",
+    "BUNDLE_ENABLED",
+    "BUNDLE_MINIFY",
+    "BUNDLE_KEEP_BUILDS",
+    "PRECACHE_SCREENSAVER_PHOTOS",
+    "PRECACHE_GALLERY_THUMBS",
+    "WATCHDOG_ENABLED",
+    "WATCHDOG_INTERVAL_SECONDS",
+    "WATCHDOG_RSS_WARN_MB",
+    "WATCHDOG_RSS_CRITICAL_MB",
+    "WATCHDOG_FDS_WARN_PERCENT",
+    "WATCHDOG_FDS_CRITICAL_PERCENT",
+    "WATCHDOG_DISK_WARN_MB",
+    "WATCHDOG_DISK_CRITICAL_MB",
+    "WATCHDOG_STORAGE_WARN_MS",
+    "WATCHDOG_STORAGE_CRITICAL_MS",
+    "WATCHDOG_QUEUE_WARN",
+    "WATCHDOG_QUEUE_CRITICAL",
+    "WATCHDOG_LOOP_LAG_WARN_MS",
+    "WATCHDOG_LOOP_LAG_CRITICAL_MS",
+    "WATCHDOG_MITIGATIONS",
+    "IDEMPOTENCY_ENABLED",
+    "IDEMPOTENCY_TTL_SECONDS",
+    "IDEMPOTENCY_MAX_KEYS",
+    "IDEMPOTENCY_MAX_RESPONSE_BYTES",
+    "TELEMETRY_ENABLED",
+    "TELEMETRY_ROLLUP_SECONDS",
+    "TELEMETRY_KEEP_DAYS",
+    "SELFIE_RELAY_ENABLED",
+    "SELFIE_RELAY_URL",
+    "SELFIE_RELAY_MAX_SIDE",
+    "SELFIE_RELAY_JPEG_QUALITY",
+    "SELFIE_RELAY_BATCH_ACTION",
+    "SELFIE_RELAY_BATCH_SIZE",
+    "SELFIE_RELAY_INTERVAL_SECONDS",
+    "SELFIE_RELAY_TIMEOUT_SECONDS",
+    "SELFIE_RELAY_RETRY_MAX_SECONDS",
+    "SELFIE_RELAY_MAX_ATTEMPTS"
+}
+
+# Allowed values for string settings
+CHOICES = {
+    "STORAGE_MODE": ("local", "googleDrive"),
+    "PROFILING_MODE": ("cprofile", "sampling"),
+    "ASGI_SERVER": ("auto", "uvicorn", "builtin"),
+    "JSON_ENCODER": ("auto", "orjson", "msgspec", "stdlib")
+}
+
+# (minimum, maximum) for numeric settings; None means unbounded
+RANGES = {
+    "API_PORT": (1, 65535),
+    "COLD_START_TARGET_MS": (1, None),
+    "PROFILING_SAMPLE_INTERVAL_MS": (1, 1000),
+    "PROFILES_KEEP": (1, None),
+    "CONFIG_RELOAD_INTERVAL_SECONDS": (0.5, 3600),
+    "MAX_REQUESTS_PER_MINUTE": (1, None),
+    "RATE_LIMIT_BURST": (1, None),
+    "MAX_UPLOAD_BYTES": (1024, None),
+    "MAX_CONCURRENT_UPLOADS": (1, None),
+    "MAX_INFLIGHT_UPLOAD_BYTES": (1024, None),
+    "GALLERY_THUMB_SIZE": (16, 2048),
+    "GALLERY_DISPLAY_SIZE": (64, 8192),
+    "GALLERY_JPEG_QUALITY": (1, 95),
+    "SELFIE_DUPLICATE_WINDOW_SECONDS": (0, None),
+    "SELFIE_NEAR_DUPLICATE_DISTANCE": (0, 64),
+    "PLACEHOLDER_SIZE": (4, 64),
+    "SCREENSAVER_PHOTO_SIZE": (320, 8192),
+    "SCREENSAVER_PREFETCH_COUNT": (0, 20),
+    "SELFIE_RETENTION_DAYS": (1, None),
+    "SELFIE_ACTIVE_BUDGET_MB": (1, None),
+    "SELFIE_RETENTION_INTERVAL_SECONDS": (5, None),
+    "SELFIE_RETENTION_BATCH": (1, 1000),
+    "SELFIE_ARCHIVE_THUMB_SIZE": (16, 2048),
+    "SELFIE_ARCHIVE_COPY_SIZE": (64, 8192),
+    "SELFIE_ARCHIVE_JPEG_QUALITY": (1, 95),
+    "BULK_IMPORT_BATCH_SIZE": (1, 100000),
+    "BULK_IMPORT_MAX_ERRORS": (0, 10000),
+    "BATCH_MAX_REQUESTS": (1, 200),
+    "BATCH_MAX_WORKERS": (1, 64),
+    "REPLICATION_INTERVAL_SECONDS": (1, 86400),
+    "REPLICATION_BATCH_SIZE": (1, 10000),
+    "REPLICATION_TIMEOUT_SECONDS": (1, 300),
+    "ASGI_MAX_WORKERS": (1, 256),
+    "ASGI_BODY_SPOOL_BYTES": (0, None),
+    "ASGI_KEEPALIVE_SECONDS": (1, 3600),
+    "MOSAIC_CELL_SIZE": (16, 1024),
+    "MOSAIC_CELL_GAP": (0, 64),
+    "MOSAIC_TILE_CELLS": (1, 64),
+    "MOSAIC_DEFAULT_WIDTH": (16, 16384),
+    "MOSAIC_DEFAULT_HEIGHT": (16, 16384),
+    "MOSAIC_MAX_SIDE": (64, 16384),
+    "MOSAIC_JPEG_QUALITY": (1, 95),
+    "MOSAIC_MAX_LAYOUTS": (1, 100),
+    "BUNDLE_KEEP_BUILDS": (1, 100),
+    "WATCHDOG_INTERVAL_SECONDS": (1, 3600),
+    "WATCHDOG_RSS_WARN_MB": (1, None),
+    "WATCHDOG_RSS_CRITICAL_MB": (1, None),
+    "WATCHDOG_FDS_WARN_PERCENT": (1, 100),
+    "WATCHDOG_FDS_CRITICAL_PERCENT": (1, 100),
+    "WATCHDOG_DISK_WARN_MB": (0, None),
+    "WATCHDOG_DISK_CRITICAL_MB": (0, None),
+    "WATCHDOG_STORAGE_WARN_MS": (1, None),
+    "WATCHDOG_STORAGE_CRITICAL_MS": (1, None),
+    "WATCHDOG_QUEUE_WARN": (1, None),
+    "WATCHDOG_QUEUE_CRITICAL": (1, None),
+    "WATCHDOG_LOOP_LAG_WARN_MS": (1, None),
+    "WATCHDOG_LOOP_LAG_CRITICAL_MS": (1, None),
+    "IDEMPOTENCY_TTL_SECONDS": (1, 7 * 24 * 3600),
+    "IDEMPOTENCY_MAX_KEYS": (1, 100000),
+    "IDEMPOTENCY_MAX_RESPONSE_BYTES": (0, 16 * 1024 * 1024),
+    "TELEMETRY_BUFFER_EVENTS": (100, 10000000),
+    "TELEMETRY_ROLLUP_SECONDS": (5, 3600),
+    "TELEMETRY_KEEP_DAYS": (1, 3650),
+    "SELFIE_RELAY_MAX_SIDE": (64, 8192),
+    "SELFIE_RELAY_JPEG_QUALITY": (1, 95),
+    "SELFIE_RELAY_BATCH_SIZE": (1, 50),
+    "SELFIE_RELAY_INTERVAL_SECONDS": (1, 3600),
+    "SELFIE_RELAY_TIMEOUT_SECONDS": (1, 600),
+    "SELFIE_RELAY_RETRY_MAX_SECONDS": (1, 86400),
+    "SELFIE_RELAY_MAX_ATTEMPTS": (1, None)
+}
+
+
+class ConfigError(ValueError):
+    """Raised when the config file or environment holds an invalid value."""
+
+
+# Current effective config and where each value came from
+_state = {
+    "defaults": {},
+    "values": {},
+    "sources": {},
+    "version": None,
+    "file": None,
+    "file_mtime": None,
+    "loaded_at": None,
+    # Changed keys waiting for a restart, with their new values
+    "pending": {}
+}
+
+_listeners = []
+_lock = threading.Lock()
+_watcher = None
+
+
+# ================================================================
+# SECTION 2: LOADING & VALIDATION
+# ================================================================
+
+def _config_file_path():
+    return os.environ.get(CONFIG_FILE_ENV, DEFAULT_CONFIG_FILE)
+
+
+def _read_config_file(path):
+    """
+    Read the JSON config file.
+
+    Returns:
+        Dict of settings (empty if the file does not exist)
+
+    Raises:
+        ConfigError: If the file is not a JSON object
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ConfigError(f"Cannot read {path}: {e}")
+    if not isinstance(data, dict):
+        raise ConfigError(f"{path} must contain a JSON object")
+    return data
+
+
+def _parse_env_value(name, raw, default):
+    """Convert an environment string to the type of the default value."""
+    if isinstance(default, bool):
+        lowered = raw.strip().lower()
+        if lowered in ("1", "true", "yes", "on"):
+            return True
+        if lowered in ("0", "false", "no", "off"):
+            return False
+        raise ConfigError(f"{ENV_PREFIX}{name} must be true or false, got {raw!r}")
+    if isinstance(default, dict):
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ConfigError(f"{ENV_PREFIX}{name} is not valid JSON: {e}")
+        return value
+    if isinstance(default, list):
+        raw = raw.strip()
+        if raw.startswith("["):
+            try:
+                return json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise ConfigError(f"{ENV_PREFIX}{name} is not a valid JSON list: {e}")
+        return [item.strip() for item in raw.split(",") if item.strip()]
+    if isinstance(default, (int, float)):
+        try:
+            return type(default)(raw)
+        except ValueError:
+            raise ConfigError(f"{ENV_PREFIX}{name} must be a number, got {raw!r}")
+    return raw
+
+
+def _validate(name, value, default):
+    """
+    Check a single setting against its default's type, CHOICES and RANGES.
+
+    Returns:
+        The value (ints are accepted where floats are expected)
+
+    Raises:
+        ConfigError: If the value is invalid
+    """
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ConfigError(f"{name} must be true or false")
+    elif isinstance(default, float) and isinstance(value, int) and not isinstance(value, bool):
+        value = float(value)
+    elif type(value) is not type(default):
+        raise ConfigError(f"{name} must be {type(default).__name__}, "
+                          f"got {type(value).__name__}")
+
+    if name in CHOICES and value not in CHOICES[name]:
+        raise ConfigError(f"{name} must be one of {', '.join(CHOICES[name])}")
+
+    if name in RANGES:
+        low, high = RANGES[name]
+        if (low is not None and value < low) or (high is not None and value > high):
+            raise ConfigError(f"{name} must be between {low} and {high if high is not None else 'any'}")
+
+    return value
+
+
+def _build_config(defaults):
+    """
+    Merge defaults, config file and environment into one validated dict.
+
+    Returns:
+        Tuple of (values, sources, file_path, file_mtime)
+
+    Raises:
+        ConfigError: On unknown keys or invalid values
+    """
+    path = _config_file_path()
+    file_values = _read_config_file(path)
+    file_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    unknown = sorted(set(file_values) - set(defaults))
+    if unknown:
+        raise ConfigError(f"Unknown setting(s) in {path}: {', '.join(unknown)}")
+
+    values = dict(defaults)
+    sources = {name: "default" for name in defaults}
+
+    for name, value in file_values.items():
+        values[name] = value
+        sources[name] = "file"
+
+    for name, default in defaults.items():
+        raw = os.environ.get(ENV_PREFIX + name)
+        if raw is not None:
+            values[name] = _parse_env_value(name, raw, default)
+            sources[name] = "env"
+
+    # Paths under the default DATA_DIR follow an overridden DATA_DIR
+    old_root = defaults.get("DATA_DIR")
+    new_root = values.get("DATA_DIR")
+    if old_root and new_root != old_root:
+        for name, default in defaults.items():
+            if (sources[name] == "default" and isinstance(default, str)
+                    and default.startswith(old_root + "/")):
+                values[name] = new_root + default[len(old_root):]
+
+    for name, value in values.items():
+        values[name] = _validate(name, value, defaults[name])
+
+    return values, sources, path, file_mtime
+
+
+def _compute_version(values):
+    """Short hash of the effective config, used as its version/ETag."""
+    canonical = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def apply_overrides(namespace):
+    """
+    Apply the config file and environment to config.py's globals.
+
+    Called once, at the bottom of config.py. The UPPER_CASE values
+    already in the namespace become the defaults.
+
+    Args:
+        namespace: config.py's globals() dict
+
+    Raises:
+        ConfigError: If any setting is invalid (the server should
+                     not start with a broken config)
+    """
+    defaults = {
+        name: value for name, value in namespace.items()
+        if name.isupper() and isinstance(value, (bool, int, float, str, list, dict))
+    }
+    values, sources, path, mtime = _build_config(defaults)
+
+    namespace.update(values)
+    _state.update({
+        "defaults": defaults,
+        "values": values,
+        "sources": sources,
+        "version": _compute_version(values),
+        "file": path,
+        "file_mtime": mtime,
+        "loaded_at": datetime.now().isoformat()
+    })
+
+
+# ================================================================
+# SECTION 3: HOT RELOAD
+# ================================================================
+
+def on_config_change(callback):
+    """
+    Register a function called after hot-reloaded settings change.
+
+    Args:
+        callback: Called with a dict of {name: new_value}
+    """
+    _listeners.append(callback)
+
+
+def reload_config():
+    """
+    Re-read the config file and apply hot-reloadable changes.
+
+    Returns:
+        Dict of applied changes (empty if nothing changed or the
+        new config was invalid)
+    """
+    config_module = sys.modules["config"]
+
+    with _lock:
+        try:
+            values, sources, path, mtime = _build_config(_state["defaults"])
+        except ConfigError as e:
+            print(f"[Config] Reload rejected, keeping current config: {e}")
+            _state["file_mtime"] = _current_mtime()
+            return {}
+
+        _state["file_mtime"] = mtime
+        current = _state["values"]
+        changed = {name: value for name, value in values.items() if current.get(name) != value}
+
+        applied = {name: value for name, value in changed.items() if name in HOT_RELOADABLE}
+        pending = {name: value for name, value in changed.items() if name not in HOT_RELOADABLE}
+        # Report each pending change once, not on every reload
+        reported = _state["pending"]
+        new_pending = sorted(name for name, value in pending.items()
+                             if name not in reported or reported[name] != value)
+        _state["pending"] = pending
+
+        for name, value in applied.items():
+            setattr(config_module, name, value)
+            current[name] = value
+            _state["sources"][name] = sources[name]
+
+        if applied:
+            _state["version"] = _compute_version(current)
+            _state["loaded_at"] = datetime.now().isoformat()
+            print(f"[Config] Applied: {', '.join(f'{k}={v!r}' for k, v in applied.items())}")
+        if new_pending:
+            print(f"[Config] Restart required for: {', '.join(new_pending)}")
+
+    if applied:
+        for callback in list(_listeners):
+            try:
+                callback(applied)
+            except Exception as e:
+                print(f"[Config] Change listener failed: {e}")
+
+    return applied
+
+
+def _current_mtime():
+    path = _state["file"] or _config_file_path()
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def _watch():
+    """Watcher thread: reload whenever the file's mtime changes."""
+    config_module = sys.modules["config"]
+    while True:
+        time.sleep(getattr(config_module, "CONFIG_RELOAD_INTERVAL_SECONDS", 2))
+        if _current_mtime() != _state["file_mtime"]:
+            reload_config()
+
+
+def start_config_watcher():
+    """
+    Start the background thread that watches the config file.
+
+    Safe to call more than once; only one watcher runs.
+    """
+    global _watcher
+    if _watcher is not None:
+        return
+    _watcher = threading.Thread(target=_watch, daemon=True, name="config-watcher")
+    _watcher.start()
+    print(f"[Config] Watching {_state['file']} for changes")
+
+
+# ================================================================
+# SECTION 4: INTROSPECTION
+# ================================================================
+
+def config_version():
+    """Version string of the effective config (changes on every applied reload)."""
+    return _state["version"]
+
+
+def config_info():
+    """
+    Describe the effective config for /api/config.
+
+    Returns:
+        Dict with version, file, loaded_at and the source of each
+        setting that is not a default
+    """
+    return {
+        "version": _state["version"],
+        "file": _state["file"],
+        "loaded_at": _state["loaded_at"],
+        "overrides": {
+            name: source for name, source in sorted(_state["sources"].items())
+            if source != "default"
+        }
+    }
@@ -0,0 +1,200 @@
+"""
+================================================================
+FAKE_APPS_SCRIPT.PY - LOCAL STAND-IN FOR THE APPS SCRIPT WEB APP
+================================================================
+A small HTTP server that answers like the Temple365 Apps Script
+web app does for kiosk selfies, so the selfie relay
+(selfie_relay.py) can be tried and tested without Google.
+
+PURPOSE:
+- POST /macros/s/<id>/exec with action=saveKioskSelfie (one
+  selfie) or action=saveKioskSelfies (a JSON list in "selfies")
+- Answers like Google: a 302 redirect to /macros/echo, whose GET
+  returns the JSON result ({"success": true, ...})
+- Keeps connections alive (HTTP/1.1), and logs which connection
+  each call came in on, so reuse is visible
+- Saves the received images to --save-dir
+- Can be made slow (--delay) or unreliable (--fail-rate) to try
+  the relay's retries
+
+RUNNING IT:
+================================================================
+   cd backend
+   python fake_apps_script.py --port 5055 --delay 1.5
+
+Then point the backend at it:
+
+   KIOSK_SELFIE_RELAY_URL=http://localhost:5055/macros/s/test/exec python app.py
+
+and, to try batching:
+
+   KIOSK_SELFIE_RELAY_BATCH_ACTION=saveKioskSelfies ...
+================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Actions this fake understands
+SINGLE_ACTION = "saveKioskSelfie"
+BATCH_ACTION = "saveKioskSelfies"
+
+# Results waiting to be fetched from /macros/echo, by key
+_results = {}
+_results_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: SAVING SELFIES
+# ================================================================
+
+def save_selfie(options, image_data, timestamp):
+    """
+    Decode and store one selfie like the script would.
+
+    Returns:
+        Result dict ({"success": ..., "message": ...})
+    """
+    if options.fail_rate and random.random() < options.fail_rate:
+        return {"success": False, "message": "Simulated failure"}
+    try:
+        image_bytes = base64.b64decode(image_data or "", validate=True)
+    except ValueError:
+        return {"success": False, "message": "imageData is not base64"}
+    if not image_bytes:
+        return {"success": False, "message": "imageData is required"}
+
+    name = f"kiosk_selfie_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.jpg"
+    if options.save_dir:
+        os.makedirs(options.save_dir, exist_ok=True)
+        with open(os.path.join(options.save_dir, name), 'wb') as f:
+            f.write(image_bytes)
+    print(f"[FakeAppsScript] Saved {name} ({len(image_bytes)} bytes, taken {timestamp})")
+    return {"success": True, "message": "Selfie saved", "fileName": name}
+
+
+def handle_action(options, fields):
+    """Run a doPost() action on the decoded form fields."""
+    action = fields.get("action")
+    if action == SINGLE_ACTION:
+        return save_selfie(options, fields.get("imageData"), fields.get("timestamp"))
+    if action == BATCH_ACTION:
+        try:
+            selfies = json.loads(fields.get("selfies") or "[]")
+        except ValueError:
+            return {"success": False, "message": "selfies is not JSON"}
+        results = [save_selfie(options, s.get("imageData"), s.get("timestamp"))
+                   for s in selfies if isinstance(s, dict)]
+        return {"success": True, "results": results}
+    return {"success": False, "message": f"Unknown action: {action}"}
+
+
+# ================================================================
+# SECTION 2: HTTP HANDLER
+# ================================================================
+
+class FakeAppsScriptHandler(BaseHTTPRequestHandler):
+    """POST /macros/s/<id>/exec -> 302 -> GET /macros/echo?key=..."""
+
+    protocol_version = "HTTP/1.1"
+    options = None
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace")
+        if not (path.startswith("/macros/s/") and path.endswith("/exec")):
+            self._send(404, b"Not found")
+            return
+
+        print(f"[FakeAppsScript] POST from {self.client_address[0]}:{self.client_address[1]} "
+              f"({length} bytes)")
+        if self.options.delay:
+            time.sleep(self.options.delay)
+
+        fields = {name: values[0] for name, values in parse_qs(body).items()}
+        result = handle_action(self.options, fields)
+
+        key = uuid.uuid4().hex
+        with _results_lock:
+            _results[key] = result
+        self._send(302, headers={"Location": f"/macros/echo?user_content_key={key}"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path != "/macros/echo":
+            self._send(404, b"Not found")
+            return
+        key = parse_qs(parts.query).get("user_content_key", [""])[0]
+        with _results_lock:
+            result = _results.pop(key, None)
+        if result is None:
+            self._send(404, b"Result expired")
+            return
+        self._send(200, json.dumps(result).encode("utf-8"),
+                   {"Content-Type": "application/json"})
+
+
+# ================================================================
+# SECTION 3: MAIN
+# ================================================================
+
+def make_server(port=5055, delay=0.0, fail_rate=0.0, save_dir=None, verbose=False):
+    """
+    Build the fake server (call serve_forever() on it).
+
+    Port 0 picks a free port (see server.server_address).
+    """
+    options = argparse.Namespace(delay=delay, fail_rate=fail_rate,
+                                 save_dir=save_dir, verbose=verbose)
+    handler = type("Handler", (FakeAppsScriptHandler,), {"options": options})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Apps Script endpoint for kiosk selfies.")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="Seconds to wait before answering each POST")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Share of selfies answered with success: false (0-1)")
+    parser.add_argument("--save-dir", default="./data/fake_apps_script",
+                        help="Folder for received images ('' to discard them)")
+    parser.add_argument("--verbose", action="store_true", help="Log every request line")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.port, args.delay, args.fail_rate, args.save_dir, args.verbose)
+    print(f"[FakeAppsScript] Listening on http://127.0.0.1:{server.server_address[1]}"
+          f"/macros/s/test/exec")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,478 @@
+"""
+================================================================
+GALLERY.PY - MISSIONARY PHOTO GALLERY MANIFESTS & THUMBNAILS
+================================================================
+This module lists the photos in a missionary's gallery folder and
+makes small copies of them ahead of time, so the gallery can show
+a thumbnail instantly and fetch a screen-sized image only when the
+visitor swipes to it (the originals are 2-5 MB camera photos).
+
+PURPOSE:
+- GET /api/missionaries/<id>/photos returns the gallery manifest:
+  every photo with its original, display-size and thumbnail URLs,
+  dimensions and a tiny inline placeholder
+- GET /gallery/<file> serves the resized copies (Range, ETag and
+  immutable caching, same as /media/); the screensaver's
+  screen-sized copies are made and served the same way
+
+HOW IT WORKS:
+Each gallery folder is scanned once. Photos are fingerprinted by
+content, so the same photo saved twice (e.g. as .JPG and .JPEG)
+is listed once. Each photo is decoded once to make both copies,
+which are named after the content hash and shared by every
+folder that contains the photo.
+
+The manifest is kept in memory and saved to GALLERY_CACHE_DIR.
+It is rebuilt only when the folder changes (its modification
+time), or when ?refresh=1 is passed.
+
+PILLOW:
+Resizing needs Pillow (pip install Pillow). Without it the
+manifest lists the original photos only, and the thumbnail and
+display URLs point at the originals.
+
+USAGE:
+    from gallery import gallery, warm_galleries
+
+    app.register_blueprint(gallery)
+    warm_galleries()    # optional, builds all galleries in background
+================================================================
+"""
+
+import os
+import re
+import json
+import hashlib
+import time
+import threading
+from datetime import datetime
+from flask import Blueprint, Response, abort, jsonify, request
+from werkzeug.utils import safe_join
+from config import (
+    FRONTEND_ROOT,
+    MISSIONARY_PHOTOS_DIR,
+    GALLERY_CACHE_DIR,
+    GALLERY_THUMB_SIZE,
+    GALLERY_DISPLAY_SIZE,
+    GALLERY_JPEG_QUALITY,
+    PLACEHOLDER_SIZE
+)
+from media import file_fingerprint, media_url, send_media_file
+from imaging import PIL_AVAILABLE, image_summary, oriented_size, pillow
+from resource_watchdog import background_paused
+
+gallery = Blueprint('gallery', __name__)
+
+# File types listed in a gallery
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+# Folder under MISSIONARY_PHOTOS_DIR holding one folder per missionary
+GALLERIES_FOLDER = "gallery"
+
+# Resized copies are named <content hash>_<size>q<quality>.jpg
+DERIVATIVE_PATTERN = re.compile(r"^[0-9a-f]{16}_\d+q\d+\.jpg$")
+
+# Bumped when the manifest layout changes, so saved ones are rebuilt
+MANIFEST_FORMAT = 2
+
+# folder key -> manifest dict
+_manifests = {}
+_build_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: FOLDERS
+# ================================================================
+
+def resolve_gallery_folder(folder):
+    """
+    Map a gallery folder like "gallery/kylie/" to a directory on disk.
+
+    Args:
+        folder: Path relative to MISSIONARY_PHOTOS_DIR (the same
+                value as galleryFolder in config.js)
+
+    Returns:
+        Tuple of (absolute path, normalized key like "gallery/kylie"),
+        or (None, None) if the folder does not exist or escapes
+        MISSIONARY_PHOTOS_DIR
+    """
+    key = folder.replace('\\', '/').strip('/')
+    if not key:
+        return None, None
+    root = os.path.join(FRONTEND_ROOT, MISSIONARY_PHOTOS_DIR)
+    full_path = safe_join(root, key)
+    if full_path is None or not os.path.isdir(full_path):
+        return None, None
+    return full_path, key
+
+
+def _manifest_file(key):
+    """Path of the saved manifest for a folder key."""
+    slug = re.sub(r"[^A-Za-z0-9._-]", "_", key)
+    return os.path.join(GALLERY_CACHE_DIR, "manifests", slug + ".json")
+
+
+def _list_images(full_path):
+    """Image files in a folder, sorted by name (case-insensitive)."""
+    names = [
+        entry.name for entry in os.scandir(full_path)
+        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS
+    ]
+    return sorted(names, key=str.lower)
+
+
+# ================================================================
+# SECTION 2: RESIZED COPIES
+# ================================================================
+
+def _derivative_name(fingerprint, max_side):
+    return f"{fingerprint}_{max_side}q{GALLERY_JPEG_QUALITY}.jpg"
+
+
+def _derivative_info(name):
+    """URL and size of an existing resized copy, or None."""
+    path = os.path.join(GALLERY_CACHE_DIR, name)
+    if not os.path.isfile(path):
+        return None
+    with pillow().Image.open(path) as img:
+        width, height = img.size
+    return {
+        "url": f"/gallery/{name}?v={file_fingerprint(path)}",
+        "width": width,
+        "height": height,
+        "bytes": os.path.getsize(path)
+    }
+
+
+def _save_jpeg(img, name):
+    """Write a JPEG atomically into GALLERY_CACHE_DIR."""
+    path = os.path.join(GALLERY_CACHE_DIR, name)
+    temp_path = path + ".tmp"
+    img.save(temp_path, "JPEG", quality=GALLERY_JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(temp_path, path)
+
+
+def make_resized_copies(source_path, fingerprint, sizes):
+    """
+    Create resized JPEG copies of one photo (missing ones only).
+
+    The photo is decoded once, at the smallest JPEG scale that is
+    still larger than the biggest size, and each smaller copy is
+    made from the previous one.
+
+    Used for the gallery's display/thumbnail copies and for the
+    screensaver's screen-sized copies (see playlist.py).
+
+    Args:
+        source_path: Absolute path of the original photo
+        fingerprint: Its content fingerprint
+        sizes: Longest sides wanted, in pixels
+
+    Returns:
+        Tuple of (original (width, height), list of copy infos in
+        the order of `sizes`; each has url, width, height, bytes)
+    """
+    PIL = pillow()
+    names = {size: _derivative_name(fingerprint, size) for size in sizes}
+
+    with PIL.Image.open(source_path) as img:
+        width, height = oriented_size(img)
+
+        existing = {size: _derivative_info(name) for size, name in names.items()}
+        missing = sorted((size for size, info in existing.items() if info is None), reverse=True)
+        if not missing:
+            return (width, height), [existing[size] for size in sizes]
+
+        os.makedirs(GALLERY_CACHE_DIR, exist_ok=True)
+        img.draft("RGB", (missing[0], missing[0]))
+        img = PIL.ImageOps.exif_transpose(img)
+
+        if img.mode in ("RGBA", "LA", "P"):
+            # Flatten transparency onto white instead of black
+            img = img.convert("RGBA")
+            background = PIL.Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        for size in missing:
+            img.thumbnail((size, size), PIL.Image.LANCZOS)
+            _save_jpeg(img, names[size])
+
+    return (width, height), [_derivative_info(names[size]) for size in sizes]
+
+
+# ================================================================
+# SECTION 3: MANIFESTS
+# ================================================================
+
+def _build_manifest(full_path, key):
+    """
+    Scan a gallery folder and create any missing resized copies.
+
+    Returns:
+        Manifest dict (see get_gallery_manifest)
+    """
+    os.makedirs(GALLERY_CACHE_DIR, exist_ok=True)
+
+    photos = []
+    seen = set()
+    duplicates = 0
+
+    for name in _list_images(full_path):
+        source_path = os.path.join(full_path, name)
+        fingerprint = file_fingerprint(source_path)
+        if fingerprint in seen:
+            duplicates += 1
+            continue
+        seen.add(fingerprint)
+
+        original = {
+            "url": media_url(f"{MISSIONARY_PHOTOS_DIR}/{key}/{name}"),
+            "width": None,
+            "height": None,
+            "bytes": os.path.getsize(source_path)
+        }
+        display = thumb = None
+        placeholder = None
+
+        if PIL_AVAILABLE:
+            try:
+                (width, height), (display, thumb) = make_resized_copies(
+                    source_path, fingerprint, (GALLERY_DISPLAY_SIZE, GALLERY_THUMB_SIZE))
+                original["width"], original["height"] = width, height
+                # The thumbnail is ~100x cheaper to decode than the original
+                summary = image_summary(os.path.join(GALLERY_CACHE_DIR, _derivative_name(
+                    fingerprint, GALLERY_THUMB_SIZE)), PLACEHOLDER_SIZE)
+                placeholder = summary["placeholder"] if summary else None
+            except Exception as e:
+                print(f"[Gallery] Could not resize {key}/{name}: {e}")
+
+        # A small JPEG can grow when re-encoded; keep the original then
+        if (display and display["bytes"] >= original["bytes"]
+                and os.path.splitext(name)[1].lower() in (".jpg", ".jpeg")):
+            display = original
+
+        photos.append({
+            "name": name,
+            "hash": fingerprint,
+            "original": original,
+            "display": display or original,
+            "thumb": thumb or original,
+            "placeholder": placeholder
+        })
+
+    version = hashlib.sha256(
+        "".join(photo["hash"] for photo in photos).encode('utf-8')
+    ).hexdigest()[:16]
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "folder": key,
+        "version": version,
+        "folder_mtime_ns": os.stat(full_path).st_mtime_ns,
+        "resized": PIL_AVAILABLE,
+        "duplicates_skipped": duplicates,
+        "generated_at": datetime.now().isoformat(),
+        "photos": photos
+    }
+
+    manifest_path = _manifest_file(key)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    print(f"[Gallery] Built {key}: {len(photos)} photos"
+          + (f", {duplicates} duplicates skipped" if duplicates else "")
+          + ("" if PIL_AVAILABLE else " (Pillow not installed, no thumbnails)"))
+    return manifest
+
+
+def _load_saved_manifest(key, folder_mtime_ns):
+    """Saved manifest for a folder, if it is still current."""
+    try:
+        with open(_manifest_file(key), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    if manifest.get("folder_mtime_ns") != folder_mtime_ns:
+        return None
+    if manifest.get("resized") != (PIL_AVAILABLE):
+        return None
+
+    # The resized copies may have been cleaned up since
+    for photo in manifest.get("photos", []):
+        for variant in ("display", "thumb"):
+            url = photo[variant]["url"]
+            if url.startswith("/gallery/"):
+                name = url[len("/gallery/"):].split("?")[0]
+                if not os.path.isfile(os.path.join(GALLERY_CACHE_DIR, name)):
+                    return None
+    return manifest
+
+
+def get_gallery_manifest(folder, refresh=False):
+    """
+    Get the manifest for a gallery folder, building it if needed.
+
+    Args:
+        folder: Path relative to MISSIONARY_PHOTOS_DIR, e.g. "gallery/kylie/"
+        refresh: Rescan the folder even if it looks unchanged
+
+    Returns:
+        Manifest dict with folder, version, generated_at and photos
+        (each with name, hash, a placeholder data URI, and
+        original/display/thumb entries holding url, width, height
+        and bytes), or None if the folder does
+        not exist
+    """
+    full_path, key = resolve_gallery_folder(folder)
+    if full_path is None:
+        return None
+
+    folder_mtime_ns = os.stat(full_path).st_mtime_ns
+    manifest = _manifests.get(key)
+    if manifest and not refresh and manifest["folder_mtime_ns"] == folder_mtime_ns:
+        return manifest
+
+    with _build_lock:
+        manifest = _manifests.get(key)
+        if manifest and not refresh and manifest["folder_mtime_ns"] == folder_mtime_ns:
+            return manifest
+
+        manifest = None if refresh else _load_saved_manifest(key, folder_mtime_ns)
+        if manifest is None:
+            manifest = _build_manifest(full_path, key)
+        _manifests[key] = manifest
+        return manifest
+
+
+def all_gallery_manifests():
+    """
+    The manifest of every gallery folder, built where needed.
+
+    Yields:
+        Manifest dicts (see get_gallery_manifest); a folder that
+        fails to build is logged and skipped
+    """
+    root = os.path.join(FRONTEND_ROOT, MISSIONARY_PHOTOS_DIR, GALLERIES_FOLDER)
+    if not os.path.isdir(root):
+        return
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir():
+            try:
+                manifest = get_gallery_manifest(f"{GALLERIES_FOLDER}/{entry.name}")
+            except Exception as e:
+                print(f"[Gallery] Failed to build {entry.name}: {e}")
+                continue
+            if manifest is not None:
+                yield manifest
+
+
+def clear_gallery_cache():
+    """Forget the manifests held in memory (they reload from disk)."""
+    with _build_lock:
+        _manifests.clear()
+
+
+def warm_galleries():
+    """
+    Build the manifests of every gallery folder on a background
+    thread, so their thumbnails are ready before anyone asks.
+    Waits between folders while the resource watchdog has paused
+    background jobs.
+
+    Returns:
+        The started thread
+    """
+    def build_all():
+        for _ in all_gallery_manifests():
+            while background_paused():
+                time.sleep(1)
+
+    thread = threading.Thread(target=build_all, daemon=True, name="gallery-warm")
+    thread.start()
+    return thread
+
+
+# ================================================================
+# SECTION 4: ROUTES
+# ================================================================
+
+@gallery.route('/api/missionaries/<missionary_id>/photos', methods=['GET'])
+def get_missionary_photos(missionary_id):
+    """
+    GET /api/missionaries/<id>/photos
+
+    Returns the photo manifest for a missionary's gallery.
+
+    Query parameters:
+    - folder: Gallery folder relative to assets/missionary_photos
+              (galleryFolder in config.js). Defaults to gallery/<id>/
+    - refresh: 1 to rescan the folder
+
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "missionaryId": "1",
+            "folder": "gallery/kylie",
+            "version": "9c1e...",
+            "photos": [
+                {
+                    "name": "photo.jpg",
+                    "hash": "1a4bf0a8c147f1bf",
+                    "original": { "url": "/media/...", "width": 4128, "height": 3096, "bytes": 3456789 },
+                    "display": { "url": "/gallery/...", "width": 1600, "height": 1200, "bytes": 307105 },
+                    "thumb": { "url": "/gallery/...", "width": 320, "height": 240, "bytes": 18317 },
+                    "placeholder": "data:image/jpeg;base64,..."
+                },
+                ...
+            ]
+        }
+    }
+    """
+    folder = request.args.get('folder') or f"{GALLERIES_FOLDER}/{missionary_id}"
+    manifest = get_gallery_manifest(folder, refresh=request.args.get('refresh') == '1')
+    if manifest is None:
+        return jsonify({"status": "error", "message": "Gallery folder not found"}), 404
+
+    etag = manifest["version"]
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            "status": "ok",
+            "data": {
+                "missionaryId": missionary_id,
+                "folder": manifest["folder"],
+                "version": manifest["version"],
+                "generatedAt": manifest["generated_at"],
+                "photos": manifest["photos"]
+            }
+        })
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@gallery.route('/gallery/<filename>', methods=['GET', 'HEAD'])
+def serve_gallery_file(filename):
+    """
+    GET /gallery/<file>
+
+    Serves a resized photo (gallery thumbnail or display size, or
+    a screensaver copy).
+    """
+    if not DERIVATIVE_PATTERN.match(filename):
+        abort(404)
+    full_path = os.path.join(GALLERY_CACHE_DIR, filename)
+    if not os.path.isfile(full_path):
+        abort(404)
+    return send_media_file(full_path)
@@ -0,0 +1,380 @@
+"""
+================================================================
+GEO_INDEX.PY - MISSION MAP SPATIAL INDEX & CLUSTERING
+================================================================
+This module answers "which missionaries are in this part of the
+map, grouped into clusters for this zoom level" without looking
+at every missionary on every pan.
+
+PURPOSE:
+- Each missionary with a location is filed under the geohash of
+  that location, at every precision from 1 to MAX_PRECISION
+- Each geohash cell keeps a running count and coordinate sum, so a
+  cluster's size and centre are known without visiting its members
+- GET /api/missions?bbox=...&zoom=... reads only the cells that
+  overlap the viewport, at the precision that suits the zoom level
+
+GEOHASH:
+A geohash is a short string naming a rectangle on the globe; each
+extra character splits the rectangle into 32 smaller ones, so
+"u3q" is inside "u3". Precision 1 cells are ~45 degrees wide,
+precision 5 cells ~5 km.
+
+KEEPING UP TO DATE:
+refresh() is called before each query. It compares the
+missionaries file's version (mtime and size) with the one last
+indexed and, if it changed, adds only missionaries with new ids.
+The index is rebuilt from scratch only if records were removed or
+changed.
+
+USAGE:
+    from geo_index import get_mission_index
+
+    index = get_mission_index(storage)
+    markers = index.query(south=40, west=-10, north=60, east=30, zoom=4)
+================================================================
+"""
+
+import math
+import threading
+
+# Geohash alphabet (no a, i, l, o)
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {char: index for index, char in enumerate(BASE32)}
+
+# Finest precision indexed (precision 8 cells are ~40 m)
+MAX_PRECISION = 8
+
+# Map tile width in pixels and wanted cluster cell width: markers
+# closer than ~64 px on screen merge into one cluster
+TILE_SIZE_PX = 256
+CLUSTER_SIZE_PX = 64
+
+# Members listed per cluster (ids only; the count is always exact)
+CLUSTER_SAMPLE_SIZE = 5
+
+# Fields copied into single-missionary markers
+MARKER_FIELDS = ("id", "name", "mission", "photoUrl")
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: GEOHASH
+# ================================================================
+
+def encode_geohash(lat, lng, precision):
+    """
+    Geohash of a point.
+
+    Args:
+        lat: Latitude (-90..90)
+        lng: Longitude (-180..180)
+        precision: Number of characters
+
+    Returns:
+        Geohash string
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        value_range, value = (lng_range, lng) if even else (lat_range, lat)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits <<= 1
+            value_range[1] = middle
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash):
+    """
+    Rectangle covered by a geohash.
+
+    Returns:
+        Tuple of (south, west, north, east)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(precision):
+    """
+    Size of a geohash cell at a precision.
+
+    Returns:
+        Tuple of (height in degrees latitude, width in degrees longitude)
+    """
+    bits = 5 * precision
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def precision_for_zoom(zoom):
+    """
+    Geohash precision whose cells are about CLUSTER_SIZE_PX wide on
+    a web map at this zoom level.
+
+    Args:
+        zoom: Map zoom level (0 = whole world in one 256 px tile)
+
+    Returns:
+        Precision from 1 to MAX_PRECISION
+    """
+    wanted_width = 360.0 / (2 ** max(zoom, 0)) * CLUSTER_SIZE_PX / TILE_SIZE_PX
+    for precision in range(1, MAX_PRECISION + 1):
+        if cell_size(precision)[1] <= wanted_width:
+            return precision
+    return MAX_PRECISION
+
+
+# ================================================================
+# SECTION 2: THE INDEX
+# ================================================================
+
+class MissionIndex:
+    """
+    Missionaries filed by geohash cell, at every precision.
+
+    cells[precision][geohash] = {"count", "lat_sum", "lng_sum", "ids"}
+    """
+
+    def __init__(self):
+        self.cells = {precision: {} for precision in range(1, MAX_PRECISION + 1)}
+        self.records = {}
+        self.source_version = None
+        self.version = 0
+        self._lock = threading.Lock()
+
+    # --- Updating -------------------------------------------------
+
+    def add(self, record):
+        """
+        Index one missionary (ignored without a valid location).
+
+        Returns:
+            True if the record was indexed
+        """
+        location = record.get('location') or {}
+        try:
+            lat = float(location['lat'])
+            lng = float(location['lng'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return False
+
+        geohash = encode_geohash(lat, lng, MAX_PRECISION)
+        self.records[record.get('id')] = dict(
+            {field: record.get(field) for field in MARKER_FIELDS},
+            lat=lat, lng=lng, geohash=geohash
+        )
+        for precision in range(1, MAX_PRECISION + 1):
+            cell = self.cells[precision].setdefault(
+                geohash[:precision], {"count": 0, "lat_sum": 0.0, "lng_sum": 0.0, "ids": []})
+            cell["count"] += 1
+            cell["lat_sum"] += lat
+            cell["lng_sum"] += lng
+            if len(cell["ids"]) < CLUSTER_SAMPLE_SIZE:
+                cell["ids"].append(record.get('id'))
+        return True
+
+    def refresh(self, storage):
+        """
+        Bring the index up to date with storage.
+
+        Only missionaries with ids not seen before are added. If a
+        record disappeared or moved, everything is re-indexed.
+
+        Args:
+            storage: Storage backend
+        """
+        with self._lock:
+            source_version = storage.collection_version('missionaries')
+            if source_version is not None and source_version == self.source_version:
+                return
+
+            missionaries = storage.list_missionaries()
+            current = {record.get('id'): record for record in missionaries}
+            stale = [record_id for record_id, indexed in self.records.items()
+                     if record_id not in current or
+                     not self._same_location(indexed, current[record_id])]
+
+            if stale:
+                self.cells = {precision: {} for precision in range(1, MAX_PRECISION + 1)}
+                self.records = {}
+
+            added = sum(1 for record_id, record in current.items()
+                        if record_id not in self.records and self.add(record))
+
+            self.source_version = source_version
+            if added or stale:
+                self.version += 1
+                print(f"[GeoIndex] {'Rebuilt' if stale else 'Updated'} mission index: "
+                      f"{len(self.records)} located missionaries")
+
+    @staticmethod
+    def _same_location(indexed, record):
+        """True if a stored record is still where the index has it."""
+        location = record.get('location') or {}
+        try:
+            return (float(location['lat']) == indexed['lat'] and
+                    float(location['lng']) == indexed['lng'])
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    # --- Querying -------------------------------------------------
+
+    def query(self, south, west, north, east, zoom):
+        """
+        Clustered markers for a map viewport.
+
+        Args:
+            south, west, north, east: Viewport bounds in degrees;
+                west > east means the viewport crosses the 180th
+                meridian
+            zoom: Map zoom level
+
+        Returns:
+            Dict with precision, version and markers. A marker is
+            either {"type": "missionary", id, name, mission,
+            photoUrl, lat, lng} or {"type": "cluster", count, lat,
+            lng (the members' average), geohash, bounds, ids (up
+            to CLUSTER_SAMPLE_SIZE)}. A cluster in a cell on the
+            viewport's edge counts all of the cell's members, even
+            those just outside it.
+        """
+        precision = precision_for_zoom(zoom)
+        if west > east:
+            ranges = [(west, 180.0), (-180.0, east)]
+        else:
+            ranges = [(west, east)]
+
+        with self._lock:
+            found = {}
+            for range_west, range_east in ranges:
+                for geohash in self._cells_in(precision, south, range_west, north, range_east):
+                    found[geohash] = self.cells[precision][geohash]
+
+            markers = [self._marker(geohash, cell, (south, north, ranges))
+                       for geohash, cell in sorted(found.items())]
+            return {
+                "precision": precision,
+                "version": self.version,
+                "markers": [marker for marker in markers if marker]
+            }
+
+    def _cells_in(self, precision, south, west, north, east):
+        """
+        Occupied cells at a precision that overlap a rectangle.
+
+        Walks the grid of cells covering the rectangle, or the
+        occupied cells if there are fewer of those.
+        """
+        occupied = self.cells[precision]
+        height, width = cell_size(precision)
+        south, north = max(south, -90.0), min(north, 90.0)
+        west, east = max(west, -180.0), min(east, 180.0)
+        if south > north or west > east:
+            return []
+
+        first_row = math.floor((south + 90.0) / height)
+        last_row = min(math.floor((north + 90.0) / height), int(180.0 / height) - 1)
+        first_col = math.floor((west + 180.0) / width)
+        last_col = min(math.floor((east + 180.0) / width), int(360.0 / width) - 1)
+        grid_cells = (last_row - first_row + 1) * (last_col - first_col + 1)
+
+        if grid_cells > len(occupied):
+            result = []
+            for geohash in occupied:
+                cell_south, cell_west, cell_north, cell_east = geohash_bounds(geohash)
+                if (cell_south <= north and cell_north >= south and
+                        cell_west <= east and cell_east >= west):
+                    result.append(geohash)
+            return result
+
+        result = []
+        for row in range(first_row, last_row + 1):
+            lat = -90.0 + (row + 0.5) * height
+            for col in range(first_col, last_col + 1):
+                lng = -180.0 + (col + 0.5) * width
+                geohash = encode_geohash(lat, lng, precision)
+                if geohash in occupied:
+                    result.append(geohash)
+        return result
+
+    def _marker(self, geohash, cell, viewport):
+        """Marker for one occupied cell (None if it falls outside)."""
+        if cell["count"] == 1:
+            record = self.records[cell["ids"][0]]
+            south, north, ranges = viewport
+            inside = south <= record["lat"] <= north and any(
+                range_west <= record["lng"] <= range_east for range_west, range_east in ranges)
+            if not inside:
+                return None
+            marker = {field: record[field] for field in MARKER_FIELDS}
+            marker.update(type="missionary", lat=record["lat"], lng=record["lng"])
+            return marker
+
+        return {
+            "type": "cluster",
+            "count": cell["count"],
+            "lat": round(cell["lat_sum"] / cell["count"], 6),
+            "lng": round(cell["lng_sum"] / cell["count"], 6),
+            "geohash": geohash,
+            "bounds": geohash_bounds(geohash),
+            "ids": list(cell["ids"])
+        }
+
+
+def clear_mission_index():
+    """Forget the mission index (it is rebuilt on the next request)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def get_mission_index(storage):
+    """
+    The process-wide mission index, refreshed from storage.
+
+    Args:
+        storage: Storage backend
+
+    Returns:
+        MissionIndex
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MissionIndex()
+    _index.refresh(storage)
+    return _index
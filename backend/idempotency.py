@@ -0,0 +1,251 @@
+"""
+================================================================
+IDEMPOTENCY.PY - IDEMPOTENCY KEYS FOR POST REQUESTS
+================================================================
+This module makes a retried POST cheap and safe: a request sent
+again after a timeout gets the first attempt's response back
+instead of saving a second selfie or temple visit.
+
+PURPOSE:
+- A POST with an Idempotency-Key header runs once. A retry with
+  the same key gets the stored response back, marked with
+  "Idempotent-Replayed: true", before its body is read, decoded or
+  saved again
+- A retry arriving while the first attempt is still running gets
+  409 + Retry-After
+- The same key sent with a different request (path, body size or
+  type) gets 422
+
+STORE:
+Keys live in memory, at most IDEMPOTENCY_MAX_KEYS of them (the
+oldest are dropped first), each for IDEMPOTENCY_TTL_SECONDS from
+its first use. Looking a key up is a dict access. Responses that
+should not be replayed release the key, so the retry runs for
+real:
+- server errors (5xx) and 429 (busy)
+- streamed files
+- bodies over IDEMPOTENCY_MAX_RESPONSE_BYTES
+
+Keys are per process; kiosks replicating to each other
+(replication.py) each keep their own.
+
+USAGE:
+    from idempotency import install_idempotency, idempotency_stats
+
+    install_idempotency(app)    # before install_rate_limiter(app)
+
+    POST /api/selfies
+    Idempotency-Key: 3f0c5e0a-6f8e-4d1e-9a55-2f1f0f3f6a11
+================================================================
+"""
+
+import re
+import time
+import threading
+from collections import OrderedDict
+from flask import current_app, g, jsonify, request
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Printable ASCII, as clients generate (UUIDs, random hex, ...)
+KEY_PATTERN = re.compile(r"^[\x21-\x7e]{1,255}$")
+
+# Retry-After (seconds) sent while the first attempt still runs
+IN_PROGRESS_RETRY_AFTER = 1
+
+# Response headers recomputed for the replay instead of stored
+SKIPPED_HEADERS = ("Content-Length", "Date", "Server")
+
+
+# ================================================================
+# SECTION 1: RESPONSE STORE
+# ================================================================
+
+class IdempotencyStore:
+    """
+    Thread-safe, bounded map of key -> first request and its response.
+
+    Entries are kept in the order keys were first used, so expired
+    and surplus entries are dropped from the front.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _trim(self, now):
+        """Drop expired entries, then the oldest beyond the key limit."""
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry["expires"] > now and len(self._entries) <= config.IDEMPOTENCY_MAX_KEYS:
+                break
+            self._entries.popitem(last=False)
+
+    def claim(self, key, fingerprint):
+        """
+        Start a request under `key`, or find its earlier attempt.
+
+        Args:
+            key: Idempotency-Key header value
+            fingerprint: What identifies the request (see
+                         _fingerprint); a retry must match it
+
+        Returns:
+            Tuple of (state, response) where state is "claimed" (run
+            the request, then complete() or release()), "replay"
+            (response is (status, headers, body)), "in_progress" or
+            "mismatch"
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {
+                    "fingerprint": fingerprint,
+                    "expires": now + config.IDEMPOTENCY_TTL_SECONDS,
+                    "response": None
+                }
+                self._trim(now)
+                return "claimed", None
+
+            if entry["fingerprint"] != fingerprint:
+                self.conflicts += 1
+                return "mismatch", None
+            if entry["response"] is None:
+                self.conflicts += 1
+                return "in_progress", None
+            self.replayed += 1
+            return "replay", entry["response"]
+
+    def complete(self, key, status, headers, body):
+        """Store the response of a claimed request for replays."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["response"] = (status, headers, body)
+
+    def release(self, key):
+        """Forget a claimed request, so a retry runs again."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["response"] is None:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_store = IdempotencyStore()
+
+
+# ================================================================
+# SECTION 2: FLASK HOOKS
+# ================================================================
+
+def install_idempotency(app):
+    """
+    Register the idempotency hooks on a Flask app.
+
+    Install before the rate limiter, so a replay is answered before
+    it takes a rate limit token or an upload slot.
+
+    Args:
+        app: Flask application
+    """
+    app.before_request(_check_key)
+    app.after_request(_save_response)
+    app.teardown_request(_release_key)
+
+
+def _error(message, status_code):
+    response = jsonify({"status": "error", "message": message})
+    response.status_code = status_code
+    return response
+
+
+def _fingerprint():
+    """
+    What a retry must repeat: method, path, query, body length and
+    type. The body itself is not hashed, so a replay never reads it.
+    """
+    return (request.method, request.path, request.query_string,
+            request.content_length, request.mimetype)
+
+
+def _check_key():
+    """before_request hook: replay or claim the request's key."""
+    if request.method != 'POST' or not config.IDEMPOTENCY_ENABLED:
+        return None
+    key = request.headers.get(HEADER)
+    if key is None:
+        return None
+    if not KEY_PATTERN.match(key):
+        return _error(f"{HEADER} must be 1-255 printable characters", 400)
+
+    state, stored = _store.claim(key, _fingerprint())
+    if state == "replay":
+        status, headers, body = stored
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers[REPLAYED_HEADER] = "true"
+        return response
+    if state == "in_progress":
+        response = _error(f"A request with this {HEADER} is still being processed", 409)
+        response.headers['Retry-After'] = str(IN_PROGRESS_RETRY_AFTER)
+        return response
+    if state == "mismatch":
+        return _error(f"{HEADER} was already used for a different request", 422)
+
+    g.idempotency_key = key
+    return None
+
+
+def _save_response(response):
+    """after_request hook: keep the response of a claimed request."""
+    key = g.pop('idempotency_key', None)
+    if key is None:
+        return response
+
+    replayable = (response.status_code < 500 and response.status_code != 429 and
+                  not response.is_streamed and not response.direct_passthrough)
+    body = response.get_data() if replayable else None
+    if body is not None and len(body) <= config.IDEMPOTENCY_MAX_RESPONSE_BYTES:
+        headers = [(name, value) for name, value in response.headers
+                   if name not in SKIPPED_HEADERS]
+        _store.complete(key, response.status_code, headers, body)
+    else:
+        _store.release(key)
+    return response
+
+
+def _release_key(error=None):
+    """teardown_request hook: release a key whose request failed."""
+    key = g.pop('idempotency_key', None)
+    if key is not None:
+        _store.release(key)
+
+
+# ================================================================
+# SECTION 3: STATS
+# ================================================================
+
+def idempotency_stats():
+    """
+    Store state (for /api/health).
+
+    Returns:
+        Dict with enabled, keys held, replayed (retries answered
+        from the store) and conflicts (409 / 422 answers)
+    """
+    return {
+        "enabled": config.IDEMPOTENCY_ENABLED,
+        "keys": len(_store),
+        "replayed": _store.replayed,
+        "conflicts": _store.conflicts
+    }
@@ -0,0 +1,239 @@
+"""
+================================================================
+IMAGING.PY - SMALL IMAGE HELPERS (PILLOW OPTIONAL)
+================================================================
+Image analysis shared by the storage and asset modules.
+
+PURPOSE:
+- perceptual_hash() gives a 64-bit fingerprint of what an image
+  looks like, so two selfies of the same pose taken a second
+  apart can be recognized even though their bytes differ
+- hamming_distance() compares two such fingerprints
+- image_summary() gives an image's display size and a tiny
+  blurred placeholder (an inline ~16px JPEG data URI) that the
+  UI paints while the real image downloads
+- jpeg_copies() shrinks and recompresses an image in memory
+  (e.g. the thumbnails of archived selfies, see retention.py)
+
+PILLOW:
+These helpers need Pillow (pip install Pillow). Without it, or
+for bytes that are not a decodable image, they return None and
+callers skip the check.
+Pillow is imported on first use (pillow()), not at app start;
+gallery.py and mosaic.py get it the same way.
+
+USAGE:
+    from imaging import perceptual_hash, hamming_distance
+
+    a = perceptual_hash(image_bytes)
+    b = perceptual_hash(other_bytes)
+    if a and b and hamming_distance(a, b) <= 6:
+        print("Looks like the same picture")
+================================================================
+"""
+
+import io
+import base64
+import importlib
+import importlib.util
+
+# True when Pillow is installed (checked without importing it)
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# EXIF orientations that swap width and height
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def pillow():
+    """
+    The PIL package, imported on first use.
+
+    Pillow takes a noticeable time to import, so it is loaded by
+    the first function that draws or decodes, not at app start.
+
+    Returns:
+        PIL with Image, ImageOps and ImageColor loaded, or None if
+        Pillow is not installed
+    """
+    if not PIL_AVAILABLE:
+        return None
+    for name in ("PIL.Image", "PIL.ImageOps", "PIL.ImageColor"):
+        importlib.import_module(name)
+    return importlib.import_module("PIL")
+
+
+# ================================================================
+# SECTION 1: PERCEPTUAL HASH
+# ================================================================
+
+def _open_image(source):
+    """Open bytes or a file path as a Pillow image."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return pillow().Image.open(source)
+
+
+def oriented_size(img):
+    """
+    Size of an image as displayed, after its EXIF rotation.
+
+    Args:
+        img: Open Pillow image (before any transpose)
+
+    Returns:
+        Tuple of (width, height)
+    """
+    width, height = img.size
+    if img.getexif().get(0x0112) in _ROTATED_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+def perceptual_hash(source):
+    """
+    Difference hash (dHash) of an image.
+
+    The image is shrunk to 9x8 grayscale and each bit records
+    whether a pixel is brighter than its right-hand neighbour.
+    Small changes (recompression, slight movement, exposure)
+    flip only a few bits.
+
+    Args:
+        source: Image bytes or a file path
+
+    Returns:
+        16-character hex string, or None if Pillow is not installed
+        or the data is not an image
+    """
+    PIL = pillow()
+    if PIL is None:
+        return None
+    try:
+        with _open_image(source) as img:
+            # Decode at a reduced JPEG scale; only 72 pixels are needed
+            img.draft("L", (64, 64))
+            small = img.convert("L").resize((9, 8), PIL.Image.BILINEAR)
+            pixels = list(small.getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def hamming_distance(hash_a, hash_b):
+    """
+    Number of differing bits between two perceptual hashes.
+
+    Args:
+        hash_a: Hex string from perceptual_hash()
+        hash_b: Hex string from perceptual_hash()
+
+    Returns:
+        0 (identical) to 64
+    """
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+# ================================================================
+# SECTION 2: PLACEHOLDERS
+# ================================================================
+
+def image_summary(source, placeholder_size=16, quality=40):
+    """
+    Display size and a low-quality placeholder for an image.
+
+    The placeholder is the image shrunk to at most placeholder_size
+    pixels on its longest side, as a JPEG data URI (typically
+    400-700 bytes). Browsers scale it up smoothly, which gives a
+    blurred preview with the right colors and shape.
+
+    Args:
+        source: Image bytes or a file path
+        placeholder_size: Longest side of the placeholder in pixels
+        quality: JPEG quality of the placeholder
+
+    Returns:
+        Dict with width, height and placeholder, or None if Pillow
+        is not installed or the data is not an image
+    """
+    PIL = pillow()
+    if PIL is None:
+        return None
+    try:
+        with _open_image(source) as img:
+            width, height = oriented_size(img)
+            img.draft("RGB", (placeholder_size * 4, placeholder_size * 4))
+            small = PIL.ImageOps.exif_transpose(img)
+            if small.mode != "RGB":
+                small = small.convert("RGBA")
+                background = PIL.Image.new("RGB", small.size, (255, 255, 255))
+                background.paste(small, mask=small.getchannel("A"))
+                small = background
+            small.thumbnail((placeholder_size, placeholder_size), PIL.Image.BILINEAR)
+
+            buffer = io.BytesIO()
+            small.save(buffer, "JPEG", quality=quality)
+    except Exception:
+        return None
+
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return {
+        "width": width,
+        "height": height,
+        "placeholder": f"data:image/jpeg;base64,{encoded}"
+    }
+
+
+# ================================================================
+# SECTION 3: RECOMPRESSION
+# ================================================================
+
+def jpeg_copies(source, sizes, quality=75):
+    """
+    Smaller JPEG versions of an image, made in memory.
+
+    The image is decoded once, at the smallest JPEG scale that
+    still covers the largest size, and each copy is made from the
+    previous one. Images are never enlarged.
+
+    Args:
+        source: Image bytes or a file path
+        sizes: Longest sides wanted, in pixels
+        quality: JPEG quality of the copies
+
+    Returns:
+        List of JPEG bytes in the order of `sizes`, or None if
+        Pillow is not installed or the data is not an image
+    """
+    PIL = pillow()
+    if PIL is None:
+        return None
+    copies = {}
+    try:
+        with _open_image(source) as img:
+            largest = max(sizes)
+            img.draft("RGB", (largest, largest))
+            img = PIL.ImageOps.exif_transpose(img)
+            if img.mode in ("RGBA", "LA", "P"):
+                # Flatten transparency onto white instead of black
+                img = img.convert("RGBA")
+                background = PIL.Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            for size in sorted(set(sizes), reverse=True):
+                img.thumbnail((size, size), PIL.Image.LANCZOS)
+                buffer = io.BytesIO()
+                img.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+                copies[size] = buffer.getvalue()
+    except Exception:
+        return None
+    return [copies[size] for size in sizes]
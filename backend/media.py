@@ -0,0 +1,270 @@
+"""
+================================================================
+MEDIA.PY - STATIC MEDIA SERVING (RANGE REQUESTS & CACHING)
+================================================================
+This module serves the kiosk's photos and videos from the backend
+so that browsers can seek, resume and cache them properly.
+
+PURPOSE:
+- GET /media/<path>  serves files from MEDIA_DIRS under FRONTEND_ROOT
+- HTTP Range requests (206 Partial Content) so video scrubbing and
+  replay fetch only the bytes needed
+- Strong ETags from the file's content hash, 304 Not Modified
+- Fingerprinted URLs (/media/<path>?v=<hash>) cached as immutable
+
+SENDING THE BYTES:
+Responses hand an open file (positioned at the range start and
+limited to the range length) to the WSGI server's file_wrapper.
+Servers with sendfile support (e.g. gunicorn) then copy straight
+from the file to the socket; others stream it in blocks. With
+MEDIA_USE_X_SENDFILE = True a front-end web server sends the
+file instead.
+
+USAGE:
+    from media import media, media_url, send_media_file
+
+    app.register_blueprint(media)
+    url = media_url("assets/videos/president_nelson.mp4")
+    # -> "/media/assets/videos/president_nelson.mp4?v=1f3a..."
+================================================================
+"""
+
+import os
+import mimetypes
+from urllib.parse import quote
+from flask import Blueprint, Response, abort, jsonify, request
+from werkzeug.datastructures import ContentRange
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
+from config import FRONTEND_ROOT, MEDIA_DIRS, MEDIA_USE_X_SENDFILE
+from blob_store import hash_file
+
+# MEDIA_MAX_AGE_SECONDS is hot-reloadable, so it is read as config.NAME
+import config
+
+media = Blueprint('media', __name__)
+
+# Block size used when the server streams instead of sendfile
+BUFFER_SIZE = 256 * 1024
+
+
+# ================================================================
+# SECTION 1: PATHS & FINGERPRINTS
+# ================================================================
+
+def resolve_media_path(relpath):
+    """
+    Map a URL path like "assets/videos/x.mp4" to a file on disk.
+
+    Args:
+        relpath: Path relative to FRONTEND_ROOT
+
+    Returns:
+        Absolute file path, or None if it is outside MEDIA_DIRS,
+        tries to escape the root, or does not exist
+    """
+    relpath = relpath.replace('\\', '/').lstrip('/')
+    top_dir, _, rest = relpath.partition('/')
+    if top_dir not in MEDIA_DIRS or not rest:
+        return None
+    # Join inside the media dir so ".." cannot climb out of it
+    full_path = safe_join(os.path.join(FRONTEND_ROOT, top_dir), rest)
+    if full_path is None or not os.path.isfile(full_path):
+        return None
+    return full_path
+
+
+def file_fingerprint(full_path, stat_result=None):
+    """
+    Content hash of a file, cached until its size or mtime changes.
+
+    Args:
+        full_path: Absolute file path
+        stat_result: os.stat() result if the caller already has one
+
+    Returns:
+        16-character hex string (a prefix of the file's blob hash)
+    """
+    return hash_file(full_path, stat_result)[:16]
+
+
+def media_url(relpath):
+    """
+    Fingerprinted URL for a media file, safe to cache forever.
+
+    Args:
+        relpath: Path relative to FRONTEND_ROOT, e.g. "assets/temple_photos/x.jpg"
+
+    Returns:
+        URL path like "/media/assets/temple_photos/x.jpg?v=<hash>",
+        or None if the file cannot be served
+    """
+    full_path = resolve_media_path(relpath)
+    if full_path is None:
+        return None
+    return f"/media/{quote(relpath.replace(os.sep, '/'))}?v={file_fingerprint(full_path)}"
+
+
+# ================================================================
+# SECTION 2: RANGE-LIMITED FILE
+# ================================================================
+
+class _FileSlice:
+    """
+    File object that yields at most `length` bytes from its current
+    position. Exposes fileno()/tell() so sendfile-capable servers can
+    send the slice without copying it through Python.
+    """
+
+    def __init__(self, f, length):
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def close(self):
+        self._file.close()
+
+
+# ================================================================
+# SECTION 3: ROUTES
+# ================================================================
+
+@media.route('/media/<path:filename>', methods=['GET', 'HEAD'])
+def serve_media(filename):
+    """
+    GET /media/<path>
+
+    Serves a photo or video with Range, ETag and caching support.
+
+    Query parameters:
+    - v: Fingerprint from media_url(). When it matches the file's
+         current content, the response is cacheable for
+         MEDIA_MAX_AGE_SECONDS and marked immutable.
+    """
+    full_path = resolve_media_path(filename)
+    if full_path is None:
+        abort(404)
+    return send_media_file(full_path)
+
+
+def send_media_file(full_path):
+    """
+    Build the response for a file, honoring Range, If-None-Match,
+    If-Range and the ?v= fingerprint of the current request.
+
+    Shared by /media/ and other routes that serve files from disk
+    (e.g. gallery thumbnails in gallery.py).
+
+    Args:
+        full_path: Absolute path of an existing file
+
+    Returns:
+        Flask Response (200, 206, 304 or 416)
+    """
+    stat_result = os.stat(full_path)
+    size = stat_result.st_size
+    etag = file_fingerprint(full_path, stat_result)
+
+    headers = {'Accept-Ranges': 'bytes'}
+    if request.args.get('v') == etag:
+        headers['Cache-Control'] = (f"public, max-age={config.MEDIA_MAX_AGE_SECONDS}, "
+                                    f"immutable")
+    else:
+        headers['Cache-Control'] = "no-cache"
+
+    mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    # Conditional GET: the browser already has this exact content
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    # Range request (ignored if If-Range names an older version).
+    # Multiple ranges are not served as multipart; the whole file
+    # is sent instead, which RFC 9110 allows.
+    start, stop, status = 0, size, 200
+    byte_range = request.range
+    if_range = request.if_range
+    range_is_current = (if_range.etag == etag if if_range.etag is not None
+                        else if_range.date is None or
+                        if_range.date.timestamp() >= int(stat_result.st_mtime))
+    if byte_range is not None and range_is_current and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416, headers=headers)
+            response.headers['Content-Range'] = f"bytes */{size}"
+            return response
+        start, stop = bounds
+        status = 206
+
+    length = stop - start
+
+    if MEDIA_USE_X_SENDFILE and status == 200:
+        headers['X-Sendfile'] = full_path
+        response = Response(status=200, headers=headers, mimetype=mimetype)
+    else:
+        f = open(full_path, 'rb')
+        f.seek(start)
+        body = wrap_file(request.environ, _FileSlice(f, length), BUFFER_SIZE)
+        response = Response(body, status=status, headers=headers,
+                            mimetype=mimetype, direct_passthrough=True)
+
+    response.content_length = length
+    response.set_etag(etag)
+    response.last_modified = stat_result.st_mtime
+    if status == 206:
+        response.content_range = ContentRange('bytes', start, stop, size)
+    return response
+
+
+@media.route('/api/media', methods=['GET'])
+def get_media_info():
+    """
+    GET /api/media?path=assets/videos/president_nelson.mp4
+
+    Returns the fingerprinted URL for a media file, so the frontend
+    can request it with long-lived caching.
+
+    Response:
+    {
+        "status": "ok",
+        "data": {
+            "path": "assets/videos/president_nelson.mp4",
+            "url": "/media/assets/videos/president_nelson.mp4?v=1f3a...",
+            "size": 48213377,
+            "etag": "1f3a..."
+        }
+    }
+    """
+    relpath = request.args.get('path', '')
+    full_path = resolve_media_path(relpath)
+    if full_path is None:
+        return jsonify({"status": "error", "message": "Media file not found"}), 404
+
+    return jsonify({
+        "status": "ok",
+        "data": {
+            "path": relpath,
+            "url": media_url(relpath),
+            "size": os.path.getsize(full_path),
+            "etag": file_fingerprint(full_path)
+        }
+    })
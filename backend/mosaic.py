@@ -0,0 +1,402 @@
+"""
+================================================================
+MOSAIC.PY - SELFIE WALL ("WARD WALL") MOSAIC
+================================================================
+This module composes the most recent selfies into one large wall
+image, so a display can show hundreds of faces with a single
+image request instead of one thumbnail request per selfie.
+
+PURPOSE:
+- render_mosaic() returns a JPEG of the wall at a requested size
+  (GET /api/selfies/mosaic?w=1920&h=1080 in app.py)
+- The wall is drawn from a tile cache on disk; when selfies
+  change, only the tiles whose selfies changed are redrawn
+
+HOW IT WORKS:
+The wall is a grid of cells, MOSAIC_CELL_SIZE pixels or a little
+more so they fill the requested size exactly. The newest selfies
+fill it, each in slot (id % number of cells): a new selfie takes
+the slot of the one that is now too old to be shown, and every
+other selfie stays where it was. The wall fills up like a ring
+rather than in date order, which is what makes small updates
+possible.
+
+Cells are grouped into tiles of MOSAIC_TILE_CELLS x
+MOSAIC_TILE_CELLS. Each tile has a key made of its selfies' image
+hashes. A tile is redrawn only when its key changes, and the
+tiles are saved as PNG in MOSAIC_CACHE_DIR, so a restarted server
+does not redraw them either. Each selfie is shrunk to cell size
+once; the small copy is kept in the cache as well.
+
+The finished wall has a strong ETag, and it changes only when a
+tile does. A display polling the wall gets 304 until there is a
+new selfie.
+
+PILLOW:
+Drawing needs Pillow (pip install Pillow). Without it
+render_mosaic() returns None and the route answers 503.
+
+USAGE:
+    from mosaic import render_mosaic
+
+    wall = render_mosaic(storage, 1920, 1080)
+    if wall:
+        print(wall["path"], wall["etag"], wall["tiles_drawn"])
+================================================================
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+from imaging import PIL_AVAILABLE, pillow
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from config import MOSAIC_CACHE_DIR
+
+# Folder of MOSAIC_CACHE_DIR holding the cell-sized selfie copies;
+# every other folder is one wall size
+CELLS_FOLDER = "cells"
+
+# Bumped when the drawing changes, so cached tiles are redrawn
+MOSAIC_FORMAT = 1
+
+# Serializes drawing; a second request for the same wall waits and
+# then finds it ready
+_lock = threading.Lock()
+
+# The last drawn wall, kept decoded so an update only pastes the
+# redrawn tiles: {"name", "etag", "image"}
+_last_wall = {}
+
+
+# ================================================================
+# SECTION 1: LAYOUT
+# ================================================================
+
+def parse_side(value, default):
+    """
+    A requested wall side in pixels.
+
+    Args:
+        value: Query parameter value (None or '' for the default)
+        default: Side used when no value is given
+
+    Returns:
+        Side in pixels
+
+    Raises:
+        ValueError: If the value is not a whole number in range
+    """
+    if value is None or value == '':
+        return default
+    try:
+        side = int(value)
+    except ValueError:
+        raise ValueError(f"Size must be a whole number of pixels, got {value!r}")
+    if not 16 <= side <= config.MOSAIC_MAX_SIDE:
+        raise ValueError(f"Size must be between 16 and {config.MOSAIC_MAX_SIDE} pixels")
+    return side
+
+
+def _background():
+    """MOSAIC_BACKGROUND as an RGB tuple (near black if invalid)."""
+    try:
+        return pillow().ImageColor.getrgb(config.MOSAIC_BACKGROUND)[:3]
+    except ValueError:
+        return (17, 17, 17)
+
+
+def wall_layout(width, height):
+    """
+    Grid of a wall of the given size.
+
+    Returns:
+        Dict with width, height, cols, rows, cell_w, cell_h, tile
+        (cells per tile side), gap, background, quality and name
+        (cache folder; changes with any of the settings)
+    """
+    cell = config.MOSAIC_CELL_SIZE
+    cols = max(1, width // cell)
+    rows = max(1, height // cell)
+    layout = {
+        "width": width,
+        "height": height,
+        "cols": cols,
+        "rows": rows,
+        "cell_w": width // cols,
+        "cell_h": height // rows,
+        "tile": config.MOSAIC_TILE_CELLS,
+        "gap": min(config.MOSAIC_CELL_GAP, min(width // cols, height // rows) // 4),
+        "background": _background(),
+        "quality": config.MOSAIC_JPEG_QUALITY,
+        "format": MOSAIC_FORMAT
+    }
+    settings = hashlib.sha1(json.dumps(layout, sort_keys=True).encode('utf-8')).hexdigest()
+    layout["name"] = f"{width}x{height}_{settings[:10]}"
+    return layout
+
+
+def _tiles(layout):
+    """(name, first col, first row, cols, rows) of every tile."""
+    size = layout["tile"]
+    for first_row in range(0, layout["rows"], size):
+        for first_col in range(0, layout["cols"], size):
+            yield (f"{first_col // size}_{first_row // size}", first_col, first_row,
+                   min(size, layout["cols"] - first_col), min(size, layout["rows"] - first_row))
+
+
+# ================================================================
+# SECTION 2: PLACING SELFIES
+# ================================================================
+
+def assign_slots(selfies, slot_count):
+    """
+    Place the newest selfies in the wall's cells.
+
+    Selfie ids count up, so (id % slot_count) gives every one of
+    the newest slot_count selfies its own cell, and a new selfie
+    replaces the oldest one shown. If ids have gaps, a selfie whose
+    cell is taken goes to the first free cell.
+
+    Returns:
+        List of slot_count selfie records (None for empty cells)
+    """
+    numbered = [s for s in selfies if isinstance(s.get('id'), int)]
+    newest = sorted(numbered, key=lambda s: s['id'])[-slot_count:]
+
+    slots = [None] * slot_count
+    displaced = []
+    for selfie in newest:
+        slot = selfie['id'] % slot_count
+        if slots[slot] is None:
+            slots[slot] = selfie
+        else:
+            displaced.append(selfie)
+
+    free = [slot for slot, selfie in enumerate(slots) if selfie is None]
+    for slot, selfie in zip(free, displaced):
+        slots[slot] = selfie
+    return slots
+
+
+def _image_source(storage, selfie):
+    """
+    (cache key, image path) of a selfie, or (None, None) while its
+    image is not on this kiosk (e.g. not yet fetched from a peer).
+    """
+    if selfie is None:
+        return None, None
+    path = storage.get_selfie_path(selfie)
+    if not path or not os.path.isfile(path):
+        return None, None
+    source = selfie.get('blob') or f"file:{selfie.get('filename')}"
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16], path
+
+
+# ================================================================
+# SECTION 3: DRAWING
+# ================================================================
+
+def _save_atomic(img, path, **options):
+    """Write an image to a temp file and swap it in."""
+    temp_path = f"{path}.tmp"
+    img.save(temp_path, **options)
+    os.replace(temp_path, path)
+
+
+def _cell_image(key, path, size):
+    """
+    A selfie cropped to cell size, from the cache or made now.
+
+    Returns:
+        RGB image, or None if the selfie cannot be decoded
+    """
+    PIL = pillow()
+    cell_path = os.path.join(MOSAIC_CACHE_DIR, CELLS_FOLDER, f"{key}_{size[0]}x{size[1]}.jpg")
+    try:
+        if os.path.isfile(cell_path):
+            with PIL.Image.open(cell_path) as img:
+                img.load()
+                return img.convert("RGB") if img.mode != "RGB" else img
+
+        with PIL.Image.open(path) as img:
+            img.draft("RGB", (size[0] * 2, size[1] * 2))
+            img = PIL.ImageOps.exif_transpose(img).convert("RGB")
+            # Faces sit in the upper part of a selfie
+            img = PIL.ImageOps.fit(img, size, PIL.Image.LANCZOS, centering=(0.5, 0.4))
+        os.makedirs(os.path.dirname(cell_path), exist_ok=True)
+        _save_atomic(img, cell_path, format="JPEG", quality=90)
+        return img
+    except (OSError, ValueError, PIL.Image.DecompressionBombError) as e:
+        print(f"[Mosaic] Could not draw selfie image {path}: {e}")
+        return None
+
+
+def _draw_tile(layout, sources, first_col, first_row, cols, rows):
+    """Draw one tile from the (key, path) of each of its cells."""
+    cell_w, cell_h, gap = layout["cell_w"], layout["cell_h"], layout["gap"]
+    PIL = pillow()
+    tile = PIL.Image.new("RGB", (cols * cell_w, rows * cell_h), layout["background"])
+    inner = (cell_w - gap, cell_h - gap)
+
+    for row in range(rows):
+        for col in range(cols):
+            key, path = sources[(first_row + row) * layout["cols"] + first_col + col]
+            if key is None:
+                continue
+            img = _cell_image(key, path, inner)
+            if img is not None:
+                tile.paste(img, (col * cell_w + gap // 2, row * cell_h + gap // 2))
+    return tile
+
+
+# ================================================================
+# SECTION 4: CACHE
+# ================================================================
+
+def clear_mosaic_cache():
+    """Forget the decoded wall (the next request redraws from tiles)."""
+    with _lock:
+        _last_wall.clear()
+
+
+def _load_state(layout_dir):
+    """Tile keys and ETag of a cached wall ({} if none)."""
+    try:
+        with open(os.path.join(layout_dir, "state.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(layout_dir, state):
+    path = os.path.join(layout_dir, "state.json")
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _prune_cache():
+    """
+    Drop the least recently drawn wall sizes beyond
+    MOSAIC_MAX_LAYOUTS, and cell copies no kept wall uses.
+    """
+    try:
+        names = [entry.name for entry in os.scandir(MOSAIC_CACHE_DIR)
+                 if entry.is_dir() and entry.name != CELLS_FOLDER]
+    except OSError:
+        return
+
+    states = {name: _load_state(os.path.join(MOSAIC_CACHE_DIR, name)) for name in names}
+    recent = sorted(names, key=lambda name: states[name].get("drawn_at", 0), reverse=True)
+    for name in recent[config.MOSAIC_MAX_LAYOUTS:]:
+        shutil.rmtree(os.path.join(MOSAIC_CACHE_DIR, name), ignore_errors=True)
+        del states[name]
+
+    in_use = set()
+    for state in states.values():
+        in_use.update(state.get("cells", []))
+    cells_dir = os.path.join(MOSAIC_CACHE_DIR, CELLS_FOLDER)
+    try:
+        for entry in os.scandir(cells_dir):
+            if entry.name not in in_use:
+                os.remove(entry.path)
+    except OSError:
+        pass
+
+
+# ================================================================
+# SECTION 5: RENDERING
+# ================================================================
+
+def render_mosaic(storage, width, height):
+    """
+    Bring the wall of the given size up to date.
+
+    Args:
+        storage: Storage backend (list_selfies, get_selfie_path)
+        width: Wall width in pixels
+        height: Wall height in pixels
+
+    Returns:
+        Dict with path (the wall JPEG), etag, tiles_drawn, tiles
+        and selfies (number shown), or None without Pillow
+    """
+    if not PIL_AVAILABLE:
+        return None
+    PIL = pillow()
+
+    with _lock:
+        layout = wall_layout(width, height)
+        layout_dir = os.path.join(MOSAIC_CACHE_DIR, layout["name"])
+        wall_path = os.path.join(layout_dir, "wall.jpg")
+        state = _load_state(layout_dir)
+
+        slots = assign_slots(storage.list_selfies(), layout["cols"] * layout["rows"])
+        sources = [_image_source(storage, selfie) for selfie in slots]
+        inner = f"{layout['cell_w'] - layout['gap']}x{layout['cell_h'] - layout['gap']}"
+
+        tile_keys = {}
+        for name, first_col, first_row, cols, rows in _tiles(layout):
+            keys = [sources[(first_row + row) * layout["cols"] + first_col + col][0] or "-"
+                    for row in range(rows) for col in range(cols)]
+            tile_keys[name] = hashlib.sha1("|".join(keys).encode('utf-8')).hexdigest()[:16]
+
+        etag = hashlib.sha1(
+            (layout["name"] + "".join(tile_keys[name] for name in sorted(tile_keys))).encode('utf-8')
+        ).hexdigest()[:20]
+        result = {
+            "path": wall_path,
+            "etag": etag,
+            "tiles_drawn": 0,
+            "tiles": len(tile_keys),
+            "selfies": sum(1 for key, _ in sources if key)
+        }
+        if state.get("etag") == etag and os.path.isfile(wall_path):
+            return result
+
+        # Start from the wall in memory (only redrawn tiles are
+        # pasted) or a blank one (every tile is pasted, from disk
+        # when its key is unchanged)
+        reuse = _last_wall.get("name") == layout["name"] and _last_wall.get("etag") == state.get("etag")
+        wall = _last_wall["image"] if reuse else PIL.Image.new("RGB", (width, height), layout["background"])
+        left = (width - layout["cols"] * layout["cell_w"]) // 2
+        top = (height - layout["rows"] * layout["cell_h"]) // 2
+        os.makedirs(os.path.join(layout_dir, "tiles"), exist_ok=True)
+
+        for name, first_col, first_row, cols, rows in _tiles(layout):
+            tile_path = os.path.join(layout_dir, "tiles", f"{name}.png")
+            unchanged = state.get("tiles", {}).get(name) == tile_keys[name] and os.path.isfile(tile_path)
+            if unchanged and reuse:
+                continue
+            tile = None
+            if unchanged:
+                try:
+                    with PIL.Image.open(tile_path) as cached:
+                        tile = cached.convert("RGB")
+                except OSError:
+                    tile = None
+            if tile is None:
+                tile = _draw_tile(layout, sources, first_col, first_row, cols, rows)
+                _save_atomic(tile, tile_path, format="PNG", compress_level=1)
+                result["tiles_drawn"] += 1
+            wall.paste(tile, (left + first_col * layout["cell_w"], top + first_row * layout["cell_h"]))
+
+        _save_atomic(wall, wall_path, format="JPEG", quality=layout["quality"],
+                     optimize=True, progressive=True)
+        _save_state(layout_dir, {
+            "etag": etag,
+            "tiles": tile_keys,
+            "cells": sorted({f"{key}_{inner}.jpg" for key, _ in sources if key}),
+            "drawn_at": os.path.getmtime(wall_path)
+        })
+        _last_wall.update(name=layout["name"], etag=etag, image=wall)
+        _prune_cache()
+
+        print(f"[Mosaic] Drew {layout['name']}: {result['tiles_drawn']} of "
+              f"{result['tiles']} tiles, {result['selfies']} selfies")
+        return result
@@ -0,0 +1,147 @@
+"""
+================================================================
+PLAYLIST.PY - SCREENSAVER PLAYLIST
+================================================================
+This module plans the screensaver's photo rotation on the server,
+so the kiosk browser never has to download or decode the whole
+temple photo folder at once.
+
+PURPOSE:
+- Each distinct temple photo appears once (identical files are
+  merged by content hash, see list_temple_photos())
+- Photos are resized to SCREENSAVER_PHOTO_SIZE, so the browser
+  decodes a screen-sized JPEG instead of a multi-MB original
+- The order is shuffled with a seed saved in
+  SCREENSAVER_STATE_FILE, so it is the same after a restart
+- The response tells the client to download only the next
+  SCREENSAVER_PREFETCH_COUNT photos ahead
+
+SHUFFLING:
+Each photo's position comes from hash(seed + photo hash), not
+from shuffling the list as a whole. Adding or removing one photo
+therefore leaves the relative order of all the others unchanged.
+
+USAGE:
+    from playlist import build_playlist
+
+    playlist = build_playlist(temple_photos)
+    # {"version": "...", "photos": [{"url": ..., "path": ...}, ...]}
+================================================================
+"""
+
+import os
+import json
+import random
+import hashlib
+import threading
+from config import SCREENSAVER_PHOTO_SIZE, SCREENSAVER_STATE_FILE
+from gallery import make_resized_copies
+from imaging import PIL_AVAILABLE
+from media import resolve_media_path
+
+_seed = None
+_cache = {"key": None, "playlist": None}
+_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: SHUFFLE SEED
+# ================================================================
+
+def get_seed():
+    """
+    The shuffle seed, created and saved on first use.
+
+    Returns:
+        Integer seed
+    """
+    global _seed
+    if _seed is not None:
+        return _seed
+
+    try:
+        with open(SCREENSAVER_STATE_FILE, 'r', encoding='utf-8') as f:
+            _seed = int(json.load(f)["seed"])
+            return _seed
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    _seed = random.SystemRandom().getrandbits(63)
+    directory = os.path.dirname(SCREENSAVER_STATE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(SCREENSAVER_STATE_FILE + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump({"seed": _seed}, f)
+    os.replace(SCREENSAVER_STATE_FILE + ".tmp", SCREENSAVER_STATE_FILE)
+    return _seed
+
+
+def _position(seed, photo_hash):
+    """Sort key of a photo in the shuffled order."""
+    return hashlib.sha256(f"{seed}:{photo_hash}".encode('utf-8')).hexdigest()
+
+
+# ================================================================
+# SECTION 2: PLAYLIST
+# ================================================================
+
+def build_playlist(photos):
+    """
+    Plan the screensaver rotation.
+
+    Resized copies are made on first use and reused afterwards;
+    the finished playlist is cached until the photos change.
+
+    Args:
+        photos: Temple photo dicts with path, hash, size, url and
+                (optionally) width, height and placeholder, as
+                returned by /api/temple-photos
+
+    Returns:
+        Dict with version and photos (each with path, url,
+        original_url, width, height and placeholder)
+    """
+    seed = get_seed()
+    key = (seed, SCREENSAVER_PHOTO_SIZE, tuple(photo['hash'] for photo in photos))
+
+    with _lock:
+        if _cache["key"] == key:
+            return _cache["playlist"]
+
+        entries = []
+        for photo in sorted(photos, key=lambda p: _position(seed, p['hash'])):
+            # Pillow could not read it, so a browser probably cannot either
+            if PIL_AVAILABLE and photo.get('width') is None:
+                continue
+
+            entry = {
+                "path": photo['path'],
+                "url": photo['url'],
+                "original_url": photo['url'],
+                "width": photo.get('width'),
+                "height": photo.get('height'),
+                "placeholder": photo.get('placeholder')
+            }
+
+            full_path = resolve_media_path(photo['path'])
+            if PIL_AVAILABLE and full_path:
+                try:
+                    _, (copy,) = make_resized_copies(full_path, photo['hash'][:16],
+                                                     (SCREENSAVER_PHOTO_SIZE,))
+                    # Small originals can grow when re-encoded
+                    if copy and copy['bytes'] < photo['size']:
+                        entry.update(url=copy['url'], width=copy['width'],
+                                     height=copy['height'])
+                except Exception as e:
+                    print(f"[Playlist] Could not resize {photo['path']}: {e}")
+
+            entries.append(entry)
+
+        version = hashlib.sha256(
+            "".join(entry['url'] for entry in entries).encode('utf-8')
+        ).hexdigest()[:16]
+
+        playlist = {"version": version, "photos": entries}
+        _cache.update(key=key, playlist=playlist)
+
+    return playlist
@@ -0,0 +1,143 @@
+"""
+================================================================
+PRECACHE.PY - OFFLINE PRECACHE MANIFEST
+================================================================
+This module lists everything the kiosk needs to boot without the
+network, for the service worker (sw.js) to keep in Cache Storage.
+
+PURPOSE:
+- build_precache_manifest() returns every file to precache with
+  a hash of its content, and a version that changes whenever one
+  of them does (GET /api/precache-manifest in app.py)
+- The service worker downloads only entries whose hash changed
+  since its last copy, and drops the old copy afterwards
+
+WHAT IS LISTED:
+- shell:        The page (/), its JS and CSS bundle (bundle.py)
+                and the images index.html refers to (icons)
+- screensaver:  The screen-sized copy of every playlist photo
+                (PRECACHE_SCREENSAVER_PHOTOS)
+- missionaries: Missionary portraits and the thumbnails of every
+                gallery photo (PRECACHE_GALLERY_THUMBS)
+
+Every URL is the one the page actually requests, so the service
+worker can answer it from the cache as it is.
+
+USAGE:
+    from precache import build_precache_manifest
+
+    manifest = build_precache_manifest(playlist)
+    manifest["version"]     # e.g. "5f0c2a9e1b7d4c33"
+    manifest["assets"]      # [{"url", "hash", "group"}, ...]
+================================================================
+"""
+
+import os
+import re
+import hashlib
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from config import FRONTEND_ROOT, MISSIONARY_PHOTOS_DIR
+from bundle import build_bundle
+from gallery import IMAGE_EXTENSIONS, all_gallery_manifests
+from media import file_fingerprint, media_url, resolve_media_path
+
+# Images index.html refers to by relative path
+PAGE_IMAGE = re.compile(r'(?:src|href)="(assets/[^"]+\.(?:svg|png|jpe?g|gif|webp|ico))"',
+                        re.IGNORECASE)
+
+
+# ================================================================
+# SECTION 1: ENTRIES
+# ================================================================
+
+def _url_hash(url):
+    """The ?v= fingerprint of a media URL (the URL itself if none)."""
+    version = parse_qs(urlsplit(url).query).get('v')
+    return version[0] if version else hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+def shell_entries():
+    """The page, its bundle and the images in index.html."""
+    built = build_bundle()
+    entries = [
+        {"url": "/", "hash": built["index"]["hash"]},
+        {"url": f"/bundle/{built['js']['name']}", "hash": built["js"]["hash"]},
+        {"url": f"/bundle/{built['css']['name']}", "hash": built["css"]["hash"]}
+    ]
+
+    with open(os.path.join(FRONTEND_ROOT, "index.html"), 'r', encoding='utf-8') as f:
+        html = re.sub(r"<!--.*?-->", "", f.read(), flags=re.DOTALL)
+    for relpath in sorted(set(PAGE_IMAGE.findall(html))):
+        full_path = resolve_media_path(relpath)
+        if full_path:
+            entries.append({"url": f"/{relpath}", "hash": file_fingerprint(full_path)})
+    return entries
+
+
+def screensaver_entries(playlist):
+    """The screen-sized copy of every photo in the playlist."""
+    return [{"url": photo["url"], "hash": _url_hash(photo["url"])}
+            for photo in playlist.get("photos", []) if photo.get("url")]
+
+
+def missionary_entries():
+    """Missionary portraits and every gallery photo's thumbnail."""
+    entries = []
+    root = os.path.join(FRONTEND_ROOT, MISSIONARY_PHOTOS_DIR)
+    if os.path.isdir(root):
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                url = media_url(f"{MISSIONARY_PHOTOS_DIR}/{entry.name}")
+                if url:
+                    entries.append({"url": url, "hash": _url_hash(url)})
+
+    for manifest in all_gallery_manifests():
+        for photo in manifest["photos"]:
+            url = photo["thumb"]["url"]
+            entries.append({"url": url, "hash": _url_hash(url)})
+    return entries
+
+
+# ================================================================
+# SECTION 2: MANIFEST
+# ================================================================
+
+def build_precache_manifest(playlist):
+    """
+    List every file the kiosk needs offline.
+
+    Args:
+        playlist: The screensaver playlist (see playlist.py)
+
+    Returns:
+        Dict with version, generated_at, counts (entries per group)
+        and assets (each with url, hash and group)
+    """
+    groups = {"shell": shell_entries()}
+    if config.PRECACHE_SCREENSAVER_PHOTOS:
+        groups["screensaver"] = screensaver_entries(playlist)
+    if config.PRECACHE_GALLERY_THUMBS:
+        groups["missionaries"] = missionary_entries()
+
+    assets = []
+    seen = set()
+    for group, entries in groups.items():
+        for entry in entries:
+            if entry["url"] not in seen:
+                seen.add(entry["url"])
+                assets.append(dict(entry, group=group))
+
+    version = hashlib.sha256(
+        "\n".join(f"{a['url']} {a['hash']}" for a in assets).encode('utf-8')
+    ).hexdigest()[:16]
+
+    return {
+        "version": version,
+        "generated_at": datetime.now().isoformat(),
+        "counts": {group: sum(1 for a in assets if a["group"] == group) for group in groups},
+        "assets": assets
+    }
@@ -0,0 +1,364 @@
+"""
+================================================================
+PROFILING.PY - OPT-IN REQUEST PROFILING
+================================================================
+This module profiles selected API requests and saves the
+profiles to disk so slow endpoints can be investigated on the
+kiosk itself.
+
+PURPOSE:
+- Wrap selected requests in cProfile or a sampling profiler
+- Save each profile (plus a small JSON summary) to PROFILES_DIR
+- List saved profiles with their top functions by cumulative time
+
+ENABLING:
+Set one of these in config.py:
+- PROFILING_ENABLED = True       (profile every matching request)
+- PROFILING_ALLOW_HEADER = True  (profile requests that send
+                                  the header X-Kiosk-Profile: 1)
+
+If both are False, install_profiler() registers no hooks at all,
+so requests run exactly as if this module did not exist, and
+app.py does not register GET /api/debug/profiles either.
+
+OUTPUT FILES (in PROFILES_DIR):
+- <id>.prof    cProfile data   -> snakeviz <id>.prof
+- <id>.folded  collapsed stacks -> flamegraph.pl <id>.folded > out.svg
+                                  (or drop it into speedscope.app)
+- <id>.json    summary used by GET /api/debug/profiles
+
+USAGE:
+    from profiling import install_profiler, list_profiles
+
+    install_profiler(app)
+    profiles = list_profiles(limit=10)
+================================================================
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+from config import (
+    PROFILING_ENABLED,
+    PROFILING_ALLOW_HEADER,
+    PROFILES_DIR
+)
+
+# PROFILING_MODE, PROFILING_ROUTES, PROFILING_SAMPLE_INTERVAL_MS and
+# PROFILES_KEEP are hot-reloadable, so they are read as config.NAME
+import config
+
+# Request header that asks for a single request to be profiled
+PROFILE_HEADER = "X-Kiosk-Profile"
+
+# Number of functions kept in each summary
+TOP_FUNCTIONS = 25
+
+# cProfile cannot profile two threads at once (Python 3.12+ refuses
+# outright), so concurrent requests are profiled one at a time and
+# the others simply run unprofiled.
+_profile_slot = threading.Lock()
+
+# Counter to keep profile ids unique within the same millisecond
+_id_lock = threading.Lock()
+_id_counter = 0
+
+
+# ================================================================
+# SECTION 1: PROFILERS
+# ================================================================
+
+class CProfileProfiler:
+    """Deterministic profiler built on cProfile."""
+
+    mode = "cprofile"
+    extension = ".prof"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def save(self, path):
+        """Write the raw profile in pstats format."""
+        self._profile.dump_stats(path)
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """
+        Get the functions with the highest cumulative time.
+
+        Returns:
+            List of dicts with function, calls, total_ms, cumulative_ms
+        """
+        stats = pstats.Stats(self._profile).stats
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, callers) in stats.items():
+            rows.append({
+                "function": _label(filename, line, func),
+                "calls": nc,
+                "total_ms": round(tt * 1000, 3),
+                "cumulative_ms": round(ct * 1000, 3)
+            })
+        rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+        return rows[:limit]
+
+
+class SamplingProfiler:
+    """
+    Low-overhead profiler that samples the request thread's stack.
+
+    A helper thread wakes every PROFILING_SAMPLE_INTERVAL_MS and
+    records the request thread's current call stack. Identical
+    stacks are counted, which is exactly the "collapsed stack"
+    input that flame graph tools expect.
+    """
+
+    mode = "sampling"
+    extension = ".folded"
+
+    def __init__(self, interval_ms=None):
+        if interval_ms is None:
+            interval_ms = config.PROFILING_SAMPLE_INTERVAL_MS
+        self._interval = interval_ms / 1000
+        self._interval_ms = interval_ms
+        self._thread_id = threading.get_ident()
+        self._stacks = Counter()
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, daemon=True,
+                                         name="profiling-sampler")
+        self._sampler.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def save(self, path):
+        """Write collapsed stacks, one 'frame;frame;frame count' per line."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """
+        Get the functions seen in the most samples.
+
+        A function counts once per sample it appears anywhere in,
+        so sample counts approximate cumulative (inclusive) time.
+
+        Returns:
+            List of dicts with function, samples, cumulative_ms
+        """
+        inclusive = Counter()
+        for stack, count in self._stacks.items():
+            for function in set(stack.split(";")):
+                inclusive[function] += count
+        return [
+            {
+                "function": function,
+                "samples": samples,
+                "cumulative_ms": round(samples * self._interval_ms, 3)
+            }
+            for function, samples in inclusive.most_common(limit)
+        ]
+
+
+def _label(filename, line, func):
+    """Short, flamegraph-safe label for a function."""
+    name = os.path.basename(filename) if filename != "~" else "built-in"
+    return f"{func} ({name}:{line})".replace(";", ",")
+
+
+# ================================================================
+# SECTION 2: FLASK HOOKS
+# ================================================================
+
+def install_profiler(app):
+    """
+    Register the profiling hooks on a Flask app.
+
+    Does nothing when profiling is disabled in config.py, so the
+    request path carries no extra work.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        True if hooks were installed
+    """
+    if not (PROFILING_ENABLED or PROFILING_ALLOW_HEADER):
+        return False
+
+    app.before_request(_start_profiling)
+    app.teardown_request(_finish_profiling)
+    print(f"[Profiling] Enabled ({config.PROFILING_MODE} mode, saving to {PROFILES_DIR})")
+    return True
+
+
+def _should_profile():
+    """Decide whether the current request should be profiled."""
+    if not any(request.path.startswith(prefix) for prefix in config.PROFILING_ROUTES):
+        return False
+    if request.path.startswith("/api/debug/profiles"):
+        return False
+    if PROFILING_ENABLED:
+        return True
+    return request.headers.get(PROFILE_HEADER) == "1"
+
+
+def _start_profiling():
+    """before_request hook: start a profiler if this request qualifies."""
+    if not _should_profile():
+        return
+    if not _profile_slot.acquire(blocking=False):
+        return
+
+    if config.PROFILING_MODE == "sampling":
+        profiler = SamplingProfiler()
+    else:
+        profiler = CProfileProfiler()
+
+    g.kiosk_profiler = profiler
+    g.kiosk_profile_started = time.perf_counter()
+    profiler.start()
+
+
+def _finish_profiling(error=None):
+    """teardown_request hook: stop the profiler and save the results."""
+    profiler = g.pop("kiosk_profiler", None)
+    if profiler is None:
+        return
+
+    try:
+        profiler.stop()
+        duration_ms = (time.perf_counter() - g.pop("kiosk_profile_started")) * 1000
+        _save_profile(profiler, duration_ms, error)
+    except Exception as e:
+        print(f"[Profiling] Failed to save profile: {e}")
+    finally:
+        _profile_slot.release()
+
+
+# ================================================================
+# SECTION 3: PROFILE FILES
+# ================================================================
+
+def _new_profile_id():
+    """Sortable, filesystem-safe id like 20240115_093012_123_0007_GET_api_selfies."""
+    global _id_counter
+    with _id_lock:
+        _id_counter = (_id_counter + 1) % 10000
+        counter = _id_counter
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]
+    slug = request.path.strip('/').replace('/', '_') or "root"
+    return f"{stamp}_{counter:04d}_{request.method}_{slug}"
+
+
+def _save_profile(profiler, duration_ms, error):
+    """Write the raw profile and its JSON summary, then prune old ones."""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    profile_id = _new_profile_id()
+
+    profiler.save(os.path.join(PROFILES_DIR, profile_id + profiler.extension))
+
+    summary = {
+        "id": profile_id,
+        "mode": profiler.mode,
+        "method": request.method,
+        "path": request.full_path.rstrip('?'),
+        "duration_ms": round(duration_ms, 3),
+        "error": str(error) if error else None,
+        "file": profile_id + profiler.extension,
+        "created_at": datetime.now().isoformat(),
+        "top_functions": profiler.top_functions()
+    }
+    with open(os.path.join(PROFILES_DIR, profile_id + ".json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    _prune_profiles()
+
+
+def _summary_files():
+    """Summary files in PROFILES_DIR, newest first."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    names = [name for name in os.listdir(PROFILES_DIR) if name.endswith(".json")]
+    return sorted(names, reverse=True)
+
+
+def _prune_profiles():
+    """Delete the oldest profiles beyond PROFILES_KEEP."""
+    for name in _summary_files()[config.PROFILES_KEEP:]:
+        profile_id = name[:-len(".json")]
+        for extension in (".json", CProfileProfiler.extension, SamplingProfiler.extension):
+            try:
+                os.remove(os.path.join(PROFILES_DIR, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(limit=20, top=10):
+    """
+    List saved profiles, newest first.
+
+    Args:
+        limit: Maximum number of profiles to return
+        top: Number of top functions to include per profile
+
+    Returns:
+        List of profile summary dicts
+    """
+    profiles = []
+    for name in _summary_files()[:limit]:
+        try:
+            with open(os.path.join(PROFILES_DIR, name), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        summary["top_functions"] = summary.get("top_functions", [])[:top]
+        profiles.append(summary)
+    return profiles
+
+
+def get_profile_path(profile_id):
+    """
+    Get the path of a saved raw profile file.
+
+    Args:
+        profile_id: Id from list_profiles()
+
+    Returns:
+        Absolute file path, or None if no such profile exists
+    """
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    for extension in (CProfileProfiler.extension, SamplingProfiler.extension):
+        path = os.path.abspath(os.path.join(PROFILES_DIR, profile_id + extension))
+        if os.path.exists(path):
+            return path
+    return None
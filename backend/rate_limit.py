@@ -0,0 +1,303 @@
+"""
+================================================================
+RATE_LIMIT.PY - REQUEST RATE LIMITING & UPLOAD BACK-PRESSURE
+================================================================
+This module keeps a runaway client from exhausting the kiosk.
+
+PURPOSE:
+- Token-bucket rate limit per client (IP address) and per route
+- Global cap on concurrent uploads and on upload bytes in flight
+- Reject excess requests early with 429 + Retry-After, BEFORE
+  their (possibly multi-MB) bodies are read into memory
+
+HOW IT WORKS:
+Every client/route pair gets a bucket holding up to
+RATE_LIMIT_BURST tokens, refilled at MAX_REQUESTS_PER_MINUTE
+(or the route's entry in RATE_LIMIT_ROUTES). Each request takes
+one token; an empty bucket means 429.
+
+Requests to UPLOAD_ROUTES additionally reserve a slot and their
+Content-Length against MAX_CONCURRENT_UPLOADS and
+MAX_INFLIGHT_UPLOAD_BYTES. The reservation is released when the
+request finishes, successful or not. Bodies over MAX_UPLOAD_BYTES
+get 413: at once when the Content-Length says so, and as soon as
+that many bytes were read for chunked bodies (which reserve
+MAX_UPLOAD_BYTES, as their size is unknown).
+
+cap_request_body() applies the same cap to POST /api/batch, which
+parses its whole body before its sub-requests are checked.
+
+All settings are read from config at request time, so they can
+be tuned in kiosk_config.json without a restart.
+
+USAGE:
+    from rate_limit import install_rate_limiter, rate_limit_stats
+
+    install_rate_limiter(app)
+================================================================
+"""
+
+import math
+import time
+import threading
+from collections import OrderedDict
+from flask import g, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import config
+
+# Most buckets kept in memory; the least recently used are dropped
+# (a dropped bucket simply starts full again)
+MAX_BUCKETS = 10000
+
+# Retry-After (seconds) sent when the upload caps are full
+UPLOAD_RETRY_AFTER = 2
+
+
+# ================================================================
+# SECTION 1: TOKEN BUCKETS
+# ================================================================
+
+class TokenBucketLimiter:
+    """
+    Thread-safe collection of token buckets keyed by (client, route).
+    """
+
+    def __init__(self, max_buckets=MAX_BUCKETS):
+        self._buckets = OrderedDict()
+        self._max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def acquire(self, key, per_minute, burst):
+        """
+        Take one token from the bucket for `key`.
+
+        Args:
+            key: Bucket key, e.g. ("127.0.0.1", "POST /api/selfies")
+            per_minute: Refill rate
+            burst: Bucket capacity
+
+        Returns:
+            0 if allowed, otherwise seconds until a token is available
+        """
+        rate = per_minute / 60.0
+        now = time.monotonic()
+
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            if tokens >= 1:
+                wait = 0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+                self.rejected += 1
+
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self._max_buckets:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# ================================================================
+# SECTION 2: UPLOAD BACK-PRESSURE
+# ================================================================
+
+class UploadGate:
+    """
+    Global cap on concurrent uploads and on bytes in flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+        self.peak_in_flight = 0
+        self.peak_in_flight_bytes = 0
+        self.rejected = 0
+
+    def try_enter(self, size):
+        """
+        Reserve a slot for an upload of `size` bytes.
+
+        Returns:
+            True if the upload may proceed (call leave() afterwards)
+        """
+        with self._lock:
+            if (self.in_flight >= config.MAX_CONCURRENT_UPLOADS or
+                    self.in_flight_bytes + size > config.MAX_INFLIGHT_UPLOAD_BYTES):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.in_flight_bytes += size
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.peak_in_flight_bytes = max(self.peak_in_flight_bytes, self.in_flight_bytes)
+            return True
+
+    def leave(self, size):
+        """Release a reservation made by try_enter()."""
+        with self._lock:
+            self.in_flight -= 1
+            self.in_flight_bytes -= size
+
+
+_limiter = TokenBucketLimiter()
+_upload_gate = UploadGate()
+
+
+# ================================================================
+# SECTION 3: FLASK HOOKS
+# ================================================================
+
+def install_rate_limiter(app):
+    """
+    Register the rate limiting hooks on a Flask app.
+
+    Args:
+        app: Flask application
+    """
+    app.before_request(_check_request)
+    app.teardown_request(_release_upload)
+
+
+class CappedInput:
+    """
+    wsgi.input of a chunked upload: reading more than `limit` bytes
+    raises RequestEntityTooLarge (413) instead of returning them.
+    """
+
+    # Bytes per read when the whole body is asked for
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self._limit = limit
+        self._read = 0
+
+    def _count(self, data):
+        self._read += len(data)
+        if self._read > self._limit:
+            raise RequestEntityTooLarge()
+        return data
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = []
+            while True:
+                chunk = self.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+        # One byte past the limit is enough to know it is too large
+        return self._count(self._stream.read(min(size, self._limit + 1 - self._read)))
+
+    def readline(self, size=-1):
+        if size is None or size < 0:
+            size = self._limit + 1 - self._read
+        return self._count(self._stream.readline(min(size, self._limit + 1 - self._read)))
+
+
+def _route_key():
+    """'METHOD /rule' for the current request, e.g. 'GET /api/selfies'."""
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return f"{request.method} {rule}"
+
+
+def _too_many(message, retry_after):
+    """Build a 429 response in the API's standard error format."""
+    response = jsonify({"status": "error", "message": message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _check_request():
+    """before_request hook: apply the rate limit and the upload caps."""
+    if request.method == 'OPTIONS':
+        return None
+
+    route = _route_key()
+
+    if config.ENABLE_RATE_LIMITING and route not in config.RATE_LIMIT_EXEMPT:
+        per_minute = config.RATE_LIMIT_ROUTES.get(route, config.MAX_REQUESTS_PER_MINUTE)
+        burst = min(config.RATE_LIMIT_BURST, per_minute)
+        wait = _limiter.acquire((request.remote_addr, route), per_minute, burst)
+        if wait:
+            return _too_many("Too many requests, please slow down", wait)
+
+    if route in config.UPLOAD_ROUTES:
+        too_large = cap_request_body()
+        if too_large:
+            return too_large
+        # Chunked bodies have no Content-Length; assume the worst
+        size = request.content_length
+        if size is None:
+            size = config.MAX_UPLOAD_BYTES
+        if not _upload_gate.try_enter(size):
+            return _too_many("Server is busy with other uploads, please retry",
+                             UPLOAD_RETRY_AFTER)
+        g.kiosk_upload_reserved = size
+
+    return None
+
+
+def cap_request_body():
+    """
+    Hold the current request's body to MAX_UPLOAD_BYTES.
+
+    Call before the body is read. Applied to UPLOAD_ROUTES here,
+    and by routes that read a large body themselves (e.g. the
+    batch route in batch.py, before its sub-requests are checked).
+
+    Returns:
+        413 response if the Content-Length is over the cap, else
+        None (a chunked body then gets 413 once it reads past it)
+    """
+    if request.content_length is None:
+        # The body has not been read yet, so the route reads it
+        # through this cap
+        request.environ['wsgi.input'] = CappedInput(request.environ['wsgi.input'],
+                                                    config.MAX_UPLOAD_BYTES)
+        return None
+    if request.content_length > config.MAX_UPLOAD_BYTES:
+        response = jsonify({"status": "error", "message": "Upload is too large"})
+        response.status_code = 413
+        return response
+    return None
+
+
+def _release_upload(error=None):
+    """teardown_request hook: release the upload reservation, if any."""
+    size = g.pop('kiosk_upload_reserved', None)
+    if size is not None:
+        _upload_gate.leave(size)
+
+
+# ================================================================
+# SECTION 4: STATS
+# ================================================================
+
+def rate_limit_stats():
+    """
+    Current limiter state, for health checks and benchmarks.
+
+    Returns:
+        Dict with bucket count, upload slots/bytes in flight and
+        rejection counters
+    """
+    return {
+        "enabled": config.ENABLE_RATE_LIMITING,
+        "buckets": len(_limiter),
+        "rate_limited": _limiter.rejected,
+        "uploads_in_flight": _upload_gate.in_flight,
+        "upload_bytes_in_flight": _upload_gate.in_flight_bytes,
+        "peak_uploads_in_flight": _upload_gate.peak_in_flight,
+        "peak_upload_bytes_in_flight": _upload_gate.peak_in_flight_bytes,
+        "uploads_rejected": _upload_gate.rejected
+    }
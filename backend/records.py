@@ -0,0 +1,422 @@
+"""
+================================================================
+RECORDS.PY - TYPED RECORDS & FAST JSON ENCODING
+================================================================
+One class per kind of record the kiosk stores, plus the JSON
+encoder used for API responses and the data files.
+
+PURPOSE:
+- TempleVisit, Selfie, Miracle, Missionary and Event use
+  __slots__, so a record in memory is a fixed set of attributes
+  instead of a dict (a 100k-record collection takes 20-30% less
+  memory; see `python benchmark.py --scenarios records`)
+- validate() on each class checks a request body at the API
+  boundary and raises ValueError with a message for the caller
+- dumps() / loads() use orjson or msgspec when installed and the
+  standard json module otherwise, chosen by JSON_ENCODER in
+  config.py. Records can be passed to dumps() directly.
+
+Storage keeps exchanging plain dicts (the JSON files, Google Drive
+and replication all use them); from_dict() / to_dict() convert.
+Fields a record class does not know (e.g. 'uid' and 'version' from
+replication) are kept in `extra` and written back unchanged.
+
+USAGE:
+    from records import TempleVisit, dumps
+
+    try:
+        visit = TempleVisit.validate(request.get_json())
+    except ValueError as e:
+        return error_response(str(e))
+
+    visit = TempleVisit.from_dict(stored)
+    body = dumps([visit])       # bytes, compact
+    text = dumps(data, indent=True).decode('utf-8')
+================================================================
+"""
+
+import json
+from datetime import date, datetime
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+# Longest accepted text value (notes, captions, stories, ...)
+MAX_TEXT_LENGTH = 2000
+
+
+# ================================================================
+# SECTION 1: JSON ENCODING
+# ================================================================
+
+def encoder_name():
+    """
+    The JSON encoder in use: "orjson", "msgspec" or "stdlib".
+
+    A JSON_ENCODER that is not installed falls back to "stdlib".
+    """
+    choice = config.JSON_ENCODER
+    if choice in ("auto", "orjson") and orjson is not None:
+        return "orjson"
+    if choice in ("auto", "msgspec") and msgspec is not None:
+        return "msgspec"
+    return "stdlib"
+
+
+def _default(value):
+    """Encode values the JSON encoders do not know themselves."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(data, indent):
+    if indent:
+        text = json.dumps(data, indent=2, ensure_ascii=False, default=_default)
+    else:
+        text = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_default)
+    return text.encode('utf-8')
+
+
+def dumps(data, indent=False):
+    """
+    Encode data as UTF-8 JSON.
+
+    Args:
+        data: Dicts, lists, records and plain values
+        indent: True for a 2-space indented file layout
+
+    Returns:
+        The JSON document as bytes
+    """
+    encoder = encoder_name()
+    try:
+        if encoder == "orjson":
+            option = orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=_default, option=option)
+        if encoder == "msgspec":
+            encoded = msgspec.json.encode(data, enc_hook=_default)
+            return msgspec.json.format(encoded, indent=2) if indent else encoded
+    except (TypeError, OverflowError):
+        # e.g. integers beyond 64 bits; the standard encoder copes
+        pass
+    return _stdlib_dumps(data, indent)
+
+
+def loads(data):
+    """
+    Decode a JSON document (bytes or str).
+
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    encoder = encoder_name()
+    if encoder == "orjson":
+        return orjson.loads(data)
+    if encoder == "msgspec":
+        try:
+            return msgspec.json.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e))
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider using dumps() / loads() above, so jsonify()
+    and request.get_json() go through the fast encoder.
+
+    Like Flask's default provider, responses are indented in debug
+    mode and compact otherwise.
+    """
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps(obj, indent=self._app.debug) + b"\n"
+        return self._app.response_class(body, mimetype="application/json")
+
+
+def install_json_provider(app):
+    """Encode the app's JSON with the fast encoder (see SECTION 1)."""
+    app.json = FastJSONProvider(app)
+
+
+# ================================================================
+# SECTION 2: FIELD CHECKS
+# ================================================================
+# Shared by the validate() methods below and bulk_import.py. Each
+# takes a dict of strings (CSV) or JSON values and raises
+# ValueError with a message for the caller.
+
+def check_text(data, field, required=False):
+    """A stripped text field ('' if missing)."""
+    value = data.get(field)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"'{field}' is required")
+    if len(value) > MAX_TEXT_LENGTH:
+        raise ValueError(f"'{field}' is longer than {MAX_TEXT_LENGTH} characters")
+    return value
+
+
+def check_date(data, field, required=False):
+    """A YYYY-MM-DD date field ('' if missing and optional)."""
+    value = check_text(data, field, required)
+    if value:
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"'{field}' must be a date like 2024-01-15, got {value!r}")
+    return value
+
+
+def check_number(data, field, minimum, maximum):
+    """An optional number field within [minimum, maximum], or None."""
+    value = data.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a number, got {value!r}")
+    if not minimum <= number <= maximum:
+        raise ValueError(f"'{field}' must be between {minimum} and {maximum}")
+    return number
+
+
+def check_count(data, field, default=1):
+    """A whole number of at least 1 (default if missing)."""
+    value = data.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' must be a whole number, got {value!r}")
+    try:
+        value = int(str(value).strip())
+    except ValueError:
+        raise ValueError(f"'{field}' must be a whole number, got {value!r}")
+    if value < 1:
+        raise ValueError(f"'{field}' must be at least 1")
+    return value
+
+
+def _require_object(data):
+    """Reject request bodies that are not JSON objects."""
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    return data
+
+
+# ================================================================
+# SECTION 3: RECORD CLASSES
+# ================================================================
+
+class Record:
+    """
+    Base class: a fixed set of FIELDS stored in __slots__.
+
+    Fields that are None are left out of to_dict(), as are OPTIONAL
+    fields that are empty; unknown keys live in `extra`.
+    """
+
+    __slots__ = ('extra',)
+
+    FIELDS = ()
+    OPTIONAL = ()
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, values.pop(field, None))
+        self.extra = values or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a stored dict (no validation)."""
+        return cls(**data)
+
+    def to_dict(self):
+        """The record as a plain dict, ready for storage or JSON."""
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is None or (not value and field in self.OPTIONAL):
+                continue
+            data[field] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class TempleVisit(Record):
+    """A night (or trip) of temple attendance."""
+
+    __slots__ = FIELDS = ('id', 'date', 'count', 'notes', 'created_at')
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Check a temple visit request body or import row.
+
+        Fields: date (required, YYYY-MM-DD), count (whole number of
+        at least 1, default 1), notes.
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        data = _require_object(data)
+        return cls(date=check_date(data, 'date', required=True),
+                   count=check_count(data, 'count'),
+                   notes=check_text(data, 'notes'))
+
+
+class Selfie(Record):
+    """Metadata of a selfie; the image itself is in the blob store."""
+
+    __slots__ = FIELDS = ('id', 'blob', 'filename', 'caption', 'size', 'timestamp',
+                          'phash', 'near_duplicate_of')
+    OPTIONAL = ('blob', 'filename', 'phash', 'near_duplicate_of')
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Check a selfie upload body.
+
+        Fields: imageBase64 (required, base64 with or without a
+        data: prefix), caption.
+
+        Returns:
+            (image_base64, Selfie with the caption)
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        data = _require_object(data)
+        image = data.get('imageBase64')
+        if not image:
+            raise ValueError("'imageBase64' field is required")
+        if not isinstance(image, str):
+            raise ValueError("'imageBase64' must be a base64 string")
+        return image, cls(caption=check_text(data, 'caption'))
+
+
+class Miracle(Record):
+    """A story shared on the miracles board."""
+
+    __slots__ = FIELDS = ('id', 'title', 'story', 'author', 'created_at')
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Check a miracle request body.
+
+        Fields: story (required), title, author.
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        data = _require_object(data)
+        return cls(title=check_text(data, 'title'),
+                   story=check_text(data, 'story', required=True),
+                   author=check_text(data, 'author'))
+
+
+class Missionary(Record):
+    """A missionary from the ward and where they serve."""
+
+    # Optional text fields use the names of MISSIONARIES_LIST in
+    # config/config.js
+    __slots__ = FIELDS = ('id', 'name', 'mission', 'language', 'scripture', 'photoUrl',
+                          'galleryFolder', 'startDate', 'location', 'created_at')
+    OPTIONAL = ('language', 'scripture', 'photoUrl', 'galleryFolder', 'startDate', 'location')
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Check a missionary request body or import row.
+
+        Fields: name and mission (required), language, scripture,
+        photoUrl, galleryFolder, startDate (YYYY-MM-DD) and the
+        mission location as lat/lng (or a "location" object).
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        data = _require_object(data)
+        location = data.get('location') if isinstance(data.get('location'), dict) else data
+        lat = check_number(location, 'lat', -90, 90)
+        lng = check_number(location, 'lng', -180, 180)
+        if (lat is None) != (lng is None):
+            raise ValueError("'lat' and 'lng' must be given together")
+
+        return cls(name=check_text(data, 'name', required=True),
+                   mission=check_text(data, 'mission', required=True),
+                   language=check_text(data, 'language'),
+                   scripture=check_text(data, 'scripture'),
+                   photoUrl=check_text(data, 'photoUrl'),
+                   galleryFolder=check_text(data, 'galleryFolder'),
+                   startDate=check_date(data, 'startDate'),
+                   location={'lat': lat, 'lng': lng} if lat is not None else None)
+
+
+class Event(Record):
+    """An entry on the ward calendar."""
+
+    __slots__ = FIELDS = ('id', 'title', 'date', 'time', 'location', 'description',
+                          'created_at')
+    OPTIONAL = ('time', 'location', 'description')
+
+    @classmethod
+    def validate(cls, data):
+        """
+        Check a calendar event request body.
+
+        Fields: title and date (required, YYYY-MM-DD), time (HH:MM),
+        location, description.
+
+        Raises:
+            ValueError: If the data is invalid
+        """
+        data = _require_object(data)
+        time_of_day = check_text(data, 'time')
+        if time_of_day:
+            try:
+                datetime.strptime(time_of_day, "%H:%M")
+            except ValueError:
+                raise ValueError(f"'time' must be a time like 19:30, got {time_of_day!r}")
+        return cls(title=check_text(data, 'title', required=True),
+                   date=check_date(data, 'date', required=True),
+                   time=time_of_day,
+                   location=check_text(data, 'location'),
+                   description=check_text(data, 'description'))
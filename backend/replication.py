@@ -0,0 +1,608 @@
+"""
+================================================================
+REPLICATION.PY - MULTI-KIOSK REPLICATION
+================================================================
+This module lets several kiosks in one building share their
+selfies, temple visits and missionaries. Each kiosk keeps its own
+data/ folder and pulls the others' changes over the local network.
+
+PURPOSE:
+- Every record saved on this kiosk is appended to a change log
+  (REPLICATION_DIR/changes.jsonl), numbered 1, 2, 3, ...
+- GET /api/replication/changes?since=N serves the log in batches
+- A background task pulls each of REPLICATION_PEERS from where it
+  left off, merges the new records into storage, and appends them
+  to its own log, so they travel on to kiosks that pull from it
+- Selfie images are not copied with the records. They are fetched
+  by hash from a peer the first time they are needed
+  (fetch_blob, used by GET /api/selfies/<id>/image)
+
+IDENTITY & MERGING:
+Each kiosk has a node id (REPLICATION_NODE_ID, or a random one
+kept in state.json). A record is named everywhere by its uid,
+"<node>:<id on that node>@<creation time>" (unique within its
+collection even if the id is reused), and gets its own local id
+on each kiosk. Logs written before the creation time was added
+hold "<node>:<id>" uids; those records keep them. Every change carries a
+version "<UTC time>|<node>"; when two versions of one uid meet,
+the later one wins (last writer wins), with the node id breaking
+ties, so all kiosks settle on the same copy whatever order
+changes arrive in. Records are never deleted
+by replication; each kiosk archives old selfies on its own.
+
+Every change also keeps its origin node and its number in the
+origin's log. A kiosk remembers the highest number applied per
+origin, so a change that arrives twice (through two peers, or
+after a retried pull) is applied once.
+
+TOPOLOGIES:
+    Peers:  every kiosk lists every other kiosk
+    Hub:    kiosks list the hub; the hub lists every kiosk
+
+TRYING IT LOCALLY:
+    mkdir -p /tmp/k1 /tmp/k2 && cd /tmp/k1
+    KIOSK_API_PORT=5001 KIOSK_REPLICATION_ENABLED=true \\
+      KIOSK_REPLICATION_PEERS=http://localhost:5002 python /path/to/backend/app.py
+    (and the same in /tmp/k2 with the ports swapped)
+
+USAGE:
+    from replication import record_local_changes, start_replication_worker
+
+    storage.add_change_listener(record_local_changes)
+    start_replication_worker(lambda: storage)
+================================================================
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from config import REPLICATION_DIR
+from resource_watchdog import background_paused
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+# Collections that replicate
+REPLICATED_COLLECTIONS = ("selfies", "temple_visits", "missionaries")
+
+# Field holding the creation time of each replicated record
+CREATED_FIELDS = {"selfies": "timestamp", "temple_visits": "created_at",
+                  "missionaries": "created_at"}
+
+# Fields that only mean something on the kiosk that holds the record
+LOCAL_FIELDS = ("id", "filename", "duplicate", "near_duplicate_of",
+                "uid", "version", "origin")
+
+# Header carrying REPLICATION_SHARED_KEY
+KEY_HEADER = "X-Replication-Key"
+
+# Seconds before asking peers again for an image none of them had
+MISSING_BLOB_RETRY_SECONDS = 60
+
+# Header counting how many kiosks an image request has passed
+# through. A kiosk asked for an image it lacks asks its own peers
+# (so images cross a hub) until MAX_BLOB_HOPS, which also stops
+# two kiosks asking each other forever.
+HOPS_HEADER = "X-Replication-Hops"
+MAX_BLOB_HOPS = 2
+
+_lock = threading.RLock()
+_sync_lock = threading.Lock()
+_change_log = None
+_state = None
+_scanned_versions = {}
+_missing_blobs = {}
+_blob_locks = {}
+_worker = None
+
+
+# ================================================================
+# SECTION 1: CHANGE LOG
+# ================================================================
+
+class ChangeLog:
+    """
+    Append-only JSON Lines file of changes, numbered from 1.
+
+    Each line: {"seq", "origin", "origin_seq", "collection", "uid",
+    "version", "record"}. The byte offset of every line is kept in
+    memory, so reading from any point is one seek.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = []
+        self.applied = {}
+        # (collection, uid) of every change made on this kiosk
+        self.local_uids = set()
+        self._load()
+
+    def _load(self):
+        """Index the existing file (dropping a half-written last line)."""
+        if not os.path.exists(self.path):
+            return
+        position = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.offsets.append(position)
+                self._remember(entry)
+                position += len(line)
+        if position != os.path.getsize(self.path):
+            print(f"[Replication] Dropping incomplete end of {self.path}")
+            with open(self.path, 'r+b') as f:
+                f.truncate(position)
+
+    def _remember(self, entry):
+        """Update the per-origin high-water marks for one entry."""
+        origin = entry["origin"]
+        if entry["origin_seq"] > self.applied.get(origin, 0):
+            self.applied[origin] = entry["origin_seq"]
+        if origin == node_id():
+            uid = entry["uid"]
+            if "@" not in uid:
+                # Logged before uids had a creation time
+                uid = _local_uid(origin, entry["collection"], uid.rsplit(":", 1)[1],
+                                 entry["record"])
+            self.local_uids.add((entry["collection"], uid))
+
+    @property
+    def latest(self):
+        """Number of the last change (0 when empty)."""
+        return len(self.offsets)
+
+    def append(self, entries):
+        """
+        Add changes to the end of the log.
+
+        Args:
+            entries: Change dicts without "seq" (a local change
+                     without "origin_seq" gets its own seq)
+
+        Returns:
+            The entries as written
+        """
+        if not entries:
+            return []
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        written = []
+        with open(self.path, 'ab') as f:
+            position = f.tell()
+            for entry in entries:
+                entry = dict(entry, seq=self.latest + 1)
+                entry.setdefault("origin_seq", entry["seq"])
+                line = (json.dumps(entry, separators=(",", ":"), ensure_ascii=False) +
+                        "\n").encode("utf-8")
+                f.write(line)
+                self.offsets.append(position)
+                self._remember(entry)
+                position += len(line)
+                written.append(entry)
+        return written
+
+    def read(self, since, limit):
+        """
+        Changes after number `since`, at most `limit` of them.
+
+        Returns:
+            List of change dicts, oldest first
+        """
+        if since >= self.latest:
+            return []
+        count = min(limit, self.latest - since)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[since])
+            return [json.loads(f.readline()) for _ in range(count)]
+
+
+def _get_log():
+    """The change log, loaded on first use."""
+    global _change_log
+    with _lock:
+        if _change_log is None:
+            _change_log = ChangeLog(os.path.join(REPLICATION_DIR, "changes.jsonl"))
+        return _change_log
+
+
+# ================================================================
+# SECTION 2: NODE STATE
+# ================================================================
+# state.json: {"node_id": "...", "peers": {url: {"node", "cursor"}}}
+
+def _state_path():
+    return os.path.join(REPLICATION_DIR, "state.json")
+
+
+def _get_state():
+    """Node id and pull positions, loaded on first use."""
+    global _state
+    with _lock:
+        if _state is None:
+            _state = {"node_id": None, "peers": {}}
+            try:
+                with open(_state_path(), 'r', encoding='utf-8') as f:
+                    _state.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+            if not _state["node_id"]:
+                _state["node_id"] = config.REPLICATION_NODE_ID or uuid.uuid4().hex[:12]
+                _save_state()
+        return _state
+
+
+def _save_state():
+    """Write state.json (temp file + rename, like storage does)."""
+    os.makedirs(REPLICATION_DIR, exist_ok=True)
+    temp_path = _state_path() + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"node_id": _state["node_id"],
+                   "peers": {url: {"node": peer.get("node"), "cursor": peer.get("cursor", 0)}
+                             for url, peer in _state["peers"].items()}}, f, indent=2)
+    os.replace(temp_path, _state_path())
+
+
+def node_id():
+    """
+    This kiosk's node id.
+
+    REPLICATION_NODE_ID if set, else the id chosen on first start.
+    Changing it once records have replicated makes other kiosks
+    see this kiosk's records as new ones.
+    """
+    if config.REPLICATION_NODE_ID:
+        return config.REPLICATION_NODE_ID
+    return _get_state()["node_id"]
+
+
+def _new_version():
+    """A version stamp that sorts by time across kiosks."""
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return f"{now}|{node_id()}"
+
+
+# ================================================================
+# SECTION 3: RECORDING LOCAL CHANGES
+# ================================================================
+
+def _local_uid(node, collection, local_id, record):
+    """
+    uid of a record made on this kiosk.
+
+    The local id alone can come back (a selfie archived here, or
+    ids from before archiving counted the archive); with the
+    record's creation time it cannot.
+    """
+    return f"{node}:{local_id}@{record.get(CREATED_FIELDS[collection], '')}"
+
+
+def _local_entries(collection, records, log):
+    """Change entries for records saved on this kiosk (not yet logged)."""
+    node = node_id()
+    entries = []
+    for record in records:
+        if record.get('uid') or record.get('id') is None:
+            continue
+        uid = _local_uid(node, collection, record['id'], record)
+        if (collection, uid) in log.local_uids:
+            continue
+        entries.append({
+            "origin": node,
+            "collection": collection,
+            "uid": uid,
+            "version": record.get('version') or _new_version(),
+            "record": {key: value for key, value in record.items() if key not in LOCAL_FIELDS}
+        })
+    return entries
+
+
+def record_local_changes(collection, records):
+    """
+    Storage change listener: log records saved on this kiosk.
+
+    Does nothing while replication is off; catch_up_local() logs
+    anything saved meanwhile once it is turned on.
+
+    Args:
+        collection: Collection name
+        records: The saved records
+    """
+    if not config.REPLICATION_ENABLED or collection not in REPLICATED_COLLECTIONS:
+        return
+    with _lock:
+        log = _get_log()
+        log.append(_local_entries(collection, records, log))
+
+
+def catch_up_local(storage):
+    """
+    Log local records that are missing from the change log.
+
+    Covers records saved while replication was off, before this
+    module existed, or just before a crash. A collection whose
+    file has not changed since the last look is skipped.
+
+    Args:
+        storage: Storage backend
+
+    Returns:
+        Number of records logged
+    """
+    logged = 0
+    for collection in REPLICATED_COLLECTIONS:
+        version = storage.collection_version(collection)
+        if version is not None and _scanned_versions.get(collection) == version:
+            continue
+        records = storage.list_collection(collection)
+        with _lock:
+            log = _get_log()
+            logged += len(log.append(_local_entries(collection, records, log)))
+        _scanned_versions[collection] = version
+    if logged:
+        print(f"[Replication] Logged {logged} earlier local records")
+    return logged
+
+
+# ================================================================
+# SECTION 4: APPLYING CHANGES FROM PEERS
+# ================================================================
+
+def apply_changes(storage, changes):
+    """
+    Merge a batch of changes from a peer and relay them onward.
+
+    Changes from this kiosk, already-applied changes and unknown
+    collections are skipped. The records are merged one storage
+    write per collection, then the changes are appended to this
+    kiosk's log.
+
+    Args:
+        storage: Storage backend
+        changes: Change dicts as served by /api/replication/changes
+
+    Returns:
+        Number of changes applied
+
+    Raises:
+        OSError: If storage could not be written (nothing is logged,
+                 so the batch is pulled again)
+    """
+    node = node_id()
+    with _lock:
+        log = _get_log()
+        fresh = [change for change in changes
+                 if change.get("origin") != node and
+                 change.get("collection") in REPLICATED_COLLECTIONS and
+                 change.get("origin_seq", 0) > log.applied.get(change.get("origin"), 0)]
+        if not fresh:
+            return 0
+
+        for collection in REPLICATED_COLLECTIONS:
+            records = [dict(change["record"], uid=change["uid"], version=change["version"],
+                            origin=change["origin"])
+                       for change in fresh if change["collection"] == collection]
+            if records and storage.apply_replicated(collection, records) is None:
+                raise OSError(f"Could not write replicated {collection}")
+
+        log.append([{key: change[key] for key in
+                     ("origin", "origin_seq", "collection", "uid", "version", "record")}
+                    for change in fresh])
+    return len(fresh)
+
+
+# ================================================================
+# SECTION 5: PULLING FROM PEERS
+# ================================================================
+
+def _request(url, hops=0):
+    """GET a peer URL with the shared key; returns the open response."""
+    headers = {"X-Replication-Node": node_id(), HOPS_HEADER: str(hops)}
+    if config.REPLICATION_SHARED_KEY:
+        headers[KEY_HEADER] = config.REPLICATION_SHARED_KEY
+    return urllib.request.urlopen(urllib.request.Request(url, headers=headers),
+                                  timeout=config.REPLICATION_TIMEOUT_SECONDS)
+
+
+def pull_from_peer(storage, peer_url):
+    """
+    Pull and apply everything new from one peer.
+
+    Args:
+        storage: Storage backend
+        peer_url: Peer base URL, e.g. "http://192.168.1.21:5000"
+
+    Returns:
+        Number of changes applied
+
+    Raises:
+        OSError / ValueError: If the peer cannot be reached or
+                              answers nonsense (progress so far is kept)
+    """
+    with _lock:
+        peer = _get_state()["peers"].setdefault(peer_url, {"node": None, "cursor": 0})
+    applied = 0
+
+    while True:
+        url = (f"{peer_url.rstrip('/')}/api/replication/changes"
+               f"?since={peer['cursor']}&limit={config.REPLICATION_BATCH_SIZE}")
+        with _request(url) as response:
+            data = json.load(response)["data"]
+
+        if data["node"] == node_id():
+            raise ValueError(f"{peer_url} is this kiosk")
+        if data["node"] != peer["node"] or data["latest"] < peer["cursor"]:
+            # A different kiosk, or its log was reset: start over
+            # (changes already applied are skipped)
+            restart = peer["cursor"] > 0
+            peer.update(node=data["node"], cursor=0)
+            if restart:
+                print(f"[Replication] {peer_url} changed identity, re-reading its log")
+                continue
+
+        changes = data["changes"]
+        if not changes:
+            break
+        applied += apply_changes(storage, changes)
+        with _lock:
+            peer["cursor"] = changes[-1]["seq"]
+            _save_state()
+        if peer["cursor"] >= data["latest"]:
+            break
+
+    return applied
+
+
+def run_sync_pass(storage):
+    """
+    Log any unlogged local records, then pull from every peer.
+
+    Args:
+        storage: Storage backend
+
+    Returns:
+        Dict of peer URL -> {"applied": n} or {"error": message}
+    """
+    with _sync_lock:
+        catch_up_local(storage)
+        results = {}
+        for peer_url in config.REPLICATION_PEERS:
+            peer = _get_state()["peers"].setdefault(peer_url, {"node": None, "cursor": 0})
+            try:
+                applied = pull_from_peer(storage, peer_url)
+                results[peer_url] = {"applied": applied}
+                peer.update(last_pull=datetime.now().isoformat(), last_error=None,
+                            pulled_total=peer.get("pulled_total", 0) + applied)
+                if applied:
+                    print(f"[Replication] Applied {applied} changes from {peer_url}")
+            except (OSError, ValueError, KeyError) as e:
+                results[peer_url] = {"error": str(e)}
+                peer["last_error"] = str(e)
+                print(f"[Replication] Pull from {peer_url} failed: {e}")
+        return results
+
+
+def start_replication_worker(get_storage):
+    """
+    Start the background puller (once per process).
+
+    It runs every REPLICATION_INTERVAL_SECONDS and does nothing
+    while REPLICATION_ENABLED is off or the resource watchdog has
+    paused background jobs.
+
+    Args:
+        get_storage: Function returning the storage backend
+    """
+    global _worker
+    if _worker is not None:
+        return
+
+    def run():
+        while True:
+            if config.REPLICATION_ENABLED and not background_paused():
+                try:
+                    run_sync_pass(get_storage())
+                except Exception as e:
+                    print(f"[Replication] Pass failed: {e}")
+            time.sleep(config.REPLICATION_INTERVAL_SECONDS)
+
+    _worker = threading.Thread(target=run, daemon=True, name="replication")
+    _worker.start()
+
+
+# ================================================================
+# SECTION 6: LAZY IMAGE FETCH
+# ================================================================
+
+def fetch_blob(storage, blob_hash, hops=0):
+    """
+    Get an image that arrived by replication from whichever peer
+    has it, if it is not already stored here.
+
+    Args:
+        storage: Storage backend (LocalStorage)
+        blob_hash: Blob hash from the selfie record
+        hops: HOPS_HEADER of the request asking for it (0 when
+              this kiosk needs the image itself)
+
+    Returns:
+        Local file path, or None if no peer could supply it
+    """
+    if storage.blobs.exists(blob_hash):
+        return storage.blobs.path(blob_hash)
+    if not config.REPLICATION_ENABLED or hops >= MAX_BLOB_HOPS:
+        return None
+
+    with _lock:
+        if time.time() - _missing_blobs.get(blob_hash, 0) < MISSING_BLOB_RETRY_SECONDS:
+            return None
+        blob_lock = _blob_locks.setdefault(blob_hash, threading.Lock())
+
+    # One download per image, however many requests want it
+    with blob_lock:
+        if not storage.blobs.exists(blob_hash):
+            for peer_url in config.REPLICATION_PEERS:
+                try:
+                    url = f"{peer_url.rstrip('/')}/api/replication/blobs/{blob_hash}"
+                    with _request(url, hops + 1) as response:
+                        storage.blobs.put_stream(response, expected_hash=blob_hash)
+                    print(f"[Replication] Fetched image {blob_hash[:12]} from {peer_url}")
+                    break
+                except (OSError, ValueError) as e:
+                    print(f"[Replication] {peer_url} could not supply {blob_hash[:12]}: {e}")
+
+    with _lock:
+        _blob_locks.pop(blob_hash, None)
+        if not storage.blobs.exists(blob_hash):
+            _missing_blobs[blob_hash] = time.time()
+            return None
+        _missing_blobs.pop(blob_hash, None)
+    return storage.blobs.path(blob_hash)
+
+
+# ================================================================
+# SECTION 7: SERVING PEERS
+# ================================================================
+
+def read_changes(since, limit):
+    """
+    A page of this kiosk's change log, for GET /api/replication/changes.
+
+    Returns:
+        Dict with node, latest and changes
+    """
+    with _lock:
+        log = _get_log()
+        return {"node": node_id(), "latest": log.latest, "changes": log.read(since, limit)}
+
+
+def replication_status():
+    """
+    Replication state (for /api/health and /api/replication/status).
+
+    Returns:
+        Dict with enabled, node, latest (last change number),
+        applied (highest change applied per origin) and peers
+        (URL -> node, cursor, last_pull, last_error, pulled_total)
+    """
+    if not config.REPLICATION_ENABLED:
+        return {"enabled": False}
+    with _lock:
+        log = _get_log()
+        state = _get_state()
+        return {
+            "enabled": True,
+            "node": node_id(),
+            "latest": log.latest,
+            "applied": dict(log.applied),
+            "peers": {url: dict(state["peers"].get(url, {}))
+                      for url in config.REPLICATION_PEERS}
+        }
@@ -0,0 +1,491 @@
+"""
+================================================================
+RESOURCE_WATCHDOG.PY - RESOURCE WATCHDOG
+================================================================
+This module notices a kiosk slowly running out of something (memory,
+disk, file handles, a fast disk, idle threads) before it stalls,
+and reports it through GET /api/health?deep=1.
+
+PURPOSE:
+- A background task samples the server every
+  WATCHDOG_INTERVAL_SECONDS; each check is "ok", "warn" or
+  "critical" against the WATCHDOG_* limits in config.py
+- The report's status is the worst of its checks; /api/health
+  answers 503 while it is critical
+- Mitigations (WATCHDOG_MITIGATIONS): in-memory caches are dropped
+  when memory is high, and background jobs pause while something
+  else is critical (they resume once nothing is)
+
+CHECKS:
+    memory            Resident memory of the process (RSS)
+    file_descriptors  Open files and sockets vs the process limit
+    disk              Free space on the disk holding DATA_DIR
+    storage_latency   Write + fsync + read of a small file in DATA_DIR
+    data_files        Collection files that no longer parse
+    queues            Work waiting in registered background queues
+    threads           Thread count; tasks waiting for a pool thread
+    event_loop        Delay of the ASGI event loop (asgi.py only)
+
+Memory and file descriptors use psutil when installed, /proc on
+Linux otherwise, and report "unknown" where neither is available.
+
+REGISTERING:
+What to watch is handed in by its owner (batch.py and asgi.py
+their thread pools, asgi.py its event loop, app.py the caches and
+the retention backlog), so the watchdog imports none of them:
+    watch_queue("selfie_retention", lambda: pending_count)
+    watch_pool("batch", executor)
+    watch_event_loop(asyncio.get_running_loop())
+    watch_cache("gallery manifests", clear_gallery_cache)
+Background jobs check background_paused() before each pass.
+
+USAGE:
+    from resource_watchdog import start_watchdog, watchdog_report
+
+    start_watchdog(lambda: storage)       # in the background
+    report = watchdog_report(storage)     # {"status", "checks", ...}
+================================================================
+"""
+
+import gc
+import os
+import time
+import shutil
+import threading
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+# Severity of each level, for picking the worst
+LEVELS = {"unknown": 0, "ok": 0, "warn": 1, "critical": 2}
+
+# Critical checks that pause background jobs (data_files and queues
+# do not: pausing would not fix them, and a paused job's own queue
+# would never drain)
+PAUSE_ON = ("memory", "file_descriptors", "disk", "storage_latency", "threads", "event_loop")
+
+# Least time between two cache shrinks while memory stays high
+CACHE_SHRINK_COOLDOWN_SECONDS = 300
+
+# Bytes written by the storage latency probe
+PROBE_BYTES = 4096
+
+# Mitigations kept in the report
+MITIGATION_HISTORY = 20
+
+_queues = {}
+_pools = {}
+_caches = {}
+_loop = None
+_registry_lock = threading.Lock()
+
+# Set while background jobs are paused
+_paused = threading.Event()
+
+# Collection name -> (version, error or None) from the last check
+_data_files = {}
+
+_status = {
+    "last_report": None,
+    "last_shrink": 0.0,
+    "mitigations": []
+}
+_worker = None
+_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: REGISTERING WHAT TO WATCH
+# ================================================================
+
+def watch_queue(name, depth):
+    """
+    Report a background queue's length under "queues".
+
+    Args:
+        name: Name shown in the report
+        depth: Function returning the number of waiting items
+    """
+    with _registry_lock:
+        _queues[name] = depth
+
+
+def watch_pool(name, executor):
+    """Report a ThreadPoolExecutor's threads and waiting tasks under "threads"."""
+    with _registry_lock:
+        _pools[name] = executor
+
+
+def watch_event_loop(loop):
+    """Measure how late an asyncio event loop runs callbacks."""
+    global _loop
+    _loop = loop
+
+
+def watch_cache(name, clear):
+    """
+    Let the watchdog drop an in-memory cache when memory is high.
+
+    Args:
+        name: Name shown in the mitigation log
+        clear: Function emptying the cache (it must refill itself
+               on demand)
+    """
+    with _registry_lock:
+        _caches[name] = clear
+
+
+def background_paused():
+    """True while the watchdog has paused background jobs."""
+    return _paused.is_set()
+
+
+# ================================================================
+# SECTION 2: SAMPLES
+# ================================================================
+
+def _level(value, warn, critical, low_is_bad=False):
+    """The level of a value against its limits ("unknown" if None)."""
+    if value is None:
+        return "unknown"
+    if low_is_bad:
+        return "critical" if value <= critical else "warn" if value <= warn else "ok"
+    return "critical" if value >= critical else "warn" if value >= warn else "ok"
+
+
+def _rss_bytes():
+    """Resident memory of this process, or None if unknown."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _open_fds():
+    """Tuple of (open files and sockets, soft limit); None where unknown."""
+    count = None
+    if psutil is not None:
+        process = psutil.Process()
+        count = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+    else:
+        try:
+            count = len(os.listdir("/proc/self/fd"))
+        except OSError:
+            pass
+
+    limit = None
+    if resource is not None:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            limit = soft
+    return count, limit
+
+
+def check_memory():
+    rss = _rss_bytes()
+    rss_mb = round(rss / (1024 * 1024), 1) if rss is not None else None
+    return {"level": _level(rss_mb, config.WATCHDOG_RSS_WARN_MB, config.WATCHDOG_RSS_CRITICAL_MB),
+            "rss_mb": rss_mb}
+
+
+def check_file_descriptors():
+    count, limit = _open_fds()
+    percent = round(100.0 * count / limit, 1) if count is not None and limit else None
+    return {"level": _level(percent, config.WATCHDOG_FDS_WARN_PERCENT,
+                            config.WATCHDOG_FDS_CRITICAL_PERCENT),
+            "open": count, "limit": limit, "percent": percent}
+
+
+def check_disk():
+    path = config.DATA_DIR if os.path.isdir(config.DATA_DIR) else "."
+    usage = shutil.disk_usage(path)
+    free_mb = round(usage.free / (1024 * 1024), 1)
+    return {"level": _level(free_mb, config.WATCHDOG_DISK_WARN_MB,
+                            config.WATCHDOG_DISK_CRITICAL_MB, low_is_bad=True),
+            "free_mb": free_mb, "total_mb": round(usage.total / (1024 * 1024), 1),
+            "path": os.path.abspath(path)}
+
+
+def check_storage_latency():
+    """
+    Time writing, syncing and reading back a small file in DATA_DIR,
+    the same path every JSON save takes. A write that fails (disk
+    full, read-only card) is critical.
+    """
+    probe = os.path.join(config.DATA_DIR, ".watchdog_probe")
+    started = time.perf_counter()
+    try:
+        os.makedirs(config.DATA_DIR, exist_ok=True)
+        with open(probe, 'wb') as f:
+            f.write(os.urandom(PROBE_BYTES))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(probe, 'rb') as f:
+            f.read()
+        os.remove(probe)
+    except OSError as e:
+        return {"level": "critical", "ms": None, "error": str(e)}
+    ms = round((time.perf_counter() - started) * 1000, 2)
+    return {"level": _level(ms, config.WATCHDOG_STORAGE_WARN_MS, config.WATCHDOG_STORAGE_CRITICAL_MS),
+            "ms": ms}
+
+
+def check_data_files(storage):
+    """
+    Collections whose file no longer parses. A file is only parsed
+    again after it changed (collection_version()).
+    """
+    if storage is None:
+        return {"level": "unknown", "corrupt": {}}
+
+    corrupt = {}
+    for name in storage.list_collections():
+        version = storage.collection_version(name)
+        seen = _data_files.get(name)
+        if seen and seen[0] == version and version is not None:
+            error = seen[1]
+        else:
+            error = storage.check_collection(name)
+            _data_files[name] = (version, error)
+        if error:
+            corrupt[name] = error
+    return {"level": "critical" if corrupt else "ok", "corrupt": corrupt}
+
+
+def check_queues():
+    with _registry_lock:
+        queues = dict(_queues)
+
+    depths = {}
+    for name, depth in queues.items():
+        try:
+            depths[name] = depth()
+        except Exception as e:
+            print(f"[Watchdog] Queue {name} not readable: {e}")
+    deepest = max((d for d in depths.values() if d is not None), default=0)
+    return {"level": _level(deepest, config.WATCHDOG_QUEUE_WARN, config.WATCHDOG_QUEUE_CRITICAL),
+            "depths": depths}
+
+
+def check_threads():
+    """
+    Thread count, and each pool's threads and waiting tasks; a pool
+    with tasks waiting has every thread busy.
+    """
+    with _registry_lock:
+        pools = dict(_pools)
+
+    # ThreadPoolExecutor has no public counters; these attributes
+    # have been stable since Python 3.2
+    details = {}
+    for name, executor in pools.items():
+        details[name] = {
+            "threads": len(executor._threads),
+            "max_workers": executor._max_workers,
+            "waiting": executor._work_queue.qsize()
+        }
+    waiting = max((pool["waiting"] for pool in details.values()), default=0)
+    return {"level": _level(waiting, config.WATCHDOG_QUEUE_WARN, config.WATCHDOG_QUEUE_CRITICAL),
+            "count": threading.active_count(), "pools": details}
+
+
+def check_event_loop():
+    """
+    Delay between scheduling a callback on the event loop from this
+    thread and the loop running it. Gives up at twice the critical
+    limit (and reports that as the lag).
+    """
+    loop = _loop
+    if loop is None or loop.is_closed():
+        return None
+
+    ran = threading.Event()
+    started = time.perf_counter()
+    try:
+        loop.call_soon_threadsafe(ran.set)
+    except RuntimeError:
+        return None
+    timeout = 2 * config.WATCHDOG_LOOP_LAG_CRITICAL_MS / 1000
+    ran.wait(timeout)
+    lag_ms = round(min(time.perf_counter() - started, timeout) * 1000, 2)
+    return {"level": _level(lag_ms, config.WATCHDOG_LOOP_LAG_WARN_MS,
+                            config.WATCHDOG_LOOP_LAG_CRITICAL_MS),
+            "lag_ms": lag_ms}
+
+
+def sample(storage=None):
+    """
+    Run every check once.
+
+    Args:
+        storage: Storage backend for data_files (None skips it)
+
+    Returns:
+        Dict with status (worst level), sampled_at, checks (name ->
+        dict with level and values), paused and mitigations
+    """
+    checks = {}
+    for name, check in (("memory", check_memory),
+                        ("file_descriptors", check_file_descriptors),
+                        ("disk", check_disk),
+                        ("storage_latency", check_storage_latency),
+                        ("data_files", lambda: check_data_files(storage)),
+                        ("queues", check_queues),
+                        ("threads", check_threads),
+                        ("event_loop", check_event_loop)):
+        try:
+            result = check()
+        except Exception as e:
+            result = {"level": "unknown", "error": str(e)}
+        if result is not None:
+            checks[name] = result
+
+    worst = max((c["level"] for c in checks.values()), key=LEVELS.get, default="ok")
+    return {
+        "status": "ok" if worst == "unknown" else worst,
+        "sampled_at": datetime.now().isoformat(),
+        "checks": checks
+    }
+
+
+# ================================================================
+# SECTION 3: MITIGATIONS
+# ================================================================
+
+def _record(action, reason):
+    print(f"[Watchdog] {action} ({reason})")
+    with _lock:
+        history = _status["mitigations"]
+        history.append({"at": datetime.now().isoformat(), "action": action, "reason": reason})
+        del history[:-MITIGATION_HISTORY]
+
+
+def shrink_caches():
+    """
+    Empty every registered cache and collect garbage.
+
+    Returns:
+        Names of the caches emptied
+    """
+    with _registry_lock:
+        caches = dict(_caches)
+    cleared = []
+    for name, clear in caches.items():
+        try:
+            clear()
+            cleared.append(name)
+        except Exception as e:
+            print(f"[Watchdog] Could not clear {name}: {e}")
+    gc.collect()
+    return cleared
+
+
+def mitigate(report):
+    """
+    Act on a report: shrink caches when memory is at warn or worse,
+    pause background jobs while a PAUSE_ON check is critical and
+    resume them once none is.
+    """
+    checks = report["checks"]
+    memory = checks.get("memory", {})
+    now = time.time()
+    if LEVELS[memory.get("level", "ok")] >= LEVELS["warn"] and \
+            now - _status["last_shrink"] >= CACHE_SHRINK_COOLDOWN_SECONDS:
+        _status["last_shrink"] = now
+        cleared = shrink_caches()
+        _record(f"Dropped caches: {', '.join(cleared) or 'none registered'}",
+                f"memory {memory.get('rss_mb')} MB")
+
+    critical = [name for name in PAUSE_ON if checks.get(name, {}).get("level") == "critical"]
+    if critical and not _paused.is_set():
+        _paused.set()
+        _record("Paused background jobs", f"critical: {', '.join(critical)}")
+    elif not critical and _paused.is_set():
+        _paused.clear()
+        _record("Resumed background jobs", "nothing critical")
+
+
+# ================================================================
+# SECTION 4: REPORT & BACKGROUND TASK
+# ================================================================
+
+def _take_sample(storage):
+    report = sample(storage)
+    if config.WATCHDOG_MITIGATIONS:
+        mitigate(report)
+    elif _paused.is_set():
+        _paused.clear()
+    with _lock:
+        _status["last_report"] = report
+    return report
+
+
+def watchdog_report(storage=None):
+    """
+    The latest sample (for /api/health?deep=1), taken now when the
+    background task is not running or has fallen behind.
+
+    Args:
+        storage: Storage backend, used if a sample is taken now
+
+    Returns:
+        Dict from sample() plus paused, mitigations (latest last)
+        and interval_seconds
+    """
+    with _lock:
+        report = _status["last_report"]
+    stale_after = 2 * config.WATCHDOG_INTERVAL_SECONDS
+    if report is None or not config.WATCHDOG_ENABLED or \
+            (datetime.now() - datetime.fromisoformat(report["sampled_at"])).total_seconds() > stale_after:
+        report = _take_sample(storage)
+
+    with _lock:
+        return dict(report, paused=_paused.is_set(),
+                    mitigations=list(_status["mitigations"]),
+                    interval_seconds=config.WATCHDOG_INTERVAL_SECONDS)
+
+
+def start_watchdog(get_storage):
+    """
+    Start the background sampler (once per process).
+
+    It samples every WATCHDOG_INTERVAL_SECONDS and does nothing
+    while WATCHDOG_ENABLED is off.
+
+    Args:
+        get_storage: Function returning the storage backend
+    """
+    global _worker
+    if _worker is not None:
+        return
+
+    def run():
+        last_status = "ok"
+        while True:
+            if config.WATCHDOG_ENABLED:
+                try:
+                    report = _take_sample(get_storage())
+                    if report["status"] != last_status:
+                        print(f"[Watchdog] Status {last_status} -> {report['status']}")
+                        last_status = report["status"]
+                except Exception as e:
+                    print(f"[Watchdog] Sample failed: {e}")
+            time.sleep(config.WATCHDOG_INTERVAL_SECONDS)
+
+    _worker = threading.Thread(target=run, daemon=True, name="watchdog")
+    _worker.start()
@@ -0,0 +1,253 @@
+"""
+================================================================
+RETENTION.PY - SELFIE RETENTION & ARCHIVAL
+================================================================
+This module keeps the active selfie list small, however long the
+kiosk has been running, by moving old selfies into an archive.
+
+PURPOSE:
+- Selfies older than SELFIE_RETENTION_DAYS are archived
+- If the active selfies' images use more than
+  SELFIE_ACTIVE_BUDGET_MB, the oldest are archived early until
+  they fit
+- An archived selfie keeps a thumbnail and a recompressed copy
+  in the blob store (both JPEG, SELFIE_ARCHIVE_* sizes); the
+  full-size original is gzipped into the cold folder, or deleted
+  if SELFIE_ARCHIVE_KEEP_ORIGINALS is off
+
+TIERS:
+    active    selfies/metadata.json    original image
+    archive   selfie_archive/index.json  thumbnail + copy (hot),
+                                         original gzipped (cold)
+
+BACKGROUND TASK:
+start_retention_worker() runs a pass every
+SELFIE_RETENTION_INTERVAL_SECONDS. Each pass archives at most
+SELFIE_RETENTION_BATCH selfies, so it never holds the storage lock
+for long; while more are due, passes follow each other a second
+apart. Settings are re-read every pass (they are hot-reloadable).
+Passes are skipped while the resource watchdog (resource_watchdog.py)
+has paused background jobs.
+
+Without Pillow no copies can be made: selfies still move to the
+archive index, but their original stays the hot image.
+
+USAGE:
+    from retention import run_retention_pass, start_retention_worker
+
+    run_retention_pass(storage)                 # one step, now
+    start_retention_worker(lambda: storage)     # in the background
+================================================================
+"""
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta
+from imaging import jpeg_copies
+from resource_watchdog import background_paused
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+
+# Seconds between passes while selfies are still due
+BUSY_INTERVAL_SECONDS = 1.0
+
+_status = {
+    "last_run": None,
+    "last_archived": 0,
+    "archived_total": 0,
+    "pending": None,
+    "active_count": None,
+    "active_bytes": None,
+    "budget_bytes": None,
+    "last_error": None
+}
+_worker = None
+_lock = threading.Lock()
+
+
+# ================================================================
+# SECTION 1: CHOOSING SELFIES TO ARCHIVE
+# ================================================================
+
+def _taken_at(selfie):
+    """When a selfie was taken, or None if its record does not say."""
+    try:
+        return datetime.fromisoformat(selfie['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _image_size(storage, selfie):
+    """Bytes on disk of a selfie's image."""
+    if selfie.get('size') is not None:
+        return selfie['size']
+    path = storage.get_selfie_path(selfie)
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def select_for_archive(storage, selfies, now=None):
+    """
+    Pick the selfies that are due for the archive, oldest first.
+
+    A selfie is due when it is older than SELFIE_RETENTION_DAYS,
+    or when the active images are over SELFIE_ACTIVE_BUDGET_MB and
+    it is among the oldest. Images shared by several selfies are
+    counted once, and only stop counting when the last of those
+    selfies is archived.
+
+    Args:
+        storage: Storage backend
+        selfies: Active selfie records
+        now: Current time (default: now)
+
+    Returns:
+        Tuple of (list of due selfie records, active bytes before
+        archiving, budget in bytes)
+    """
+    now = now or datetime.now()
+    cutoff = now - timedelta(days=config.SELFIE_RETENTION_DAYS)
+    budget = config.SELFIE_ACTIVE_BUDGET_MB * 1024 * 1024
+
+    # Oldest first; records without a time count as oldest
+    ordered = sorted(selfies, key=lambda s: _taken_at(s) or datetime.min)
+
+    references = {}
+    sizes = {}
+    for selfie in ordered:
+        key = selfie.get('blob') or selfie.get('filename') or f"id:{selfie.get('id')}"
+        references[key] = references.get(key, 0) + 1
+        if key not in sizes:
+            sizes[key] = _image_size(storage, selfie)
+    active_bytes = sum(sizes.values())
+
+    due = []
+    remaining_bytes = active_bytes
+    for selfie in ordered:
+        taken_at = _taken_at(selfie)
+        too_old = taken_at is not None and taken_at < cutoff
+        if not too_old and remaining_bytes <= budget:
+            break
+
+        due.append(selfie)
+        key = selfie.get('blob') or selfie.get('filename') or f"id:{selfie.get('id')}"
+        references[key] -= 1
+        if references[key] == 0:
+            remaining_bytes -= sizes[key]
+
+    return due, active_bytes, budget
+
+
+# ================================================================
+# SECTION 2: ARCHIVING
+# ================================================================
+
+def _make_copies(storage, selfie):
+    """
+    Thumbnail and recompressed copy of a selfie's image.
+
+    Returns:
+        Dict with id, thumb and copy (JPEG bytes or None). The copy
+        is None when it would not be smaller than the original.
+    """
+    entry = {"id": selfie.get('id'), "thumb": None, "copy": None}
+    path = storage.get_selfie_path(selfie)
+    if not path or not os.path.isfile(path):
+        return entry
+
+    copies = jpeg_copies(path,
+                         (config.SELFIE_ARCHIVE_THUMB_SIZE, config.SELFIE_ARCHIVE_COPY_SIZE),
+                         quality=config.SELFIE_ARCHIVE_JPEG_QUALITY)
+    if copies:
+        thumb, copy = copies
+        entry["thumb"] = thumb
+        if len(copy) < os.path.getsize(path):
+            entry["copy"] = copy
+    return entry
+
+
+def run_retention_pass(storage, limit=None):
+    """
+    Archive up to `limit` due selfies.
+
+    The copies are made before the storage lock is taken, so
+    uploads are only blocked while the index files are rewritten.
+
+    Args:
+        storage: Storage backend (LocalStorage)
+        limit: Most selfies to archive (default SELFIE_RETENTION_BATCH)
+
+    Returns:
+        Tuple of (number archived, number still due afterwards)
+    """
+    limit = limit or config.SELFIE_RETENTION_BATCH
+    due, active_bytes, budget = select_for_archive(storage, storage.list_selfies())
+
+    batch = due[:limit]
+    archived = storage.archive_selfies([_make_copies(storage, selfie) for selfie in batch])
+    pending = len(due) - archived
+
+    with _lock:
+        _status.update(
+            last_run=datetime.now().isoformat(),
+            last_archived=archived,
+            archived_total=_status["archived_total"] + archived,
+            pending=pending,
+            active_count=len(storage.list_selfies()),
+            active_bytes=active_bytes,
+            budget_bytes=budget,
+            last_error=None
+        )
+    if archived:
+        print(f"[Retention] Archived {archived} selfies, {pending} still due")
+    return archived, pending
+
+
+def retention_status():
+    """
+    What the retention task did last (for /api/health).
+
+    Returns:
+        Dict with enabled, last_run, last_archived, archived_total,
+        pending, active_count, active_bytes (before the last pass),
+        budget_bytes and last_error
+    """
+    with _lock:
+        return dict(_status, enabled=config.SELFIE_RETENTION_ENABLED)
+
+
+# ================================================================
+# SECTION 3: BACKGROUND TASK
+# ================================================================
+
+def start_retention_worker(get_storage):
+    """
+    Start the background retention task (once per process).
+
+    Args:
+        get_storage: Function returning the storage backend; called
+                     on each pass, so storage can load lazily
+    """
+    global _worker
+    if _worker is not None:
+        return
+
+    def run():
+        while True:
+            pending = 0
+            if config.SELFIE_RETENTION_ENABLED and not background_paused():
+                try:
+                    _, pending = run_retention_pass(get_storage())
+                except Exception as e:
+                    with _lock:
+                        _status["last_error"] = str(e)
+                    print(f"[Retention] Pass failed: {e}")
+            time.sleep(BUSY_INTERVAL_SECONDS if pending > 0
+                       else config.SELFIE_RETENTION_INTERVAL_SECONDS)
+
+    _worker = threading.Thread(target=run, daemon=True, name="selfie-retention")
+    _worker.start()
@@ -0,0 +1,592 @@
+"""
+================================================================
+SELFIE_RELAY.PY - SELFIE RELAY TO THE APPS SCRIPT WEB APP
+================================================================
+This module takes kiosk selfies off the page's hands and forwards
+them to the Google Apps Script web app (SELFIE_RELAY_URL) in the
+background, so the visitor sees "saved" as soon as the kiosk has
+the picture instead of after Google's round trip.
+
+PURPOSE:
+- POST /api/selfies/relay writes the selfie to an outbox folder
+  (SELFIE_RELAY_DIR) and answers 202 straight away
+- A background task forwards the outbox, oldest first:
+  - each image is shrunk to SELFIE_RELAY_MAX_SIDE and recompressed
+    once (kept only when smaller), before its first try
+  - with SELFIE_RELAY_BATCH_ACTION set, up to
+    SELFIE_RELAY_BATCH_SIZE selfies go in one call; otherwise one
+    call per selfie (the script's saveKioskSelfie action)
+  - every call goes over the same kept-alive HTTPS connection,
+    including Apps Script's redirect to googleusercontent.com
+- A failed selfie is retried with growing pauses and moved to
+  SELFIE_RELAY_DIR/failed/ after SELFIE_RELAY_MAX_ATTEMPTS tries
+
+OUTBOX:
+Each selfie is <id>.jpg plus <id>.json (timestamp, tries, last
+error). The .json is written last, so a selfie is only sent once
+its image is complete, and it survives a restart. The number
+waiting is reported to the resource watchdog as the
+"selfie_relay" queue and in /api/health.
+
+APPS SCRIPT CALLS (application/x-www-form-urlencoded):
+    action=saveKioskSelfie&imageData=<base64 JPEG>&timestamp=<ISO>
+    action=<SELFIE_RELAY_BATCH_ACTION>&selfies=[{"imageData", "timestamp"}, ...]
+The script answers {"success": true} (a batch may add
+"results": [{"success": ...}, ...] per selfie). See
+docs/AppsScript-Changes.md for the batch action.
+
+TESTING WITHOUT GOOGLE:
+    python fake_apps_script.py --port 5055
+    KIOSK_SELFIE_RELAY_URL=http://localhost:5055/macros/s/test/exec python app.py
+
+USAGE:
+    from selfie_relay import selfie_relay, start_selfie_relay
+
+    app.register_blueprint(selfie_relay)
+    start_selfie_relay()
+================================================================
+"""
+
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+import http.client
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import urlencode, urljoin, urlsplit
+from flask import Blueprint, jsonify, request
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from config import SELFIE_RELAY_DIR
+from imaging import jpeg_copies
+from records import check_text
+from resource_watchdog import background_paused
+
+selfie_relay = Blueprint('selfie_relay', __name__)
+
+# Apps Script action saving one selfie
+SINGLE_ACTION = "saveKioskSelfie"
+
+# Failed selfies are moved here (inside SELFIE_RELAY_DIR)
+FAILED_DIR = "failed"
+
+# Redirects followed per call (Apps Script uses one)
+MAX_REDIRECTS = 5
+
+# Image formats accepted, by their first bytes
+IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n")
+
+_items = OrderedDict()
+_lock = threading.Lock()
+_loaded = False
+_wake = threading.Event()
+_worker = None
+
+_status = {
+    "sent_total": 0,
+    "failed_total": 0,
+    "calls": 0,
+    "last_sent": None,
+    "last_error": None,
+    "bytes_saved": 0
+}
+
+
+# ================================================================
+# SECTION 1: OUTBOX
+# ================================================================
+
+def _path(item_id, extension):
+    return os.path.join(SELFIE_RELAY_DIR, f"{item_id}.{extension}")
+
+
+def _write_file(path, data):
+    """Write a file in one piece (temporary file, then rename)."""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _save_meta(meta):
+    _write_file(_path(meta["id"], "json"), json.dumps(meta).encode('utf-8'))
+
+
+def _load_outbox():
+    """Read the outbox folder once, oldest selfie first (call with _lock held)."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    os.makedirs(SELFIE_RELAY_DIR, exist_ok=True)
+    for name in sorted(os.listdir(SELFIE_RELAY_DIR)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(SELFIE_RELAY_DIR, name), 'rb') as f:
+                meta = json.loads(f.read())
+            _items[meta["id"]] = meta
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[SelfieRelay] Skipping unreadable outbox entry {name}: {e}")
+    if _items:
+        print(f"[SelfieRelay] {len(_items)} selfies waiting in {SELFIE_RELAY_DIR}")
+
+
+def enqueue_selfie(image_bytes, timestamp):
+    """
+    Put a selfie in the outbox and wake the background task.
+
+    Args:
+        image_bytes: JPEG or PNG bytes as captured
+        timestamp: When it was taken (ISO text from the page)
+
+    Returns:
+        The outbox entry (dict with id, timestamp, received, ...)
+    """
+    item_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    meta = {
+        "id": item_id,
+        "timestamp": timestamp,
+        "received": datetime.now().isoformat(),
+        "size": len(image_bytes),
+        "prepared": False,
+        "attempts": 0,
+        "next_try": 0,
+        "last_error": None
+    }
+    with _lock:
+        _load_outbox()
+        _write_file(_path(item_id, "jpg"), image_bytes)
+        _save_meta(meta)
+        _items[item_id] = meta
+    _wake.set()
+    return meta
+
+
+def _remove(meta):
+    """Delete a forwarded selfie from the outbox."""
+    with _lock:
+        _items.pop(meta["id"], None)
+    for extension in ("json", "jpg"):
+        try:
+            os.remove(_path(meta["id"], extension))
+        except FileNotFoundError:
+            pass
+
+
+def _move_to_failed(meta):
+    """Give up on a selfie, keeping it in failed/ for a manual look."""
+    failed_dir = os.path.join(SELFIE_RELAY_DIR, FAILED_DIR)
+    os.makedirs(failed_dir, exist_ok=True)
+    with _lock:
+        _items.pop(meta["id"], None)
+    for extension in ("jpg", "json"):
+        try:
+            os.replace(_path(meta["id"], extension),
+                       os.path.join(failed_dir, f"{meta['id']}.{extension}"))
+        except FileNotFoundError:
+            pass
+
+
+def outbox_depth():
+    """Number of selfies waiting to be forwarded."""
+    with _lock:
+        _load_outbox()
+        return len(_items)
+
+
+# ================================================================
+# SECTION 2: KEPT-ALIVE HTTP CONNECTIONS
+# ================================================================
+
+class ConnectionPool:
+    """
+    One open http.client connection per host, reused call after call.
+
+    Apps Script answers a POST with a redirect to another host
+    (script.googleusercontent.com), so two connections stay open.
+    Only the relay's background thread uses a pool.
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self.opened = 0
+        self.requests = 0
+
+    def _connection(self, scheme, host, port, timeout):
+        key = (scheme, host, port)
+        connection = self._connections.get(key)
+        if connection is None:
+            if scheme == "https":
+                connection = http.client.HTTPSConnection(host, port, timeout=timeout)
+            else:
+                connection = http.client.HTTPConnection(host, port, timeout=timeout)
+            self._connections[key] = connection
+            self.opened += 1
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return key, connection
+
+    def _drop(self, key):
+        connection = self._connections.pop(key, None)
+        if connection is not None:
+            connection.close()
+
+    def _send_once(self, method, url, body, headers, timeout):
+        """One request on the host's connection; the body is read in full."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {url}")
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        key, connection = self._connection(parts.scheme, parts.hostname, parts.port, timeout)
+        reused = connection.sock is not None
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            self._drop(key)
+            if not reused:
+                raise
+            # The server closed the idle connection before reading
+            # the request; send it again on a new one
+            key, connection = self._connection(parts.scheme, parts.hostname, parts.port, timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except Exception:
+                self._drop(key)
+                raise
+        except Exception:
+            self._drop(key)
+            raise
+
+        self.requests += 1
+        if response.will_close:
+            self._drop(key)
+        return response.status, response.getheader("Location"), data
+
+    def request(self, method, url, body=None, headers=None, timeout=30):
+        """
+        Send a request, following redirects.
+
+        Args:
+            method: HTTP method
+            url: Absolute http(s) URL
+            body: Request body bytes (dropped when a 301/302/303
+                  redirect turns the request into a GET)
+            headers: Request headers
+            timeout: Seconds per connect / read
+
+        Returns:
+            Tuple of (status, response body bytes)
+
+        Raises:
+            OSError, http.client.HTTPException: On connection errors
+        """
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            status, location, data = self._send_once(method, url, body, headers, timeout)
+            if status not in (301, 302, 303, 307, 308) or not location:
+                return status, data
+            url = urljoin(url, location)
+            if status in (301, 302, 303):
+                method, body = "GET", None
+                headers.pop("Content-Type", None)
+        raise http.client.HTTPException(f"More than {MAX_REDIRECTS} redirects")
+
+    def close(self):
+        for key in list(self._connections):
+            self._drop(key)
+
+
+_pool = ConnectionPool()
+
+
+# ================================================================
+# SECTION 3: FORWARDING
+# ================================================================
+
+def _prepare(meta):
+    """
+    Shrink and recompress a selfie's image once, before its first try.
+
+    The copy replaces a JPEG only when it is smaller, and always
+    replaces a PNG (the script stores JPEGs). Without Pillow the
+    image is sent as captured.
+    """
+    if meta["prepared"]:
+        return
+    path = _path(meta["id"], "jpg")
+    with open(path, 'rb') as f:
+        is_jpeg = f.read(3) == IMAGE_SIGNATURES[0]
+    size = os.path.getsize(path)
+    copies = jpeg_copies(path, (config.SELFIE_RELAY_MAX_SIDE,),
+                         quality=config.SELFIE_RELAY_JPEG_QUALITY)
+    if copies and (len(copies[0]) < size or not is_jpeg):
+        _write_file(path, copies[0])
+        with _lock:
+            _status["bytes_saved"] += max(0, size - len(copies[0]))
+    meta["prepared"] = True
+    _save_meta(meta)
+
+
+def _image_data(meta):
+    with open(_path(meta["id"], "jpg"), 'rb') as f:
+        return base64.b64encode(f.read()).decode('ascii')
+
+
+def _call_script(fields):
+    """
+    POST form fields to the Apps Script web app.
+
+    Returns:
+        The script's JSON answer (dict)
+
+    Raises:
+        OSError, http.client.HTTPException: Connection problems
+        ValueError: An error status or an answer that is not JSON
+                    (e.g. a Google sign-in page)
+    """
+    body = urlencode(fields).encode('ascii')
+    status, data = _pool.request(
+        "POST", config.SELFIE_RELAY_URL, body=body,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        timeout=config.SELFIE_RELAY_TIMEOUT_SECONDS)
+    with _lock:
+        _status["calls"] += 1
+    if status >= 400:
+        raise ValueError(f"Apps Script returned HTTP {status}")
+    try:
+        answer = json.loads(data)
+    except ValueError:
+        raise ValueError(f"Apps Script answer is not JSON: {data[:80]!r}")
+    if not isinstance(answer, dict):
+        raise ValueError("Apps Script answer is not a JSON object")
+    return answer
+
+
+def _send(batch):
+    """
+    Forward selfies in one call (batch action) or one call each.
+
+    One call each stops at the first error: the selfies already
+    saved by the script are reported as sent, the one that failed
+    as failed, and the rest are left for the next pass.
+
+    Returns:
+        List of (meta, error message or None) per selfie tried
+    """
+    if config.SELFIE_RELAY_BATCH_ACTION and len(batch) > 1:
+        try:
+            selfies = [{"imageData": _image_data(meta), "timestamp": meta["timestamp"]}
+                       for meta in batch]
+            answer = _call_script({"action": config.SELFIE_RELAY_BATCH_ACTION,
+                                   "selfies": json.dumps(selfies)})
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            return [(meta, str(e)) for meta in batch]
+        if not answer.get("success"):
+            message = answer.get("message") or "Apps Script reported a failure"
+            return [(meta, message) for meta in batch]
+        results = answer.get("results")
+        if not isinstance(results, list) or len(results) != len(batch):
+            return [(meta, None) for meta in batch]
+        return [(meta, None if isinstance(result, dict) and result.get("success")
+                 else (result or {}).get("message") or "Apps Script reported a failure")
+                for meta, result in zip(batch, results)]
+
+    outcomes = []
+    for meta in batch:
+        try:
+            answer = _call_script({"action": SINGLE_ACTION,
+                                   "imageData": _image_data(meta),
+                                   "timestamp": meta["timestamp"]})
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            outcomes.append((meta, str(e)))
+            break
+        outcomes.append((meta, None if answer.get("success")
+                         else answer.get("message") or "Apps Script reported a failure"))
+    return outcomes
+
+
+def _record_failure(meta, message, now):
+    """Schedule a retry of a selfie, or give up on it."""
+    meta["attempts"] += 1
+    meta["last_error"] = message
+    meta["next_try"] = now + min(config.SELFIE_RELAY_RETRY_MAX_SECONDS, 2 ** meta["attempts"])
+    with _lock:
+        _status["last_error"] = message
+    if meta["attempts"] >= config.SELFIE_RELAY_MAX_ATTEMPTS:
+        _move_to_failed(meta)
+        with _lock:
+            _status["failed_total"] += 1
+        print(f"[SelfieRelay] Gave up on {meta['id']} after {meta['attempts']} tries: {message}")
+    else:
+        _save_meta(meta)
+
+
+def run_relay_pass(now=None):
+    """
+    Forward the selfies that are due, up to one batch.
+
+    A selfie whose image cannot be prepared is counted as a failed
+    try on its own; the others are still sent. An error while
+    sending stops the pass (see _send); untried selfies stay due.
+
+    Returns:
+        Tuple of (number forwarded, number still due afterwards)
+    """
+    now = now or time.time()
+    with _lock:
+        _load_outbox()
+        due = [meta for meta in _items.values() if meta["next_try"] <= now]
+    batch = due[:config.SELFIE_RELAY_BATCH_SIZE]
+    if not batch:
+        return 0, 0
+
+    ready = []
+    for meta in batch:
+        try:
+            _prepare(meta)
+        except OSError as e:
+            _record_failure(meta, f"Image not readable: {e}", now)
+            continue
+        ready.append(meta)
+
+    outcomes = _send(ready) if ready else []
+
+    sent = 0
+    for meta, error in outcomes:
+        if error is None:
+            _remove(meta)
+            sent += 1
+        else:
+            _record_failure(meta, error, now)
+
+    if sent:
+        with _lock:
+            _status["sent_total"] += sent
+            _status["last_sent"] = datetime.now().isoformat()
+            if sent == len(ready):
+                _status["last_error"] = None
+        print(f"[SelfieRelay] Forwarded {sent} selfies, {len(due) - len(batch)} more due")
+    return sent, len(due) - len(batch)
+
+
+def _seconds_to_next_try(now):
+    """Seconds until the earliest retry, or None if nothing waits."""
+    with _lock:
+        if not _items:
+            return None
+        return max(0.0, min(meta["next_try"] for meta in _items.values()) - now)
+
+
+def start_selfie_relay():
+    """
+    Start the background relay task (once per process).
+
+    It wakes when a selfie arrives, when a retry is due, and every
+    SELFIE_RELAY_INTERVAL_SECONDS; passes follow each other at once
+    while more selfies are due. Passes are skipped while relaying
+    is off (or SELFIE_RELAY_URL is empty) or the resource watchdog
+    has paused background jobs.
+    """
+    global _worker
+    if _worker is not None:
+        return
+
+    def run():
+        while True:
+            pending = 0
+            if config.SELFIE_RELAY_ENABLED and config.SELFIE_RELAY_URL and not background_paused():
+                try:
+                    _, pending = run_relay_pass()
+                except Exception as e:
+                    with _lock:
+                        _status["last_error"] = str(e)
+                    print(f"[SelfieRelay] Pass failed: {e}")
+            if pending > 0:
+                continue
+
+            wait = config.SELFIE_RELAY_INTERVAL_SECONDS
+            next_try = _seconds_to_next_try(time.time())
+            if next_try is not None:
+                wait = min(wait, next_try)
+            _wake.wait(wait)
+            _wake.clear()
+
+    _worker = threading.Thread(target=run, daemon=True, name="selfie-relay")
+    _worker.start()
+
+
+def relay_status():
+    """
+    What the relay has done (for /api/health).
+
+    Returns:
+        Dict with enabled, pending, sent_total, failed_total,
+        calls, connections (opened so far; fewer than calls means
+        they were reused), bytes_saved by recompressing, last_sent
+        and last_error
+    """
+    pending = outbox_depth()
+    with _lock:
+        return dict(_status, enabled=config.SELFIE_RELAY_ENABLED, pending=pending,
+                    connections=_pool.opened)
+
+
+# ================================================================
+# SECTION 4: ROUTES
+# ================================================================
+
+@selfie_relay.route('/api/selfies/relay', methods=['POST'])
+def post_selfie_relay():
+    """
+    POST /api/selfies/relay
+
+    Accept a kiosk selfie for the Apps Script mosaic and forward it
+    in the background.
+
+    Request body:
+    {
+        "imageBase64": "data:image/jpeg;base64,...",
+        "timestamp": "2026-10-18T19:42:00.000Z"
+    }
+
+    Response (202): { "status": "ok", "data": { "id": "...",
+    "pending": 1 }, "message": "Selfie queued" }
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "No data provided"}), 400
+
+    image = data.get('imageBase64')
+    if not image or not isinstance(image, str):
+        return jsonify({"status": "error", "message": "'imageBase64' field is required"}), 400
+    if ',' in image:
+        image = image.split(',', 1)[1]
+    try:
+        image_bytes = base64.b64decode(image)
+        timestamp = check_text(data, 'timestamp') or datetime.now().isoformat()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e) or "Invalid image data"}), 400
+    if not image_bytes.startswith(IMAGE_SIGNATURES):
+        return jsonify({"status": "error", "message": "Image must be a JPEG or PNG"}), 400
+
+    try:
+        meta = enqueue_selfie(image_bytes, timestamp)
+    except OSError as e:
+        print(f"[SelfieRelay] Could not queue selfie: {e}")
+        return jsonify({"status": "error", "message": "Failed to queue selfie"}), 500
+
+    return jsonify({"status": "ok", "data": {"id": meta["id"], "pending": outbox_depth()},
+                    "message": "Selfie queued"}), 202
@@ -59,10 +59,13 @@ from datetime import datetime
 from config import (
     GOOGLE_CREDENTIALS_FILE,
     GOOGLE_DRIVE_SELFIES_FOLDER_ID,
-    GOOGLE_DRIVE_DATA_FOLDER_ID,
-    LOG_STORAGE
+    GOOGLE_DRIVE_DATA_FOLDER_ID
 )
 
+# Read as config.LOG_STORAGE at call time so a hot-reloaded
+# value takes effect immediately
+import config
+
 
 class GoogleDriveStorage:
     """
@@ -84,17 +87,23 @@ class GoogleDriveStorage:
         """
         Initialize Google Drive storage.
         
+        Kept free of I/O and heavy imports: the Drive service (and
+        the google-api libraries it needs) should be built on the
+        first call that actually talks to Drive.
+        
         TODO: Implement actual Google Drive API initialization
         """
         self._service = None
-        self._log("GoogleDriveStorage initialized (stub)")
         
-        # TODO: Initialize Google Drive service
-        # self._init_google_drive_service()
+        # TODO: Initialize Google Drive service lazily, e.g.
+        # def _get_service(self):
+        #     if self._service is None:
+        #         self._init_google_drive_service()
+        #     return self._service
     
     def _log(self, message):
         """Log a storage operation if logging is enabled."""
-        if LOG_STORAGE:
+        if config.LOG_STORAGE:
             print(f"[GoogleDriveStorage] {message}")
     
     def _init_google_drive_service(self):
@@ -230,6 +239,17 @@ class GoogleDriveStorage:
         self._log("list_selfies_from_drive called (not yet implemented)")
         return []
     
+    def get_selfie_path(self, selfie):
+        """
+        Get the local image file of a selfie record.
+        
+        Drive selfies live in Drive, not on the kiosk's disk.
+        
+        Returns:
+            None
+        """
+        return None
+    
     
     # ============================================================
     # SECTION 3: TEMPLE VISITS STORAGE
@@ -254,6 +274,16 @@ class GoogleDriveStorage:
         self._log("save_temple_visit_to_drive called (not yet implemented)")
         return None
     
+    def save_temple_visits_to_drive(self, items):
+        """
+        Save many temple visit records to Google Drive at once.
+        
+        TODO: Implement actual saving to Google Drive/Sheets
+        (one Sheets append per batch)
+        """
+        self._log("save_temple_visits_to_drive called (not yet implemented)")
+        return None
+    
     def list_temple_visits_from_drive(self):
         """
         List all temple visits from Google Drive.
@@ -303,6 +333,15 @@ class GoogleDriveStorage:
         self._log("save_missionary_to_drive called (Phase 2 - not yet implemented)")
         return None
     
+    def save_missionaries_to_drive(self, items):
+        """
+        Save many missionary records to Google Drive at once.
+        
+        TODO: Implement when Phase 2 is ready
+        """
+        self._log("save_missionaries_to_drive called (Phase 2 - not yet implemented)")
+        return None
+    
     def list_missionaries_from_drive(self):
         """
         List all missionaries from Google Drive.
@@ -351,3 +390,127 @@ class GoogleDriveStorage:
         """
         self._log("list_temple_photos_from_drive called (not yet implemented)")
         return []
+    
+    
+    # ============================================================
+    # SECTION 8: SELFIE ARCHIVE
+    # ============================================================
+    
+    def list_archived_selfies(self):
+        """
+        List archived selfies.
+        
+        TODO: Implement actual Google Drive archive
+        """
+        self._log("list_archived_selfies called (not yet implemented)")
+        return []
+    
+    def archive_selfies(self, entries):
+        """
+        Move selfies from the active list to the archive.
+        
+        TODO: Implement actual Google Drive archive
+        """
+        self._log("archive_selfies called (not yet implemented)")
+        return 0
+    
+    
+    # ============================================================
+    # SECTION 9: BACKUP & RESTORE
+    # ============================================================
+    
+    def list_collections(self):
+        """
+        Names of the collections included in backups.
+        
+        TODO: Implement actual Google Drive backup
+        """
+        self._log("list_collections called (not yet implemented)")
+        return []
+    
+    def list_collection(self, name):
+        """
+        Read every record of a collection.
+        
+        TODO: Implement actual Google Drive backup
+        """
+        self._log("list_collection called (not yet implemented)")
+        return []
+    
+    def collection_version(self, name):
+        """
+        A cheap marker that changes whenever a collection is written.
+        
+        TODO: Use the Drive file's modifiedTime. None means "unknown",
+        so callers always re-read.
+        """
+        return None
+    
+    def check_collection(self, name):
+        """
+        Why a collection can no longer be read, or None if it can.
+        
+        TODO: Check the Drive file once collections are stored there
+        """
+        return None
+    
+    def merge_collection(self, name, records):
+        """
+        Add records to a collection, skipping ids it already has.
+        
+        TODO: Implement actual Google Drive restore
+        """
+        self._log("merge_collection called (not yet implemented)")
+        return None
+    
+    def import_blob(self, fileobj, blob_hash):
+        """
+        Store an image from a backup archive.
+        
+        TODO: Implement actual Google Drive restore
+        """
+        raise ValueError("Restoring images to Google Drive is not yet implemented")
+    
+    
+    # ============================================================
+    # SECTION 10: REPLICATION
+    # ============================================================
+    # Kiosks sharing a Drive folder already see each other's data,
+    # so there is nothing to replicate.
+    
+    def add_change_listener(self, callback):
+        """
+        Be told about new records saved on this kiosk.
+        
+        Never called back: Drive is already shared by every kiosk.
+        """
+    
+    def apply_replicated(self, collection, records):
+        """
+        Merge records from other kiosks into a collection.
+        
+        TODO: Not needed while every kiosk writes to the same Drive
+        """
+        self._log("apply_replicated called (not yet implemented)")
+        return None
+    
+    
+    # ============================================================
+    # SECTION 11: STORAGE INTERFACE
+    # ============================================================
+    # app.py calls the same method names on every backend, so
+    # map them onto the Drive-specific methods above.
+    
+    save_selfie = save_selfie_to_drive
+    list_selfies = list_selfies_from_drive
+    save_temple_visit = save_temple_visit_to_drive
+    save_temple_visits = save_temple_visits_to_drive
+    list_temple_visits = list_temple_visits_from_drive
+    save_miracle = save_miracle_to_drive
+    list_miracles = list_miracles_from_drive
+    save_missionary = save_missionary_to_drive
+    save_missionaries = save_missionaries_to_drive
+    list_missionaries = list_missionaries_from_drive
+    save_event = save_event_to_drive
+    list_events = list_events_from_drive
+    list_temple_photos = list_temple_photos_from_drive
@@ -12,10 +12,13 @@ PURPOSE:
 
 FILE STRUCTURE:
 ./data/
+├── blobs/                (selfie images, named by content hash;
+│   └── 1a/1a4bf0...       identical images are stored once)
 ├── selfies/
-│   ├── selfie_001.jpg
-│   ├── selfie_002.jpg
-│   └── metadata.json
+│   └── metadata.json     (records refer to images by "blob" hash)
+├── selfie_archive/       (old selfies, see retention.py)
+│   ├── index.json
+│   └── originals/        (full-size images, gzipped)
 ├── temple_photos/
 │   └── (screensaver images)
 ├── temple_visits.json
@@ -40,8 +43,10 @@ USAGE:
 """
 
 import os
-import json
+import gzip
+import shutil
 import base64
+import threading
 from datetime import datetime
 from config import (
     DATA_DIR, 
@@ -50,8 +55,36 @@ from config import (
     MIRACLES_FILE,
     MISSIONARIES_FILE,
     CALENDAR_FILE,
-    LOG_STORAGE
+    BLOBS_DIR,
+    SELFIE_ARCHIVE_DIR,
+    FRONTEND_ROOT,
+    TEMPLE_PHOTOS_ASSET_DIR
 )
+from blob_store import BlobStore, hash_file
+from imaging import perceptual_hash, hamming_distance
+from records import TempleVisit, Selfie, Missionary, dumps, loads
+
+# Read as config.LOG_STORAGE at call time so a hot-reloaded
+# value takes effect immediately
+import config
+
+# Fields that differ between copies of one record on two kiosks:
+# the local id, and where the selfie image is kept (an export names
+# every image by its blob hash). Ignored when merging a backup.
+MERGE_LOCAL_FIELDS = ('id', 'filename', 'blob')
+
+
+def _merge_key(record):
+    """What makes two records in a backup merge the same record."""
+    if record.get('uid'):
+        return ('uid', record['uid'])
+    return tuple(sorted((field, repr(value)) for field, value in record.items()
+                        if field not in MERGE_LOCAL_FIELDS))
+
+
+def _archive_key(record):
+    """What makes an archived selfie the same as an active one."""
+    return (record.get('id'), record.get('timestamp'))
 
 
 class LocalStorage:
@@ -69,13 +102,27 @@ class LocalStorage:
     def __init__(self):
         """
         Initialize the local storage.
-        Creates necessary directories if they don't exist.
+        
+        Does no disk I/O; data directories are created on the
+        first write (see _ensure_directories).
         """
-        self._ensure_directories()
-        self._log("LocalStorage initialized")
+        # Serializes read-modify-write cycles on the JSON files so
+        # concurrent requests cannot lose each other's records
+        self._lock = threading.RLock()
+        self._directories_ready = False
+        
+        # Selfie images, stored once per unique content
+        self.blobs = BlobStore(BLOBS_DIR)
+        
+        # Called with (collection, records) after new records are
+        # saved (see add_change_listener)
+        self._change_listeners = []
     
     def _ensure_directories(self):
-        """Create data directories if they don't exist."""
+        """Create data directories if they don't exist (once per process)."""
+        if self._directories_ready:
+            return
+        
         directories = [
             DATA_DIR,
             SELFIES_DIR
@@ -85,10 +132,12 @@ class LocalStorage:
             if not os.path.exists(directory):
                 os.makedirs(directory)
                 self._log(f"Created directory: {directory}")
+        
+        self._directories_ready = True
     
     def _log(self, message):
         """Log a storage operation if logging is enabled."""
-        if LOG_STORAGE:
+        if config.LOG_STORAGE:
             print(f"[LocalStorage] {message}")
     
     
@@ -100,6 +149,8 @@ class LocalStorage:
         """
         Read data from a JSON file.
         
+        Decoded with the fast encoder when installed (records.py).
+        
         Args:
             filepath: Path to the JSON file
             
@@ -110,9 +161,9 @@ class LocalStorage:
             return []
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
+            with open(filepath, 'rb') as f:
+                return loads(f.read())
+        except ValueError:
             self._log(f"Warning: Invalid JSON in {filepath}")
             return []
         except Exception as e:
@@ -123,6 +174,9 @@ class LocalStorage:
         """
         Write data to a JSON file.
         
+        The file is indented for people reading it; records.dumps()
+        makes that cheap with orjson installed.
+        
         Args:
             filepath: Path to the JSON file
             data: Data to write (will be JSON serialized)
@@ -130,9 +184,14 @@ class LocalStorage:
         Returns:
             True if successful, False otherwise
         """
+        # Write to a temp file first and swap it in, so a crash
+        # mid-write never leaves a truncated JSON file behind
+        temp_path = f"{filepath}.tmp"
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._ensure_directories()
+            with open(temp_path, 'wb') as f:
+                f.write(dumps(data, indent=True))
+            os.replace(temp_path, filepath)
             return True
         except Exception as e:
             self._log(f"Error writing {filepath}: {e}")
@@ -153,6 +212,21 @@ class LocalStorage:
         max_id = max(item.get('id', 0) for item in data_list)
         return max_id + 1
     
+    def _next_selfie_id(self, selfies):
+        """
+        Get the next selfie ID, past the active list and the archive.
+        
+        Archived selfies keep their IDs, so an ID that archiving
+        freed from the active list must not be handed out again.
+        
+        Args:
+            selfies: The active selfie records
+            
+        Returns:
+            Next available ID (integer)
+        """
+        return self._get_next_id(selfies + self.list_archived_selfies())
+    
     
     # ============================================================
     # SECTION 3: SELFIE STORAGE
@@ -162,49 +236,99 @@ class LocalStorage:
         """
         Save a selfie image to local storage.
         
+        The image goes into the blob store, so identical bytes are
+        written to disk only once. A selfie identical to one saved
+        within SELFIE_DUPLICATE_WINDOW_SECONDS is not saved again;
+        one that merely looks the same is saved and flagged with
+        'near_duplicate_of'.
+        
         Args:
             image_base64: Base64-encoded image data
                          (with or without data:image/... prefix)
             caption: Optional caption for the selfie
             
         Returns:
-            Dict with saved selfie metadata, or None on error
+            Dict with saved selfie metadata (for an exact repeat,
+            the earlier selfie's metadata with 'duplicate': True),
+            or None on error
             
-        TODO: Implement actual image saving
         TODO: Add image validation
         TODO: Add image compression/resizing
         """
-        self._log("save_selfie called (not yet implemented)")
-        
-        # TODO: Implementation steps:
-        # 1. Strip base64 prefix if present
-        #    if ',' in image_base64:
-        #        image_base64 = image_base64.split(',')[1]
-        #
-        # 2. Decode base64 to bytes
-        #    image_bytes = base64.b64decode(image_base64)
-        #
-        # 3. Generate unique filename
-        #    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        #    filename = f"selfie_{timestamp}.jpg"
-        #    filepath = os.path.join(SELFIES_DIR, filename)
-        #
-        # 4. Save image file
-        #    with open(filepath, 'wb') as f:
-        #        f.write(image_bytes)
-        #
-        # 5. Save metadata
-        #    metadata = {
-        #        'id': self._get_next_id(self.list_selfies()),
-        #        'filename': filename,
-        #        'caption': caption,
-        #        'timestamp': datetime.now().isoformat()
-        #    }
-        #    self._save_selfie_metadata(metadata)
-        #
-        # 6. Return metadata
-        #    return metadata
+        # Strip base64 prefix if present
+        if ',' in image_base64:
+            image_base64 = image_base64.split(',', 1)[1]
         
+        try:
+            image_bytes = base64.b64decode(image_base64)
+        except (ValueError, TypeError) as e:
+            self._log(f"Invalid selfie image data: {e}")
+            return None
+        
+        # Decode outside the lock; it is the slow part
+        phash = perceptual_hash(image_bytes)
+        
+        try:
+            blob_hash, is_new = self.blobs.put(image_bytes)
+        except OSError as e:
+            self._log(f"Error saving selfie image: {e}")
+            return None
+        
+        with self._lock:
+            selfies = self.list_selfies()
+            timestamp = datetime.now()
+            
+            repeat = self._find_recent_repeat(selfies, timestamp, blob_hash, phash)
+            if repeat and repeat.get('blob') == blob_hash:
+                self._log(f"Selfie {repeat['id']} uploaded again, not saving a copy")
+                return dict(repeat, duplicate=True)
+            
+            metadata = Selfie(
+                id=self._next_selfie_id(selfies),
+                blob=blob_hash,
+                caption=caption,
+                size=len(image_bytes),
+                timestamp=timestamp.isoformat(),
+                phash=phash,
+                near_duplicate_of=repeat['id'] if repeat else None
+            ).to_dict()
+            
+            selfies.append(metadata)
+            if not self._write_json_file(self._selfie_metadata_file(), selfies):
+                return None
+        
+        self._log(f"Saved selfie {metadata['id']} ({len(image_bytes)} bytes, "
+                  f"{'new image' if is_new else 'image already stored'})")
+        self._notify_change('selfies', [metadata])
+        return metadata
+    
+    def _find_recent_repeat(self, selfies, now, blob_hash, phash):
+        """
+        Find a selfie taken within SELFIE_DUPLICATE_WINDOW_SECONDS
+        that has the same bytes or looks the same.
+        
+        Args:
+            selfies: Existing selfie records, oldest first
+            now: Time of the new selfie
+            blob_hash: Blob hash of the new image
+            phash: Perceptual hash of the new image (or None)
+            
+        Returns:
+            The most recent matching record, or None
+        """
+        window = config.SELFIE_DUPLICATE_WINDOW_SECONDS
+        for selfie in reversed(selfies):
+            try:
+                age = (now - datetime.fromisoformat(selfie['timestamp'])).total_seconds()
+            except (KeyError, ValueError):
+                continue
+            if age > window:
+                break
+            if selfie.get('blob') == blob_hash:
+                return selfie
+            if (phash and selfie.get('phash') and
+                    hamming_distance(phash, selfie['phash']) <= config.SELFIE_NEAR_DUPLICATE_DISTANCE):
+                return selfie
         return None
     
     def list_selfies(self):
@@ -213,32 +337,180 @@ class LocalStorage:
         
         Returns:
             List of selfie metadata dicts
+        """
+        return self._read_json_file(self._selfie_metadata_file())
+    
+    def get_selfie_path(self, selfie):
+        """
+        Get the image file of a selfie record.
+        
+        Args:
+            selfie: Record from list_selfies()
             
-        TODO: Implement actual listing
+        Returns:
+            File path (records saved before the blob store existed
+            point into SELFIES_DIR), or None if the record has no image
+        """
+        if selfie.get('blob'):
+            return self.blobs.path(selfie['blob'])
+        if selfie.get('filename'):
+            return os.path.join(SELFIES_DIR, selfie['filename'])
+        return None
+    
+    def _selfie_metadata_file(self):
+        """Path of the JSON file holding selfie metadata."""
+        return os.path.join(SELFIES_DIR, 'metadata.json')
+    
+    
+    # ============================================================
+    # SECTION 4: SELFIE ARCHIVE
+    # ============================================================
+    # Old selfies leave the active list (metadata.json) for the
+    # archive index, so list_selfies() stays small. retention.py
+    # decides which ones and makes their copies.
+    
+    def list_archived_selfies(self):
         """
-        self._log("list_selfies called (not yet implemented)")
+        List archived selfies, oldest first.
         
-        # TODO: Implementation:
-        # metadata_file = os.path.join(SELFIES_DIR, 'metadata.json')
-        # return self._read_json_file(metadata_file)
+        Returns:
+            List of selfie records; 'blob' is the recompressed
+            copy, 'thumb' the thumbnail and 'original' the hash of
+            the full-size image (in the cold folder, if kept)
+        """
+        return self._read_json_file(self._selfie_archive_file())
+    
+    def archive_selfies(self, entries):
+        """
+        Move selfies from the active list to the archive.
         
-        return []
+        Args:
+            entries: List of dicts with id, thumb (JPEG bytes or
+                     None) and copy (JPEG bytes, or None to keep
+                     the original as the hot image)
+                     
+        Returns:
+            Number of selfies archived
+        """
+        if not entries:
+            return 0
+        
+        with self._lock:
+            selfies = self.list_selfies()
+            archive = self.list_archived_selfies()
+            # By id and time taken: selfies saved before IDs counted
+            # the archive can share an id with an archived one
+            archived_keys = {_archive_key(record) for record in archive}
+            by_id = {record.get('id'): record for record in selfies}
+            archived_at = datetime.now().isoformat()
+            
+            moved = []
+            for entry in entries:
+                record = by_id.get(entry['id'])
+                if record is None:
+                    continue
+                # Only records that are in the archive leave the list
+                if _archive_key(record) not in archived_keys:
+                    archive.append(self._archive_record(record, entry, archived_at))
+                    archived_keys.add(_archive_key(record))
+                moved.append(record)
+            if not moved:
+                return 0
+            
+            # Archive first: a crash in between leaves a selfie in
+            # both lists, which the next pass cleans up, never in none
+            moved_keys = {_archive_key(record) for record in moved}
+            remaining = [record for record in selfies if _archive_key(record) not in moved_keys]
+            os.makedirs(SELFIE_ARCHIVE_DIR, exist_ok=True)
+            if not self._write_json_file(self._selfie_archive_file(), archive):
+                return 0
+            if not self._write_json_file(self._selfie_metadata_file(), remaining):
+                return 0
+            
+            self._release_originals(moved, remaining, archive)
+        
+        self._log(f"Archived {len(moved)} selfies ({len(remaining)} still active)")
+        return len(moved)
     
-    def _save_selfie_metadata(self, metadata):
+    def _archive_record(self, record, entry, archived_at):
         """
-        Save selfie metadata to the metadata file.
+        Build the archive record of a selfie and store its copies.
         
-        TODO: Implement
+        The original is copied (gzipped) into the cold folder here
+        but only removed from the hot store by _release_originals(),
+        once the archive index has been written.
         """
-        # metadata_file = os.path.join(SELFIES_DIR, 'metadata.json')
-        # all_metadata = self._read_json_file(metadata_file)
-        # all_metadata.append(metadata)
-        # self._write_json_file(metadata_file, all_metadata)
-        pass
+        archived = dict(record, archived_at=archived_at)
+        archived.pop('filename', None)
+        
+        path = self.get_selfie_path(record)
+        if not path or not os.path.isfile(path):
+            return archived
+        original = record.get('blob') or hash_file(path)
+        archived['original'] = original
+        
+        if entry.get('thumb'):
+            archived['thumb'], _ = self.blobs.put(entry['thumb'])
+        if not entry.get('copy'):
+            # Nothing smaller to keep hot; the original stays
+            archived['blob'] = original
+            if not record.get('blob'):
+                with open(path, 'rb') as f:
+                    self.blobs.put_stream(f, expected_hash=original)
+            return archived
+        
+        archived['blob'], _ = self.blobs.put(entry['copy'])
+        if config.SELFIE_ARCHIVE_KEEP_ORIGINALS:
+            cold_path = self.get_archived_original_path(archived)
+            if not os.path.exists(cold_path):
+                os.makedirs(os.path.dirname(cold_path), exist_ok=True)
+                with open(path, 'rb') as source, gzip.open(f"{cold_path}.tmp", 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(f"{cold_path}.tmp", cold_path)
+        return archived
+    
+    def _release_originals(self, moved, remaining, archive):
+        """
+        Delete the hot originals of archived selfies that nothing
+        else still uses.
+        """
+        in_use = {record.get('blob') for record in remaining}
+        in_use.update(record.get('blob') for record in archive)
+        in_use.update(record.get('thumb') for record in archive)
+        
+        for record in moved:
+            if record.get('blob'):
+                if record['blob'] not in in_use:
+                    self.blobs.delete(record['blob'])
+            elif record.get('filename'):
+                # Legacy image file; the archive now has its own copy
+                legacy_path = os.path.join(SELFIES_DIR, record['filename'])
+                if os.path.exists(legacy_path):
+                    os.remove(legacy_path)
+    
+    def get_archived_original_path(self, selfie):
+        """
+        Get the gzipped full-size image of an archived selfie.
+        
+        Args:
+            selfie: Record from list_archived_selfies()
+            
+        Returns:
+            Path of originals/<hash>.gz (it exists only if
+            SELFIE_ARCHIVE_KEEP_ORIGINALS was on when archived and
+            a smaller copy was made), or None
+        """
+        if not selfie.get('original'):
+            return None
+        return os.path.join(SELFIE_ARCHIVE_DIR, 'originals', f"{selfie['original']}.gz")
+    
+    def _selfie_archive_file(self):
+        """Path of the JSON file holding archived selfie records."""
+        return os.path.join(SELFIE_ARCHIVE_DIR, 'index.json')
     
     
     # ============================================================
-    # SECTION 4: TEMPLE VISITS STORAGE
+    # SECTION 5: TEMPLE VISITS STORAGE
     # ============================================================
     
     def save_temple_visit(self, data):
@@ -252,28 +524,55 @@ class LocalStorage:
                   
         Returns:
             The saved record with ID, or None on error
+        """
+        with self._lock:
+            visits = self._read_json_file(TEMPLE_VISITS_FILE)
+            
+            new_visit = self._new_temple_visit(data, self._get_next_id(visits))
             
-        TODO: Implement actual saving
-        """
-        self._log("save_temple_visit called (not yet implemented)")
-        
-        # TODO: Implementation:
-        # visits = self._read_json_file(TEMPLE_VISITS_FILE)
-        # 
-        # new_visit = {
-        #     'id': self._get_next_id(visits),
-        #     'date': data['date'],
-        #     'count': data.get('count', 1),
-        #     'notes': data.get('notes', ''),
-        #     'created_at': datetime.now().isoformat()
-        # }
-        # 
-        # visits.append(new_visit)
-        # self._write_json_file(TEMPLE_VISITS_FILE, visits)
-        # 
-        # return new_visit
+            visits.append(new_visit)
+            if not self._write_json_file(TEMPLE_VISITS_FILE, visits):
+                return None
         
-        return None
+        self._log(f"Saved temple visit {new_visit['id']} ({new_visit['date']})")
+        self._notify_change('temple_visits', [new_visit])
+        return new_visit
+    
+    def save_temple_visits(self, items):
+        """
+        Save many temple visit records with one file write.
+        
+        Args:
+            items: List of dicts, each as for save_temple_visit()
+            
+        Returns:
+            List of saved records with IDs, or None on error (then
+            none of them were saved)
+        """
+        with self._lock:
+            visits = self._read_json_file(TEMPLE_VISITS_FILE)
+            next_id = self._get_next_id(visits)
+            
+            new_visits = [self._new_temple_visit(data, next_id + offset)
+                          for offset, data in enumerate(items)]
+            
+            visits.extend(new_visits)
+            if not self._write_json_file(TEMPLE_VISITS_FILE, visits):
+                return None
+        
+        self._log(f"Saved {len(new_visits)} temple visits")
+        self._notify_change('temple_visits', new_visits)
+        return new_visits
+    
+    def _new_temple_visit(self, data, visit_id):
+        """Build a temple visit record."""
+        return TempleVisit(
+            id=visit_id,
+            date=data['date'],
+            count=data.get('count', 1),
+            notes=data.get('notes', ''),
+            created_at=datetime.now().isoformat()
+        ).to_dict()
     
     def list_temple_visits(self):
         """
@@ -281,19 +580,12 @@ class LocalStorage:
         
         Returns:
             List of temple visit records
-            
-        TODO: Implement actual listing
         """
-        self._log("list_temple_visits called (not yet implemented)")
-        
-        # TODO: Implementation:
-        # return self._read_json_file(TEMPLE_VISITS_FILE)
-        
-        return []
+        return self._read_json_file(TEMPLE_VISITS_FILE)
     
     
     # ============================================================
-    # SECTION 5: MIRACLES STORAGE (PHASE 2)
+    # SECTION 6: MIRACLES STORAGE (PHASE 2)
     # ============================================================
     
     def save_miracle(self, data):
@@ -327,30 +619,75 @@ class LocalStorage:
     
     
     # ============================================================
-    # SECTION 6: MISSIONARIES STORAGE (PHASE 2)
+    # SECTION 7: MISSIONARIES STORAGE
     # ============================================================
     
     def save_missionary(self, data):
         """
         Save a missionary record.
         
-        TODO: Implement when Phase 2 is ready
+        Args:
+            data: Dict with missionary data
+                  Required: 'name', 'mission'
+                  Optional: 'language', 'scripture', 'photoUrl',
+                  'galleryFolder', 'startDate', 'location'
+                  ({"lat": ..., "lng": ...})
+                  
+        Returns:
+            The saved record with ID, or None on error
         """
-        self._log("save_missionary called (Phase 2 - not yet implemented)")
-        return None
+        saved = self.save_missionaries([data])
+        return saved[0] if saved else None
+    
+    def save_missionaries(self, items):
+        """
+        Save many missionary records with one file write.
+        
+        Args:
+            items: List of dicts, each as for save_missionary()
+            
+        Returns:
+            List of saved records with IDs, or None on error (then
+            none of them were saved)
+        """
+        with self._lock:
+            missionaries = self._read_json_file(MISSIONARIES_FILE)
+            next_id = self._get_next_id(missionaries)
+            
+            new_missionaries = [self._new_missionary(data, next_id + offset)
+                                for offset, data in enumerate(items)]
+            
+            missionaries.extend(new_missionaries)
+            if not self._write_json_file(MISSIONARIES_FILE, missionaries):
+                return None
+        
+        self._log(f"Saved {len(new_missionaries)} missionaries")
+        self._notify_change('missionaries', new_missionaries)
+        return new_missionaries
+    
+    def _new_missionary(self, data, missionary_id):
+        """Build a missionary record (empty optional fields left out)."""
+        fields = {field: data.get(field) for field in Missionary.OPTIONAL}
+        return Missionary(
+            id=missionary_id,
+            name=data['name'],
+            mission=data['mission'],
+            created_at=datetime.now().isoformat(),
+            **fields
+        ).to_dict()
     
     def list_missionaries(self):
         """
         List all missionaries.
         
-        TODO: Implement when Phase 2 is ready
+        Returns:
+            List of missionary records
         """
-        self._log("list_missionaries called (Phase 2 - not yet implemented)")
-        return []
+        return self._read_json_file(MISSIONARIES_FILE)
     
     
     # ============================================================
-    # SECTION 7: CALENDAR STORAGE (PHASE 2)
+    # SECTION 8: CALENDAR STORAGE (PHASE 2)
     # ============================================================
     
     def save_event(self, data):
@@ -373,31 +710,293 @@ class LocalStorage:
     
     
     # ============================================================
-    # SECTION 8: TEMPLE PHOTOS (SCREENSAVER)
+    # SECTION 9: BACKUP & RESTORE
+    # ============================================================
+    # Whole collections as stored on disk, for backup.py.
+    
+    def _collection_files(self):
+        """Collection name -> JSON file, for every backed-up collection."""
+        return {
+            'selfies': self._selfie_metadata_file(),
+            'archived_selfies': self._selfie_archive_file(),
+            'temple_visits': TEMPLE_VISITS_FILE,
+            'miracles': MIRACLES_FILE,
+            'missionaries': MISSIONARIES_FILE,
+            'calendar': CALENDAR_FILE
+        }
+    
+    def list_collections(self):
+        """
+        Names of the collections included in backups.
+        
+        Returns:
+            List of names, e.g. ['selfies', 'temple_visits', ...]
+        """
+        return list(self._collection_files())
+    
+    def list_collection(self, name):
+        """
+        Read every record of a collection.
+        
+        Args:
+            name: Name from list_collections()
+            
+        Returns:
+            List of records
+        """
+        return self._read_json_file(self._collection_files()[name])
+    
+    def collection_version(self, name):
+        """
+        A cheap marker that changes whenever a collection is written.
+        
+        Lets caches (such as the mission map index) skip re-reading
+        a collection that has not changed.
+        
+        Args:
+            name: Name from list_collections()
+            
+        Returns:
+            Tuple of (mtime_ns, size) of its file, or None if the
+            file does not exist yet
+        """
+        try:
+            stat = os.stat(self._collection_files()[name])
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def check_collection(self, name):
+        """
+        Why a collection's file can no longer be read, or None if it
+        can (or does not exist yet).
+        
+        _read_json_file() treats a damaged file as empty so the kiosk
+        keeps running; this tells the resource watchdog about it.
+        
+        Args:
+            name: Name from list_collections()
+            
+        Returns:
+            Error message or None
+        """
+        filepath = self._collection_files()[name]
+        try:
+            with open(filepath, 'rb') as f:
+                data = loads(f.read())
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            return f"Invalid JSON in {filepath}: {e}"
+        except OSError as e:
+            return f"Cannot read {filepath}: {e}"
+        if not isinstance(data, list):
+            return f"{filepath} does not hold a list of records"
+        return None
+    
+    def merge_collection(self, name, records):
+        """
+        Add records to a collection, skipping those it already has.
+        
+        Used when restoring a backup, so importing the same (or an
+        overlapping incremental) archive twice changes nothing. A
+        record is already here when one with the same uid, or the
+        same content apart from MERGE_LOCAL_FIELDS, is. New records
+        keep their id unless this collection uses it already (a
+        backup of another kiosk); then they get the next free id.
+        Active and archived selfies count as one collection here.
+        
+        Args:
+            name: Name from list_collections()
+            records: Records to add (dicts with an 'id')
+            
+        Returns:
+            Tuple of (added count, skipped count), or None if the
+            collection could not be written
+        """
+        filepath = self._collection_files()[name]
+        with self._lock:
+            existing = self._read_json_file(filepath)
+            known_ids = {record.get('id') for record in existing}
+            if name in ('selfies', 'archived_selfies'):
+                # Active and archived selfies share one id space
+                known_ids.update(record.get('id') for record in
+                                 self.list_selfies() + self.list_archived_selfies())
+            known_keys = {_merge_key(record) for record in existing}
+            
+            added = []
+            clashing = []
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                key = _merge_key(record)
+                if key in known_keys:
+                    continue
+                known_keys.add(key)
+                if record.get('id') in known_ids or not isinstance(record.get('id'), int):
+                    clashing.append(record)
+                else:
+                    known_ids.add(record['id'])
+                    added.append(record)
+            
+            # Renumbered after the others, so no new id is taken twice
+            next_id = max([0] + [i for i in known_ids if isinstance(i, int)]) + 1
+            for record in clashing:
+                added.append(dict(record, id=next_id))
+                next_id += 1
+            
+            if added:
+                existing.extend(added)
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                if not self._write_json_file(filepath, existing):
+                    return None
+        
+        self._log(f"Merged {len(added)} {name} records ({len(clashing)} with new ids, "
+                  f"{len(records) - len(added)} already present)")
+        return len(added), len(records) - len(added)
+    
+    def import_blob(self, fileobj, blob_hash):
+        """
+        Store an image from a backup archive in the blob store.
+        
+        Args:
+            fileobj: Readable stream of the image bytes
+            blob_hash: The hash the archive names it by
+            
+        Returns:
+            True if the image was new, False if already stored
+            
+        Raises:
+            ValueError: If the bytes do not match blob_hash
+        """
+        _, is_new = self.blobs.put_stream(fileobj, expected_hash=blob_hash)
+        return is_new
+    
+    
+    # ============================================================
+    # SECTION 10: REPLICATION
+    # ============================================================
+    # Other kiosks' records arrive through replication.py. Each
+    # replicated record carries a 'uid' ("<node>:<id>@<created>")
+    # that names it everywhere, and a 'version' ("<time>|<node>");
+    # it gets its own local id here.
+    
+    def add_change_listener(self, callback):
+        """
+        Be told about new records saved on this kiosk.
+        
+        Only records created here (uploads, form posts, bulk
+        imports) are reported; apply_replicated() and
+        merge_collection() are not.
+        
+        Args:
+            callback: Function(collection, records), called after
+                      the records are on disk
+        """
+        self._change_listeners.append(callback)
+    
+    def _notify_change(self, collection, records):
+        """Pass newly saved records to the change listeners."""
+        for callback in self._change_listeners:
+            try:
+                callback(collection, records)
+            except Exception as e:
+                print(f"[LocalStorage] Change listener failed for {collection}: {e}")
+    
+    def apply_replicated(self, collection, records):
+        """
+        Merge records from other kiosks into a collection.
+        
+        A record whose uid is new is added with the next local id.
+        One whose uid is already here replaces the stored copy only
+        if its version is newer (last writer wins), keeping the
+        local id. Selfies already moved to the archive are left
+        there.
+        
+        Args:
+            collection: 'selfies', 'temple_visits' or 'missionaries'
+            records: Records with 'uid' and 'version' (no 'id')
+            
+        Returns:
+            Tuple of (added count, updated count), or None if the
+            collection could not be written
+        """
+        filepath = self._collection_files()[collection]
+        with self._lock:
+            existing = self._read_json_file(filepath)
+            positions = {record['uid']: index for index, record in enumerate(existing)
+                         if record.get('uid')}
+            archived = set()
+            if collection == 'selfies':
+                archived = {record.get('uid') for record in self.list_archived_selfies()}
+            
+            if collection == 'selfies':
+                next_id = self._next_selfie_id(existing)
+            else:
+                next_id = self._get_next_id(existing)
+            added = updated = 0
+            for record in records:
+                uid = record['uid']
+                if uid in archived:
+                    continue
+                if uid in positions:
+                    current = existing[positions[uid]]
+                    if record['version'] > current.get('version', ''):
+                        existing[positions[uid]] = dict(record, id=current['id'])
+                        updated += 1
+                    continue
+                positions[uid] = len(existing)
+                existing.append(dict(record, id=next_id))
+                next_id += 1
+                added += 1
+            
+            if added or updated:
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+                if not self._write_json_file(filepath, existing):
+                    return None
+        
+        if added or updated:
+            self._log(f"Replicated {collection}: {added} added, {updated} updated")
+        return added, updated
+    
+    
+    # ============================================================
+    # SECTION 11: TEMPLE PHOTOS (SCREENSAVER)
     # ============================================================
     
     def list_temple_photos(self):
         """
         List all temple photos available for the screensaver.
         
-        Scans the temple_photos directory and returns list of paths.
+        Scans TEMPLE_PHOTOS_ASSET_DIR and lists each distinct image
+        once: files with identical bytes (e.g. "photo (1).jpg" and
+        "photo (2).jpg") share one entry. Hashes are cached until a
+        file changes, so rescanning is cheap.
         
         Returns:
-            List of photo file paths
-            
-        TODO: Implement actual directory scanning
+            List of dicts with path (relative to FRONTEND_ROOT),
+            hash, size and duplicates (paths of identical copies)
         """
-        self._log("list_temple_photos called (not yet implemented)")
+        photo_dir = os.path.join(FRONTEND_ROOT, TEMPLE_PHOTOS_ASSET_DIR)
+        if not os.path.isdir(photo_dir):
+            return []
         
-        # TODO: Implementation:
-        # photos = []
-        # photo_dir = TEMPLE_PHOTOS_DIR
-        # 
-        # if os.path.exists(photo_dir):
-        #     for filename in os.listdir(photo_dir):
-        #         if filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-        #             photos.append(f"assets/temple_photos/{filename}")
-        # 
-        # return photos
+        photos = {}
+        for filename in sorted(os.listdir(photo_dir), key=str.lower):
+            if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+                continue
+            full_path = os.path.join(photo_dir, filename)
+            relpath = f"{TEMPLE_PHOTOS_ASSET_DIR}/{filename}"
+            photo_hash = hash_file(full_path)
+            
+            if photo_hash in photos:
+                photos[photo_hash]['duplicates'].append(relpath)
+                continue
+            photos[photo_hash] = {
+                'path': relpath,
+                'hash': photo_hash,
+                'size': os.path.getsize(full_path),
+                'duplicates': []
+            }
         
-        return []
+        return list(photos.values())
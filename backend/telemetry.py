@@ -0,0 +1,433 @@
+"""
+================================================================
+TELEMETRY.PY - CLIENT RENDER & INTERACTION TELEMETRY
+================================================================
+This module collects timings measured by the kiosk page on the
+kiosk's own hardware and keeps them as per-minute percentiles.
+
+PURPOSE:
+- POST /api/telemetry takes a batch of events from the page
+  (js/telemetry.js): page load timings, screen views, screensaver
+  transitions, gallery swipes, image decode times, long tasks
+- Events go into an in-memory ring buffer (the oldest are dropped
+  when it is full), so ingest is a few appends per event
+- A background task rolls finished minutes up into count, mean,
+  p50/p90/p99 and max per metric, appended to one JSON Lines file
+  per day in TELEMETRY_DIR
+- GET /api/telemetry/summary merges those rows for a time window
+
+EVENTS:
+    { "type": "transition", "name": "screensaver", "ms": 41.7 }
+
+type is one of EVENT_TYPES, name a short label (letters, digits,
+_ . : / -) and ms an optional duration; events without one are
+counted only. The metric is "<type>:<name>". Events are filed
+under the minute they arrive in (the page sends them within
+seconds), so the kiosk's clock does not matter.
+
+ROLLUP ROWS (one line per minute and metric):
+    {"minute": "2026-10-18T19:42", "metric": "screen_view:home",
+     "count": 12, "mean": 18.2, "p50": 16.1, "p90": 33.0,
+     "p99": 48.4, "max": 48.4, "timed": 12,
+     "hist": {"16": 7, "17": 3, ...}}
+
+"hist" counts durations per logarithmic bucket (4 per doubling),
+so rows of many minutes merge into window percentiles, estimated
+within a bucket's width (about 19%, usually much closer).
+
+USAGE:
+    POST /api/telemetry          { "events": [ ... ] }
+    GET  /api/telemetry/summary?minutes=60&type=screen_view&series=1
+================================================================
+"""
+
+import os
+import math
+import time
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, request
+
+# Read as config.NAME at call time so hot-reloaded values apply
+import config
+from config import TELEMETRY_BUFFER_EVENTS, TELEMETRY_DIR
+from records import dumps, loads
+from resource_watchdog import background_paused
+
+telemetry = Blueprint('telemetry', __name__)
+
+# Accepted event types
+EVENT_TYPES = ("navigation", "screen_view", "transition", "interaction",
+               "image_decode", "image_load", "long_task")
+
+# Longest accepted name; other characters than these make it "other"
+MAX_NAME_LENGTH = 48
+NAME_CHARACTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.:/-")
+
+# Longest accepted duration (ms); longer values are counted only
+MAX_DURATION_MS = 10 * 60 * 1000
+
+# Most events taken from one request, and largest request body
+MAX_BATCH_EVENTS = 1000
+MAX_BODY_BYTES = 512 * 1024
+
+# Histogram buckets per doubling of the duration
+BUCKETS_PER_OCTAVE = 4
+
+# Longest window /api/telemetry/summary accepts (minutes)
+MAX_SUMMARY_MINUTES = 31 * 24 * 60
+
+# (minute number, metric, duration ms or None), oldest first
+_buffer = deque(maxlen=TELEMETRY_BUFFER_EVENTS)
+
+# Minute number -> metric -> durations, for minutes not written yet
+_open_minutes = {}
+
+_stats = {"received": 0, "rejected": 0, "overwritten": 0, "rows_written": 0, "last_rollup": None}
+_rollup_lock = threading.Lock()
+_worker = None
+
+
+# ================================================================
+# SECTION 1: INGEST
+# ================================================================
+
+def _clean_name(name):
+    """A metric name safe to keep ("other" if it is not)."""
+    name = str(name or "")[:MAX_NAME_LENGTH]
+    if not name:
+        return "page"
+    return name if NAME_CHARACTERS.issuperset(name) else "other"
+
+
+def _clean_duration(value):
+    """A duration in ms, or None if missing or out of range."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if not 0 <= value <= MAX_DURATION_MS:
+        return None
+    return float(value)
+
+
+def ingest(events, now=None):
+    """
+    Add events to the ring buffer.
+
+    Args:
+        events: List of event dicts (see module docstring)
+        now: Arrival time in seconds (default: now)
+
+    Returns:
+        Tuple of (accepted, rejected) counts
+    """
+    minute = int((now or time.time()) // 60)
+    accepted = 0
+    for event in events[:MAX_BATCH_EVENTS]:
+        if not isinstance(event, dict) or event.get("type") not in EVENT_TYPES:
+            continue
+        if len(_buffer) == _buffer.maxlen:
+            _stats["overwritten"] += 1
+        _buffer.append((minute, f"{event['type']}:{_clean_name(event.get('name'))}",
+                        _clean_duration(event.get("ms"))))
+        accepted += 1
+
+    rejected = len(events) - accepted
+    _stats["received"] += accepted
+    _stats["rejected"] += rejected
+    return accepted, rejected
+
+
+# ================================================================
+# SECTION 2: ROLLUP
+# ================================================================
+
+def _bucket(ms):
+    """Histogram bucket of a duration."""
+    return 0 if ms < 1 else math.ceil(math.log2(ms) * BUCKETS_PER_OCTAVE)
+
+
+def _bucket_limit(bucket):
+    """Largest duration in a bucket."""
+    return 2 ** (bucket / BUCKETS_PER_OCTAVE)
+
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _summarize(minute, metric, values):
+    """The rollup row of one metric in one minute."""
+    row = {
+        "minute": datetime.fromtimestamp(minute * 60).strftime("%Y-%m-%dT%H:%M"),
+        "metric": metric,
+        "count": len(values)
+    }
+    durations = sorted(v for v in values if v is not None)
+    if durations:
+        hist = {}
+        for ms in durations:
+            bucket = _bucket(ms)
+            hist[bucket] = hist.get(bucket, 0) + 1
+        row.update(
+            mean=round(sum(durations) / len(durations), 2),
+            p50=round(_percentile(durations, 0.50), 2),
+            p90=round(_percentile(durations, 0.90), 2),
+            p99=round(_percentile(durations, 0.99), 2),
+            max=round(durations[-1], 2),
+            timed=len(durations),
+            hist={str(bucket): count for bucket, count in sorted(hist.items())}
+        )
+    return row
+
+
+def _day_file(day):
+    return os.path.join(TELEMETRY_DIR, f"{day}.jsonl")
+
+
+def _prune_days(today):
+    """Delete day files older than TELEMETRY_KEEP_DAYS."""
+    cutoff = (today - timedelta(days=config.TELEMETRY_KEEP_DAYS)).isoformat()
+    for entry in os.scandir(TELEMETRY_DIR):
+        if entry.name.endswith(".jsonl") and entry.name[:-len(".jsonl")] < cutoff:
+            os.remove(entry.path)
+
+
+def rollup_telemetry(now=None, flush_all=False):
+    """
+    Move buffered events into their minutes and write every minute
+    that has ended.
+
+    Args:
+        now: Current time in seconds (default: now)
+        flush_all: Also write the current minute (e.g. at shutdown)
+
+    Returns:
+        Number of rows written
+    """
+    current = int((now or time.time()) // 60)
+    with _rollup_lock:
+        while True:
+            try:
+                minute, metric, ms = _buffer.popleft()
+            except IndexError:
+                break
+            _open_minutes.setdefault(minute, {}).setdefault(metric, []).append(ms)
+
+        done = sorted(m for m in _open_minutes if flush_all or m < current)
+        lines_by_day = {}
+        for minute in done:
+            day = datetime.fromtimestamp(minute * 60).date().isoformat()
+            for metric, values in sorted(_open_minutes.pop(minute).items()):
+                lines_by_day.setdefault(day, []).append(dumps(_summarize(minute, metric, values)))
+
+        if lines_by_day:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            for day, lines in lines_by_day.items():
+                with open(_day_file(day), 'ab') as f:
+                    f.write(b"\n".join(lines) + b"\n")
+            _prune_days(datetime.fromtimestamp(current * 60).date())
+
+        written = sum(len(lines) for lines in lines_by_day.values())
+        _stats["rows_written"] += written
+        _stats["last_rollup"] = datetime.now().isoformat()
+        return written
+
+
+def start_telemetry_rollup():
+    """
+    Start the background rollup task (once per process).
+
+    It runs every TELEMETRY_ROLLUP_SECONDS and skips passes while
+    the resource watchdog has paused background jobs (the ring
+    buffer then keeps the newest events).
+    """
+    global _worker
+    if _worker is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(config.TELEMETRY_ROLLUP_SECONDS)
+            if config.TELEMETRY_ENABLED and not background_paused():
+                try:
+                    rollup_telemetry()
+                except Exception as e:
+                    print(f"[Telemetry] Rollup failed: {e}")
+
+    _worker = threading.Thread(target=run, daemon=True, name="telemetry-rollup")
+    _worker.start()
+
+
+# ================================================================
+# SECTION 3: SUMMARY
+# ================================================================
+
+def _read_rows(start, end):
+    """Rollup rows with start <= minute < end (datetimes)."""
+    first, last = start.strftime("%Y-%m-%dT%H:%M"), end.strftime("%Y-%m-%dT%H:%M")
+    day = start.date()
+    while day <= end.date():
+        try:
+            with open(_day_file(day.isoformat()), 'rb') as f:
+                for line in f:
+                    try:
+                        row = loads(line)
+                    except ValueError:
+                        # A line cut short by a crash mid-write
+                        continue
+                    if first <= row["minute"] < last:
+                        yield row
+        except FileNotFoundError:
+            pass
+        day += timedelta(days=1)
+
+
+def _merge(rows):
+    """Window totals of one metric from its per-minute rows."""
+    count = sum(row["count"] for row in rows)
+    timed = [row for row in rows if row.get("timed")]
+    merged = {"count": count, "minutes": len(rows)}
+    if not timed:
+        return merged
+
+    hist = {}
+    for row in timed:
+        for bucket, n in row["hist"].items():
+            hist[int(bucket)] = hist.get(int(bucket), 0) + n
+    total = sum(hist.values())
+    largest = max(row["max"] for row in timed)
+
+    def percentile(fraction):
+        # Interpolated within the bucket holding the rank
+        rank = max(1, math.ceil(fraction * total))
+        seen = 0
+        for bucket in sorted(hist):
+            if seen + hist[bucket] >= rank:
+                low = _bucket_limit(bucket - 1) if bucket > 0 else 0.0
+                high = min(_bucket_limit(bucket), largest)
+                return round(low + (high - low) * (rank - seen) / hist[bucket], 2)
+            seen += hist[bucket]
+        return largest
+
+    merged.update(
+        mean=round(sum(row["mean"] * row["timed"] for row in timed) / total, 2),
+        p50=percentile(0.50),
+        p90=percentile(0.90),
+        p99=percentile(0.99),
+        max=largest
+    )
+    return merged
+
+
+def telemetry_summary(minutes=60, event_type=None, name=None, series=False):
+    """
+    Percentiles per metric over the last `minutes` minutes.
+
+    Minutes that have ended are rolled up first, so they are
+    included without waiting for the background task.
+
+    Args:
+        minutes: Window length
+        event_type: Only metrics of this type
+        name: Only metrics with this name
+        series: Also return each metric's per-minute rows
+
+    Returns:
+        Dict with from, to, metrics (metric -> count, minutes, mean,
+        p50, p90, p99, max), series if asked for, and stats
+    """
+    rollup_telemetry()
+    end = datetime.fromtimestamp(int(time.time() // 60) * 60)
+    start = end - timedelta(minutes=minutes)
+
+    rows_by_metric = {}
+    for row in _read_rows(start, end):
+        metric_type, _, metric_name = row["metric"].partition(":")
+        if event_type and metric_type != event_type:
+            continue
+        if name and metric_name != name:
+            continue
+        rows_by_metric.setdefault(row["metric"], []).append(row)
+
+    summary = {
+        "from": start.strftime("%Y-%m-%dT%H:%M"),
+        "to": end.strftime("%Y-%m-%dT%H:%M"),
+        "metrics": {metric: _merge(rows) for metric, rows in sorted(rows_by_metric.items())},
+        "stats": telemetry_stats()
+    }
+    if series:
+        summary["series"] = {
+            metric: [{key: value for key, value in row.items() if key not in ("metric", "hist")}
+                     for row in rows]
+            for metric, rows in sorted(rows_by_metric.items())
+        }
+    return summary
+
+
+def telemetry_stats():
+    """Ingest counters and buffer fill."""
+    return dict(_stats, enabled=config.TELEMETRY_ENABLED, buffered=len(_buffer),
+                buffer_size=_buffer.maxlen)
+
+
+# ================================================================
+# SECTION 4: ROUTES
+# ================================================================
+
+@telemetry.route('/api/telemetry', methods=['POST'])
+def post_telemetry():
+    """
+    POST /api/telemetry
+
+    Body: { "events": [ { "type", "name", "ms" }, ... ] }. Sent as
+    application/json by fetch, or as text/plain by
+    navigator.sendBeacon() when the page is closing.
+
+    Response (202): { "status": "ok", "data": { "accepted": 40,
+    "rejected": 0, "enabled": true } }
+    """
+    if not config.TELEMETRY_ENABLED:
+        return jsonify({"status": "ok", "data": {"accepted": 0, "rejected": 0, "enabled": False}}), 202
+    if request.content_length is not None and request.content_length > MAX_BODY_BYTES:
+        return jsonify({"status": "error", "message": "Telemetry batch is too large"}), 413
+
+    body = request.get_json(force=True, silent=True)
+    events = body.get("events") if isinstance(body, dict) else None
+    if not isinstance(events, list):
+        return jsonify({"status": "error", "message": "Body must be {\"events\": [...]}"}), 400
+
+    accepted, rejected = ingest(events)
+    return jsonify({"status": "ok",
+                    "data": {"accepted": accepted, "rejected": rejected, "enabled": True}}), 202
+
+
+@telemetry.route('/api/telemetry/summary', methods=['GET'])
+def get_telemetry_summary():
+    """
+    GET /api/telemetry/summary
+
+    Query parameters:
+        minutes: Window ending at the current minute (default 60)
+        type:    Only this event type (e.g. screen_view)
+        name:    Only this name (e.g. screensaver)
+        series:  1 to add per-minute rows
+
+    Response: { "status": "ok", "data": { "from", "to", "metrics":
+    { "screen_view:home": { "count", "minutes", "mean", "p50",
+    "p90", "p99", "max" }, ... }, "stats": { ... } } }
+    """
+    try:
+        minutes = int(request.args.get('minutes', 60))
+    except ValueError:
+        return jsonify({"status": "error", "message": "'minutes' must be a whole number"}), 400
+    if not 1 <= minutes <= MAX_SUMMARY_MINUTES:
+        return jsonify({"status": "error",
+                        "message": f"'minutes' must be between 1 and {MAX_SUMMARY_MINUTES}"}), 400
+
+    summary = telemetry_summary(minutes,
+                                event_type=request.args.get('type') or None,
+                                name=request.args.get('name') or None,
+                                series=request.args.get('series') in ('1', 'true'))
+    return jsonify({"status": "ok", "data": summary})
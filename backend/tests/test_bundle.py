@@ -0,0 +1,61 @@
+"""
+================================================================
+TEST_BUNDLE.PY - MINIFIER TESTS
+================================================================
+minify_js() must tell a regex literal from a division, or it
+copies code as if it were a regex (or the other way round) and
+the bundle breaks.
+
+RUNNING THEM:
+    cd backend
+    python -m pytest tests        (or python -m unittest discover tests)
+================================================================
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bundle import minify_js
+
+
+class MinifyJsTest(unittest.TestCase):
+
+    def assertMinifies(self, source, expected):
+        self.assertEqual(minify_js(source), expected + "\n")
+
+    def test_division(self):
+        self.assertMinifies("x = a / b / c", "x=a/b/c")
+        self.assertMinifies("x = 10 / 2", "x=10/2")
+        self.assertMinifies("x = f(a) / 2", "x=f(a)/2")
+        self.assertMinifies("x = a[0] / 2", "x=a[0]/2")
+
+    def test_division_after_update_operators(self):
+        self.assertMinifies("x = a++ / 2; y = /re[/]x/g.test(s)",
+                            "x=a++/2;y=/re[/]x/g.test(s)")
+        self.assertMinifies("x = a-- / 2 / b", "x=a--/2/b")
+
+    def test_regex(self):
+        self.assertMinifies("x = /a b/g", "x=/a b/g")
+        self.assertMinifies("f(/a \\/\\/ b/)", "f(/a \\/\\/ b/)")
+        self.assertMinifies("x = a + /b c/.source", "x=a+/b c/.source")
+        self.assertMinifies("return /x y/.test(s)", "return/x y/.test(s)")
+        self.assertMinifies("x = [/a/, /b/]", "x=[/a/,/b/]")
+
+    def test_regex_with_slash_in_class(self):
+        self.assertMinifies("x = /[/] y/", "x=/[/] y/")
+
+    def test_update_operators_keep_their_spaces(self):
+        self.assertMinifies("a = b ++ + c", "a=b++ +c")
+        self.assertMinifies("a = b + ++c", "a=b+ ++c")
+        self.assertMinifies("a = b - --c", "a=b- --c")
+
+    def test_comments_and_strings(self):
+        self.assertMinifies("x = 1; // one\ny = '/* 2 */' /* two */", "x=1;\ny='/* 2 */'")
+        self.assertMinifies("x = a / 2 // half", "x=a/2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+================================================================
+TEST_STORAGE_LOCAL.PY - SELFIE ARCHIVE REGRESSION TESTS
+================================================================
+Selfies moved to the archive keep their ids; a selfie saved after
+an archive pass must not take one of them, and an archive pass
+must never drop a selfie it did not write to the archive.
+
+RUNNING THEM:
+    cd backend
+    python -m pytest tests        (or python -m unittest discover tests)
+================================================================
+"""
+
+import os
+import sys
+import base64
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage_local import LocalStorage
+
+
+def _image(data):
+    """Selfie upload body for some bytes (not decoded as an image)."""
+    return base64.b64encode(data).decode('ascii')
+
+
+class SelfieArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        # DATA_DIR is relative to the working directory
+        self._cwd = os.getcwd()
+        self._dir = tempfile.mkdtemp()
+        os.chdir(self._dir)
+        self.storage = LocalStorage()
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self._dir)
+
+    def _archive(self, selfie):
+        return self.storage.archive_selfies([{"id": selfie['id'], "thumb": None, "copy": None}])
+
+    def test_save_after_archive_gets_a_new_id(self):
+        first = self.storage.save_selfie(_image(b"first selfie"))
+        self.assertEqual(self._archive(first), 1)
+
+        second = self.storage.save_selfie(_image(b"second selfie"))
+        self.assertNotEqual(second['id'], first['id'])
+        self.assertEqual(self._archive(second), 1)
+
+        self.assertEqual(self.storage.list_selfies(), [])
+        archive = self.storage.list_archived_selfies()
+        self.assertEqual([record['blob'] for record in archive], [first['blob'], second['blob']])
+        for record in archive:
+            self.assertTrue(os.path.isfile(self.storage.get_selfie_path(record)))
+
+    def test_selfie_sharing_an_archived_id_is_archived(self):
+        # Data saved before ids counted the archive: two selfies, id 1
+        first = self.storage.save_selfie(_image(b"first selfie"))
+        self._archive(first)
+        second = self.storage.save_selfie(_image(b"second selfie"))
+        selfies = self.storage.list_selfies()
+        selfies[0]['id'] = first['id']
+        self.storage._write_json_file(self.storage._selfie_metadata_file(), selfies)
+
+        self.assertEqual(self.storage.archive_selfies(
+            [{"id": first['id'], "thumb": None, "copy": None}]), 1)
+
+        self.assertEqual(self.storage.list_selfies(), [])
+        archive = self.storage.list_archived_selfies()
+        self.assertEqual(len(archive), 2)
+        self.assertTrue(os.path.isfile(self.storage.blobs.path(second['blob'])))
+
+    def test_archive_pass_repeated_after_crash(self):
+        # A crash between the two writes leaves a selfie in both lists
+        selfie = self.storage.save_selfie(_image(b"selfie"))
+        self._archive(selfie)
+        self.storage._write_json_file(self.storage._selfie_metadata_file(), [selfie])
+
+        self.assertEqual(self._archive(selfie), 1)
+        self.assertEqual(self.storage.list_selfies(), [])
+        self.assertEqual(len(self.storage.list_archived_selfies()), 1)
+        self.assertTrue(os.path.isfile(self.storage.blobs.path(selfie['blob'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -94,6 +94,9 @@ const KIOSK_CONFIG = {
         BULLETIN_QR_ENABLED: false,  // Replaced with floating QR code
         MISSIONARY_SECTION_ENABLED: true,  // Now a Phase 1 feature
 
+        // Report render timings to the backend (/api/telemetry)
+        TELEMETRY_ENABLED: true,
+
         // Phase 2 features (set to true when ready)
         YOUTH_SECTION_ENABLED: false,
         PRIMARY_SECTION_ENABLED: false,
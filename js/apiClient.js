@@ -25,6 +25,15 @@
 const ApiClient = (function() {
     'use strict';
 
+    // Every POST carries a key; the backend answers a retry with the
+    // same key from the first attempt's response (idempotency.py)
+    const IDEMPOTENCY_HEADER = 'Idempotency-Key';
+
+    // Times a POST is sent again after a timeout or network error,
+    // and the wait before each retry
+    const POST_RETRIES = 2;
+    const POST_RETRY_DELAY_MS = 1000;
+
     /* ============================================================
        SECTION 1: PRIVATE HELPER FUNCTIONS
        ============================================================ */
@@ -57,16 +66,41 @@ const ApiClient = (function() {
         }
     }
     
+    /**
+     * A new random idempotency key.
+     * @returns {string}
+     */
+    function newIdempotencyKey() {
+        if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}` +
+               `${Math.random().toString(36).slice(2)}`;
+    }
+
+    /**
+     * Wait before a retry.
+     * @param {number} ms
+     * @returns {Promise<void>}
+     */
+    function delay(ms) {
+        return new Promise(resolve => setTimeout(resolve, ms));
+    }
+
     /**
      * Make an HTTP request to the backend.
+     * A POST is sent with an Idempotency-Key and, after a timeout or
+     * network error (or while its first attempt is still running on
+     * the server), sent again with the same key up to POST_RETRIES
+     * times, so a retry never saves a record twice.
      * @param {string} endpoint - API endpoint (e.g., "/api/temple-visits")
-     * @param {Object} options - Fetch options
+     * @param {Object} options - Fetch options, plus idempotencyKey to
+     *        reuse a key across calls (e.g. a user pressing "retry")
      * @returns {Promise<Object>} Response data
      */
     async function makeRequest(endpoint, options = {}) {
-        const url = `${getBaseUrl()}${endpoint}`;
-        const timeout = getTimeout();
-        
+        const { idempotencyKey, ...requestOptions } = options;
+
         // Set up default options
         const defaultOptions = {
             method: 'GET',
@@ -76,10 +110,40 @@ const ApiClient = (function() {
             }
         };
         
-        const fetchOptions = { ...defaultOptions, ...options };
-        
-        logApiCall(fetchOptions.method, endpoint, options.body);
+        const fetchOptions = { ...defaultOptions, ...requestOptions };
         
+        logApiCall(fetchOptions.method, endpoint, requestOptions.body);
+
+        if (fetchOptions.method !== 'POST') {
+            return await sendRequest(endpoint, fetchOptions);
+        }
+
+        fetchOptions.headers = {
+            ...fetchOptions.headers,
+            [IDEMPOTENCY_HEADER]: idempotencyKey || newIdempotencyKey()
+        };
+        let result = await sendRequest(endpoint, fetchOptions);
+        for (let retry = 1; retry <= POST_RETRIES && result.retryable; retry++) {
+            console.warn(`[API] Retrying ${endpoint} (${retry}/${POST_RETRIES})`);
+            await delay((result.retryAfter || 0) * 1000 || POST_RETRY_DELAY_MS);
+            result = await sendRequest(endpoint, fetchOptions);
+        }
+        delete result.retryable;
+        return result;
+    }
+
+    /**
+     * Send one HTTP request.
+     * @param {string} endpoint - API endpoint
+     * @param {Object} fetchOptions - Complete fetch options
+     * @returns {Promise<Object>} Response data; errors worth retrying
+     *          (timeouts, network errors, 409) have retryable: true;
+     *          network errors also have offline: true
+     */
+    async function sendRequest(endpoint, fetchOptions) {
+        const url = `${getBaseUrl()}${endpoint}`;
+        const timeout = getTimeout();
+
         try {
             // Create abort controller for timeout
             const controller = new AbortController();
@@ -91,7 +155,28 @@ const ApiClient = (function() {
             });
             
             clearTimeout(timeoutId);
-            
+
+            // Server is shedding load (rate limit or upload back-pressure)
+            if (response.status === 429) {
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+                console.warn(`[API] Server busy, retry after ${retryAfter}s: ${endpoint}`);
+                return {
+                    status: 'error',
+                    message: 'Server is busy, please try again shortly',
+                    retryAfter: retryAfter
+                };
+            }
+
+            // The first attempt of this POST is still being processed
+            if (response.status === 409) {
+                return {
+                    status: 'error',
+                    message: 'Request is still being processed',
+                    retryAfter: parseInt(response.headers.get('Retry-After'), 10) || 1,
+                    retryable: true
+                };
+            }
+
             // Check if response is OK
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
@@ -110,7 +195,7 @@ const ApiClient = (function() {
             // Handle different error types
             if (error.name === 'AbortError') {
                 console.error(`[API] Request timeout: ${endpoint}`);
-                return { status: 'error', message: 'Request timed out' };
+                return { status: 'error', message: 'Request timed out', retryable: true };
             }
             
             if (error.message.includes('Failed to fetch')) {
@@ -118,7 +203,9 @@ const ApiClient = (function() {
                 console.error(`[API] Expected backend at: ${getBaseUrl()}`);
                 return { 
                     status: 'error', 
-                    message: 'Cannot connect to backend. Make sure Python server is running.' 
+                    message: 'Cannot connect to backend. Make sure Python server is running.',
+                    retryable: true,
+                    offline: true
                 };
             }
             
@@ -127,6 +214,42 @@ const ApiClient = (function() {
         }
     }
 
+    // Promise of the /api/bootstrap payload (null until started)
+    let _bootstrap = null;
+
+    /**
+     * Take one part of the startup bootstrap, if it was requested.
+     * Each part is handed out once; later calls go to the network
+     * so they see fresh data.
+     * @param {string} key - Part name (config, health, playlist, ...)
+     * @returns {Promise<*>} The part's data, or undefined
+     */
+    async function takeBootstrapPart(key) {
+        if (!_bootstrap) return undefined;
+        const data = await _bootstrap;
+        if (!data || data[key] === undefined || data[key] === null) return undefined;
+        const value = data[key];
+        data[key] = null;
+        return value;
+    }
+
+    /**
+     * Look up keyed entries (image or media info) in the bootstrap.
+     * @param {string} key - "images" or "media"
+     * @param {Array<string>} paths - Paths wanted
+     * @returns {Promise<Object|undefined>} path -> info, or undefined
+     *          unless every path is there
+     */
+    async function findBootstrapEntries(key, paths) {
+        if (!_bootstrap) return undefined;
+        const data = await _bootstrap;
+        const entries = data && data[key];
+        if (!entries || !paths.every(path => entries[path])) return undefined;
+        const found = {};
+        paths.forEach(path => { found[path] = entries[path]; });
+        return found;
+    }
+
 
     /* ============================================================
        SECTION 2: TEMPLE VISITS API
@@ -160,14 +283,17 @@ const ApiClient = (function() {
      * @param {string} visitData.date - Date of visit (YYYY-MM-DD)
      * @param {number} visitData.count - Number of people who attended
      * @param {string} visitData.notes - Optional notes
+     * @param {string} idempotencyKey - Optional; pass the same key when
+     *        submitting the same visit again, so it is saved once
      * @returns {Promise<Object>} Result of the operation
      * 
      * TODO: Implement in backend to save to local storage or Google Drive
      */
-    async function postTempleVisit(visitData) {
+    async function postTempleVisit(visitData, idempotencyKey) {
         return await makeRequest('/api/temple-visits', {
             method: 'POST',
-            body: JSON.stringify(visitData)
+            body: JSON.stringify(visitData),
+            idempotencyKey: idempotencyKey
         });
     }
 
@@ -199,21 +325,56 @@ const ApiClient = (function() {
         return await makeRequest('/api/selfies');
     }
     
+    /**
+     * URL of the selfie wall: the most recent selfies in one JPEG,
+     * sized for a display. Only the parts with new selfies are
+     * redrawn on the server, and the image has an ETag, so
+     * reloading it is cheap when nothing changed.
+     * @param {number} width - Wall width in pixels
+     * @param {number} height - Wall height in pixels
+     * @returns {string} Absolute image URL
+     */
+    function getSelfieMosaicUrl(width, height) {
+        return `${getBaseUrl()}/api/selfies/mosaic?w=${Math.round(width)}&h=${Math.round(height)}`;
+    }
+    
     /**
      * Upload a new selfie.
      * @param {Object} selfieData - Selfie data
      * @param {string} selfieData.imageBase64 - Base64-encoded image data
      * @param {string} selfieData.caption - Optional caption
+     * @param {string} idempotencyKey - Optional; pass the same key when
+     *        uploading the same selfie again, so it is saved once
      * @returns {Promise<Object>} Result of the upload
      * 
      * TODO: Implement image upload to backend
      * TODO: Handle large image files appropriately
      * TODO: Add image compression on frontend before upload
      */
-    async function postSelfie(selfieData) {
+    async function postSelfie(selfieData, idempotencyKey) {
         return await makeRequest('/api/selfies', {
             method: 'POST',
-            body: JSON.stringify(selfieData)
+            body: JSON.stringify(selfieData),
+            idempotencyKey: idempotencyKey
+        });
+    }
+
+    /**
+     * Hand a kiosk selfie to the backend, which forwards it to the
+     * Apps Script web app in the background (see selfie_relay.py).
+     * Answers as soon as the backend has saved it.
+     * @param {Object} selfieData - Selfie data
+     * @param {string} selfieData.imageBase64 - Base64-encoded JPEG
+     * @param {string} selfieData.timestamp - When it was taken (ISO)
+     * @param {string} idempotencyKey - Optional; pass the same key when
+     *        sending the same selfie again, so it is forwarded once
+     * @returns {Promise<Object>} { status, data: { id, pending } }
+     */
+    async function relaySelfie(selfieData, idempotencyKey) {
+        return await makeRequest('/api/selfies/relay', {
+            method: 'POST',
+            body: JSON.stringify(selfieData),
+            idempotencyKey: idempotencyKey
         });
     }
 
@@ -280,10 +441,66 @@ const ApiClient = (function() {
      * }
      */
     async function getMissions() {
-        // TODO: Implement when Phase 2 is ready
+        const missions = await takeBootstrapPart('missions');
+        if (missions !== undefined) return { status: 'ok', data: missions };
         return await makeRequest('/api/missions');
     }
 
+    /**
+     * Get clustered map markers for the visible part of the map.
+     * Call on every pan/zoom; the server only reads the index cells
+     * inside the viewport.
+     * @param {Object} bounds - { south, west, north, east } in degrees
+     * @param {number} zoom - Map zoom level (0 = whole world)
+     * @returns {Promise<Object>} Markers for the viewport
+     *
+     * Expected response format:
+     * {
+     *   status: "ok",
+     *   data: {
+     *     zoom: 4,
+     *     markers: [
+     *       { type: "cluster", count: 12, lat: -23.1, lng: -46.2, bounds: [...] },
+     *       { type: "missionary", id: 3, name: "Elder Smith", lat: 40.7, lng: -74.0 }
+     *     ]
+     *   }
+     * }
+     */
+    async function getMissionMarkers(bounds, zoom) {
+        const bbox = [bounds.south, bounds.west, bounds.north, bounds.east].join(',');
+        return await makeRequest(`/api/missions?bbox=${bbox}&zoom=${Math.round(zoom)}`);
+    }
+
+    /**
+     * Get a missionary's gallery photos with thumbnail and
+     * display-size URLs.
+     * @param {number|string} missionaryId - Missionary id
+     * @param {string} galleryFolder - galleryFolder from config.js
+     *                                 (e.g. "gallery/kylie/")
+     * @returns {Promise<Object>} Gallery manifest
+     *
+     * Expected response format:
+     * {
+     *   status: "ok",
+     *   data: {
+     *     folder: "gallery/kylie",
+     *     photos: [
+     *       {
+     *         name: "photo.jpg",
+     *         original: { url: "/media/...", width: 4128, height: 3096 },
+     *         display: { url: "/gallery/...", width: 1600, height: 1200 },
+     *         thumb: { url: "/gallery/...", width: 320, height: 240 }
+     *       },
+     *       ...
+     *     ]
+     *   }
+     * }
+     */
+    async function getMissionaryPhotos(missionaryId, galleryFolder) {
+        const query = galleryFolder ? `?folder=${encodeURIComponent(galleryFolder)}` : '';
+        return await makeRequest(`/api/missionaries/${encodeURIComponent(missionaryId)}/photos${query}`);
+    }
+
 
     /* ============================================================
        SECTION 6: CALENDAR API (PHASE 2)
@@ -315,6 +532,9 @@ const ApiClient = (function() {
         
         if (params.toString()) {
             endpoint += `?${params.toString()}`;
+        } else {
+            const events = await takeBootstrapPart('calendar');
+            if (events !== undefined) return { status: 'ok', data: events };
         }
         
         // TODO: Implement when Phase 2 is ready
@@ -341,6 +561,8 @@ const ApiClient = (function() {
      * - Feature flags from backend
      */
     async function getConfig() {
+        const backendConfig = await takeBootstrapPart('config');
+        if (backendConfig !== undefined) return { status: 'ok', data: backendConfig };
         return await makeRequest('/api/config');
     }
 
@@ -368,8 +590,86 @@ const ApiClient = (function() {
     }
 
 
+    /**
+     * Get the screensaver's photo rotation.
+     * @returns {Promise<Object>} Playlist
+     *
+     * Expected response format:
+     * {
+     *   status: "ok",
+     *   data: {
+     *     version: "4be1...",
+     *     prefetch: 2,
+     *     photos: [
+     *       { path: "assets/temple_photos/...", url: "/gallery/...",
+     *         width: 1920, height: 1280, placeholder: "data:..." },
+     *       ...
+     *     ]
+     *   }
+     * }
+     */
+    async function getScreensaverPlaylist() {
+        const playlist = await takeBootstrapPart('playlist');
+        if (playlist !== undefined) return { status: 'ok', data: playlist };
+        return await makeRequest('/api/screensaver/playlist');
+    }
+
+    /**
+     * Get display size and a tiny inline placeholder for images.
+     * @param {Array<string>} paths - Image paths relative to the
+     *                                kiosk root (as in config.js)
+     * @returns {Promise<Object>} Map of path -> info
+     *
+     * Expected response format:
+     * {
+     *   status: "ok",
+     *   data: {
+     *     "assets/missionary_photos/2.png": {
+     *       url: "/media/...", width: 411, height: 295,
+     *       placeholder: "data:image/jpeg;base64,..."
+     *     },
+     *     ...
+     *   }
+     * }
+     */
+    async function getImageInfo(paths) {
+        const known = await findBootstrapEntries('images', paths);
+        if (known) return { status: 'ok', data: known };
+
+        const query = paths.map(path => `path=${encodeURIComponent(path)}`).join('&');
+        return await makeRequest(`/api/images?${query}`);
+    }
+
+
+    /* ============================================================
+       SECTION 9: MEDIA API
+       ============================================================
+       The backend serves photos and videos at /media/... with
+       Range requests (video seeking) and long-lived caching.
+       ============================================================ */
+
+    /**
+     * Get the backend URL for a media file.
+     * The URL is fingerprinted, so the browser can cache it forever.
+     * @param {string} path - Path relative to the kiosk root
+     *                        (e.g. "assets/videos/president_nelson.mp4")
+     * @returns {Promise<string|null>} Absolute URL, or null if the
+     *          backend is unavailable or does not have the file
+     */
+    async function getMediaUrl(path) {
+        const known = await findBootstrapEntries('media', [path]);
+        const response = known
+            ? { status: 'ok', data: known[path] }
+            : await makeRequest(`/api/media?path=${encodeURIComponent(path)}`);
+        if (response.status !== 'ok' || !response.data) {
+            return null;
+        }
+        return `${getBaseUrl()}${response.data.url}`;
+    }
+
+
     /* ============================================================
-       SECTION 9: HEALTH CHECK
+       SECTION 10: HEALTH CHECK
        ============================================================
        Simple endpoint to check if backend is running.
        ============================================================ */
@@ -379,6 +679,9 @@ const ApiClient = (function() {
      * @returns {Promise<boolean>} True if backend is available
      */
     async function checkHealth() {
+        if (await takeBootstrapPart('health') !== undefined) {
+            return true;
+        }
         try {
             const response = await makeRequest('/api/config');
             return response.status === 'ok';
@@ -389,7 +692,65 @@ const ApiClient = (function() {
 
 
     /* ============================================================
-       SECTION 10: PUBLIC API
+       SECTION 11: BATCHING & STARTUP BOOTSTRAP
+       ============================================================
+       One round trip instead of many. startBootstrap() fetches
+       everything needed at startup with GET /api/bootstrap; the
+       getters above (getConfig, getScreensaverPlaylist,
+       getImageInfo, getMediaUrl, ...) answer their first call from
+       it and fall back to their own request if it failed.
+       ============================================================ */
+
+    /**
+     * Start fetching the startup data. Call before the modules
+     * initialize; their first API calls wait for it.
+     * @param {Object} options
+     * @param {Array<string>} options.images - Image paths to describe
+     * @param {Array<string>} options.media - Media paths to resolve
+     * @returns {Promise<Object|null>} Bootstrap data, or null if the
+     *          backend is unavailable
+     */
+    function startBootstrap(options = {}) {
+        const params = new URLSearchParams();
+        (options.images || []).forEach(path => params.append('image', path));
+        (options.media || []).forEach(path => params.append('media', path));
+
+        const query = params.toString();
+        _bootstrap = makeRequest(`/api/bootstrap${query ? `?${query}` : ''}`)
+            .then(response => (response.status === 'ok' ? response.data : null));
+        return _bootstrap;
+    }
+
+    /**
+     * Run several API requests in one round trip.
+     * GET requests run in parallel on the server; others run in
+     * order.
+     * @param {Array<Object>} requests - Each { id, method, path, body }
+     * @returns {Promise<Object>} { status, data: { responses: [...] } },
+     *          one response ({ id, status, headers, body }) per request
+     */
+    async function batch(requests) {
+        return await makeRequest('/api/batch', {
+            method: 'POST',
+            body: JSON.stringify({ requests: requests })
+        });
+    }
+
+    /**
+     * Send a batch of telemetry events (see telemetry.js).
+     * @param {Array<Object>} events - Each { type, name, ms }
+     * @returns {Promise<Object>} { status, data: { accepted, rejected, enabled } }
+     */
+    async function postTelemetry(events) {
+        return await makeRequest('/api/telemetry', {
+            method: 'POST',
+            body: JSON.stringify({ events: events })
+        });
+    }
+
+
+    /* ============================================================
+       SECTION 12: PUBLIC API
        ============================================================ */
     
     return {
@@ -399,7 +760,9 @@ const ApiClient = (function() {
         
         // Selfies (Phase 1)
         getSelfies: getSelfies,
+        getSelfieMosaicUrl: getSelfieMosaicUrl,
         postSelfie: postSelfie,
+        relaySelfie: relaySelfie,
         
         // Miracles (Phase 2)
         getMiracles: getMiracles,
@@ -407,6 +770,8 @@ const ApiClient = (function() {
         
         // Missions (Phase 2)
         getMissions: getMissions,
+        getMissionMarkers: getMissionMarkers,
+        getMissionaryPhotos: getMissionaryPhotos,
         
         // Calendar (Phase 2)
         getCalendarEvents: getCalendarEvents,
@@ -414,9 +779,24 @@ const ApiClient = (function() {
         // Configuration
         getConfig: getConfig,
         getTemplePhotos: getTemplePhotos,
+        getImageInfo: getImageInfo,
+        getScreensaverPlaylist: getScreensaverPlaylist,
+
+        // Media
+        getMediaUrl: getMediaUrl,
         
         // Health check
-        checkHealth: checkHealth
+        checkHealth: checkHealth,
+
+        // Batching
+        startBootstrap: startBootstrap,
+        batch: batch,
+
+        // Telemetry
+        postTelemetry: postTelemetry,
+
+        // Idempotency keys for callers that retry on their own
+        newIdempotencyKey: newIdempotencyKey
     };
 
 })();
@@ -75,6 +75,13 @@ const KioskApp = (function() {
     function init() {
         console.log('[KioskApp] Starting initialization...');
         
+        // Fetch the modules' startup data in one request; their
+        // first API calls are answered from it
+        startBootstrap();
+
+        // Measure render times on this hardware (see telemetry.js)
+        Telemetry.init();
+
         // Initialize all modules in order
         try {
             // Views must be initialized first to set up the DOM
@@ -119,11 +126,42 @@ const KioskApp = (function() {
             // Optional: Check backend health
             checkBackendHealth();
 
+            // Keep the page and its photos cached for offline boots
+            registerServiceWorker();
+
         } catch (error) {
             console.error('[KioskApp] Initialization failed:', error);
         }
     }
     
+    /**
+     * Request everything the modules load at startup with a single
+     * GET /api/bootstrap instead of one request per module.
+     */
+    function startBootstrap() {
+        const missionaries = (window.KIOSK_CONFIG && window.KIOSK_CONFIG.MISSIONARIES &&
+            window.KIOSK_CONFIG.MISSIONARIES.MISSIONARIES_LIST) || [];
+
+        ApiClient.startBootstrap({
+            images: missionaries.map(m => m.photoUrl).filter(Boolean),
+            media: [Temple365Video.getVideoPath()]
+        });
+    }
+
+    /**
+     * Register the offline service worker (sw.js). Only works when
+     * the page is served by the backend, which serves /sw.js; opened
+     * as a file, the page runs without it.
+     */
+    function registerServiceWorker() {
+        if (!('serviceWorker' in navigator) || !location.protocol.startsWith('http')) {
+            return;
+        }
+        navigator.serviceWorker.register('/sw.js', { scope: '/' })
+            .then(() => ConfigLoader.debugLog('Service worker registered'))
+            .catch(error => console.warn('[KioskApp] Service worker not registered:', error.message));
+    }
+
     /**
      * Check if the backend is reachable.
      */
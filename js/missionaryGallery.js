@@ -8,13 +8,19 @@
    - Photo counter (e.g., "2 of 4")
    - Close button to return to profile
 
-   CURRENT: Photos are loaded from local assets folder
+   CURRENT: Photos are listed by the backend
+            (GET /api/missionaries/{id}/photos), which provides a
+            small thumbnail and a screen-sized copy of each photo.
+            The thumbnail shows instantly; the screen-sized copy
+            replaces it once downloaded. Only the current photo and
+            the next thumbnail are fetched.
+            Without the backend, the config.js galleryPhotos array
+            and the full-size files are used.
    FUTURE: Will integrate with Google Drive for remote photo storage
 
    FOLDER STRUCTURE:
    - Each missionary has their own gallery folder
    - Path: assets/missionary_photos/gallery/{missionary_name}/
-   - Photos are listed in config.js galleryPhotos array
 
    ================================================================ */
 
@@ -34,6 +40,7 @@ const MissionaryGallery = (function() {
     let _nextBtn = null;
     let _swipeHint = null;
 
+    // Each photo: { thumb: url|null, display: url }
     let _photos = [];
     let _currentIndex = 0;
     let _missionaryName = '';
@@ -136,11 +143,36 @@ const MissionaryGallery = (function() {
        SECTION 3: GALLERY OPERATIONS
        ============================================================ */
 
+    /**
+     * Get the photo list for a missionary.
+     * Uses the backend manifest when available, otherwise the
+     * galleryPhotos array from config.js.
+     * @param {Object} missionary - The missionary object
+     * @returns {Promise<Array>} Photos as { thumb, display } URLs
+     */
+    async function loadPhotoList(missionary) {
+        const response = await ApiClient.getMissionaryPhotos(missionary.id, _galleryFolder);
+        if (response.status === 'ok' && response.data && response.data.photos.length > 0) {
+            const baseUrl = ConfigLoader.getApiBaseUrl();
+            return response.data.photos.map(function(photo) {
+                return {
+                    thumb: baseUrl + photo.thumb.url,
+                    display: baseUrl + photo.display.url
+                };
+            });
+        }
+
+        const basePath = 'assets/missionary_photos/';
+        return (missionary.galleryPhotos || []).map(function(photoFilename) {
+            return { thumb: null, display: basePath + _galleryFolder + photoFilename };
+        });
+    }
+
     /**
      * Open the gallery for a missionary.
      * @param {Object} missionary - The missionary object with gallery data
      */
-    function open(missionary) {
+    async function open(missionary) {
         if (!missionary) {
             console.error('[MissionaryGallery] No missionary data provided');
             return;
@@ -148,7 +180,7 @@ const MissionaryGallery = (function() {
 
         _missionaryName = missionary.name || 'Missionary';
         _galleryFolder = missionary.galleryFolder || '';
-        _photos = missionary.galleryPhotos || [];
+        _photos = await loadPhotoList(missionary);
 
         // If no photos in config, try to use a default message
         if (_photos.length === 0) {
@@ -202,9 +234,9 @@ const MissionaryGallery = (function() {
     function loadCurrentPhoto() {
         if (!_currentImage || _photos.length === 0) return;
 
-        const photoFilename = _photos[_currentIndex];
-        const basePath = 'assets/missionary_photos/';
-        const fullPath = basePath + _galleryFolder + photoFilename;
+        const index = _currentIndex;
+        const photo = _photos[index];
+        const fullPath = photo.display;
 
         /* FUTURE: Google Drive Integration
         // When using Google Drive, construct URL like this:
@@ -225,9 +257,31 @@ const MissionaryGallery = (function() {
             _currentImage.classList.remove('loading');
         };
 
-        _currentImage.src = fullPath;
         _currentImage.alt = _missionaryName + ' - Photo ' + (_currentIndex + 1);
 
+        if (photo.thumb) {
+            // Show the thumbnail now, swap in the sharp copy when ready
+            _currentImage.src = photo.thumb;
+
+            const sharp = new Image();
+            const loadStartedAt = performance.now();
+            sharp.onload = function() {
+                Telemetry.record('image_load', 'gallery', performance.now() - loadStartedAt);
+                if (_isOpen && _currentIndex === index) {
+                    _currentImage.src = fullPath;
+                }
+            };
+            sharp.src = fullPath;
+
+            // Warm the next thumbnail so swiping feels instant
+            const next = _photos[(index + 1) % _photos.length];
+            if (next.thumb) {
+                new Image().src = next.thumb;
+            }
+        } else {
+            _currentImage.src = fullPath;
+        }
+
         // Update counter
         updateCounter();
     }
@@ -249,8 +303,10 @@ const MissionaryGallery = (function() {
 
         hideSwipeHint();
 
+        const startedAt = performance.now();
         _currentIndex = (_currentIndex - 1 + _photos.length) % _photos.length;
         loadCurrentPhoto();
+        Telemetry.afterPaint('interaction', 'gallery_swipe', startedAt);
     }
 
     /**
@@ -261,8 +317,10 @@ const MissionaryGallery = (function() {
 
         hideSwipeHint();
 
+        const startedAt = performance.now();
         _currentIndex = (_currentIndex + 1) % _photos.length;
         loadCurrentPhoto();
+        Telemetry.afterPaint('interaction', 'gallery_swipe', startedAt);
     }
 
     /**
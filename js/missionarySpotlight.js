@@ -5,6 +5,8 @@
    - Displays a grid of missionary squares
    - Auto-calculates grid layout based on missionary count
    - Shows missionary photos or silhouette placeholders
+   - Paints a tiny blurred preview of each photo (from the
+     backend's /api/images) while the photo loads
    - Handles clicks to navigate to individual missionary details
 
    PURPOSE:
@@ -21,6 +23,9 @@ const MissionarySpotlight = (function() {
 
     let _gridContainer = null;
     let _missionaries = [];
+
+    // photoUrl -> { width, height, placeholder } from the backend
+    let _imageInfo = {};
     let _isActive = false;
     let _scrollHintDismissed = false;
     let _hideHintOnScrollHandler = null;
@@ -44,6 +49,9 @@ const MissionarySpotlight = (function() {
         // Load missionary data from config
         loadMissionaryData();
 
+        // Fetch photo sizes and placeholders in the background
+        loadImageInfo();
+
         ConfigLoader.debugLog('Missionary spotlight initialized');
     }
 
@@ -64,6 +72,45 @@ const MissionarySpotlight = (function() {
         }
     }
 
+    /**
+     * Fetch size and placeholder for every missionary photo, then
+     * apply them to any squares already on screen.
+     */
+    async function loadImageInfo() {
+        const paths = _missionaries.map(m => m.photoUrl).filter(Boolean);
+        if (paths.length === 0) return;
+
+        const response = await ApiClient.getImageInfo(paths);
+        if (response.status !== 'ok' || !response.data) return;
+
+        _imageInfo = response.data;
+        if (_gridContainer) {
+            _gridContainer.querySelectorAll('img.missionary-photo').forEach(applyImageInfo);
+        }
+    }
+
+    /**
+     * Give a photo its intrinsic size and a blurred background
+     * that shows until the photo itself has decoded.
+     * @param {HTMLImageElement} img - A missionary photo element
+     */
+    function applyImageInfo(img) {
+        const info = _imageInfo[img.getAttribute('src')];
+        if (!info) return;
+
+        if (info.width && info.height) {
+            img.width = info.width;
+            img.height = info.height;
+        }
+        if (info.placeholder && !img.complete) {
+            img.style.backgroundImage = `url('${info.placeholder}')`;
+            img.style.backgroundSize = 'cover';
+            img.addEventListener('load', function() {
+                img.style.backgroundImage = '';
+            }, { once: true });
+        }
+    }
+
     /* ============================================================
        SECTION 4: GRID LAYOUT CALCULATION
        ============================================================ */
@@ -142,6 +189,7 @@ const MissionarySpotlight = (function() {
             img.src = missionary.photoUrl;
             img.alt = missionary.name;
             img.className = 'missionary-photo';
+            applyImageInfo(img);
             photoContainer.appendChild(img);
         } else {
             // Use silhouette placeholder
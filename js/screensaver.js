@@ -10,6 +10,21 @@
    The screensaver acts as an "attract mode" for the kiosk,
    drawing attention with beautiful temple photos when the
    kiosk is not being used.
+
+   PLAYLIST:
+   When the backend is running, the photo order comes from
+   /api/screensaver/playlist: each distinct photo once, shuffled
+   the same way after every restart, resized to screen size.
+   Without the backend, the config.js list is used as-is.
+
+   Only the next few photos (the playlist's "prefetch" count) are
+   downloaded ahead, so the browser never holds the whole folder
+   in memory.
+
+   PLACEHOLDERS:
+   Each playlist photo has a tiny blurred preview layered
+   underneath it, so a photo that is still downloading shows its
+   colors instead of a blank.
    ================================================================ */
 
 const Screensaver = (function() {
@@ -21,6 +36,18 @@ const Screensaver = (function() {
     
     // Array of temple photo URLs
     let _photos = [];
+
+    // Photo URL -> inline placeholder data URI (from the backend)
+    let _placeholders = {};
+
+    // Photo URL -> original asset path (for the temple name overlay)
+    let _sourcePaths = {};
+
+    // Photos to download ahead of the one on screen
+    let _prefetchCount = 2;
+
+    // Photo URL -> Image being downloaded/held for the next photos
+    let _prefetched = {};
     
     // Current photo index
     let _currentIndex = 0;
@@ -52,7 +79,7 @@ const Screensaver = (function() {
   // 2) Name overlay (safe)
   const overlay = document.getElementById("temple-name-overlay");
   if (overlay) {
-    overlay.innerText = formatTempleNameFromFilename(photoUrl);
+    overlay.innerText = formatTempleNameFromFilename(_sourcePaths[photoUrl] || photoUrl);
   }
 }
 
@@ -81,8 +108,11 @@ const Screensaver = (function() {
         updateTempleDisplay(_photos[0], _bgCurrent);
 
         
-        // Preload all images
-        preloadImages();
+        // Download the next few photos
+        prefetchUpcoming();
+
+        // Switch to the backend's playlist when it is available
+        loadPlaylist();
         
         // Set up click handler
         setupClickHandler();
@@ -96,22 +126,60 @@ const Screensaver = (function() {
        ============================================================ */
     
     /**
-     * Preload all temple photos for smooth transitions.
+     * Download the next few photos for smooth transitions.
+     * Photos that have left the window are released so the
+     * browser can free their memory.
      */
-    function preloadImages() {
-        _photos.forEach(photoUrl => {
-            const img = new Image();
-            img.src = photoUrl;
+    function prefetchUpcoming() {
+        const wanted = {};
+        const count = Math.min(_prefetchCount, _photos.length - 1);
+        for (let step = 1; step <= count; step++) {
+            const photoUrl = _photos[(_currentIndex + step) % _photos.length];
+            wanted[photoUrl] = _prefetched[photoUrl] || new Image();
+            wanted[photoUrl].src = photoUrl;
+        }
+        _prefetched = wanted;
+    }
+    
+    /**
+     * Replace the config.js photos with the backend's playlist.
+     * Without the backend, the config.js photos stay in use.
+     */
+    async function loadPlaylist() {
+        const response = await ApiClient.getScreensaverPlaylist();
+        if (response.status !== 'ok' || !response.data || response.data.photos.length === 0) {
+            return;
+        }
+
+        const baseUrl = ConfigLoader.getApiBaseUrl();
+        _placeholders = {};
+        _sourcePaths = {};
+        const photoUrls = response.data.photos.map(photo => {
+            const photoUrl = baseUrl + photo.url;
+            if (photo.placeholder) {
+                _placeholders[photoUrl] = photo.placeholder;
+            }
+            _sourcePaths[photoUrl] = photo.path;
+            return photoUrl;
         });
+        _prefetchCount = response.data.prefetch;
+
+        setPhotos(photoUrls);
+        ConfigLoader.debugLog('Screensaver playlist loaded:', photoUrls.length, 'photos');
     }
     
     /**
      * Set the background image of an element.
+     * The placeholder (if known) is layered underneath, so it
+     * shows until the photo has loaded.
      * @param {HTMLElement} element - The element to update
      * @param {string} imageUrl - URL of the image
      */
     function setBackground(element, imageUrl) {
-        element.style.backgroundImage = `url('${imageUrl}')`;
+        const placeholder = _placeholders[imageUrl];
+        element.style.backgroundImage = placeholder
+            ? `url('${imageUrl}'), url('${placeholder}')`
+            : `url('${imageUrl}')`;
     }
     
     /**
@@ -171,12 +239,14 @@ const Screensaver = (function() {
         
         // Prepare the next background
         updateTempleDisplay(_photos[nextIndex], _bgNext);
+        Telemetry.timeImageDecode(_photos[nextIndex], 'screensaver');
 
 
         // Crossfade animation
         // Fade out current, fade in next
         _bgCurrent.style.opacity = '0';
         _bgNext.style.opacity = '1';
+        Telemetry.watchFrames('transition', 'screensaver', 1500);
         
         // After transition completes, swap the elements
         setTimeout(() => {
@@ -187,6 +257,9 @@ const Screensaver = (function() {
             
             // Update the index
             _currentIndex = nextIndex;
+
+            // Move the download window along
+            prefetchUpcoming();
             
         }, 1500); // Match CSS transition duration
         
@@ -277,22 +350,20 @@ const Screensaver = (function() {
 
 
     /* ============================================================
-       SECTION 7: PHOTO MANAGEMENT (FOR FUTURE USE)
+       SECTION 7: PHOTO MANAGEMENT
        ============================================================ */
     
     /**
      * Set a new list of photos.
      * @param {Array<string>} photoUrls - Array of image URLs
-     * 
-     * TODO: Use this when loading photos from backend API
      */
     function setPhotos(photoUrls) {
         _photos = photoUrls;
         _currentIndex = 0;
         
         if (_photos.length > 0) {
-            setBackground(_bgCurrent, _photos[0]);
-            preloadImages();
+            updateTempleDisplay(_photos[0], _bgCurrent);
+            prefetchUpcoming();
         }
         
         // Restart rotation if active
@@ -308,9 +379,8 @@ const Screensaver = (function() {
     function addPhoto(photoUrl) {
         _photos.push(photoUrl);
         
-        // Preload the new image
-        const img = new Image();
-        img.src = photoUrl;
+        // Downloaded when it comes within the prefetch window
+        prefetchUpcoming();
     }
     
     /**
@@ -4,9 +4,16 @@
    Handles webcam access, preview, countdown, capture, and upload
    for the kiosk selfie mosaic feature.
 
+   UPLOAD:
+   Selfies are handed to the local backend (POST /api/selfies/relay),
+   which answers at once and forwards them to the Apps Script web
+   app in the background. Only when the backend cannot be reached
+   is the selfie posted to Apps Script directly.
+
    DEPENDENCIES:
    - Views.js for screen management
-   - Apps Script endpoint for upload
+   - ApiClient.js for the backend relay
+   - Apps Script endpoint for upload without the backend
    ================================================================ */
 
 const SelfieCapture = (function() {
@@ -16,7 +23,9 @@ const SelfieCapture = (function() {
        SECTION 1: CONFIGURATION
        ============================================================ */
 
-    // Apps Script web app URL for kiosk selfie uploads
+    // Apps Script web app URL for kiosk selfie uploads, used only
+    // when the backend is not running (it relays them otherwise;
+    // see SELFIE_RELAY_URL in backend/config.py)
     const APPS_SCRIPT_URL = 'https://script.google.com/macros/s/AKfycbxFqa1EIlhbDGkTruKe1T_3qq50ITqYxtGsYdbwYFZidGzyutZqWIRwaUsRKn-a0trb8g/exec';
 
     // Camera constraints
@@ -359,25 +368,50 @@ const SelfieCapture = (function() {
 
 
     /* ============================================================
-       SECTION 7: UPLOAD TO APPS SCRIPT
+       SECTION 7: UPLOAD (RELAYED TO APPS SCRIPT)
        ============================================================ */
 
     /**
-     * Upload selfie to Apps Script backend.
+     * Upload selfie: through the backend relay, or straight to
+     * Apps Script when the backend cannot be reached.
      * @param {Blob} imageBlob - The captured image blob
-     * @returns {Promise<Object>} - Upload result
+     * @returns {Promise<Object>} - Upload result ({ success, message })
      */
     async function uploadSelfie(imageBlob) {
         console.log('[SelfieCapture] Uploading selfie...');
 
         // Convert blob to base64
         const base64Data = await blobToBase64(imageBlob);
+        const timestamp = new Date().toISOString();
+
+        const result = await ApiClient.relaySelfie({
+            imageBase64: base64Data,
+            timestamp: timestamp
+        });
+
+        if (result.status === 'ok') {
+            return { success: true, message: result.message };
+        }
+        if (!result.offline) {
+            return { success: false, message: result.message };
+        }
+
+        console.warn('[SelfieCapture] Backend unreachable, uploading to Apps Script directly');
+        return await uploadToAppsScript(base64Data, timestamp);
+    }
 
+    /**
+     * Upload selfie straight to the Apps Script web app.
+     * @param {string} base64Data - JPEG as base64 (no data: prefix)
+     * @param {string} timestamp - When it was taken (ISO)
+     * @returns {Promise<Object>} - Upload result
+     */
+    async function uploadToAppsScript(base64Data, timestamp) {
         // Create form data for Apps Script
         const formData = new FormData();
         formData.append('action', 'saveKioskSelfie');
         formData.append('imageData', base64Data);
-        formData.append('timestamp', new Date().toISOString());
+        formData.append('timestamp', timestamp);
 
         // Send to Apps Script
         const response = await fetch(APPS_SCRIPT_URL, {
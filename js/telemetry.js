@@ -0,0 +1,274 @@
+/* ================================================================
+   TELEMETRY.JS - RENDER & INTERACTION TIMINGS
+   ================================================================
+   Measures how fast the kiosk actually renders on its own hardware
+   and reports it to the backend (POST /api/telemetry), which keeps
+   per-minute percentiles (GET /api/telemetry/summary).
+
+   WHAT IS MEASURED:
+   - navigation:   page load milestones (DOM ready, load, first paint)
+   - screen_view:  time from switching screens to the next painted
+                   frame (views.js)
+   - transition:   the longest frame during a screensaver crossfade
+   - interaction:  time from a gallery swipe to the next painted frame
+   - image_decode / image_load: decode time of screensaver photos,
+                   load time of gallery photos
+   - long_task:    main thread tasks over 50 ms (where supported)
+
+   Events are queued in memory and sent in batches every
+   FLUSH_INTERVAL_MS (or once MAX_BATCH_EVENTS are waiting), and
+   with navigator.sendBeacon() when the page is closed. Nothing is
+   measured when FEATURE_FLAGS.TELEMETRY_ENABLED is false, and
+   sending stops if the backend has telemetry turned off.
+
+   USAGE:
+     Telemetry.record('image_load', 'gallery', 120.5);
+     const startedAt = performance.now();
+     // ... change the screen ...
+     Telemetry.afterPaint('screen_view', 'home', startedAt);
+   ================================================================ */
+
+const Telemetry = (function() {
+    'use strict';
+
+    /* ============================================================
+       SECTION 1: CONFIGURATION
+       ============================================================ */
+
+    // Time between batches sent to the backend
+    const FLUSH_INTERVAL_MS = 15000;
+
+    // Send early once this many events are waiting
+    const MAX_BATCH_EVENTS = 200;
+
+    // Events kept while the backend is unreachable; older ones are
+    // dropped
+    const MAX_QUEUED_EVENTS = 1000;
+
+
+    /* ============================================================
+       SECTION 2: PRIVATE VARIABLES
+       ============================================================ */
+
+    let _events = [];
+    let _enabled = false;
+    let _flushTimer = null;
+    let _isInitialized = false;
+
+
+    /* ============================================================
+       SECTION 3: INITIALIZATION
+       ============================================================ */
+
+    /**
+     * Start measuring. Called once by app.js at startup.
+     */
+    function init() {
+        if (_isInitialized) return;
+        _isInitialized = true;
+
+        _enabled = ConfigLoader.isFeatureEnabled('TELEMETRY_ENABLED') &&
+                   typeof performance !== 'undefined';
+        if (!_enabled) {
+            return;
+        }
+
+        observeLongTasks();
+        if (document.readyState === 'complete') {
+            recordNavigation();
+        } else {
+            window.addEventListener('load', () => setTimeout(recordNavigation, 0), { once: true });
+        }
+
+        _flushTimer = setInterval(flush, FLUSH_INTERVAL_MS);
+        window.addEventListener('pagehide', sendBeacon);
+
+        ConfigLoader.debugLog('Telemetry started');
+    }
+
+
+    /* ============================================================
+       SECTION 4: RECORDING
+       ============================================================ */
+
+    /**
+     * Queue one event.
+     * @param {string} type - Event type (see backend telemetry.py)
+     * @param {string} name - Short label, e.g. 'screensaver'
+     * @param {number} ms - Duration in milliseconds (optional)
+     */
+    function record(type, name, ms) {
+        if (!_enabled) return;
+
+        const event = { type: type, name: name };
+        if (typeof ms === 'number' && isFinite(ms)) {
+            event.ms = Math.round(ms * 10) / 10;
+        }
+        _events.push(event);
+
+        if (_events.length > MAX_QUEUED_EVENTS) {
+            _events.splice(0, _events.length - MAX_QUEUED_EVENTS);
+        }
+        if (_events.length >= MAX_BATCH_EVENTS) {
+            flush();
+        }
+    }
+
+    /**
+     * Record the time from `startedAt` until the next frame has been
+     * painted (two animation frames later).
+     * @param {string} type - Event type
+     * @param {string} name - Short label
+     * @param {number} startedAt - performance.now() when the change began
+     */
+    function afterPaint(type, name, startedAt) {
+        if (!_enabled) return;
+        requestAnimationFrame(() => {
+            requestAnimationFrame(() => record(type, name, performance.now() - startedAt));
+        });
+    }
+
+    /**
+     * Record the longest frame seen during an animation, which is
+     * what a viewer notices as a stutter.
+     * @param {string} type - Event type
+     * @param {string} name - Short label
+     * @param {number} durationMs - How long the animation runs
+     */
+    function watchFrames(type, name, durationMs) {
+        if (!_enabled) return;
+
+        const startedAt = performance.now();
+        let last = startedAt;
+        let longest = 0;
+
+        function frame(now) {
+            longest = Math.max(longest, now - last);
+            last = now;
+            if (now - startedAt < durationMs) {
+                requestAnimationFrame(frame);
+            } else {
+                record(type, name, longest);
+            }
+        }
+        requestAnimationFrame(frame);
+    }
+
+    /**
+     * Record how long an image takes to load and decode.
+     * @param {string} url - Image URL
+     * @param {string} name - Short label
+     */
+    function timeImageDecode(url, name) {
+        if (!_enabled || !url) return;
+
+        const image = new Image();
+        const startedAt = performance.now();
+        image.src = url;
+        if (typeof image.decode === 'function') {
+            image.decode()
+                .then(() => record('image_decode', name, performance.now() - startedAt))
+                .catch(() => {});
+        }
+    }
+
+    /**
+     * Record the page load milestones of this page.
+     */
+    function recordNavigation() {
+        const entries = performance.getEntriesByType ? performance.getEntriesByType('navigation') : [];
+        if (entries.length) {
+            const timing = entries[0];
+            record('navigation', 'dom_ready', timing.domContentLoadedEventEnd);
+            record('navigation', 'load', timing.loadEventEnd || performance.now());
+        }
+
+        const paints = performance.getEntriesByType ? performance.getEntriesByType('paint') : [];
+        paints.forEach(paint => {
+            if (paint.name === 'first-contentful-paint') {
+                record('navigation', 'first_paint', paint.startTime);
+            }
+        });
+    }
+
+    /**
+     * Record main thread tasks longer than 50 ms.
+     */
+    function observeLongTasks() {
+        if (typeof PerformanceObserver === 'undefined' ||
+                !(PerformanceObserver.supportedEntryTypes || []).includes('longtask')) {
+            return;
+        }
+        new PerformanceObserver(list => {
+            list.getEntries().forEach(entry => record('long_task', 'page', entry.duration));
+        }).observe({ type: 'longtask', buffered: true });
+    }
+
+
+    /* ============================================================
+       SECTION 5: SENDING
+       ============================================================ */
+
+    /**
+     * Send the waiting events to the backend.
+     * @returns {Promise<void>}
+     */
+    async function flush() {
+        if (!_enabled || _events.length === 0) return;
+
+        const batch = _events.splice(0, MAX_BATCH_EVENTS);
+        const result = await ApiClient.postTelemetry(batch);
+
+        if (result.status === 'ok' && result.data && result.data.enabled === false) {
+            // Turned off on the backend; stop measuring
+            stop();
+        } else if (result.status !== 'ok') {
+            // Keep them for the next attempt
+            _events = batch.concat(_events).slice(-MAX_QUEUED_EVENTS);
+        }
+    }
+
+    /**
+     * Send what is left while the page is being closed.
+     */
+    function sendBeacon() {
+        if (!_enabled || _events.length === 0 || !navigator.sendBeacon) return;
+
+        // text/plain keeps the beacon a "simple" cross-origin request
+        const body = new Blob([JSON.stringify({ events: _events })], { type: 'text/plain' });
+        if (navigator.sendBeacon(`${ConfigLoader.getApiBaseUrl()}/api/telemetry`, body)) {
+            _events = [];
+        }
+    }
+
+    /**
+     * Stop measuring and sending.
+     */
+    function stop() {
+        _enabled = false;
+        _events = [];
+        if (_flushTimer) {
+            clearInterval(_flushTimer);
+            _flushTimer = null;
+        }
+        ConfigLoader.debugLog('Telemetry stopped');
+    }
+
+
+    /* ============================================================
+       SECTION 6: PUBLIC API
+       ============================================================ */
+
+    return {
+        init: init,
+        record: record,
+        afterPaint: afterPaint,
+        watchFrames: watchFrames,
+        timeImageDecode: timeImageDecode,
+        flush: flush
+    };
+
+})();
+
+// Make available globally
+window.Telemetry = Telemetry;
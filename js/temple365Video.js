@@ -7,6 +7,9 @@
    - Video starts only when user taps "Start Video"
    - When video ends, button changes to "Play Again"
    - Does not autoplay or loop
+   - Streams from the backend's /media/ route when it is running
+     (seeking and replay fetch only the needed bytes, and the file
+     is cached); falls back to the local file otherwise
    ================================================================ */
 
 const Temple365Video = (function() {
@@ -20,6 +23,13 @@ const Temple365Video = (function() {
     let _playButton = null;
     let _isInitialized = false;
 
+    // Video path relative to the kiosk root
+    const VIDEO_PATH = 'assets/videos/president_nelson.mp4';
+
+    // Original <source> URL, used if the backend copy fails
+    let _localSrc = null;
+    let _usingBackend = false;
+
 
     /* ============================================================
        SECTION 2: INITIALIZATION
@@ -40,10 +50,29 @@ const Temple365Video = (function() {
         // Set up event listeners
         setupEventListeners();
 
+        // Prefer the backend copy (Range requests + caching)
+        useBackendSource();
+
         _isInitialized = true;
         console.log('[Temple365Video] Initialized');
     }
 
+    /**
+     * Point the video at the backend's /media/ URL if available.
+     */
+    async function useBackendSource() {
+        const backendUrl = await ApiClient.getMediaUrl(VIDEO_PATH);
+        if (!backendUrl || !_videoElement.paused || _videoElement.currentTime > 0) {
+            return;
+        }
+
+        const source = _videoElement.querySelector('source');
+        _localSrc = source ? source.getAttribute('src') : VIDEO_PATH;
+        _usingBackend = true;
+        _videoElement.src = backendUrl;
+        _videoElement.load();
+    }
+
     /**
      * Set up event listeners.
      */
@@ -119,6 +148,15 @@ const Temple365Video = (function() {
      * Handle video error.
      */
     function handleVideoError(e) {
+    // Backend copy failed: fall back to the local file once
+    if (_usingBackend) {
+        console.warn('[Temple365Video] Backend video failed, using local file');
+        _usingBackend = false;
+        _videoElement.removeAttribute('src');
+        _videoElement.load();
+        return;
+    }
+
     console.error('[Temple365Video] Video error:', e);
 
     // Show local-only fallback message
@@ -188,10 +226,19 @@ const Temple365Video = (function() {
        SECTION 5: PUBLIC API
        ============================================================ */
 
+    /**
+     * Path of the Temple 365 video (for the startup bootstrap).
+     * @returns {string} Path relative to the kiosk root
+     */
+    function getVideoPath() {
+        return VIDEO_PATH;
+    }
+
     return {
         init: init,
         activate: activate,
-        deactivate: deactivate
+        deactivate: deactivate,
+        getVideoPath: getVideoPath
     };
 
 })();
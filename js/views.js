@@ -78,6 +78,8 @@ const Views = (function() {
      * @param {string} stateName - The state/screen to show
      */
     function showScreen(stateName) {
+        const startedAt = performance.now();
+
         // First hide all screens
         hideAllScreens();
         
@@ -85,6 +87,7 @@ const Views = (function() {
         const screen = getScreenElement(stateName);
         if (screen) {
             screen.classList.add('active');
+            Telemetry.afterPaint('screen_view', stateName.toLowerCase(), startedAt);
             ConfigLoader.debugLog(`Showing screen: ${stateName}`);
         } else {
             console.error(`[Views] Cannot show screen: ${stateName}`);
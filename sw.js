@@ -0,0 +1,311 @@
+/* ================================================================
+   SW.JS - OFFLINE SERVICE WORKER
+   ================================================================
+   Lets the kiosk boot from the browser's own cache when the
+   backend or network is slow, and refreshes in the background.
+
+   PURPOSE:
+   - Keeps every file in GET /api/precache-manifest (the page,
+     its bundle, screensaver photos, missionary thumbnails) in a
+     Cache Storage cache named after the manifest's version
+   - Answers those files from the cache, the page itself from the
+     cache while fetching a fresh copy for next time
+   - Answers API reads (GET /api/...) from the last response seen
+     while fetching a fresh one (stale-while-revalidate); a write
+     (POST) to a collection drops its cached reads
+
+   UPDATES:
+   Every page load checks the manifest (at most once a minute).
+   When its version changed, only entries whose hash changed are
+   downloaded; the rest are copied from the previous cache, which
+   is then deleted.
+
+   Registered by app.js when the page is served by the backend
+   (http://localhost:5000/), which serves this file at /sw.js.
+   ================================================================ */
+
+'use strict';
+
+/* ============================================================
+   SECTION 1: SETTINGS
+   ============================================================ */
+
+// Precache names are this prefix plus the manifest version
+const PRECACHE_PREFIX = 'kiosk-precache-';
+
+// Last responses of API reads
+const API_CACHE = 'kiosk-api-v1';
+
+const MANIFEST_URL = '/api/precache-manifest';
+
+// Entry in each precache holding its url -> hash index; written
+// last, so a precache without it is incomplete
+const INDEX_KEY = '/__precache-index';
+
+// API reads that must always come from the server
+const API_NO_CACHE = [
+    '/api/health',
+    '/api/precache-manifest',
+    '/api/replication/',
+    '/api/export',
+    '/api/debug/',
+    '/api/telemetry'
+];
+
+// Downloads running at once while precaching
+const PRECACHE_CONCURRENCY = 4;
+
+// Minimum time between manifest checks
+const REFRESH_INTERVAL_MS = 60 * 1000;
+
+let _lastRefresh = 0;
+let _refreshing = null;
+
+// Name of the precache in use (looked up again after a restart)
+let _precacheName = null;
+
+
+/* ============================================================
+   SECTION 2: PRECACHE
+   ============================================================ */
+
+/**
+ * Fetch the precache manifest from the backend.
+ * @returns {Promise<Object>} { version, assets: [{ url, hash }] }
+ */
+async function fetchManifest() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-store' });
+    if (!response.ok) {
+        throw new Error(`Manifest request failed: ${response.status}`);
+    }
+    return (await response.json()).data;
+}
+
+/**
+ * Name of the newest complete precache, or null.
+ * @returns {Promise<string|null>}
+ */
+async function currentPrecache() {
+    const names = (await caches.keys()).filter(name => name.startsWith(PRECACHE_PREFIX));
+    for (const name of names.reverse()) {
+        const cache = await caches.open(name);
+        if (await cache.match(INDEX_KEY)) {
+            return name;
+        }
+    }
+    return null;
+}
+
+/**
+ * The precache answering requests (cached lookup of currentPrecache).
+ * @returns {Promise<Cache|null>}
+ */
+async function activePrecache() {
+    if (!_precacheName) {
+        _precacheName = await currentPrecache();
+    }
+    return _precacheName ? caches.open(_precacheName) : null;
+}
+
+/**
+ * Read a precache's url -> hash index.
+ * @param {Cache} cache
+ * @returns {Promise<Object>}
+ */
+async function readIndex(cache) {
+    const response = await cache.match(INDEX_KEY);
+    return response ? (await response.json()).hashes : {};
+}
+
+/**
+ * Fill the precache of a manifest version. Entries whose hash is
+ * unchanged are copied from the previous precache; a download that
+ * fails is skipped (it is served from the network instead).
+ * @param {Object} manifest - From fetchManifest()
+ * @returns {Promise<string>} Name of the filled precache
+ */
+async function precache(manifest) {
+    const name = PRECACHE_PREFIX + manifest.version;
+    const previousName = await currentPrecache();
+    if (previousName === name) {
+        return name;
+    }
+
+    const cache = await caches.open(name);
+    const previous = previousName ? await caches.open(previousName) : null;
+    const previousHashes = previous ? await readIndex(previous) : {};
+    const hashes = {};
+    const queue = manifest.assets.slice();
+    let copied = 0;
+    let failed = 0;
+
+    async function worker() {
+        while (queue.length) {
+            const asset = queue.shift();
+            try {
+                const old = previousHashes[asset.url] === asset.hash && await previous.match(asset.url);
+                if (old) {
+                    await cache.put(asset.url, old);
+                    copied++;
+                } else {
+                    await cache.add(new Request(asset.url, { cache: 'reload' }));
+                }
+                hashes[asset.url] = asset.hash;
+            } catch (error) {
+                failed++;
+            }
+        }
+    }
+
+    const workers = [];
+    for (let i = 0; i < PRECACHE_CONCURRENCY; i++) {
+        workers.push(worker());
+    }
+    await Promise.all(workers);
+
+    await cache.put(INDEX_KEY, new Response(JSON.stringify({ version: manifest.version, hashes: hashes }),
+        { headers: { 'Content-Type': 'application/json' } }));
+    console.log(`[SW] Precached ${manifest.assets.length} files ` +
+                `(${copied} unchanged, ${failed} failed) as ${name}`);
+    return name;
+}
+
+/**
+ * Delete every precache except the one named.
+ * @param {string} keep
+ */
+async function deleteOtherPrecaches(keep) {
+    _precacheName = keep;
+    const names = await caches.keys();
+    await Promise.all(names
+        .filter(name => name.startsWith(PRECACHE_PREFIX) && name !== keep)
+        .map(name => caches.delete(name)));
+}
+
+/**
+ * Bring the precache up to date with the backend's manifest.
+ * Runs at most once per REFRESH_INTERVAL_MS, and never twice at
+ * the same time.
+ * @returns {Promise<void>}
+ */
+function refreshPrecache() {
+    const now = Date.now();
+    if (_refreshing || now - _lastRefresh < REFRESH_INTERVAL_MS) {
+        return _refreshing || Promise.resolve();
+    }
+    _lastRefresh = now;
+    _refreshing = fetchManifest()
+        .then(precache)
+        .then(deleteOtherPrecaches)
+        .catch(error => console.warn('[SW] Precache not updated:', error.message))
+        .finally(() => { _refreshing = null; });
+    return _refreshing;
+}
+
+
+/* ============================================================
+   SECTION 3: LIFECYCLE
+   ============================================================ */
+
+self.addEventListener('install', event => {
+    // A failed manifest request must not block installing; API
+    // reads are still cached and the precache follows later
+    event.waitUntil(refreshPrecache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+
+/* ============================================================
+   SECTION 4: ANSWERING REQUESTS
+   ============================================================ */
+
+/**
+ * Answer from the cache if possible and update the cache from the
+ * network in the background; without a cached copy, wait for the
+ * network.
+ * @param {FetchEvent} event
+ * @param {Cache} cache - Cache to read and update
+ * @param {string|Request} key - Cache key (default: the request)
+ * @returns {Promise<Response>}
+ */
+async function staleWhileRevalidate(event, cache, key) {
+    key = key || event.request;
+    const cached = await cache.match(key);
+    const network = fetch(event.request).then(response => {
+        if (response.ok) {
+            cache.put(key, response.clone());
+        }
+        return response;
+    });
+
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+/**
+ * Drop cached API reads of the collection a write went to
+ * (e.g. POST /api/temple-visits/bulk drops GET /api/temple-visits).
+ * @param {URL} url - URL of the write
+ */
+async function invalidateApiReads(url) {
+    const collection = url.pathname.split('/').slice(0, 3).join('/');
+    const cache = await caches.open(API_CACHE);
+    const keys = await cache.keys();
+    await Promise.all(keys
+        .filter(request => new URL(request.url).pathname.startsWith(collection))
+        .map(request => cache.delete(request)));
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    const isApi = url.pathname.startsWith('/api/');
+
+    if (request.method !== 'GET') {
+        if (isApi && request.method === 'POST') {
+            event.respondWith(fetch(request).then(response => {
+                if (response.ok) {
+                    event.waitUntil(invalidateApiReads(url));
+                }
+                return response;
+            }));
+        }
+        return;
+    }
+
+    // The page: cached copy now, fresh copy (and precache check) later
+    if (request.mode === 'navigate' && url.origin === self.location.origin &&
+            (url.pathname === '/' || url.pathname === '/index.html')) {
+        event.respondWith((async () => {
+            event.waitUntil(refreshPrecache());
+            const cache = await activePrecache();
+            if (!cache) {
+                return fetch(request);
+            }
+            return staleWhileRevalidate(event, cache, '/');
+        })());
+        return;
+    }
+
+    if (isApi) {
+        if (!API_NO_CACHE.some(prefix => url.pathname.startsWith(prefix))) {
+            event.respondWith(caches.open(API_CACHE).then(cache => staleWhileRevalidate(event, cache)));
+        }
+        return;
+    }
+
+    // Precached files (their URLs change with their content)
+    if (url.origin === self.location.origin) {
+        event.respondWith((async () => {
+            const cache = await activePrecache();
+            const cached = cache && await cache.match(request);
+            return cached || fetch(request);
+        })());
+    }
+});